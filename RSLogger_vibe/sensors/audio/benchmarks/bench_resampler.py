@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Throughput benchmark for the streaming polyphase resampler.
+
+Run from the audio sensor directory:
+
+    python benchmarks/bench_resampler.py [--seconds 30] [--json results.json]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.resampler import PolyphaseResampler
+
+
+CONVERSIONS = [
+    (48000, 44100),
+    (44100, 48000),
+    (96000, 48000),
+    (48000, 16000),
+    (44100, 16000),
+]
+
+
+def run_case(in_rate: int, out_rate: int, channels: int, dtype: str,
+             blocksize: int, seconds: float) -> dict:
+    """Resample ``seconds`` of noise blockwise and measure throughput."""
+    resampler = PolyphaseResampler(in_rate, out_rate, channels, dtype)
+    rng = np.random.default_rng(0)
+    noise = rng.uniform(-0.5, 0.5, (blocksize * 16, channels))
+    if dtype == 'float32':
+        source = noise.astype(np.float32)
+    else:
+        source = (noise * np.iinfo(dtype).max).astype(dtype)
+
+    total_blocks = int(seconds * in_rate / blocksize)
+    # Warm up caches and allocations before timing
+    for i in range(16):
+        resampler.process(source[i * blocksize:(i + 1) * blocksize])
+
+    block_times = np.zeros(total_blocks)
+    start = time.perf_counter()
+    for i in range(total_blocks):
+        offset = (i % 16) * blocksize
+        block_start = time.perf_counter()
+        resampler.process(source[offset:offset + blocksize])
+        block_times[i] = time.perf_counter() - block_start
+    elapsed = time.perf_counter() - start
+
+    audio_seconds = total_blocks * blocksize / in_rate
+    return {
+        "in_rate": in_rate,
+        "out_rate": out_rate,
+        "channels": channels,
+        "dtype": dtype,
+        "blocksize": blocksize,
+        "audio_seconds": audio_seconds,
+        "elapsed_seconds": elapsed,
+        "realtime_factor": audio_seconds / elapsed,
+        "input_samples_per_second": total_blocks * blocksize * channels / elapsed,
+        "block_us_p50": float(np.percentile(block_times, 50) * 1e6),
+        "block_us_p99": float(np.percentile(block_times, 99) * 1e6),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the streaming resampler")
+    parser.add_argument("--seconds", type=float, default=30.0, help="Audio seconds per case")
+    parser.add_argument("--blocksize", type=int, default=4410, help="Frames per block")
+    parser.add_argument("--json", type=Path, help="Write results to a JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for in_rate, out_rate in CONVERSIONS:
+        for channels in (1, 2):
+            for dtype in ('float32', 'int16'):
+                result = run_case(in_rate, out_rate, channels, dtype, args.blocksize, args.seconds)
+                results.append(result)
+                print(f"{in_rate:>6} -> {out_rate:<6} {channels}ch {dtype:<7} "
+                      f"{result['realtime_factor']:8.1f}x realtime  "
+                      f"block p50 {result['block_us_p50']:7.1f} us  p99 {result['block_us_p99']:7.1f} us")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""Benchmark and soak harness for the audio recorder.
+
+Drives ``AudioRecorder`` through the full callback, queue and writer path
+with the virtual input backend, optionally much faster than real time, and
+reports callback-to-disk latency percentiles, queue high-water marks,
+dropped blocks, RSS growth and write throughput as JSON.
+
+Run from the audio sensor directory:
+
+    python benchmarks/soak_recorder.py --seconds 600 --speed 100 --json results.json
+    python benchmarks/soak_recorder.py --rates 48000 --channels 2 --dtypes int16 --seconds 43200
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import psutil
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.recorder import AudioRecorder, RecordingConfig
+from src.backends import VirtualBackend, VirtualDevice, noise_source
+
+
+RATES = [16000, 44100, 48000, 96000]
+CHANNELS = [1, 2]
+DTYPES = ['float32', 'int16', 'int32']
+
+
+class InstrumentedRecorder(AudioRecorder):
+    """Recorder that timestamps blocks on the way in and on the way to disk.
+
+    Latency is measured from the moment the callback hands a block to the
+    queue to the moment the write containing its last frame returns.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._queued: Deque[Tuple[int, float]] = deque()  # (end frame, enqueue time)
+        self._queued_frames = 0
+        self._written_frames = 0
+        self._stats_lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.queue_high_water = 0
+        self.dropped_blocks = 0
+        self.bytes_written = 0
+
+    def _audio_callback(self, indata, frames, time_info, status) -> None:
+        # Only the writer takes from the queue, so a full queue now means this block is dropped
+        full = self._audio_queue.full() and self._pre_roll is None
+        enqueued = time.perf_counter()
+        super()._audio_callback(indata, frames, time_info, status)
+        if full:
+            self.dropped_blocks += 1
+            return
+        with self._stats_lock:
+            self._queued_frames += len(indata)
+            self._queued.append((self._queued_frames, enqueued))
+        self.queue_high_water = max(self.queue_high_water, self._audio_queue.qsize())
+
+    def _write_chunk_to_file(self, chunk: np.ndarray) -> None:
+        super()._write_chunk_to_file(chunk)
+        done = time.perf_counter()
+        self.bytes_written += chunk.nbytes
+        with self._stats_lock:
+            self._written_frames += len(chunk)
+            while self._queued and self._queued[0][0] <= self._written_frames:
+                self.latencies.append(done - self._queued.popleft()[1])
+
+
+async def sample_rss(process: psutil.Process, interval: float, series: List[Dict[str, float]],
+                     recorder: InstrumentedRecorder, samplerate: int, stop: asyncio.Event) -> None:
+    """Record RSS against audio time until ``stop`` is set."""
+    start = time.perf_counter()
+    while not stop.is_set():
+        series.append({
+            "wall_seconds": time.perf_counter() - start,
+            "audio_seconds": recorder._total_frames_written / samplerate,
+            "rss_mb": process.memory_info().rss / 1024 / 1024,
+        })
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def rss_growth(series: List[Dict[str, float]]) -> Dict[str, Optional[float]]:
+    """Summarize RSS growth, ignoring the first quarter while buffers warm up."""
+    if len(series) < 4:
+        return {"rss_start_mb": None, "rss_end_mb": None, "rss_peak_mb": None, "rss_mb_per_audio_hour": None}
+    steady = series[len(series) // 4:]
+    audio = np.array([s["audio_seconds"] for s in steady])
+    rss = np.array([s["rss_mb"] for s in steady])
+    slope = float(np.polyfit(audio, rss, 1)[0]) * 3600 if np.ptp(audio) > 0 else None
+    return {
+        "rss_start_mb": series[0]["rss_mb"],
+        "rss_end_mb": series[-1]["rss_mb"],
+        "rss_peak_mb": max(s["rss_mb"] for s in series),
+        "rss_mb_per_audio_hour": slope,
+    }
+
+
+def percentiles_ms(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {key: None for key in ("p50", "p90", "p99", "p999", "max")}
+    data = np.array(values) * 1000
+    return {
+        "p50": float(np.percentile(data, 50)),
+        "p90": float(np.percentile(data, 90)),
+        "p99": float(np.percentile(data, 99)),
+        "p999": float(np.percentile(data, 99.9)),
+        "max": float(data.max()),
+    }
+
+
+async def run_case(samplerate: int, channels: int, dtype: str, seconds: float, speed: float,
+                   blocksize: int, rss_interval: float, xrun_probability: float,
+                   output_dir: Path) -> Dict[str, Any]:
+    """Record ``seconds`` of virtual audio at ``speed`` times real time and measure it."""
+    backend = VirtualBackend(
+        devices=[VirtualDevice("Soak Input", channels=channels, samplerate=samplerate)],
+        blocksize=blocksize, speed=speed, source=noise_source(0.5, seed=0),
+        xrun_probability=xrun_probability, seed=0
+    )
+    config = RecordingConfig(samplerate=samplerate, channels=channels, dtype=dtype,
+                             output_dir=str(output_dir), pre_roll_seconds=0)
+    recorder = InstrumentedRecorder(config, backend=backend)
+    output_path = output_dir / f"soak_{samplerate}_{channels}ch_{dtype}.wav"
+
+    process = psutil.Process()
+    series: List[Dict[str, float]] = []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_rss(process, rss_interval, series, recorder, samplerate, stop))
+
+    start = time.perf_counter()
+    await recorder.record(output_path, duration=seconds / speed)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await sampler
+
+    stream = backend.streams[-1]
+    audio_seconds = recorder._total_frames_written / samplerate
+    file_size = output_path.stat().st_size if output_path.exists() else 0
+    for path in output_dir.glob(f"{output_path.stem}*"):
+        path.unlink()
+
+    return {
+        "samplerate": samplerate,
+        "channels": channels,
+        "dtype": dtype,
+        "blocksize": blocksize,
+        "speed": speed,
+        "audio_seconds": audio_seconds,
+        "elapsed_seconds": elapsed,
+        "achieved_speed": audio_seconds / elapsed if elapsed else None,
+        "blocks_delivered": stream.blocks_delivered,
+        "blocks_dropped_queue": recorder.dropped_blocks,
+        "frames_dropped_xrun": stream.frames_dropped,
+        "queue_high_water": recorder.queue_high_water,
+        "queue_capacity": recorder._audio_queue.maxsize,
+        "dropouts": recorder.get_dropout_stats(),
+        "latency_ms": percentiles_ms(recorder.latencies),
+        "write_mb_per_second": recorder.bytes_written / elapsed / 1024 / 1024 if elapsed else None,
+        "file_mb": file_size / 1024 / 1024,
+        **rss_growth(series),
+        "rss_series": series,
+    }
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.output_dir) as tmp:
+        for samplerate in args.rates:
+            for channels in args.channels:
+                for dtype in args.dtypes:
+                    result = await run_case(samplerate, channels, dtype, args.seconds, args.speed,
+                                            args.blocksize, args.rss_interval, args.xrun_probability,
+                                            Path(tmp))
+                    results.append(result)
+                    latency = result["latency_ms"]
+                    print(f"{samplerate:>6} Hz {channels}ch {dtype:<7} "
+                          f"{result['achieved_speed']:6.1f}x  "
+                          f"latency p50 {latency['p50'] or 0:6.1f} ms p99 {latency['p99'] or 0:6.1f} ms  "
+                          f"queue max {result['queue_high_water']:>3}  "
+                          f"dropped {result['blocks_dropped_queue']}  "
+                          f"RSS {result['rss_mb_per_audio_hour'] or 0:+.1f} MB/h")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark and soak-test the audio recorder without hardware")
+    parser.add_argument("--seconds", type=float, default=60.0, help="Audio seconds per case")
+    parser.add_argument("--speed", type=float, default=100.0, help="Multiple of real time, 0 for unpaced")
+    parser.add_argument("--rates", type=int, nargs="+", default=RATES, help="Sample rates to sweep")
+    parser.add_argument("--channels", type=int, nargs="+", default=CHANNELS, help="Channel counts to sweep")
+    parser.add_argument("--dtypes", nargs="+", default=DTYPES, choices=DTYPES, help="Sample formats to sweep")
+    parser.add_argument("--blocksize", type=int, default=1024, help="Frames per callback block")
+    parser.add_argument("--xrun-probability", type=float, default=0.0, help="Chance of an injected xrun per block")
+    parser.add_argument("--rss-interval", type=float, default=0.5, help="Wall seconds between RSS samples")
+    parser.add_argument("--output-dir", type=Path, default=None, help="Where to write the temporary recordings")
+    parser.add_argument("--json", type=Path, help="Write results to a JSON file")
+    args = parser.parse_args()
+
+    # Drops are counted in the results, so per-block warnings would only slow the run
+    logging.basicConfig(level=logging.ERROR)
+    results = asyncio.run(run(args))
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
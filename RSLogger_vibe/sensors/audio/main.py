@@ -5,6 +5,7 @@ import sys
 from src.recorder import RecordingConfig
 from src.config import ConfigManager
 from src.cli import parse_args
+from src.backends import create_backend, set_backend
 from src.modes import run_standalone_recording, run_controlled_mode
 
 
@@ -26,6 +27,9 @@ async def main() -> None:
     # Parse command line arguments
     args = parse_args(default_config)
     
+    if args.backend:
+        set_backend(create_backend(args.backend))
+    
     # Handle config management commands first
     if args.show_config:
         print("Current configuration:")
@@ -33,7 +37,17 @@ async def main() -> None:
         print(f"  Channels: {default_config.channels}")
         print(f"  Output directory: {default_config.output_dir}")
         print(f"  Data type: {default_config.dtype}")
-        print(f"  Device: {default_config.device or 'Default'}") 
+        print(f"  Device: {default_config.device or 'Default'}")
+        print(f"  Native rate capture: {'on' if default_config.native_rate else 'off'}")
+        print(f"  Pre-roll when armed: {default_config.pre_roll_seconds} s")
+        print(f"  Sound-activated: {'on' if default_config.sound_activated else 'off'} "
+              f"(threshold {default_config.threshold_db} dBFS, hysteresis {default_config.hysteresis_db} dB, "
+              f"hang {default_config.hang_seconds} s)")
+        print(f"  Disk policy: {default_config.disk_policy} "
+              f"(reserve {default_config.disk_reserve_mb} MB, "
+              f"secondary {default_config.secondary_output_dir or 'none'})")
+        print(f"  Clock index: every {default_config.clock_index_every} block(s)"
+              if default_config.clock_index_every else "  Clock index: off")
         print(f"\nConfig file: {config_manager.config_path}")
         return
         
@@ -48,7 +62,19 @@ async def main() -> None:
         channels=args.channels,
         dtype=default_config.dtype,
         output_dir=args.output_dir,
-        device=args.device
+        device=args.device,
+        native_rate=args.native_rate,
+        pre_roll_seconds=args.pre_roll,
+        sound_activated=args.sound_activated,
+        threshold_db=args.threshold_db,
+        hysteresis_db=args.hysteresis_db,
+        hang_seconds=args.hang_seconds,
+        disk_policy=args.disk_policy,
+        secondary_output_dir=args.secondary_output_dir,
+        disk_reserve_mb=args.disk_reserve_mb,
+        disk_warn_seconds=default_config.disk_warn_seconds,
+        disk_action_seconds=default_config.disk_action_seconds,
+        clock_index_every=default_config.clock_index_every
     )
     
     # Save config if requested
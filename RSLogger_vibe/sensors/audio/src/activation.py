@@ -0,0 +1,61 @@
+"""Sound-activated recording: block level measurement and segment detection."""
+
+from typing import Optional
+
+import numpy as np
+
+
+SILENCE_DB = -200.0  # Level reported for digital silence
+
+
+def block_level_db(block: np.ndarray) -> float:
+    """Get the RMS level of a block in dB relative to full scale."""
+    if block.size == 0:
+        return SILENCE_DB
+    data = block.reshape(-1).astype(np.float32, copy=False)
+    if np.issubdtype(block.dtype, np.integer):
+        data = data / float(np.iinfo(block.dtype).max)
+    # One dot product per block keeps the cost linear in the block size and allocation free for float input
+    mean_square = float(np.dot(data, data)) / data.size
+    if mean_square <= 0.0:
+        return SILENCE_DB
+    return 10.0 * np.log10(mean_square)
+
+
+class ActivityDetector:
+    """Decide when to open and close segments from per-block levels.
+
+    A segment opens when a block reaches ``threshold_db`` and stays open
+    while blocks remain above ``threshold_db - hysteresis_db``. It closes
+    once the level has stayed below that release level for ``hang_seconds``.
+    """
+
+    OPEN = 'open'
+    CLOSE = 'close'
+
+    def __init__(self, samplerate: int, threshold_db: float = -40.0,
+                 hysteresis_db: float = 6.0, hang_seconds: float = 2.0):
+        self.threshold_db = threshold_db
+        self.release_db = threshold_db - hysteresis_db
+        self.hang_frames = int(hang_seconds * samplerate)
+        self.active = False
+        self._quiet_frames = 0
+
+    def update(self, level_db: float, frames: int) -> Optional[str]:
+        """Feed one block's level and get ``OPEN``, ``CLOSE`` or None."""
+        if not self.active:
+            if level_db >= self.threshold_db:
+                self.active = True
+                self._quiet_frames = 0
+                return self.OPEN
+            return None
+
+        if level_db >= self.release_db:
+            self._quiet_frames = 0
+            return None
+
+        self._quiet_frames += frames
+        if self._quiet_frames >= self.hang_frames:
+            self.active = False
+            return self.CLOSE
+        return None
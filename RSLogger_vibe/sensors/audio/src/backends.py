@@ -0,0 +1,353 @@
+"""Audio input backends for RSLogger Audio.
+
+The recorder and device manager talk to an input backend instead of calling
+``sounddevice`` directly. ``SoundDeviceBackend`` is the real PortAudio one;
+``VirtualBackend`` synthesizes audio on its own thread so the whole
+callback, queue and writer path can run without hardware, at real time or
+faster, with injected xruns and status flags.
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Union, Callable, Iterable
+
+import numpy as np
+
+from .exceptions import ConfigurationError
+
+
+logger = logging.getLogger(__name__)
+
+BACKEND_ENV = 'RSLOGGER_AUDIO_BACKEND'
+
+# source(start_frame, frames, channels, samplerate) -> float32 samples in [-1, 1]
+SignalSource = Callable[[int, int, int, float], np.ndarray]
+
+
+class InputBackend:
+    """Interface shared by all input backends, mirroring the sounddevice calls we use."""
+
+    name = 'base'
+
+    def query_devices(self, device: Optional[Union[int, str]] = None,
+                      kind: Optional[str] = None) -> Any:
+        """Return one device dict, or all devices when neither argument is given."""
+        raise NotImplementedError
+
+    def InputStream(self, **kwargs) -> Any:
+        """Create an input stream that feeds ``callback`` once started."""
+        raise NotImplementedError
+
+    def reinitialize(self) -> None:
+        """Re-enumerate devices, for hosts that fix the device list at startup."""
+
+
+class SoundDeviceBackend(InputBackend):
+    """Capture through PortAudio with the sounddevice package."""
+
+    name = 'sounddevice'
+
+    def query_devices(self, device: Optional[Union[int, str]] = None,
+                      kind: Optional[str] = None) -> Any:
+        import sounddevice as sd
+        return sd.query_devices(device, kind)
+
+    def InputStream(self, **kwargs) -> Any:
+        import sounddevice as sd
+        return sd.InputStream(**kwargs)
+
+    def reinitialize(self) -> None:
+        # PortAudio only sees hotplugged devices after a restart, which ends any open stream
+        import sounddevice as sd
+        sd._terminate()
+        sd._initialize()
+
+
+# Synthetic signal sources
+
+def sine_source(frequency: float = 440.0, amplitude: float = 0.5) -> SignalSource:
+    """Continuous sine tone on every channel."""
+    def source(start: int, frames: int, channels: int, samplerate: float) -> np.ndarray:
+        t = (start + np.arange(frames)) / samplerate
+        tone = (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+        return np.repeat(tone[:, None], channels, axis=1)
+    return source
+
+
+def noise_source(amplitude: float = 0.1, seed: Optional[int] = None) -> SignalSource:
+    """Uniform white noise."""
+    rng = np.random.default_rng(seed)
+
+    def source(start: int, frames: int, channels: int, samplerate: float) -> np.ndarray:
+        return rng.uniform(-amplitude, amplitude, (frames, channels)).astype(np.float32)
+    return source
+
+
+def silence_source() -> SignalSource:
+    """Digital silence."""
+    def source(start: int, frames: int, channels: int, samplerate: float) -> np.ndarray:
+        return np.zeros((frames, channels), dtype=np.float32)
+    return source
+
+
+class VirtualCallbackFlags:
+    """Status flags passed to the callback, compatible with ``sd.CallbackFlags``."""
+
+    _NAMES = ('input_underflow', 'input_overflow', 'output_underflow',
+              'output_overflow', 'priming_output')
+
+    def __init__(self, **flags: bool):
+        for name in self._NAMES:
+            setattr(self, name, bool(flags.pop(name, False)))
+        if flags:
+            raise ConfigurationError(f"Unknown callback flags: {', '.join(flags)}")
+
+    def __bool__(self) -> bool:
+        return any(getattr(self, name) for name in self._NAMES)
+
+    def __str__(self) -> str:
+        return ', '.join(name.replace('_', ' ') for name in self._NAMES if getattr(self, name))
+
+    def __or__(self, other: 'VirtualCallbackFlags') -> 'VirtualCallbackFlags':
+        return VirtualCallbackFlags(**{
+            name: getattr(self, name) or getattr(other, name) for name in self._NAMES
+        })
+
+
+@dataclass
+class VirtualTimeInfo:
+    """Block timing passed to the callback, with the attributes of PortAudio's time info."""
+    inputBufferAdcTime: float
+    currentTime: float
+    outputBufferDacTime: float = 0.0
+
+
+@dataclass
+class VirtualDevice:
+    """A synthetic input device."""
+    name: str
+    channels: int = 2
+    samplerate: float = 48000.0
+    source: Optional[SignalSource] = None
+    drift_ppm: float = 0.0  # Deviation of the simulated device clock from nominal
+
+    def as_dict(self, index: int) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "index": index,
+            "hostapi": 0,
+            "max_input_channels": self.channels,
+            "max_output_channels": 0,
+            "default_samplerate": self.samplerate,
+            "default_low_input_latency": 0.01,
+            "default_high_input_latency": 0.1,
+        }
+
+
+class VirtualInputStream:
+    """Input stream that calls the callback from its own thread.
+
+    Blocks are released when their last sample would have been captured,
+    scaled by the backend's ``speed`` (0 means as fast as possible). An
+    xrun drops the frames of the affected blocks and flags the next block
+    with ``input_overflow``, like a device overrun.
+    """
+
+    def __init__(self, backend: 'VirtualBackend', device: VirtualDevice,
+                 samplerate: Optional[float] = None, channels: Optional[int] = None,
+                 dtype: str = 'float32', callback: Optional[Callable] = None,
+                 blocksize: Optional[int] = None, **kwargs):
+        self.backend = backend
+        self.device = device
+        self.samplerate = float(samplerate or device.samplerate)
+        self.channels = channels or device.channels
+        self.dtype = np.dtype(dtype)
+        self.blocksize = blocksize or backend.blocksize
+        self.latency = self.blocksize / self.samplerate
+        self._callback = callback
+        self._source = device.source or backend.source or sine_source()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pending_flags: Optional[VirtualCallbackFlags] = None
+        self._flags_lock = threading.Lock()
+        self.frames_delivered = 0
+        self.frames_dropped = 0
+        self.blocks_delivered = 0
+        self.closed = False
+        if self.channels > device.channels:
+            raise ConfigurationError(f"{device.name} has only {device.channels} input channels")
+
+    @property
+    def active(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.closed:
+            raise RuntimeError("Stream is closed")
+        if self.active:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"virtual-{self.device.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    abort = stop
+
+    def close(self) -> None:
+        self.stop()
+        self.closed = True
+
+    def __enter__(self) -> 'VirtualInputStream':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+        self.close()
+
+    def inject_status(self, **flags: bool) -> None:
+        """Report status flags with the next block."""
+        self._add_flags(VirtualCallbackFlags(**flags))
+
+    def _add_flags(self, flags: VirtualCallbackFlags) -> None:
+        with self._flags_lock:
+            self._pending_flags = flags if self._pending_flags is None else self._pending_flags | flags
+
+    def _take_flags(self) -> VirtualCallbackFlags:
+        with self._flags_lock:
+            flags, self._pending_flags = self._pending_flags, None
+        return flags or VirtualCallbackFlags()
+
+    def _convert(self, samples: np.ndarray) -> np.ndarray:
+        """Convert float samples to the stream dtype like PortAudio would."""
+        if np.issubdtype(self.dtype, np.integer):
+            info = np.iinfo(self.dtype)
+            return np.clip(np.round(samples * info.max), info.min, info.max).astype(self.dtype)
+        return samples.astype(self.dtype, copy=False)
+
+    def _run(self) -> None:
+        backend = self.backend
+        rate = self.samplerate * (1 + self.device.drift_ppm / 1e6)
+        frames = self.blocksize
+        origin = time.monotonic()
+        frame = 0
+        block = 0
+
+        while not self._stop.is_set():
+            if backend.is_xrun(block):
+                # The device overran: these frames never reach the callback
+                lost = frames * backend.xrun_length
+                frame += lost
+                block += backend.xrun_length
+                self.frames_dropped += lost
+                self._add_flags(VirtualCallbackFlags(input_overflow=True))
+                continue
+
+            samples = self._source(frame, frames, self.channels, self.samplerate)
+            indata = self._convert(samples)
+
+            # A block is ready once its last sample has been captured
+            if backend.speed > 0:
+                due = origin + (frame + frames) / rate / backend.speed
+                delay = due - time.monotonic()
+                if delay > 0 and self._stop.wait(delay):
+                    break
+
+            time_info = VirtualTimeInfo(inputBufferAdcTime=origin + frame / rate,
+                                        currentTime=time.monotonic())
+            try:
+                self._callback(indata, frames, time_info, self._take_flags())
+            except Exception as e:
+                logger.error(f"Virtual stream callback raised {e!r}, stopping stream")
+                break
+
+            frame += frames
+            block += 1
+            self.frames_delivered += frames
+            self.blocks_delivered += 1
+
+
+class VirtualBackend(InputBackend):
+    """Synthetic input devices for tests and benchmarks without hardware."""
+
+    name = 'virtual'
+
+    def __init__(self, devices: Optional[List[VirtualDevice]] = None, blocksize: int = 512,
+                 speed: float = 1.0, source: Optional[SignalSource] = None,
+                 xrun_probability: float = 0.0, xrun_blocks: Iterable[int] = (),
+                 xrun_length: int = 1, seed: Optional[int] = None):
+        self.devices = devices or [VirtualDevice("Virtual Input")]
+        self.blocksize = blocksize
+        self.speed = speed
+        self.source = source
+        self.xrun_probability = xrun_probability
+        self.xrun_blocks = set(xrun_blocks)
+        self.xrun_length = max(1, xrun_length)
+        self._rng = np.random.default_rng(seed)
+        self.streams: List[VirtualInputStream] = []
+
+    def is_xrun(self, block: int) -> bool:
+        """Decide whether the block at this index is lost to an overrun."""
+        if block in self.xrun_blocks:
+            return True
+        return self.xrun_probability > 0 and self._rng.random() < self.xrun_probability
+
+    def _find(self, device: Optional[Union[int, str]]) -> int:
+        """Resolve a device index, matching names by substring like sounddevice."""
+        if device is None:
+            return 0
+        if isinstance(device, int):
+            if 0 <= device < len(self.devices):
+                return device
+            raise ValueError(f"Error querying device {device}")
+        matches = [i for i, dev in enumerate(self.devices) if device.lower() in dev.name.lower()]
+        if len(matches) != 1:
+            raise ValueError(f"No input device matching {device!r}" if not matches
+                             else f"Multiple input devices found for {device!r}")
+        return matches[0]
+
+    def query_devices(self, device: Optional[Union[int, str]] = None,
+                      kind: Optional[str] = None) -> Any:
+        if device is None and kind is None:
+            return [dev.as_dict(i) for i, dev in enumerate(self.devices)]
+        index = self._find(device)
+        return self.devices[index].as_dict(index)
+
+    def InputStream(self, device: Optional[Union[int, str]] = None, **kwargs) -> VirtualInputStream:
+        stream = VirtualInputStream(self, self.devices[self._find(device)], **kwargs)
+        self.streams.append(stream)
+        return stream
+
+
+_backend: Optional[InputBackend] = None
+
+
+def create_backend(name: str, **options) -> InputBackend:
+    """Create a backend by name."""
+    if name == SoundDeviceBackend.name:
+        return SoundDeviceBackend()
+    if name == VirtualBackend.name:
+        return VirtualBackend(**options)
+    raise ConfigurationError(f"Unknown audio backend: {name}")
+
+
+def get_backend() -> InputBackend:
+    """Get the process-wide backend, chosen by ``RSLOGGER_AUDIO_BACKEND`` on first use."""
+    global _backend
+    if _backend is None:
+        _backend = create_backend(os.environ.get(BACKEND_ENV, SoundDeviceBackend.name))
+    return _backend
+
+
+def set_backend(backend: Optional[InputBackend]) -> None:
+    """Replace the process-wide backend; None restores the default on next use."""
+    global _backend
+    _backend = backend
@@ -1,10 +1,11 @@
 """Command-line interface module for RSLogger Audio."""
 
 import argparse
-from typing import Optional, Union
+from typing import Optional, Union, List
 from dataclasses import dataclass
 
 from .recorder import RecordingConfig
+from .disk_guard import DiskPolicy
 
 
 @dataclass
@@ -16,6 +17,16 @@ class CLIArgs:
     output_dir: str
     channels: int
     device: Optional[Union[int, str]]
+    devices: Optional[List[Union[int, str]]]
+    native_rate: bool
+    pre_roll: float
+    sound_activated: bool
+    threshold_db: float
+    hysteresis_db: float
+    hang_seconds: float
+    disk_policy: str
+    secondary_output_dir: Optional[str]
+    disk_reserve_mb: float
     info: bool
     list_devices: bool
     save_config: bool
@@ -23,6 +34,7 @@ class CLIArgs:
     reset_config: bool
     controlled: bool
     control_url: str
+    backend: Optional[str]
 
 
 def create_parser(default_config: RecordingConfig) -> argparse.ArgumentParser:
@@ -71,6 +83,77 @@ def create_parser(default_config: RecordingConfig) -> argparse.ArgumentParser:
         help="Audio input device (name or ID)"
     )
     
+    parser.add_argument(
+        "--devices",
+        type=str,
+        nargs="+",
+        help="Record several input devices at once (names or IDs)"
+    )
+    
+    parser.add_argument(
+        "--native-rate",
+        action="store_true",
+        default=default_config.native_rate,
+        help="Capture at the device's native sample rate and resample to --samplerate"
+    )
+    
+    parser.add_argument(
+        "--pre-roll",
+        type=float,
+        default=default_config.pre_roll_seconds,
+        help=f"Seconds of audio kept from before the start while armed (default: {default_config.pre_roll_seconds})"
+    )
+    
+    parser.add_argument(
+        "--sound-activated",
+        action="store_true",
+        default=default_config.sound_activated,
+        help="Only write segments where sound passes --threshold"
+    )
+    
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=default_config.threshold_db,
+        help=f"Level in dBFS that opens a segment (default: {default_config.threshold_db})"
+    )
+    
+    parser.add_argument(
+        "--hysteresis",
+        type=float,
+        default=default_config.hysteresis_db,
+        help=f"dB below --threshold a segment stays open down to (default: {default_config.hysteresis_db})"
+    )
+    
+    parser.add_argument(
+        "--hang",
+        type=float,
+        default=default_config.hang_seconds,
+        help=f"Seconds of quiet before a segment is closed (default: {default_config.hang_seconds})"
+    )
+    
+    parser.add_argument(
+        "--disk-policy",
+        choices=list(DiskPolicy.ALL),
+        default=default_config.disk_policy,
+        help="When the output volume is about to fill: warn, rotate to --secondary-output-dir, "
+             f"or stop with finalized files (default: {default_config.disk_policy})"
+    )
+    
+    parser.add_argument(
+        "--secondary-output-dir",
+        type=str,
+        default=default_config.secondary_output_dir,
+        help="Directory on another volume where the rotate policy continues the recording"
+    )
+    
+    parser.add_argument(
+        "--disk-reserve",
+        type=float,
+        default=default_config.disk_reserve_mb,
+        help=f"Free space in MB left untouched on the output volume (default: {default_config.disk_reserve_mb})"
+    )
+    
     parser.add_argument(
         "--info",
         action="store_true",
@@ -116,6 +199,13 @@ def create_parser(default_config: RecordingConfig) -> argparse.ArgumentParser:
         help="WebSocket URL for control connection (default: ws://localhost:8080/recorder)"
     )
     
+    parser.add_argument(
+        "--backend",
+        choices=["sounddevice", "virtual"],
+        default=None,
+        help="Audio input backend; 'virtual' synthesizes audio without hardware (default: sounddevice)"
+    )
+    
     return parser
 
 
@@ -141,11 +231,22 @@ def parse_args(default_config: RecordingConfig) -> CLIArgs:
         output_dir=args.output_dir,
         channels=args.channels,
         device=device,
+        devices=[parse_device(d) for d in args.devices] if args.devices else None,
+        native_rate=args.native_rate,
+        pre_roll=args.pre_roll,
+        sound_activated=args.sound_activated,
+        threshold_db=args.threshold,
+        hysteresis_db=args.hysteresis,
+        hang_seconds=args.hang,
+        disk_policy=args.disk_policy,
+        secondary_output_dir=args.secondary_output_dir,
+        disk_reserve_mb=args.disk_reserve,
         info=args.info,
         list_devices=args.list_devices,
         save_config=args.save_config,
         show_config=args.show_config,
         reset_config=args.reset_config,
         controlled=args.controlled,
-        control_url=args.control_url
+        control_url=args.control_url,
+        backend=args.backend
     )
\ No newline at end of file
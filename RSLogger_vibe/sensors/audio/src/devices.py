@@ -1,11 +1,21 @@
 """Device management module for RSLogger Audio."""
 
 import asyncio
-import sounddevice as sd
-from typing import Optional, Union, List, Dict, Any
+import logging
+import threading
+import time
+import weakref
+from typing import Optional, Union, List, Dict, Any, Callable
 from dataclasses import dataclass
 
 from .exceptions import DeviceNotFoundError
+from .backends import InputBackend, get_backend
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 30.0  # Seconds between background rescans
+MISS_RESCAN_INTERVAL = 10.0  # Seconds between rescans for devices that weren't found
 
 
 @dataclass
@@ -27,67 +37,209 @@ class AudioDevice:
         )
 
 
-class DeviceManager:
-    """Manages audio device operations."""
+class DeviceRegistry:
+    """Cached view of a backend's devices, indexed by id and name.
     
-    @staticmethod
-    async def get_device_info(device: Optional[Union[int, str]] = None) -> AudioDevice:
-        """Get information about a specific audio device."""
-        loop = asyncio.get_event_loop()
+    Querying the backend is a PortAudio round trip, so the device list is
+    read once and refreshed by ``rescan``, either explicitly or from a
+    low-frequency background poll. Lookups only touch the cached indexes.
+    """
+    
+    def __init__(self, backend: InputBackend, poll_interval: float = DEFAULT_POLL_INTERVAL):
+        self._backend = backend
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._devices: Optional[List[AudioDevice]] = None  # Every device, by index
+        self._by_name: Dict[str, AudioDevice] = {}
+        self._default: Optional[AudioDevice] = None
+        self._listeners: List[Callable[[], Any]] = []
+        self._poll_task: Optional[asyncio.Task] = None
+        self.generation = 0  # Incremented whenever the device list changes
+        self.scanned_at: Optional[float] = None
+        self.miss_rescanned_at: Optional[float] = None  # Monotonic time of the last rescan for a missing device
         
+    @property
+    def loaded(self) -> bool:
+        return self._devices is not None
+        
+    def rescan(self, reinitialize: bool = False) -> bool:
+        """Query the backend again (blocking) and return whether the devices changed."""
+        if reinitialize:
+            self._backend.reinitialize()
         try:
-            device_info = await loop.run_in_executor(
-                None,
-                sd.query_devices,
-                device,
-                'input'
-            )
+            raw = self._backend.query_devices()
         except Exception as e:
-            raise DeviceNotFoundError(f"Failed to query device {device}: {e}") from e
+            raise DeviceNotFoundError(f"Failed to query devices: {e}") from e
         
-        # Get device index if device was specified by name
-        device_id = device if isinstance(device, int) else None
-        if device is None or isinstance(device, str):
-            all_devices = await loop.run_in_executor(None, sd.query_devices)
-            for idx, dev in enumerate(all_devices):
-                if dev['name'] == device_info['name']:
-                    device_id = idx
-                    break
+        devices = [
+            AudioDevice(id=idx, name=dev['name'], channels=dev['max_input_channels'],
+                        samplerate=dev['default_samplerate'])
+            for idx, dev in enumerate(raw)
+        ]
+        by_name: Dict[str, AudioDevice] = {}
+        for dev in devices:
+            # Keep the first of several input devices with the same name, like a linear scan would
+            if dev.channels > 0:
+                by_name.setdefault(dev.name.lower(), dev)
+            
+        default = None
+        try:
+            info = self._backend.query_devices(kind='input')
+            index = info.get('index')
+            if isinstance(index, int) and 0 <= index < len(devices):
+                default = devices[index]
+            else:
+                default = by_name.get(info['name'].lower())
+        except Exception:
+            pass  # No default input device
+            
+        with self._lock:
+            changed = devices != self._devices or default != self._default
+            self._devices = devices
+            self._by_name = by_name
+            self._default = default
+            self.scanned_at = time.time()
+            if changed:
+                self.generation += 1
+        return changed
         
-        return AudioDevice(
-            id=device_id,
-            name=device_info['name'],
-            channels=device_info['max_input_channels'],
-            samplerate=device_info['default_samplerate']
-        )
-    
-    @staticmethod
-    async def list_input_devices() -> List[AudioDevice]:
-        """List all available input devices."""
-        loop = asyncio.get_event_loop()
+    def lookup(self, device: Optional[Union[int, str]] = None) -> AudioDevice:
+        """Find a device by index, exact or partial name, or the default input for None."""
+        with self._lock:
+            devices, by_name, default = self._devices or [], self._by_name, self._default
+            
+        if device is None:
+            if default is None:
+                raise DeviceNotFoundError("No default input device")
+            return default
+        if isinstance(device, int):
+            if 0 <= device < len(devices) and devices[device].channels > 0:
+                return devices[device]
+            raise DeviceNotFoundError(f"No input device with index {device}")
         
-        try:
-            devices = await loop.run_in_executor(None, sd.query_devices)
-        except Exception as e:
-            raise DeviceNotFoundError(f"Failed to query devices: {e}") from e
+        match = by_name.get(device.lower())
+        if match is not None:
+            return match
+        # Partial names match like sounddevice does, as long as they are unambiguous
+        matches = [dev for dev in devices if device.lower() in dev.name.lower() and dev.channels > 0]
+        if len(matches) == 1:
+            return matches[0]
+        if matches:
+            raise DeviceNotFoundError(f"Multiple input devices found for {device!r}")
+        raise DeviceNotFoundError(f"No input device matching {device!r}")
+        
+    def input_devices(self) -> List[AudioDevice]:
+        """Get the cached devices that have input channels."""
+        with self._lock:
+            devices = self._devices or []
+        return [dev for dev in devices if dev.channels > 0]
+        
+    def add_listener(self, callback: Callable[[], Any]) -> None:
+        """Call ``callback`` (a function or coroutine function) when a poll sees the devices change."""
+        self._listeners.append(callback)
         
-        input_devices = []
-        for idx, device in enumerate(devices):
-            if device['max_input_channels'] > 0:
-                input_devices.append(AudioDevice(
-                    id=idx,
-                    name=device['name'],
-                    channels=device['max_input_channels'],
-                    samplerate=device['default_samplerate']
-                ))
+    def remove_listener(self, callback: Callable[[], Any]) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+        
+    def start_polling(self, interval: Optional[float] = None) -> None:
+        """Rescan in the background every ``interval`` seconds."""
+        if interval is not None:
+            self.poll_interval = interval
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = asyncio.create_task(self._poll_loop())
+            
+    async def stop_polling(self) -> None:
+        if self._poll_task and not self._poll_task.done():
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+        self._poll_task = None
+        
+    async def _poll_loop(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                changed = await loop.run_in_executor(None, self.rescan)
+            except DeviceNotFoundError as e:
+                logger.warning(f"Device poll failed: {e}")
+                continue
+            if changed:
+                logger.info("Audio devices changed")
+                await self._notify()
                 
-        return input_devices
+    async def _notify(self) -> None:
+        for callback in list(self._listeners):
+            try:
+                result = callback()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Device change listener failed: {e}")
+
+
+_registries: 'weakref.WeakKeyDictionary[InputBackend, DeviceRegistry]' = weakref.WeakKeyDictionary()
+
+
+def get_registry(backend: Optional[InputBackend] = None) -> DeviceRegistry:
+    """Get the device registry of a backend, the process-wide one by default."""
+    backend = backend or get_backend()
+    registry = _registries.get(backend)
+    if registry is None:
+        registry = _registries[backend] = DeviceRegistry(backend)
+    return registry
+
+
+class DeviceManager:
+    """Manages audio device operations."""
     
     @staticmethod
-    def get_default_device() -> Optional[Union[int, str]]:
+    async def _loaded_registry(backend: Optional[InputBackend]) -> DeviceRegistry:
+        registry = get_registry(backend)
+        if not registry.loaded:
+            await asyncio.get_event_loop().run_in_executor(None, registry.rescan)
+        return registry
+    
+    @staticmethod
+    async def get_device_info(device: Optional[Union[int, str]] = None,
+                              backend: Optional[InputBackend] = None) -> AudioDevice:
+        """Get information about a specific audio device."""
+        registry = await DeviceManager._loaded_registry(backend)
+        try:
+            return registry.lookup(device)
+        except DeviceNotFoundError:
+            # The device may have been plugged in since the last scan. A device
+            # that stays unplugged is looked up with every status, so rescan at
+            # most once per interval and leave the rest to the hot-plug poll
+            now = time.monotonic()
+            if registry.miss_rescanned_at is not None and now - registry.miss_rescanned_at < MISS_RESCAN_INTERVAL:
+                raise
+            registry.miss_rescanned_at = now
+            changed = await asyncio.get_event_loop().run_in_executor(None, registry.rescan)
+            if not changed:
+                raise
+            return registry.lookup(device)
+    
+    @staticmethod
+    async def list_input_devices(backend: Optional[InputBackend] = None) -> List[AudioDevice]:
+        """List all available input devices."""
+        registry = await DeviceManager._loaded_registry(backend)
+        return registry.input_devices()
+    
+    @staticmethod
+    async def rescan(backend: Optional[InputBackend] = None, reinitialize: bool = False) -> bool:
+        """Refresh the cached device list and return whether it changed."""
+        registry = get_registry(backend)
+        return await asyncio.get_event_loop().run_in_executor(None, registry.rescan, reinitialize)
+    
+    @staticmethod
+    async def get_default_device(backend: Optional[InputBackend] = None) -> Optional[Union[int, str]]:
         """Get the default input device."""
         try:
-            default_device = sd.query_devices(kind='input')
-            return default_device['name']
-        except Exception:
-            return None
\ No newline at end of file
+            registry = await DeviceManager._loaded_registry(backend)
+            return registry.lookup(None).name
+        except DeviceNotFoundError:
+            return None
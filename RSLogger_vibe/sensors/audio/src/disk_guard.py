@@ -0,0 +1,136 @@
+"""Disk space projection for long recordings.
+
+Projects how long the volume holding a recording has before it fills, from
+the free-space trend and the measured write rate of every active writer on
+the same filesystem, so a recording can warn, move to another volume or stop
+cleanly with finalized files before the disk is full.
+"""
+
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Optional, Tuple, Union
+
+import psutil
+
+
+class DiskPolicy:
+    """What a recording does when its volume is about to fill."""
+    WARN = 'warn'
+    ROTATE = 'rotate'  # Continue on the secondary output directory
+    STOP = 'stop'  # Stop and finalize the files
+
+    ALL = (WARN, ROTATE, STOP)
+
+
+def existing_path(path: Union[str, Path]) -> Path:
+    """Get the nearest existing directory, so an output_dir not yet created still names its filesystem."""
+    path = Path(path).absolute()
+    while not path.exists() and path != path.parent:
+        path = path.parent
+    return path
+
+
+def filesystem_id(path: Union[str, Path]) -> int:
+    """Get the device id of the filesystem holding ``path``."""
+    return os.stat(existing_path(path)).st_dev
+
+
+class WriterRegistry:
+    """Writers currently streaming to disk, with their measured byte rates.
+
+    A writer is any object with a ``write_rate()`` method returning bytes
+    per second and an ``output_dir`` attribute.
+    """
+
+    def __init__(self):
+        self._writers: 'weakref.WeakSet[Any]' = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def add(self, writer: Any) -> None:
+        with self._lock:
+            self._writers.add(writer)
+
+    def discard(self, writer: Any) -> None:
+        with self._lock:
+            self._writers.discard(writer)
+
+    def write_rate(self, path: Union[str, Path]) -> float:
+        """Get the combined write rate of the writers on the filesystem holding ``path``."""
+        device = filesystem_id(path)
+        with self._lock:
+            writers = list(self._writers)
+        total = 0.0
+        for writer in writers:
+            try:
+                if filesystem_id(writer.output_dir) == device:
+                    total += writer.write_rate()
+            except OSError:
+                continue
+        return total
+
+
+active_writers = WriterRegistry()
+
+
+class DiskGuard:
+    """Project the time until a volume fills.
+
+    The rate is the larger of the free-space decline observed over
+    ``window`` seconds, which includes other processes, and the combined
+    rate of this process's active writers, which reacts immediately.
+    """
+
+    def __init__(self, path: Union[str, Path], reserve_bytes: int = 0,
+                 window: float = 60.0, writers: Optional[WriterRegistry] = None):
+        self.path = Path(path)
+        self.reserve_bytes = reserve_bytes
+        self.window = window
+        self._writers = writers or active_writers
+        self._history: Deque[Tuple[float, int]] = deque()
+
+    def move_to(self, path: Union[str, Path]) -> None:
+        """Watch a different volume, forgetting the old trend."""
+        self.path = Path(path)
+        self._history.clear()
+
+    def _observed_rate(self, now: float, free: int) -> float:
+        self._history.append((now, free))
+        while len(self._history) > 2 and now - self._history[1][0] >= self.window:
+            self._history.popleft()
+        then, free_then = self._history[0]
+        if now <= then:
+            return 0.0
+        return max(0.0, (free_then - free) / (now - then))
+
+    def projection(self) -> Dict[str, Any]:
+        """Measure free space now and project the seconds until only the reserve is left (blocking)."""
+        now = time.monotonic()
+        free = psutil.disk_usage(str(existing_path(self.path))).free
+        observed = self._observed_rate(now, free)
+        writers = self._writers.write_rate(self.path)
+        rate = max(observed, writers)
+        usable = free - self.reserve_bytes
+        if usable <= 0:
+            seconds_to_full = 0.0
+        elif rate > 0:
+            seconds_to_full = usable / rate
+        else:
+            seconds_to_full = None  # Nothing is filling the disk
+        return {
+            "path": str(self.path),
+            "free_bytes": free,
+            "reserve_bytes": self.reserve_bytes,
+            "observed_rate_bytes_s": observed,
+            "writers_rate_bytes_s": writers,
+            "rate_bytes_s": rate,
+            "seconds_to_full": seconds_to_full,
+        }
+
+    def admits(self, bytes_needed: float) -> bool:
+        """Check whether ``bytes_needed`` fit above the reserve (blocking)."""
+        free = psutil.disk_usage(str(existing_path(self.path))).free
+        return free - self.reserve_bytes >= bytes_needed
@@ -13,11 +13,26 @@ class AudioFormat(str, Enum):
     def is_valid(cls, value: str) -> bool:
         """Check if a value is a valid audio format."""
         return value in cls._value2member_map_
+    
+    @property
+    def bytes_per_sample(self) -> int:
+        """Bytes one sample of this format takes in the WAV file."""
+        return 2 if self is AudioFormat.INT16 else 4
+    
+    @property
+    def file_subtype(self) -> str:
+        """soundfile subtype the recorder writes this format as."""
+        return {
+            AudioFormat.FLOAT32: 'FLOAT',
+            AudioFormat.INT16: 'PCM_16',
+            AudioFormat.INT32: 'PCM_32',
+        }[self]
 
 
 class RecordingState(Enum):
     """States of the audio recorder."""
     IDLE = auto()
+    ARMED = auto()
     RECORDING = auto()
     STOPPING = auto()
     ERROR = auto()
\ No newline at end of file
@@ -16,8 +16,6 @@ async def run_standalone_recording(config, args):
     from .recorder import AudioRecorder
     from .devices import DeviceManager
     
-    recorder = AudioRecorder(config)
-    
     # Handle device listing
     if args.list_devices:
         devices = await DeviceManager.list_input_devices()
@@ -36,14 +34,25 @@ async def run_standalone_recording(config, args):
         print(f"  Default sample rate: {info.samplerate} Hz")
         return
     
+    # Several devices share one process and one synchronized session
+    if args.devices:
+        from .multi_recorder import MultiStreamRecorder
+        recorder = MultiStreamRecorder.for_devices(config, args.devices)
+    else:
+        recorder = AudioRecorder(config)
+    
     # Generate filename if not provided
     filename = args.filename
     if not filename:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         # Get device info for filename
-        device_info = await DeviceManager.get_device_info(config.device)
-        device_id = f"_device{device_info.id}" if device_info.id is not None else ""
-        filename = f"recording_{timestamp}{device_id}.wav"
+        if args.devices:
+            # Device labels are appended per stream by MultiStreamRecorder
+            filename = f"recording_{timestamp}.wav"
+        else:
+            device_info = await DeviceManager.get_device_info(config.device)
+            device_id = f"_device{device_info.id}" if device_info.id is not None else ""
+            filename = f"recording_{timestamp}{device_id}.wav"
     
     # Ensure .wav extension
     if not filename.endswith('.wav'):
@@ -0,0 +1,149 @@
+"""Low-bandwidth live monitoring stream for RSLogger Audio.
+
+Blocks are tapped from the capture path, downmixed to mono, resampled to a
+low rate and cut into small int16 PCM frames that can be sent to the hub as
+binary WebSocket messages.
+"""
+
+import struct
+import time
+from collections import deque
+from typing import Deque, List, Optional
+
+import numpy as np
+
+
+# Frame header: magic, sequence number, sample rate, capture time, frame count
+MONITOR_MAGIC = b'RSMN'
+MONITOR_HEADER = struct.Struct('<4sIIdH')
+
+DEFAULT_MONITOR_RATE = 16000
+DEFAULT_FRAME_MS = 20
+MAX_TAP_BLOCKS = 64  # Roughly 1.5 s of audio at typical PortAudio block sizes
+
+
+def create_tap() -> Deque[np.ndarray]:
+    """Create the bounded buffer the audio callback feeds while monitoring.
+
+    The deque drops the oldest blocks when the monitor falls behind, so the
+    callback never blocks and the disk path is unaffected.
+    """
+    return deque(maxlen=MAX_TAP_BLOCKS)
+
+
+class MonitorStream:
+    """Downmix, resample and frame captured audio for live monitoring."""
+
+    def __init__(self, source_rate: int, target_rate: int = DEFAULT_MONITOR_RATE,
+                 frame_ms: int = DEFAULT_FRAME_MS):
+        if source_rate <= 0 or target_rate <= 0:
+            raise ValueError("Sample rates must be positive")
+
+        self.source_rate = source_rate
+        self.target_rate = min(target_rate, source_rate)
+        self.frame_size = max(1, self.target_rate * frame_ms // 1000)
+        self.sequence = 0
+
+        self._step = source_rate / self.target_rate
+        # Boxcar pre-filter width approximating the decimation ratio
+        self._taps = max(1, int(round(self._step)))
+        self._history = np.zeros(self._taps - 1, dtype=np.float32)
+        self._last_sample = 0.0
+        self._position = 0.0  # Fractional read position relative to the next block
+        self._pending = np.zeros(0, dtype=np.int16)
+        self._pending_time: Optional[float] = None
+
+    def reset(self) -> None:
+        """Drop filter state and any partially built frame."""
+        self._history[:] = 0.0
+        self._last_sample = 0.0
+        self._position = 0.0
+        self._pending = np.zeros(0, dtype=np.int16)
+        self._pending_time = None
+
+    def process(self, block: np.ndarray, capture_time: Optional[float] = None) -> List[bytes]:
+        """Convert a captured block into zero or more encoded monitor frames."""
+        if capture_time is None:
+            capture_time = time.time()
+
+        mono = self._downmix(block)
+        if len(mono) == 0:
+            return []
+
+        samples = self._resample(mono)
+        if len(samples) == 0:
+            return []
+
+        pcm = np.clip(samples * 32767.0, -32768, 32767).astype(np.int16)
+        if self._pending_time is None:
+            self._pending_time = capture_time
+        self._pending = np.concatenate((self._pending, pcm))
+
+        frames = []
+        while len(self._pending) >= self.frame_size:
+            payload = self._pending[:self.frame_size]
+            self._pending = self._pending[self.frame_size:]
+            frames.append(self._encode(payload, self._pending_time))
+            self._pending_time += self.frame_size / self.target_rate
+        if len(self._pending) == 0:
+            self._pending_time = None
+
+        return frames
+
+    def _downmix(self, block: np.ndarray) -> np.ndarray:
+        """Average channels and scale integer samples to [-1, 1]."""
+        data = block.astype(np.float32)
+        if np.issubdtype(block.dtype, np.integer):
+            data /= float(np.iinfo(block.dtype).max)
+        if data.ndim > 1:
+            data = data.mean(axis=1)
+        return data
+
+    def _resample(self, mono: np.ndarray) -> np.ndarray:
+        """Low-pass with a boxcar and linearly interpolate to the target rate."""
+        if self._taps > 1:
+            padded = np.concatenate((self._history, mono))
+            cumsum = np.cumsum(padded, dtype=np.float64)
+            cumsum[self._taps:] = cumsum[self._taps:] - cumsum[:-self._taps]
+            filtered = (cumsum[self._taps - 1:] / self._taps).astype(np.float32)
+            self._history = padded[-(self._taps - 1):]
+        else:
+            filtered = mono
+
+        if self._step == 1.0:
+            return filtered
+
+        # Index 0 is the last sample of the previous block so interpolation is
+        # continuous across block boundaries
+        source = np.concatenate(([self._last_sample], filtered))
+        positions = np.arange(self._position + 1.0, len(source) - 1 + 1e-9, self._step)
+        self._last_sample = float(filtered[-1])
+        if len(positions) == 0:
+            self._position -= len(filtered)
+            return np.zeros(0, dtype=np.float32)
+
+        self._position = positions[-1] + self._step - len(source)
+        return np.interp(positions, np.arange(len(source)), source).astype(np.float32)
+
+    def _encode(self, payload: np.ndarray, capture_time: float) -> bytes:
+        """Prefix a PCM frame with the monitor header."""
+        header = MONITOR_HEADER.pack(
+            MONITOR_MAGIC, self.sequence & 0xFFFFFFFF, self.target_rate,
+            capture_time, len(payload)
+        )
+        self.sequence += 1
+        return header + payload.tobytes()
+
+
+def decode_frame(frame: bytes) -> dict:
+    """Decode a monitor frame into its header fields and samples."""
+    magic, sequence, samplerate, capture_time, count = MONITOR_HEADER.unpack_from(frame)
+    if magic != MONITOR_MAGIC:
+        raise ValueError("Not a monitor frame")
+    samples = np.frombuffer(frame, dtype=np.int16, count=count, offset=MONITOR_HEADER.size)
+    return {
+        "sequence": sequence,
+        "samplerate": samplerate,
+        "timestamp": capture_time,
+        "samples": samples
+    }
@@ -0,0 +1,200 @@
+"""Synchronized recording from several input devices in one process."""
+
+import asyncio
+import json
+import logging
+import re
+import time
+from dataclasses import replace, asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Union
+
+from .exceptions import RecordingError, ConfigurationError
+from .recorder import AudioRecorder, RecordingConfig
+from .system_monitor import SystemMonitor
+from .backends import InputBackend
+
+
+logger = logging.getLogger(__name__)
+
+
+def _rate(first: Dict[str, Any], last: Dict[str, Any], clock: str) -> Optional[float]:
+    """Measure the effective sample rate between two block stamps on one clock."""
+    if first[clock] is None or last[clock] is None:
+        return None
+    elapsed = last[clock] - first[clock]
+    if elapsed <= 0:
+        return None
+    return (last['frame'] - first['frame']) / elapsed
+
+
+def compute_drift_report(streams: List[Dict[str, Any]], epoch: float) -> List[Dict[str, Any]]:
+    """Compute per-device start offsets and clock drift from block stamps.
+
+    Each stream is a dict with ``label``, ``samplerate`` and the ``clock``
+    stamps returned by ``AudioRecorder.get_clock_stamps``. The first stream
+    with captured audio is the reference for relative skew and drift.
+    """
+    report = []
+    reference = None
+
+    for stream in streams:
+        clock = stream['clock']
+        first, last = clock['first_block'], clock['last_block']
+        nominal = stream['samplerate']
+        entry: Dict[str, Any] = {
+            "device": stream['label'],
+            "nominal_samplerate": nominal,
+            "frames_captured": clock['frames_captured']
+        }
+        if first is None:
+            entry["error"] = "no audio captured"
+            report.append(entry)
+            continue
+
+        # The callback fires once a block is full, so sample 0 was captured one block earlier
+        start_host = first['host_time'] - first['frames'] / nominal
+        host_rate = _rate(first, last, 'host_time')
+        adc_rate = _rate(first, last, 'adc_time') if first['adc_time'] else None
+
+        entry.update({
+            "start_offset_ms": (start_host - epoch) * 1000,
+            "first_adc_time": first['adc_time'],
+            "measured_samplerate_host": host_rate,
+            "measured_samplerate_adc": adc_rate,
+            "drift_ppm_host": (host_rate / nominal - 1) * 1e6 if host_rate else None,
+            "drift_ppm_adc": (adc_rate / nominal - 1) * 1e6 if adc_rate else None,
+        })
+
+        if reference is None:
+            reference = (start_host, host_rate)
+        entry["start_skew_ms"] = (start_host - reference[0]) * 1000
+        entry["relative_drift_ppm"] = (
+            (host_rate / reference[1] - 1) * 1e6 if host_rate and reference[1] else None
+        )
+        report.append(entry)
+
+    return report
+
+
+class MultiStreamRecorder:
+    """Record several devices at once, each with its own stream, queue and writer.
+
+    All streams share one event loop, one system monitor and the process-wide
+    monotonic clock, so start offsets and drift can be compared directly.
+    """
+
+    def __init__(self, configs: List[RecordingConfig], backend: Optional[InputBackend] = None):
+        if not configs:
+            raise ConfigurationError("At least one device configuration is required")
+        self.configs = configs
+        self._system_monitor = SystemMonitor(path=configs[0].output_dir)
+        self.recorders = [AudioRecorder(config, system_monitor=self._system_monitor, backend=backend)
+                          for config in configs]
+        self.labels = self._unique_labels(configs)
+        self.epoch: Optional[float] = None
+        self.drift_report: List[Dict[str, Any]] = []
+
+    @classmethod
+    def for_devices(cls, base_config: RecordingConfig, devices: List[Union[int, str]],
+                    backend: Optional[InputBackend] = None) -> 'MultiStreamRecorder':
+        """Create a recorder that applies one base configuration to several devices."""
+        return cls([replace(base_config, device=device) for device in devices], backend)
+
+    @staticmethod
+    def _device_label(config: RecordingConfig, index: int) -> str:
+        """Build a filename-safe label for a device."""
+        if config.device is None:
+            return f"dev{index}"
+        if isinstance(config.device, int):
+            return f"device{config.device}"
+        return re.sub(r'[^a-z0-9]+', '_', config.device.lower()).strip('_') or f"dev{index}"
+    
+    @classmethod
+    def _unique_labels(cls, configs: List[RecordingConfig]) -> List[str]:
+        """Label every device, suffixing the index when two names map to the same label."""
+        labels: List[str] = []
+        for i, config in enumerate(configs):
+            label = cls._device_label(config, i)
+            if label in labels:
+                label = f"{label}_{i}"
+                while label in labels:
+                    label += "_"
+            labels.append(label)
+        return labels
+
+    def output_paths(self, output_path: Path) -> List[Path]:
+        """Get the per-device file paths derived from a session output path."""
+        return [
+            output_path.with_name(f"{output_path.stem}_{label}.wav")
+            for label in self.labels
+        ]
+
+    async def record(self, output_path: Path, duration: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Record all devices concurrently and write a session file with the drift report."""
+        paths = self.output_paths(output_path)
+        self.epoch = time.monotonic()
+
+        await self._system_monitor.start_monitoring()
+        try:
+            results = await asyncio.gather(
+                *(recorder.record(path, duration) for recorder, path in zip(self.recorders, paths)),
+                return_exceptions=True
+            )
+        finally:
+            await self._system_monitor.stop_monitoring()
+
+        errors = []
+        for path, result in zip(paths, results):
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            if isinstance(result, Exception):
+                logger.error(f"Recording {path.name} failed: {result}")
+                errors.append(result)
+
+        self.drift_report = compute_drift_report([
+            {
+                "label": label,
+                "samplerate": recorder.capture_rate,
+                "clock": recorder.get_clock_stamps()
+            }
+            for label, recorder in zip(self.labels, self.recorders)
+        ], self.epoch)
+        await self._save_session(output_path, paths)
+
+        for entry in self.drift_report:
+            if "error" not in entry:
+                logger.info(f"{entry['device']}: start skew {entry['start_skew_ms']:.2f} ms, "
+                            f"drift {entry['drift_ppm_host'] or 0:.1f} ppm")
+
+        if len(errors) == len(self.recorders):
+            raise RecordingError(f"All {len(errors)} streams failed") from errors[0]
+        return self.drift_report
+
+    async def _save_session(self, output_path: Path, paths: List[Path]) -> None:
+        """Write the session file linking all device recordings."""
+        session = {
+            "timestamp": datetime.now().isoformat(),
+            "epoch_monotonic": self.epoch,
+            "streams": [
+                {"audio_file": path.name, "config": asdict(config)}
+                for path, config in zip(paths, self.configs)
+            ],
+            "drift_report": self.drift_report
+        }
+
+        session_path = output_path.with_name(f"{output_path.stem}_session.json")
+        loop = asyncio.get_event_loop()
+        try:
+            await loop.run_in_executor(
+                None,
+                lambda: session_path.write_text(json.dumps(session, indent=2))
+            )
+        except Exception as e:
+            logger.warning(f"Failed to save session file: {e}")
+
+    def stop(self) -> None:
+        """Stop all streams."""
+        for recorder in self.recorders:
+            recorder.stop()
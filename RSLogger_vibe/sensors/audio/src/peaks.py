@@ -0,0 +1,362 @@
+"""Multi-resolution waveform peak files for RSLogger Audio recordings.
+
+A ``.peaks`` sidecar stores min/max pairs for every ``base_block`` frames
+(level 0) and for successively coarser levels, each ``factor`` times
+coarser than the previous one. Values are int16 scaled to full range.
+
+File layout (little-endian)::
+
+    header       <4sHHIIHHQ  magic, version, channels, samplerate,
+                             base_block, factor, levels, total_frames
+    level table  <QQ         byte offset and bucket count per level
+    level data   int16[count, channels, 2] (min, max) per level
+
+While recording, completed level-0 buckets are appended to a
+``.peaks.partial`` spool (``<4sHHII`` magic, version, channels,
+samplerate, base_block, then level-0 data) so the hub can show peaks for a
+recording in progress and a crash does not lose them. The spool is flushed
+at most every ``SPOOL_FLUSH_INTERVAL`` seconds, and whenever it is read; it
+is removed once the final pyramid has been written.
+"""
+
+import argparse
+import logging
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+PEAKS_MAGIC = b'RSPK'
+PEAKS_VERSION = 1
+PEAKS_SUFFIX = '.peaks'
+HEADER = struct.Struct('<4sHHIIHHQ')
+LEVEL_ENTRY = struct.Struct('<QQ')
+PARTIAL_MAGIC = b'RSPP'
+PARTIAL_SUFFIX = '.partial'
+PARTIAL_HEADER = struct.Struct('<4sHHII')
+
+DEFAULT_BASE_BLOCK = 256
+DEFAULT_FACTOR = 4
+MAX_LEVELS = 8
+SPOOL_FLUSH_INTERVAL = 1.0  # Seconds between flushes of the level-0 spool
+
+
+def _to_int16(values: np.ndarray) -> np.ndarray:
+    """Scale normalized float samples to int16."""
+    return np.clip(np.round(values * 32767.0), -32768, 32767).astype(np.int16)
+
+
+class PeakPyramidBuilder:
+    """Incrementally build a min/max peak pyramid from audio chunks."""
+
+    def __init__(self, channels: int, samplerate: int,
+                 base_block: int = DEFAULT_BASE_BLOCK, factor: int = DEFAULT_FACTOR,
+                 spool_path: Optional[Path] = None, flush_interval: float = SPOOL_FLUSH_INTERVAL):
+        self.channels = channels
+        self.samplerate = samplerate
+        self.base_block = base_block
+        self.factor = factor
+        self.total_frames = 0
+        self._remainder = np.zeros((0, channels), dtype=np.float32)
+        # Completed buckets per level and the not yet reduced tail of each level
+        self._levels: List[List[np.ndarray]] = [[] for _ in range(MAX_LEVELS)]
+        self._carry: List[np.ndarray] = [np.zeros((0, channels, 2), dtype=np.int16)
+                                         for _ in range(MAX_LEVELS)]
+        # Level 0 goes to the spool file instead of memory when one is given
+        self.spool_path = spool_path
+        self.flush_interval = flush_interval
+        self._spool = None
+        self._flushed_at: Optional[float] = None  # The first buckets are flushed right away
+        if spool_path is not None:
+            self._spool = open(spool_path, 'wb')
+            self._spool.write(PARTIAL_HEADER.pack(PARTIAL_MAGIC, PEAKS_VERSION, channels, samplerate, base_block))
+            self._spool.flush()
+
+    def add(self, chunk: np.ndarray) -> None:
+        """Add a chunk of samples shaped (frames, channels)."""
+        data = chunk.reshape(len(chunk), -1)
+        if np.issubdtype(data.dtype, np.integer):
+            data = data.astype(np.float32) / float(np.iinfo(data.dtype).max)
+        self.total_frames += len(data)
+
+        if len(self._remainder):
+            data = np.concatenate((self._remainder, data))
+        full = len(data) // self.base_block * self.base_block
+        self._remainder = np.array(data[full:], dtype=np.float32)
+        if full:
+            self._push(0, self._reduce_samples(data[:full]))
+
+    def _reduce_samples(self, data: np.ndarray) -> np.ndarray:
+        """Reduce whole blocks of samples to (buckets, channels, 2) min/max pairs."""
+        blocks = data.reshape(-1, self.base_block, self.channels)
+        return _to_int16(np.stack((blocks.min(axis=1), blocks.max(axis=1)), axis=-1))
+
+    def _push(self, level: int, buckets: np.ndarray) -> None:
+        """Append buckets to a level and cascade complete groups to the next level."""
+        if level == 0 and self._spool is not None:
+            self._spool.write(np.ascontiguousarray(buckets, dtype='<i2').tobytes())
+            now = time.monotonic()
+            if self._flushed_at is None or now - self._flushed_at >= self.flush_interval:
+                self._spool.flush()
+                self._flushed_at = now
+        else:
+            self._levels[level].append(buckets)
+        if level + 1 >= MAX_LEVELS:
+            return
+
+        pending = np.concatenate((self._carry[level], buckets))
+        full = len(pending) // self.factor * self.factor
+        self._carry[level] = pending[full:]
+        if full:
+            self._push(level + 1, self._reduce_buckets(pending[:full]))
+
+    def _reduce_buckets(self, buckets: np.ndarray) -> np.ndarray:
+        """Combine groups of ``factor`` buckets into one coarser bucket."""
+        groups = buckets.reshape(-1, self.factor, self.channels, 2)
+        return np.stack((groups[..., 0].min(axis=1), groups[..., 1].max(axis=1)), axis=-1)
+
+    def finalize(self) -> List[np.ndarray]:
+        """Flush partial buckets and return the arrays for every non-empty level."""
+        tail = None
+        if len(self._remainder):
+            tail = _to_int16(np.stack((self._remainder.min(axis=0), self._remainder.max(axis=0)), axis=-1))[None]
+
+        levels = []
+        for level in range(MAX_LEVELS):
+            arrays = self._levels[level] + ([tail] if tail is not None else [])
+            if level == 0 and self._spool is not None:
+                arrays.insert(0, self._read_spool())
+            if not arrays:
+                break
+            levels.append(np.concatenate(arrays))
+            if len(levels[-1]) <= 1:
+                break
+
+            # Ungrouped buckets plus this level's partial bucket form the next level's partial bucket
+            pending = np.concatenate([self._carry[level]] + ([tail] if tail is not None else []))
+            tail = None
+            if len(pending):
+                tail = np.stack((pending[..., 0].min(axis=0), pending[..., 1].max(axis=0)), axis=-1)[None]
+        return levels
+
+    def _read_spool(self) -> np.ndarray:
+        """Read the level-0 buckets spooled so far."""
+        self._spool.flush()
+        data = np.fromfile(self.spool_path, dtype='<i2', offset=PARTIAL_HEADER.size)
+        return data.reshape(-1, self.channels, 2)
+
+    def write(self, path: Path) -> None:
+        """Finalize the pyramid, write it to a sidecar file and remove the spool."""
+        levels = self.finalize()
+        offset = HEADER.size + LEVEL_ENTRY.size * len(levels)
+
+        # Write next to the target and rename, so readers never see a half-written sidecar
+        tmp_path = Path(str(path) + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(PEAKS_MAGIC, PEAKS_VERSION, self.channels, self.samplerate,
+                                self.base_block, self.factor, len(levels), self.total_frames))
+            for data in levels:
+                f.write(LEVEL_ENTRY.pack(offset, len(data)))
+                offset += data.nbytes
+            for data in levels:
+                f.write(np.ascontiguousarray(data, dtype='<i2').tobytes())
+        os.replace(tmp_path, path)
+
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+            self.spool_path.unlink(missing_ok=True)
+
+
+def peaks_path_for(audio_path: Path) -> Path:
+    """Get the sidecar path for a recording."""
+    return Path(audio_path).with_suffix(PEAKS_SUFFIX)
+
+
+def partial_path_for(audio_path: Path) -> Path:
+    """Get the level-0 spool path used while a recording is in progress."""
+    peaks_path = peaks_path_for(audio_path)
+    return peaks_path.with_name(peaks_path.name + PARTIAL_SUFFIX)
+
+
+def find_peaks(audio_path: Path) -> Optional[Path]:
+    """Get the finished sidecar of a recording, or its spool while it is being recorded."""
+    for path in (peaks_path_for(audio_path), partial_path_for(audio_path)):
+        if path.is_file():
+            return path
+    return None
+
+
+def read_header(path: Path) -> Tuple[Dict[str, Any], List[Tuple[int, int]]]:
+    """Read the header and level table of a peaks file."""
+    with open(path, 'rb') as f:
+        magic, version, channels, samplerate, base_block, factor, levels, total_frames = \
+            HEADER.unpack(f.read(HEADER.size))
+        if magic != PEAKS_MAGIC:
+            raise ValueError(f"{path} is not a peaks file")
+        table = [LEVEL_ENTRY.unpack(f.read(LEVEL_ENTRY.size)) for _ in range(levels)]
+
+    header = {
+        "version": version,
+        "channels": channels,
+        "samplerate": samplerate,
+        "base_block": base_block,
+        "factor": factor,
+        "levels": levels,
+        "total_frames": total_frames
+    }
+    return header, table
+
+
+def _frame_range(start: float, end: Optional[float], rate: int, total: int) -> Tuple[int, int]:
+    """Convert a time range in seconds to clamped frame indices."""
+    start_frame = max(0, min(int(start * rate), total))
+    end_frame = total if end is None else max(start_frame, min(int(end * rate), total))
+    return start_frame, end_frame
+
+
+def read_partial_peaks(path: Path, start: float = 0.0, end: Optional[float] = None,
+                       width: int = 1000) -> Dict[str, Any]:
+    """Read peaks from the level-0 spool of a recording in progress."""
+    with open(path, 'rb') as f:
+        magic, version, channels, rate, base_block = PARTIAL_HEADER.unpack(f.read(PARTIAL_HEADER.size))
+    if magic != PARTIAL_MAGIC:
+        raise ValueError(f"{path} is not a peaks spool")
+
+    # The writer may be mid-bucket; only whole buckets count
+    count = (path.stat().st_size - PARTIAL_HEADER.size) // (channels * 4)
+    total = count * base_block
+    start_frame, end_frame = _frame_range(start, end, rate, total)
+
+    # Combine groups of level-0 buckets on the fly, as coarse as the requested width allows
+    group = max(1, (end_frame - start_frame) // base_block // width)
+    frames_per_bucket = base_block * group
+    first = start_frame // frames_per_bucket * group
+    last = min(-(-end_frame // frames_per_bucket) * group, count)
+    data = np.zeros((0, channels, 2), dtype=np.int16)
+    if count:
+        data = np.memmap(path, dtype='<i2', mode='r', offset=PARTIAL_HEADER.size,
+                         shape=(count, channels, 2))[first:last]
+    buckets = -(-len(data) // group)
+    padded = np.empty((buckets * group, channels, 2), dtype=np.int16)
+    padded[:len(data)] = data
+    # Repeat the last bucket into the padding so it does not change the min/max
+    if len(data):
+        padded[len(data):] = data[-1]
+    groups = padded.reshape(buckets, group, channels, 2)
+
+    return {
+        "level": 0,
+        "samplerate": rate,
+        "channels": channels,
+        "frames_per_bucket": frames_per_bucket,
+        "start_frame": first * base_block,
+        "total_frames": total,
+        "partial": True,
+        "min": (groups[..., 0].min(axis=1) / 32767.0).tolist(),
+        "max": (groups[..., 1].max(axis=1) / 32767.0).tolist()
+    }
+
+
+def read_peaks(path: Path, start: float = 0.0, end: Optional[float] = None,
+               width: int = 1000) -> Dict[str, Any]:
+    """Read the coarsest level giving at least ``width`` buckets for a time range in seconds."""
+    path = Path(path)
+    if path.name.endswith(PARTIAL_SUFFIX):
+        return read_partial_peaks(path, start, end, width)
+    header, table = read_header(path)
+    rate = header['samplerate']
+    total = header['total_frames']
+    start_frame, end_frame = _frame_range(start, end, rate, total)
+
+    level = 0
+    for candidate in range(len(table) - 1, -1, -1):
+        frames_per_bucket = header['base_block'] * header['factor'] ** candidate
+        if (end_frame - start_frame) / frames_per_bucket >= width:
+            level = candidate
+            break
+
+    frames_per_bucket = header['base_block'] * header['factor'] ** level
+    offset, count = table[level]
+    first = min(start_frame // frames_per_bucket, count)
+    last = min(-(-end_frame // frames_per_bucket), count)
+    data = np.memmap(path, dtype='<i2', mode='r', offset=offset,
+                     shape=(count, header['channels'], 2))[first:last]
+
+    return {
+        "level": level,
+        "samplerate": rate,
+        "channels": header['channels'],
+        "frames_per_bucket": frames_per_bucket,
+        "start_frame": first * frames_per_bucket,
+        "total_frames": total,
+        "partial": False,
+        "min": (data[..., 0] / 32767.0).tolist(),
+        "max": (data[..., 1] / 32767.0).tolist()
+    }
+
+
+def build_peaks_for_file(audio_path: Path, blocksize: int = 65536) -> Path:
+    """Compute a peaks sidecar for an existing recording."""
+    import soundfile as sf
+
+    audio_path = Path(audio_path)
+    with sf.SoundFile(str(audio_path)) as f:
+        builder = PeakPyramidBuilder(f.channels, f.samplerate)
+        for block in f.blocks(blocksize=blocksize, dtype='float32', always_2d=True):
+            builder.add(block)
+
+    peaks_path = peaks_path_for(audio_path)
+    builder.write(peaks_path)
+    # A spool left behind by an interrupted recording is superseded
+    partial_path_for(audio_path).unlink(missing_ok=True)
+    return peaks_path
+
+
+def backfill(directory: Path, workers: Optional[int] = None, force: bool = False) -> int:
+    """Build peaks sidecars for recordings that lack one, in parallel processes."""
+    pending = [
+        wav for wav in sorted(Path(directory).glob('*.wav'))
+        if force or not peaks_path_for(wav).exists()
+    ]
+    if not pending:
+        logger.info("All recordings already have peak files")
+        return 0
+
+    built = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(build_peaks_for_file, wav): wav for wav in pending}
+        for future in as_completed(futures):
+            wav = futures[future]
+            try:
+                future.result()
+                built += 1
+                logger.info(f"Built peaks for {wav.name} ({built}/{len(pending)})")
+            except Exception as e:
+                logger.error(f"Failed to build peaks for {wav.name}: {e}")
+    return built
+
+
+def main() -> None:
+    """Backfill peaks sidecars for an existing recordings directory."""
+    parser = argparse.ArgumentParser(description="Build waveform peak files for existing recordings")
+    parser.add_argument("directory", nargs="?", default="recordings", help="Recordings directory")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Rebuild existing peak files")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    built = backfill(Path(args.directory), args.workers, args.force)
+    print(f"Built {built} peak files")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,330 @@
+"""Random-access reader for RSLogger Audio recordings.
+
+Recordings are memory-mapped rather than loaded, so reading a range of a
+multi-gigabyte WAV or RF64 file costs only the pages that range touches.
+Ranges come back as zero-copy NumPy views in the file's own sample format;
+conversion to float happens per request or per block, never for the whole
+file.
+
+Sound-activated sessions are read through their ``*_segments.json``
+manifest, which places every segment on the session timeline.
+
+The hub loads this module by path, so it depends only on NumPy.
+"""
+
+import json
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple, Union, Iterator
+
+import numpy as np
+
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+SAMPLE_FORMATS = {
+    (WAVE_FORMAT_PCM, 16): '<i2',
+    (WAVE_FORMAT_PCM, 32): '<i4',
+    (WAVE_FORMAT_IEEE_FLOAT, 32): '<f4',
+    (WAVE_FORMAT_IEEE_FLOAT, 64): '<f8',
+}
+SEGMENTS_SUFFIX = '_segments.json'
+DEFAULT_BLOCK_FRAMES = 65536
+
+Channels = Union[None, int, slice]
+
+
+@dataclass
+class WavLayout:
+    """Where the samples of a WAV file are and how they are stored."""
+    offset: int  # Byte offset of the first sample
+    frames: int
+    channels: int
+    samplerate: int
+    dtype: np.dtype
+
+
+def read_layout(path: Path) -> WavLayout:
+    """Parse the header of a WAV or RF64 file."""
+    with open(path, 'rb') as f:
+        riff, _, wave = struct.unpack('<4sI4s', f.read(12))
+        if riff not in (b'RIFF', b'RF64') or wave != b'WAVE':
+            raise ValueError(f"{path.name} is not a WAV file")
+
+        fmt = None
+        data_size_64 = None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                raise ValueError(f"{path.name} has no data chunk")
+            chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+
+            if chunk_id == b'ds64':
+                # RF64 stores the real data size here; the data chunk size is 0xFFFFFFFF
+                _, data_size_64 = struct.unpack('<QQ', f.read(16))
+                f.seek(chunk_size - 16, os.SEEK_CUR)
+            elif chunk_id == b'fmt ':
+                body = f.read(chunk_size)
+                tag, channels, samplerate, _, _, bits = struct.unpack('<HHIIHH', body[:16])
+                if tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    tag = struct.unpack('<H', body[24:26])[0]
+                fmt = (tag, channels, samplerate, bits)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError(f"{path.name} has no fmt chunk")
+                offset = f.tell()
+                size = data_size_64 if chunk_size == 0xFFFFFFFF and data_size_64 else chunk_size
+                break
+            else:
+                f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+    tag, channels, samplerate, bits = fmt
+    if (tag, bits) not in SAMPLE_FORMATS:
+        raise ValueError(f"Unsupported WAV sample format (tag {tag}, {bits} bits)")
+    dtype = np.dtype(SAMPLE_FORMATS[(tag, bits)])
+    # Recordings still being written may have a stale size in the header
+    size = min(size, path.stat().st_size - offset)
+    return WavLayout(offset, max(0, size) // (dtype.itemsize * channels), channels, samplerate, dtype)
+
+
+def map_wav(path: Path) -> Tuple[np.ndarray, int]:
+    """Memory-map the sample data of a WAV or RF64 file as (frames, channels)."""
+    layout = read_layout(path)
+    if layout.frames == 0:
+        return np.zeros((0, layout.channels), dtype=layout.dtype), layout.samplerate
+    data = np.memmap(path, dtype=layout.dtype, mode='r', offset=layout.offset,
+                     shape=(layout.frames, layout.channels))
+    return data, layout.samplerate
+
+
+def to_float(samples: np.ndarray, dtype: Union[str, np.dtype] = 'float32') -> np.ndarray:
+    """Convert samples to float in [-1, 1), scaling integer formats by their full range."""
+    dtype = np.dtype(dtype)
+    if np.issubdtype(samples.dtype, np.integer):
+        return samples.astype(dtype) / dtype.type(2 ** (samples.dtype.itemsize * 8 - 1))
+    return samples.astype(dtype, copy=False)
+
+
+def _convert(samples: np.ndarray, dtype: Optional[Union[str, np.dtype]]) -> np.ndarray:
+    if dtype is None or np.dtype(dtype) == samples.dtype:
+        return samples
+    if np.issubdtype(np.dtype(dtype), np.floating):
+        return to_float(samples, dtype)
+    raise ValueError(f"Can only convert samples to a float dtype, not {dtype}")
+
+
+class Recording:
+    """A recorded WAV or RF64 file, memory-mapped on first access.
+
+    Ranges are given in frames by ``view`` and ``read``, or in seconds by
+    ``view_seconds`` and ``read_seconds``, and are clipped to the file.
+    ``channels`` selects one channel (an int) or a slice of channels; both
+    keep the result a view of the file.
+    """
+
+    def __init__(self, path: Union[str, Path], metadata: Optional[Dict[str, Any]] = None):
+        self.path = Path(path)
+        self.layout = read_layout(self.path)
+        self._metadata = metadata
+        self._data: Optional[np.ndarray] = None
+
+    @property
+    def samplerate(self) -> int:
+        return self.layout.samplerate
+
+    @property
+    def channels(self) -> int:
+        return self.layout.channels
+
+    @property
+    def frames(self) -> int:
+        return self.layout.frames
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.samplerate
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.layout.dtype
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """The recorder's ``.json`` sidecar, or an empty dict if there is none."""
+        if self._metadata is None:
+            sidecar = self.path.with_suffix('.json')
+            try:
+                self._metadata = json.loads(sidecar.read_text())
+            except (OSError, ValueError):
+                self._metadata = {}
+        return self._metadata
+
+    @property
+    def data(self) -> np.ndarray:
+        """All samples as a read-only (frames, channels) memory map."""
+        if self._data is None:
+            if self.frames == 0:
+                self._data = np.zeros((0, self.channels), dtype=self.dtype)
+            else:
+                self._data = np.memmap(self.path, dtype=self.dtype, mode='r', offset=self.layout.offset,
+                                       shape=(self.frames, self.channels))
+        return self._data
+
+    def close(self) -> None:
+        """Drop the memory map; it is reopened on the next access."""
+        self._data = None
+
+    def __enter__(self) -> 'Recording':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def frame_at(self, seconds: float) -> int:
+        """Get the frame at a time in seconds from the start of the file, clipped to the file."""
+        return min(max(0, int(round(seconds * self.samplerate))), self.frames)
+
+    def _bounds(self, start: int, stop: Optional[int]) -> Tuple[int, int]:
+        start = min(max(0, start), self.frames)
+        stop = self.frames if stop is None else min(max(start, stop), self.frames)
+        return start, stop
+
+    def view(self, start: int = 0, stop: Optional[int] = None, channels: Channels = None) -> np.ndarray:
+        """Get frames ``start`` to ``stop`` as a zero-copy view in the file's sample format."""
+        start, stop = self._bounds(start, stop)
+        block = self.data[start:stop]
+        return block if channels is None else block[:, channels]
+
+    def view_seconds(self, start: float = 0.0, end: Optional[float] = None,
+                     channels: Channels = None) -> np.ndarray:
+        """Get the samples between two times in seconds as a zero-copy view."""
+        stop = None if end is None else self.frame_at(end)
+        return self.view(self.frame_at(start), stop, channels)
+
+    def read(self, start: int = 0, stop: Optional[int] = None, channels: Channels = None,
+             dtype: Optional[Union[str, np.dtype]] = 'float32') -> np.ndarray:
+        """Get frames as ``dtype``, converting only the requested range.
+
+        Integer samples are scaled to [-1, 1). With ``dtype=None`` this is
+        the same as ``view``.
+        """
+        return _convert(self.view(start, stop, channels), dtype)
+
+    def read_seconds(self, start: float = 0.0, end: Optional[float] = None, channels: Channels = None,
+                     dtype: Optional[Union[str, np.dtype]] = 'float32') -> np.ndarray:
+        """Get the samples between two times in seconds as ``dtype``."""
+        return _convert(self.view_seconds(start, end, channels), dtype)
+
+    def blocks(self, start: int = 0, stop: Optional[int] = None, channels: Channels = None,
+               dtype: Optional[Union[str, np.dtype]] = None,
+               block_frames: int = DEFAULT_BLOCK_FRAMES) -> Iterator[np.ndarray]:
+        """Iterate over a range in blocks, converting each block as it is reached.
+
+        Processing a whole file this way holds at most one converted block
+        in memory.
+        """
+        start, stop = self._bounds(start, stop)
+        for position in range(start, stop, block_frames):
+            yield _convert(self.view(position, min(position + block_frames, stop), channels), dtype)
+
+    def wav_bytes(self, start: int = 0, stop: Optional[int] = None, channels: Channels = None,
+                  block_frames: int = DEFAULT_BLOCK_FRAMES) -> Iterator[bytes]:
+        """Encode a range as a WAV file in the original sample format, block by block."""
+        start, stop = self._bounds(start, stop)
+        selected = self.view(start, start, channels)
+        yield wav_header(stop - start, 1 if selected.ndim == 1 else selected.shape[1],
+                         self.samplerate, self.dtype)
+        for block in self.blocks(start, stop, channels, block_frames=block_frames):
+            yield np.ascontiguousarray(block).tobytes()
+
+
+def wav_header(frames: int, channels: int, samplerate: int, dtype: np.dtype) -> bytes:
+    """Build the header of a WAV file holding ``frames`` frames of ``dtype`` samples."""
+    dtype = np.dtype(dtype)
+    tag = WAVE_FORMAT_IEEE_FLOAT if dtype.kind == 'f' else WAVE_FORMAT_PCM
+    block_align = channels * dtype.itemsize
+    data_size = frames * block_align
+    fmt = struct.pack('<HHIIHH', tag, channels, samplerate, samplerate * block_align,
+                      block_align, dtype.itemsize * 8)
+    return (struct.pack('<4sI4s', b'RIFF', min(0xFFFFFFFF, 36 + data_size), b'WAVE')
+            + struct.pack('<4sI', b'fmt ', len(fmt)) + fmt
+            + struct.pack('<4sI', b'data', min(0xFFFFFFFF, data_size)))
+
+
+class SegmentedRecording:
+    """A sound-activated session read through its segment manifest.
+
+    Segments are placed on the session timeline by their
+    ``start_offset_seconds``; time between segments was not recorded.
+    """
+
+    def __init__(self, manifest_path: Union[str, Path]):
+        self.path = Path(manifest_path)
+        self.manifest = json.loads(self.path.read_text())
+        self._entries = self.manifest.get("segments", [])
+        self._segments: Dict[int, Recording] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def duration(self) -> float:
+        return self.manifest.get("session_duration_seconds", 0.0)
+
+    def segment(self, index: int) -> Recording:
+        """Open one segment; files are only mapped when a range inside them is read."""
+        if index not in self._segments:
+            entry = self._entries[index]
+            # Segments written to a rotated volume are listed by their full path
+            path = self.path.parent / entry["audio_file"]
+            self._segments[index] = Recording(path, metadata={"segment": entry})
+        return self._segments[index]
+
+    def segment_start(self, index: int) -> float:
+        """Get the session time in seconds at which a segment starts."""
+        return self._entries[index]["start_offset_seconds"]
+
+    def views_seconds(self, start: float = 0.0, end: Optional[float] = None,
+                      channels: Channels = None) -> List[Tuple[float, np.ndarray]]:
+        """Get zero-copy views of every segment overlapping a session time range.
+
+        Returns ``(session_time, view)`` pairs in order, where
+        ``session_time`` is the time of the view's first sample.
+        """
+        views = []
+        for index, entry in enumerate(self._entries):
+            offset = entry["start_offset_seconds"]
+            length = entry.get("duration_seconds")
+            if end is not None and offset >= end:
+                break
+            if length is not None and offset + length <= start:
+                continue
+            recording = self.segment(index)
+            first = recording.frame_at(start - offset)
+            stop = None if end is None else recording.frame_at(end - offset)
+            view = recording.view(first, stop, channels)
+            if len(view):
+                views.append((offset + first / recording.samplerate, view))
+        return views
+
+    def close(self) -> None:
+        for recording in self._segments.values():
+            recording.close()
+
+    def __enter__(self) -> 'SegmentedRecording':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_recording(path: Union[str, Path]) -> Union[Recording, SegmentedRecording]:
+    """Open a WAV/RF64 recording, or a sound-activated session from its manifest."""
+    path = Path(path)
+    if path.name.endswith(SEGMENTS_SUFFIX):
+        return SegmentedRecording(path)
+    return Recording(path)
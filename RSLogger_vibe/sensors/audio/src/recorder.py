@@ -1,13 +1,14 @@
 import asyncio
-import sounddevice as sd
 import soundfile as sf
 import numpy as np
 import logging
 import threading
-from typing import Optional, Dict, Any, List, Union
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Union, Deque, Tuple
 from pathlib import Path
 from dataclasses import dataclass, asdict
 import json
+from collections import deque
 from datetime import datetime
 import time
 
@@ -15,10 +16,23 @@ from .exceptions import RecordingError, DeviceNotFoundError, ConfigurationError
 from .enums import AudioFormat, RecordingState
 from .devices import DeviceManager, AudioDevice
 from .system_monitor import SystemMonitor
+from .monitor import create_tap
+from .peaks import PeakPyramidBuilder, peaks_path_for, partial_path_for
+from .resampler import PolyphaseResampler, needs_resampling
+from .activation import ActivityDetector, block_level_db
+from .backends import InputBackend, get_backend
+from .disk_guard import DiskGuard, DiskPolicy, active_writers
+from .timestamps import ClockIndexWriter, clock_path_for
 
 
 logger = logging.getLogger(__name__)
 
+MAX_GAPS = 1000  # Gap positions kept per recording; later gaps are only counted
+DISK_CHECK_INTERVAL = 5.0  # Seconds between time-to-full projections while recording
+START_RING_SECONDS = 1.0  # Audio buffered while waiting for a scheduled start, to pick its first sample from
+START_POLL_INTERVAL = 0.005  # Seconds between checks for the block holding a scheduled start
+MB = 1024 * 1024
+
 
 @dataclass
 class RecordingConfig:
@@ -27,6 +41,18 @@ class RecordingConfig:
     dtype: str = AudioFormat.FLOAT32.value
     output_dir: str = 'recordings'
     device: Optional[Union[int, str]] = None
+    native_rate: bool = False  # Capture at the device's native rate and resample to samplerate
+    pre_roll_seconds: float = 5.0  # Audio kept from before the trigger while armed
+    sound_activated: bool = False  # Write only segments where the level passes the threshold
+    threshold_db: float = -40.0  # Level in dBFS that opens a segment
+    hysteresis_db: float = 6.0  # A segment stays open down to threshold_db - hysteresis_db
+    hang_seconds: float = 2.0  # Quiet time before a segment is closed
+    disk_policy: str = DiskPolicy.WARN  # What to do when the output volume is about to fill
+    secondary_output_dir: Optional[str] = None  # Where the rotate policy continues the recording
+    disk_reserve_mb: float = 200.0  # Free space never written into
+    disk_warn_seconds: float = 1800.0  # Warn when the volume will fill within this time
+    disk_action_seconds: float = 120.0  # Rotate or stop when the volume will fill within this time
+    clock_index_every: int = 1  # Callback blocks per clock index entry; 0 writes no index
     
     def __post_init__(self):
         """Validate configuration after initialization."""
@@ -36,113 +62,759 @@ class RecordingConfig:
             raise ConfigurationError("Channels must be 1 (mono) or 2 (stereo)")
         if not AudioFormat.is_valid(self.dtype):
             raise ConfigurationError(f"Unsupported dtype: {self.dtype}")
+        if self.pre_roll_seconds < 0:
+            raise ConfigurationError("Pre-roll must not be negative")
+        if self.hysteresis_db < 0 or self.hang_seconds < 0:
+            raise ConfigurationError("Hysteresis and hang time must not be negative")
+        if self.disk_policy not in DiskPolicy.ALL:
+            raise ConfigurationError(f"Disk policy must be one of: {', '.join(DiskPolicy.ALL)}")
+        if self.disk_policy == DiskPolicy.ROTATE and not self.secondary_output_dir:
+            raise ConfigurationError("The rotate disk policy needs a secondary output directory")
+        if self.disk_reserve_mb < 0 or self.disk_warn_seconds < 0 or self.disk_action_seconds < 0:
+            raise ConfigurationError("Disk reserve and thresholds must not be negative")
+        if self.clock_index_every < 0:
+            raise ConfigurationError("Clock index interval must not be negative")
     
     
 class AudioRecorder:
-    def __init__(self, config: RecordingConfig = RecordingConfig()):
+    def __init__(self, config: RecordingConfig = RecordingConfig(),
+                 system_monitor: Optional[SystemMonitor] = None,
+                 backend: Optional[InputBackend] = None):
         self.config = config
+        self._backend = backend or get_backend()
         self._state = RecordingState.IDLE
         self._recording = False  # Keep for backward compatibility
         self._audio_queue: asyncio.Queue[np.ndarray] = asyncio.Queue(maxsize=500)  # Limit queue size
         self._device_info: Optional[Dict[str, Any]] = None
         self._last_audio_data: Optional[np.ndarray] = None  # For level monitoring
         self._file_writer: Optional[sf.SoundFile] = None
+        self._peaks: Optional[PeakPyramidBuilder] = None
+        # Peaks are built on their own thread, one chunk after another, to keep them off the writer's path
+        self._peaks_executor: Optional[ThreadPoolExecutor] = None
+        self._resampler: Optional[PolyphaseResampler] = None
+        self.capture_rate = config.samplerate  # Rate the input stream runs at
         self._write_lock = threading.Lock()
         self._total_frames_written = 0
         self._start_time: Optional[float] = None
-        self._system_monitor = SystemMonitor()
+        # A shared monitor is started and stopped by its owner (e.g. MultiStreamRecorder)
+        self._owns_monitor = system_monitor is None
+        self._system_monitor = system_monitor or SystemMonitor()
+        # Clock stamps of the first and latest callback blocks: (frame, adc_time, host_time, frames)
+        self._frames_captured = 0
+        self._first_stamp: Optional[tuple] = None
+        self._last_stamp: Optional[tuple] = None
+        self._monitor_tap: Optional[Deque[np.ndarray]] = None  # Live monitoring feed
+        # While armed the stream stays open and blocks go to the pre-roll ring instead of the queue
+        self._stream: Optional[Any] = None
+        self._stay_armed = False
+        self._pre_roll: Optional[Deque[Tuple[tuple, np.ndarray]]] = None
+        self._pre_roll_frames = 0
+        self._pre_roll_limit = 0
+        self._route_lock = threading.Lock()
+        # Sound-activated mode: the open segment and the session's finished segments
+        self._segment: Optional[Dict[str, Any]] = None
+        self._segment_path: Optional[Path] = None
+        self._segments: List[Dict[str, Any]] = []
+        self._wall_offset = 0.0  # time.time() - time.monotonic() at the start of the session
+        self._process_start: Optional[Dict[str, Any]] = None  # Process counters when recording started
+        # Disk admission and time-to-full projection for the volume being written
+        self.output_dir = Path(config.output_dir)
+        self._disk_guard: Optional[DiskGuard] = None
+        self._disk_projection: Optional[Dict[str, Any]] = None
+        self._rotate_to: Optional[Path] = None  # Set when the writer should continue on another volume
+        self._stop_reason: Optional[str] = None
+        self._current_path: Optional[Path] = None
+        self._file_parts: List[Path] = []
+        self._segment_dir: Optional[Path] = None
+        self._bytes_written = 0
+        self._write_started: Optional[float] = None
+        self._frame_bytes = config.channels * AudioFormat(config.dtype).bytes_per_sample
+        # Clock stamps of queued blocks, in queue order, for the open file's clock index
+        self._block_stamps: Optional[Deque[tuple]] = None
+        self._pre_roll_stamps: List[tuple] = []
+        self._clock_index: Optional[ClockIndexWriter] = None
+        self._index_frames = 0  # Captured frames taken for the open file
+        self._scheduled_start: Optional[Dict[str, Any]] = None  # The requested start instant and how close we got
+        self.started = asyncio.Event()  # Set while a recording is capturing into its file
+        self._reset_dropouts()
+        
+    @property
+    def armed(self) -> bool:
+        """Whether the input stream is kept open between recordings."""
+        return self._stream is not None
+        
+    def _reset_dropouts(self) -> None:
+        """Clear the xrun, drop and queue-pressure counters."""
+        self._input_overflows = 0
+        self._overflow_frames = 0  # Estimated from ADC time where the host provides it
+        self._status_errors = 0
+        self._dropped_blocks = 0
+        self._dropped_frames = 0
+        self._max_queue_depth = 0
+        self._gap_count = 0
+        self._gaps: List[Dict[str, Any]] = []
+        
+    def _record_gap(self, frame: int, frames: Optional[int], reason: str) -> None:
+        """Remember where audio went missing, in captured frames."""
+        self._gap_count += 1
+        if len(self._gaps) < MAX_GAPS:
+            self._gaps.append({"frame": frame, "frames": frames, "reason": reason})
+        
+    def _record_drop(self, frame: int, frames: int) -> None:
+        """Count a block dropped at the full queue, merging consecutive drops into one gap."""
+        self._dropped_blocks += 1
+        self._dropped_frames += frames
+        last = self._gaps[-1] if self._gaps else None
+        if last and last["reason"] == "queue_full" and last["frame"] + last["frames"] == frame:
+            last["frames"] += frames
+            return
+        # Log the start of a run of drops, not every block of it
+        logger.warning("Audio queue full, dropping frames")
+        self._record_gap(frame, frames, "queue_full")
         
     def _audio_callback(self, indata: np.ndarray, frames: int, 
-                       time_info: Any, status: sd.CallbackFlags) -> None:
+                       time_info: Any, status: Any) -> None:
+        adc_time = getattr(time_info, 'inputBufferAdcTime', None)
         if status:
+            if getattr(status, 'input_overflow', False):
+                # Frames were lost before this block; the ADC clock tells how many
+                lost = None
+                last = self._last_stamp
+                if adc_time and last is not None and last[1]:
+                    expected = last[1] + last[3] / self.capture_rate
+                    lost = max(0, int(round((adc_time - expected) * self.capture_rate)))
+                    self._overflow_frames += lost
+                self._input_overflows += 1
+                self._record_gap(self._frames_captured, lost, "input_overflow")
+            else:
+                self._status_errors += 1
             logger.warning(f"Audio callback status: {status}")
         
-        try:
-            self._audio_queue.put_nowait(indata.copy())
-            self._last_audio_data = indata.copy()  # Store for level monitoring
-        except asyncio.QueueFull:
-            logger.warning("Audio queue full, dropping frames")
+        # Stamp the block against the host monotonic clock and the device ADC clock
+        stamp = (self._frames_captured, adc_time, time.monotonic(), len(indata))
+        if self._first_stamp is None:
+            self._first_stamp = stamp
+        self._last_stamp = stamp
+        self._frames_captured += len(indata)
+        
+        data = indata.copy()
+        self._last_audio_data = data  # Store for level monitoring
+        with self._route_lock:
+            pre_roll = self._pre_roll
+            if pre_roll is not None:
+                pre_roll.append((stamp, data))
+                self._pre_roll_frames += len(data)
+                # Keep just enough blocks to cover the pre-roll window
+                while self._pre_roll_frames - len(pre_roll[0][1]) >= self._pre_roll_limit:
+                    self._pre_roll_frames -= len(pre_roll.popleft()[1])
+                    
+        if pre_roll is None:
+            # The stamp goes first so the writer never takes a block without it
+            log = self._block_stamps
+            if log is not None:
+                log.append(stamp)
+            try:
+                self._audio_queue.put_nowait(data)
+                depth = self._audio_queue.qsize()
+                if depth > self._max_queue_depth:
+                    self._max_queue_depth = depth
+            except asyncio.QueueFull:
+                if log is not None:
+                    log.pop()
+                self._record_drop(stamp[0], len(data))
             
-    async def record(self, output_path: Path, duration: Optional[float] = None) -> None:
+        # Feed the live monitor; the bounded deque drops old blocks instead of blocking
+        tap = self._monitor_tap
+        if tap is not None:
+            tap.append(data)
+            
+    async def record(self, output_path: Path, duration: Optional[float] = None,
+                     start_at: Optional[float] = None) -> None:
+        """Record to ``output_path``, from the sample nearest wall-clock time ``start_at`` if given."""
         logger.info(f"Recording to {output_path}")
         if duration:
             logger.info(f"Recording for {duration} seconds")
         else:
             logger.info("Press Ctrl+C to stop recording")
             
+        self._frame_bytes = self.config.channels * AudioFormat(self.config.dtype).bytes_per_sample
+        self._disk_guard = DiskGuard(output_path.parent, int(self.config.disk_reserve_mb * MB))
+        self._disk_projection = None
+        self._rotate_to = None
+        self._stop_reason = None
+        self._scheduled_start = None
+        output_path = await self._admit(output_path, duration)
+        
+        # An armed stream is already running; its pre-roll is measured back from this point
+        armed = self._state == RecordingState.ARMED
+        trigger_frame = self._frames_captured
+        
         self._state = RecordingState.RECORDING
         self._recording = True  # Keep for backward compatibility
         self._total_frames_written = 0
         self._start_time = time.time()
+        self._wall_offset = self._start_time - time.monotonic()
+        self._segments = []
+        self._reset_dropouts()
+        self.output_dir = output_path.parent
+        self._current_path = output_path
+        self._file_parts = [output_path]
+        self._segment_dir = output_path.parent
+        self._bytes_written = 0
+        self._write_started = time.monotonic()
+        activated = self.config.sound_activated
+        if not armed:
+            self._frames_captured = 0
+            self._first_stamp = None
+            self._last_stamp = None
+        self._block_stamps = deque() if self.config.clock_index_every else None
+        self._pre_roll_stamps = []
         
-        # Start system monitoring
-        await self._system_monitor.start_monitoring()
+        # Start system monitoring, with disk stats for the filesystem being written to
+        self._system_monitor.path = output_path.parent
+        self._process_start = self._system_monitor.process_snapshot()
+        if self._owns_monitor:
+            await self._system_monitor.start_monitoring()
         
-        # Check available disk space if duration is specified
-        if duration:
-            space_check = self._system_monitor.check_available_space(
-                duration / 3600, self.config.samplerate, self.config.channels, self.config.dtype
-            )
-            if not space_check['sufficient_space']:
-                logger.warning(f"Insufficient disk space! Need {space_check['estimated_size_gb']:.1f}GB, "
-                             f"have {space_check['available_gb']:.1f}GB")
-                logger.warning(f"Max recording duration: {space_check['max_duration_hours']:.1f} hours")
+        if not armed:
+            await self._prepare_capture()
         
-        # Get device info before recording
-        device_info = await DeviceManager.get_device_info(self.config.device)
-        self._device_info = asdict(device_info)
+        # Sound-activated sessions open one file per segment as sound arrives
+        if not activated:
+            await self._open_file(output_path)
+        
+        pre_roll = None
+        stream = None if armed else self._create_stream()
+        
+        writer_task: Optional[asyncio.Task] = None
+        guard_task: Optional[asyncio.Task] = None
+        active_writers.add(self)
+        try:
+            if start_at is not None:
+                if stream is not None:
+                    # Buffer from the moment the stream opens, so the start can be picked out of the ring
+                    self._start_pre_roll()
+                    stream.start()
+                pre_roll = self._take_ring(await self._wait_for_start(start_at))
+            elif armed:
+                # Later blocks go straight to the queue, so the pre-roll joins them without a gap
+                pre_roll = self._take_pre_roll(trigger_frame)
+            else:
+                stream.start()
+            if pre_roll is not None and len(pre_roll) and not activated:
+                self._index(self._pre_roll_stamps, len(pre_roll))
+                self._write_chunk_to_file(pre_roll)
+                logger.info(f"Wrote {len(pre_roll) / self.capture_rate:.2f}s of buffered audio")
+            self.started.set()
+            start_time = asyncio.get_event_loop().time()
+            
+            # Start background writer task
+            if activated:
+                writer_task = asyncio.create_task(self._activated_writer(output_path, pre_roll))
+            else:
+                writer_task = asyncio.create_task(self._stream_writer())
+            guard_task = asyncio.create_task(self._disk_guard_loop())
+            
+            while self._state == RecordingState.RECORDING:
+                if duration and (asyncio.get_event_loop().time() - start_time) >= duration:
+                    break
+                
+                # Just sleep, let the writer task handle the queue
+                await asyncio.sleep(0.1)
+            
+            # The writer drains what is already queued and exits once we leave RECORDING
+            if self._state == RecordingState.RECORDING:
+                self._state = RecordingState.STOPPING
+                        
+        except asyncio.CancelledError:
+            logger.info("Recording cancelled")
+            raise
+        finally:
+            if guard_task is not None:
+                guard_task.cancel()
+                await asyncio.gather(guard_task, return_exceptions=True)
+            if writer_task is not None:
+                if self._state == RecordingState.RECORDING:
+                    self._state = RecordingState.STOPPING
+                await asyncio.gather(writer_task, return_exceptions=True)
+            if stream is not None:
+                stream.stop()
+                stream.close()
+                with self._route_lock:
+                    self._pre_roll = None  # Left by a scheduled start stopped before it began
+            self._state = RecordingState.IDLE
+            self._recording = False  # Keep for backward compatibility
+            self.started.clear()
+            self._block_stamps = None
+            if self._stream is not None:
+                if self._stay_armed:
+                    # Go back to buffering, discarding anything queued after the writer stopped
+                    self._start_pre_roll()
+                    self._drain_queue()
+                    self._state = RecordingState.ARMED
+                else:
+                    await self._close_stream()
+            if self._owns_monitor:
+                await self._system_monitor.stop_monitoring()
+            active_writers.discard(self)
+            disk = {"stop_reason": self._stop_reason, "disk": self._disk_projection}
+            if self._scheduled_start is not None:
+                disk["scheduled_start"] = self._scheduled_start
+            if activated:
+                await self._close_segment()
+                await self._save_segment_index(output_path, disk)
+            else:
+                if len(self._file_parts) > 1:
+                    disk["part"] = len(self._file_parts)
+                    disk["previous_part"] = str(self._file_parts[-2])
+                await self._close_file_and_save_metadata(self._current_path, disk)
+            
+    async def _admit(self, output_path: Path, duration: Optional[float]) -> Path:
+        """Check the output volume has room before recording, applying the disk policy if not.
+        
+        Returns the path to record to, which the rotate policy moves to the
+        secondary output directory when the primary volume is short of space.
+        """
+        loop = asyncio.get_event_loop()
+        guard = self._disk_guard
+        bytes_per_second = self.config.samplerate * self._frame_bytes
+        # Without a duration, require room for the time the policy needs to act
+        seconds = duration if duration else self.config.disk_action_seconds
+        needed = seconds * bytes_per_second
+        if await loop.run_in_executor(None, guard.admits, needed):
+            return output_path
+        
+        policy = self.config.disk_policy
+        message = (f"Not enough disk space on {output_path.parent} for {seconds:.1f}s of audio "
+                   f"({needed / MB:.1f}MB above the {self.config.disk_reserve_mb:.0f}MB reserve)")
+        if policy == DiskPolicy.WARN:
+            logger.warning(message)
+            return output_path
+        if policy == DiskPolicy.ROTATE:
+            secondary = Path(self.config.secondary_output_dir)
+            guard.move_to(secondary)
+            if await loop.run_in_executor(None, guard.admits, needed):
+                await loop.run_in_executor(None, lambda: secondary.mkdir(parents=True, exist_ok=True))
+                logger.warning(f"{message}; recording to {secondary} instead")
+                return secondary / output_path.name
+            message += f", nor on {secondary}"
+        raise RecordingError(message)
+        
+    async def _disk_guard_loop(self) -> None:
+        """Project the time until the output volume fills and apply the disk policy."""
+        loop = asyncio.get_event_loop()
+        warned = False
+        while self._state == RecordingState.RECORDING:
+            await asyncio.sleep(DISK_CHECK_INTERVAL)
+            try:
+                projection = await loop.run_in_executor(None, self._disk_guard.projection)
+            except OSError as e:
+                logger.warning(f"Failed to check disk space: {e}")
+                continue
+            self._disk_projection = projection
+            remaining = projection["seconds_to_full"]
+            if remaining is None or remaining > self.config.disk_warn_seconds:
+                warned = False
+            elif remaining <= self.config.disk_action_seconds:
+                await self._on_disk_full(projection)
+            elif not warned:
+                logger.warning(f"{projection['path']} will be full in {remaining / 60:.1f} minutes "
+                               f"at {projection['rate_bytes_s'] / MB:.2f}MB/s")
+                warned = True
+                
+    async def _on_disk_full(self, projection: Dict[str, Any]) -> None:
+        """Rotate to the secondary volume or stop, once the output volume is about to fill."""
+        remaining = projection["seconds_to_full"]
+        policy = self.config.disk_policy
+        if policy == DiskPolicy.WARN:
+            logger.error(f"{projection['path']} will be full in {remaining:.0f}s")
+            return
+        if policy == DiskPolicy.ROTATE and self._rotate_to is None:
+            secondary = Path(self.config.secondary_output_dir)
+            if self.output_dir.absolute() != secondary.absolute():
+                loop = asyncio.get_event_loop()
+                try:
+                    await loop.run_in_executor(None, lambda: secondary.mkdir(parents=True, exist_ok=True))
+                    self._disk_guard.move_to(secondary)
+                    self._rotate_to = secondary
+                    logger.warning(f"{projection['path']} will be full in {remaining:.0f}s, "
+                                   f"continuing on {secondary}")
+                    return
+                except OSError as e:
+                    logger.error(f"Cannot rotate to {secondary}: {e}")
+        if self._rotate_to is not None:
+            return  # The writer has not switched yet
+        logger.error(f"{projection['path']} will be full in {remaining:.0f}s, stopping the recording")
+        self._stop_reason = "disk_space"
+        self.stop()
+        
+    async def _rotate_file(self) -> None:
+        """Finalize the current file and continue the recording in a new part on the rotated volume."""
+        target, self._rotate_to = self._rotate_to, None
+        old_path = self._current_path
+        new_path = target / f"{self._file_parts[0].stem}_part{len(self._file_parts) + 1:02d}.wav"
+        extra = {"part": len(self._file_parts), "continued_in": str(new_path), "stop_reason": "disk_rotation",
+                 "disk": self._disk_projection}
+        if len(self._file_parts) > 1:
+            extra["previous_part"] = str(self._file_parts[-2])
+        await self._close_file_and_save_metadata(old_path, extra, account=False)
+        self._total_frames_written = 0
+        await self._open_file(new_path)
+        self._current_path = new_path
+        self._file_parts.append(new_path)
+        self.output_dir = target
+        logger.info(f"Continuing recording in {new_path}")
         
-        # Open file for streaming writes
+    def write_rate(self) -> float:
+        """Get the bytes per second written to the output file since recording started."""
+        if self._write_started is None or self._state != RecordingState.RECORDING:
+            return 0.0
+        elapsed = time.monotonic() - self._write_started
+        return self._bytes_written / elapsed if elapsed > 0 else 0.0
+    
+    @property
+    def scheduled_start(self) -> Optional[Dict[str, Any]]:
+        """The requested start instant of a scheduled recording and its achieved skew."""
+        return self._scheduled_start
+    
+    @property
+    def disk_projection(self) -> Optional[Dict[str, Any]]:
+        """The latest time-to-full projection for the output volume."""
+        return self._disk_projection
+            
+    async def _open_file(self, path: Path) -> None:
+        """Open the output file for streaming writes and start its peak pyramid."""
         loop = asyncio.get_event_loop()
         self._file_writer = await loop.run_in_executor(
             None,
             lambda: sf.SoundFile(
-                str(output_path),
+                str(path),
                 'w',
                 samplerate=self.config.samplerate,
                 channels=self.config.channels,
                 format='WAV',
-                subtype='FLOAT' if self.config.dtype == 'float32' else 'PCM_16'
+                subtype=AudioFormat(self.config.dtype).file_subtype
             )
         )
         
-        stream = sd.InputStream(
-            samplerate=self.config.samplerate,
-            channels=self.config.channels,
-            dtype=self.config.dtype,
-            device=self.config.device,
-            callback=self._audio_callback
+        # Waveform peaks are built alongside the file so the UI never reads the WAV;
+        # level 0 is spooled to disk so it survives a crash and shows while recording
+        self._peaks_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="peaks")
+        self._peaks = await loop.run_in_executor(
+            self._peaks_executor,
+            lambda: PeakPyramidBuilder(self.config.channels, self.config.samplerate,
+                                       spool_path=partial_path_for(path))
         )
         
+        # Block clock stamps go to a sidecar as the file is written
+        self._index_frames = 0
+        if self.config.clock_index_every:
+            self._clock_index = await loop.run_in_executor(
+                None,
+                lambda: ClockIndexWriter(clock_path_for(path), self.config.samplerate, self.capture_rate,
+                                         self._wall_offset, self.config.clock_index_every)
+            )
+        
+    async def _activated_writer(self, output_path: Path, pre_roll: Optional[np.ndarray] = None) -> None:
+        """Background task that writes only the segments where sound is detected."""
+        detector = ActivityDetector(self.capture_rate, self.config.threshold_db,
+                                    self.config.hysteresis_db, self.config.hang_seconds)
+        pre_roll_limit = int(self.config.pre_roll_seconds * self.capture_rate)
+        # Blocks seen while no segment is open, with their clock stamps, trimmed to the pre-roll length
+        buffered: Deque[Tuple[np.ndarray, List[tuple]]] = deque()
+        buffered_frames = 0
+        pending: List[np.ndarray] = []
+        frames_seen = 0
+        
+        if pre_roll is not None and len(pre_roll):
+            buffered.append((pre_roll, self._pre_roll_stamps))
+            buffered_frames = len(pre_roll)
+            frames_seen = len(pre_roll)
+        
+        def flush() -> None:
+            if pending:
+                self._write_chunk_to_file(np.concatenate(pending, axis=0))
+                pending.clear()
+        
+        async def handle(block: np.ndarray) -> None:
+            nonlocal buffered_frames, frames_seen
+            stamps = self._take_stamp()
+            level = block_level_db(block)
+            if self._rotate_to is not None:
+                # Later segments go to the rotated volume; an open segment continues there
+                self._segment_dir, self._rotate_to = self._rotate_to, None
+                self.output_dir = self._segment_dir
+                if self._segment is not None:
+                    flush()
+                    await self._close_segment()
+                    await self._open_segment(output_path, frames_seen, level)
+            event = detector.update(level, len(block))
+            
+            if event == ActivityDetector.OPEN:
+                await self._open_segment(output_path, frames_seen - buffered_frames, level)
+                for earlier, earlier_stamps in buffered:
+                    self._index(earlier_stamps, len(earlier))
+                    pending.append(earlier)
+                buffered.clear()
+                buffered_frames = 0
+            
+            if self._segment is not None:
+                self._index(stamps, len(block))
+                pending.append(block)
+                self._segment["peak_level_db"] = max(self._segment["peak_level_db"], level)
+                if len(pending) >= 10:
+                    flush()
+            else:
+                buffered.append((block, stamps))
+                buffered_frames += len(block)
+                while buffered and buffered_frames - len(buffered[0][0]) >= pre_roll_limit:
+                    buffered_frames -= len(buffered.popleft()[0])
+            
+            frames_seen += len(block)
+            
+            if event == ActivityDetector.CLOSE:
+                flush()
+                await self._close_segment()
+        
         try:
-            with stream:
-                start_time = asyncio.get_event_loop().time()
-                
-                # Start background writer task
-                writer_task = asyncio.create_task(self._stream_writer())
-                
-                while self._state == RecordingState.RECORDING:
-                    if duration and (asyncio.get_event_loop().time() - start_time) >= duration:
-                        break
-                    
-                    # Just sleep, let the writer task handle the queue
-                    await asyncio.sleep(0.1)
-                
-                # Stop writer task
-                writer_task.cancel()
+            while self._state == RecordingState.RECORDING:
                 try:
-                    await writer_task
-                except asyncio.CancelledError:
-                    pass
-                        
+                    block = await asyncio.wait_for(self._audio_queue.get(), timeout=0.1)
+                except asyncio.TimeoutError:
+                    flush()
+                    continue
+                await handle(block)
+            for block in self._take_remaining():
+                await handle(block)
         except asyncio.CancelledError:
-            logger.info("Recording cancelled")
-            raise
+            pass
+        except Exception as e:
+            logger.error(f"Error in sound-activated writer: {e}")
+            self._state = RecordingState.ERROR
         finally:
+            flush()
+            
+    async def _open_segment(self, output_path: Path, start_frame: int, level: float) -> None:
+        """Open the next segment file of a sound-activated session."""
+        path = (self._segment_dir or output_path.parent) / f"{output_path.stem}_seg{len(self._segments):03d}.wav"
+        self._total_frames_written = 0
+        if self._resampler:
+            self._resampler.reset()
+        await self._open_file(path)
+        self._segment_path = path
+        
+        # Frames count from the first captured sample, whose host time the callback stamped
+        if self._first_stamp is not None:
+            _, _, host_time, frames = self._first_stamp
+            origin = self._wall_offset + host_time - frames / self.capture_rate
+        else:
+            origin = self._start_time
+        start = origin + start_frame / self.capture_rate
+        
+        self._segment = {
+            "audio_file": path.name if path.parent == output_path.parent else str(path),
+            "start_time": datetime.fromtimestamp(start).isoformat(),
+            "start_timestamp": start,
+            "start_offset_seconds": start - self._start_time,
+            "trigger_level_db": level,
+            "peak_level_db": level
+        }
+        logger.info(f"Sound detected ({level:.1f} dBFS), opened segment {path.name}")
+        
+    async def _close_segment(self) -> None:
+        """Close the open segment, if any, and add it to the session index."""
+        segment, self._segment = self._segment, None
+        if segment is None:
+            return
+        segment["duration_seconds"] = self._total_frames_written / self.config.samplerate
+        segment["total_frames"] = self._total_frames_written
+        # Resource use is accounted once for the whole session, in the segment index
+        await self._close_file_and_save_metadata(self._segment_path, {"segment": segment}, account=False)
+        self._segments.append(segment)
+        
+    async def _save_segment_index(self, output_path: Path, extra: Optional[Dict[str, Any]] = None) -> None:
+        """Write the session index listing every segment with its absolute start time."""
+        loop = asyncio.get_event_loop()
+        # Segments on a rotated volume are listed by their full path
+        segment_paths = [output_path.parent / segment["audio_file"] for segment in self._segments]
+        resources = await loop.run_in_executor(None, self._resource_usage, segment_paths)
+        index = {
+            "timestamp": datetime.now().isoformat(),
+            "mode": "sound_activated",
+            "session_start": datetime.fromtimestamp(self._start_time).isoformat(),
+            "session_duration_seconds": time.time() - self._start_time,
+            "device": self._device_info,
+            "config": asdict(self.config),
+            "segments": self._segments,
+            "dropouts": self.get_dropout_stats(include_gaps=True),
+            "resources": resources,
+            **(extra or {})
+        }
+        
+        index_path = output_path.with_name(f"{output_path.stem}_segments.json")
+        try:
+            await loop.run_in_executor(
+                None,
+                lambda: index_path.write_text(json.dumps(index, indent=2))
+            )
+        except Exception as e:
+            logger.warning(f"Failed to save segment index: {e}")
+        logger.info(f"Saved {len(self._segments)} segments, index at {index_path}")
+            
+    async def arm(self, pre_roll_seconds: Optional[float] = None) -> None:
+        """Open the input stream and keep the last seconds of audio ready for ``record``."""
+        if self._state == RecordingState.ARMED:
+            return
+        if self._state != RecordingState.IDLE:
+            raise RecordingError("Cannot arm while recording")
+        if pre_roll_seconds is not None:
+            if pre_roll_seconds < 0:
+                raise ConfigurationError("Pre-roll must not be negative")
+            self.config.pre_roll_seconds = pre_roll_seconds
+            
+        await self._prepare_capture()
+        self._frames_captured = 0
+        self._first_stamp = None
+        self._last_stamp = None
+        self._start_pre_roll()
+        
+        stream = self._create_stream()
+        loop = asyncio.get_event_loop()
+        try:
+            await loop.run_in_executor(None, stream.start)
+        except Exception as e:
+            self._pre_roll = None
+            stream.close()
+            raise RecordingError(f"Failed to open input stream: {e}") from e
+            
+        self._stream = stream
+        self._stay_armed = True
+        self._state = RecordingState.ARMED
+        logger.info(f"Armed with {self.config.pre_roll_seconds:.1f}s pre-roll")
+        
+    async def disarm(self) -> None:
+        """Close the armed stream, or let a running recording close it when it ends."""
+        self._stay_armed = False
+        if self._state == RecordingState.ARMED:
+            await self._close_stream()
             self._state = RecordingState.IDLE
-            self._recording = False  # Keep for backward compatibility
-            await self._system_monitor.stop_monitoring()
-            await self._close_file_and_save_metadata(output_path)
+            logger.info("Disarmed")
+            
+    async def _close_stream(self) -> None:
+        """Stop and close the persistent input stream."""
+        stream, self._stream = self._stream, None
+        with self._route_lock:
+            self._pre_roll = None
+        if stream is not None:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, lambda: (stream.stop(), stream.close()))
+            
+    async def _prepare_capture(self) -> None:
+        """Resolve the device and the rate the input stream will run at."""
+        device_info = await DeviceManager.get_device_info(self.config.device, backend=self._backend)
+        self._device_info = asdict(device_info)
+        
+        # Optionally open the device at its native rate and resample on the writer path
+        self.capture_rate = self.config.samplerate
+        self._resampler = None
+        if self.config.native_rate and needs_resampling(device_info.samplerate, self.config.samplerate):
+            self.capture_rate = int(round(device_info.samplerate))
+            self._resampler = PolyphaseResampler(
+                self.capture_rate, self.config.samplerate, self.config.channels, self.config.dtype
+            )
+            logger.info(f"Capturing at native {self.capture_rate} Hz, resampling to {self.config.samplerate} Hz")
+            
+    def _create_stream(self) -> Any:
+        """Create the input stream for the prepared capture settings."""
+        return self._backend.InputStream(
+            samplerate=self.capture_rate,
+            channels=self.config.channels,
+            dtype=self.config.dtype,
+            device=self.config.device,
+            callback=self._audio_callback
+        )
+        
+    def _start_pre_roll(self) -> None:
+        """Route captured blocks into a fresh pre-roll ring."""
+        with self._route_lock:
+            self._pre_roll_limit = max(1, int(self.config.pre_roll_seconds * self.capture_rate))
+            self._pre_roll_frames = 0
+            self._pre_roll = deque()
+            
+    def _take_pre_roll(self, trigger_frame: int) -> np.ndarray:
+        """Switch the callback to the queue and return the pre-roll before ``trigger_frame``."""
+        return self._take_ring(max(0, trigger_frame - int(self.config.pre_roll_seconds * self.capture_rate)))
+        
+    def _take_ring(self, start: int) -> np.ndarray:
+        """Switch the callback to the queue and return the buffered audio from frame ``start`` on."""
+        with self._route_lock:
+            blocks, self._pre_roll = self._pre_roll or deque(), None
+            
+        kept = []
+        position = 0
+        for (frame, adc_time, host_time, frames), data in blocks:
+            if frame + frames <= start:
+                continue
+            if not kept:
+                # Trim the first block and move its stamp to the first kept sample
+                offset = max(0, start - frame)
+                data = data[offset:]
+                shift = offset / self.capture_rate
+                adc_time = adc_time + shift if adc_time is not None else None
+                host_time += shift
+                self._first_stamp = (frame + offset, adc_time, host_time, frames - offset)
+            kept.append(data)
+            self._pre_roll_stamps.append((position, adc_time, host_time - frames / self.capture_rate))
+            position += len(data)
+            
+        if not kept:
+            self._first_stamp = None
+            return np.zeros((0, self.config.channels), dtype=self.config.dtype)
+        return np.concatenate(kept)
+        
+    async def _wait_for_start(self, start_at: float) -> int:
+        """Wait until the sample at wall-clock time ``start_at`` is buffered and return its frame.
+        
+        Records the achieved start, and its skew from ``start_at``, for the
+        metadata. A start already out of the buffer begins at its oldest frame.
+        """
+        with self._route_lock:
+            self._pre_roll_limit = max(self._pre_roll_limit, int(START_RING_SECONDS * self.capture_rate))
+        start = start_at - (time.time() - time.monotonic())  # On the host clock the callback stamps with
+        # Blocks are delivered once captured, so wait for the one holding the start
+        while self._state == RecordingState.RECORDING:
+            stamps, origin = self._ring_origin()
+            if stamps and origin + (stamps[-1][0] + stamps[-1][3]) / self.capture_rate > start:
+                break
+            # Sleep towards the start in short steps, so a stop is noticed
+            await asyncio.sleep(min(max(start - time.monotonic(), START_POLL_INTERVAL), 0.1))
+        else:
+            return self._frames_captured
+            
+        frame = max(stamps[0][0], int(round((start - origin) * self.capture_rate)))
+        skew = origin + frame / self.capture_rate - start
+        self._scheduled_start = {"start_at": start_at, "frame": frame, "start_skew_ms": round(skew * 1000, 3)}
+        logger.info(f"Scheduled start at frame {frame}, {skew * 1000:+.2f} ms from the requested instant")
+        return frame
+        
+    def _ring_origin(self) -> Tuple[List[tuple], Optional[float]]:
+        """Get the stamps of the buffered blocks and the host time they put frame zero at."""
+        with self._route_lock:
+            stamps = [stamp for stamp, _ in self._pre_roll or ()]
+        # Lost frames aren't counted, so only blocks since the last overflow share a time origin
+        overflow = max((gap["frame"] for gap in self._gaps if gap["reason"] == "input_overflow"), default=0)
+        stamps = [stamp for stamp in stamps if stamp[0] >= overflow] or stamps
+        if not stamps:
+            return stamps, None
+        # Callbacks run some time after their block is captured, never before, so the
+        # least delayed one gives the host time of frame zero
+        return stamps, min(host_time - (frame + frames) / self.capture_rate
+                           for frame, _, host_time, frames in stamps)
+        
+    def _drain_queue(self) -> None:
+        """Discard blocks left in the queue."""
+        while not self._audio_queue.empty():
+            self._audio_queue.get_nowait()
             
     async def _stream_writer(self) -> None:
         """Background task that writes audio chunks to disk as they arrive."""
@@ -151,6 +823,12 @@ class AudioRecorder:
         
         while self._state == RecordingState.RECORDING:
             try:
+                if self._rotate_to is not None:
+                    if chunks_to_write:
+                        self._write_chunk_to_file(np.concatenate(chunks_to_write, axis=0))
+                        chunks_to_write = []
+                    await self._rotate_file()
+                
                 # Collect multiple chunks before writing to reduce I/O overhead
                 chunk = await asyncio.wait_for(
                     self._audio_queue.get(),
@@ -158,7 +836,7 @@ class AudioRecorder:
                 )
                 
                 chunks_to_write.append(chunk)
-                self._total_frames_written += len(chunk)
+                self._index(self._take_stamp(), len(chunk))
                 
                 # Write if we have enough chunks or enough time has passed
                 current_time = time.time()
@@ -186,25 +864,66 @@ class AudioRecorder:
                     last_write_time = time.time()
                 continue
             except asyncio.CancelledError:
-                # Write any remaining chunks before exiting
-                if chunks_to_write:
-                    combined_chunk = np.concatenate(chunks_to_write, axis=0)
-                    self._write_chunk_to_file(combined_chunk)
                 break
             except Exception as e:
                 logger.error(f"Error in stream writer: {e}")
                 self._state = RecordingState.ERROR
                 break
+        
+        # Write any remaining chunks, including those queued before the stop
+        for chunk in self._take_remaining():
+            chunks_to_write.append(chunk)
+            self._index(self._take_stamp(), len(chunk))
+        if chunks_to_write:
+            self._write_chunk_to_file(np.concatenate(chunks_to_write, axis=0))
+            
+    def _take_remaining(self) -> List[np.ndarray]:
+        """Take the blocks queued so far once recording has stopped."""
+        if self._state == RecordingState.ERROR:
+            return []
+        # An armed stream keeps queueing, so only take what is there now
+        return [self._audio_queue.get_nowait() for _ in range(self._audio_queue.qsize())]
+    
+    def _take_stamp(self) -> List[tuple]:
+        """Get the clock stamp of the block just taken from the queue as (offset, adc_time, host_time)."""
+        log = self._block_stamps
+        if not log:
+            return []
+        _, adc_time, host_time, frames = log.popleft()
+        # The callback runs once the block is captured, so its first sample is a block earlier
+        return [(0, adc_time, host_time - frames / self.capture_rate)]
+    
+    def _index(self, stamps: List[tuple], frames: int) -> None:
+        """Add a block about to be written to the clock index of the open file."""
+        if self._clock_index is not None:
+            for offset, adc_time, host_time in stamps:
+                self._clock_index.add(self._index_frames + offset, adc_time, host_time)
+        self._index_frames += frames
     
     def _write_chunk_to_file(self, chunk: np.ndarray) -> None:
         """Write audio chunk to file (runs in thread executor)."""
+        if self._resampler:
+            chunk = self._resampler.process(chunk)
+        self._total_frames_written += len(chunk)
+        self._bytes_written += len(chunk) * self._frame_bytes
         with self._write_lock:
             if self._file_writer:
                 self._file_writer.write(chunk)
                 self._file_writer.flush()  # Ensure data is written to disk
+            if self._peaks:
+                self._peaks_executor.submit(self._peaks.add, chunk).add_done_callback(self._log_peaks_failure)
+            if self._clock_index:
+                self._clock_index.flush()
     
-    async def _close_file_and_save_metadata(self, output_path: Path) -> None:
-        """Close audio file and save metadata."""
+    @staticmethod
+    def _log_peaks_failure(future: Future) -> None:
+        if future.exception():
+            logger.warning(f"Failed to add waveform peaks: {future.exception()}")
+    
+    async def _close_file_and_save_metadata(self, output_path: Path,
+                                            extra: Optional[Dict[str, Any]] = None,
+                                            account: bool = True) -> None:
+        """Close audio file and save metadata, with the session's resource use if ``account``."""
         if not self._file_writer:
             logger.warning("No audio file to close")
             return
@@ -216,14 +935,47 @@ class AudioRecorder:
         
         duration_seconds = self._total_frames_written / self.config.samplerate
         
+        # Write the waveform peaks sidecar
+        peaks_file = None
+        if self._peaks:
+            peaks_path = peaks_path_for(output_path)
+            builder, self._peaks = self._peaks, None
+            try:
+                # Queued behind the chunks still being added
+                await loop.run_in_executor(self._peaks_executor, builder.write, peaks_path)
+                peaks_file = peaks_path.name
+            except Exception as e:
+                logger.warning(f"Failed to save waveform peaks: {e}")
+        if self._peaks_executor:
+            self._peaks_executor.shutdown(wait=False)
+            self._peaks_executor = None
+        
+        clock_index_file = None
+        if self._clock_index:
+            clock_index, self._clock_index = self._clock_index, None
+            try:
+                await loop.run_in_executor(None, clock_index.close)
+                clock_index_file = clock_index.path.name
+            except Exception as e:
+                logger.warning(f"Failed to save clock index: {e}")
+        
         # Save metadata
+        # Rotated recordings account every part they wrote
+        resources = await loop.run_in_executor(None, self._resource_usage, self._file_parts) if account else None
         metadata = {
             "timestamp": datetime.now().isoformat(),
             "duration_seconds": duration_seconds,
             "total_frames": self._total_frames_written,
             "device": self._device_info,
             "config": asdict(self.config),
-            "audio_file": output_path.name
+            "capture_samplerate": self.capture_rate,
+            "clock": self.get_clock_stamps(),
+            "audio_file": output_path.name,
+            "peaks_file": peaks_file,
+            "clock_index_file": clock_index_file,
+            "dropouts": self.get_dropout_stats(include_gaps=True),
+            "resources": resources,
+            **(extra or {})
         }
         
         metadata_path = output_path.with_suffix('.json')
@@ -239,6 +991,23 @@ class AudioRecorder:
         logger.info(f"Saved {duration_seconds:.2f} seconds of audio to {output_path}")
         logger.info(f"Metadata saved to {metadata_path}")
         
+    def _resource_usage(self, paths: List[Path]) -> Optional[Dict[str, Any]]:
+        """Get what the process used since recording started, against the size of the files written."""
+        if self._process_start is None:
+            return None
+        try:
+            usage = self._system_monitor.process_delta(self._process_start)
+            file_bytes = sum(path.stat().st_size for path in paths if path.exists())
+        except Exception as e:
+            logger.warning(f"Failed to measure resource usage: {e}")
+            return None
+        usage["file_mb"] = file_bytes / 1024 / 1024
+        # Bytes the process wrote per byte of audio file; well above 1 means write amplification
+        usage["write_amplification"] = (
+            usage["io_write_mb"] / usage["file_mb"] if usage["io_write_mb"] is not None and file_bytes else None
+        )
+        return usage
+        
     def stop(self) -> None:
         """Stop the recording."""
         if self._state == RecordingState.RECORDING:
@@ -246,12 +1015,67 @@ class AudioRecorder:
             logger.info("Stopping recording")
         self._recording = False  # Keep for backward compatibility
         
+    def get_clock_stamps(self) -> Dict[str, Any]:
+        """Get the clock stamps of the first and latest captured blocks."""
+        def as_dict(stamp: Optional[tuple]) -> Optional[Dict[str, Any]]:
+            if stamp is None:
+                return None
+            frame, adc_time, host_time, frames = stamp
+            return {"frame": frame, "adc_time": adc_time, "host_time": host_time, "frames": frames}
+        
+        first_frame = self._first_stamp[0] if self._first_stamp else 0
+        return {
+            "frames_captured": self._frames_captured - first_frame,
+            # time.time() - time.monotonic(), to turn host times into wall-clock times
+            "wall_offset": self._wall_offset,
+            "start_timestamp": (self._wall_offset + self._first_stamp[2] - self._first_stamp[3] / self.capture_rate
+                                if self._first_stamp else None),
+            "first_block": as_dict(self._first_stamp),
+            "last_block": as_dict(self._last_stamp)
+        }
+    
+    def get_dropout_stats(self, include_gaps: bool = False) -> Dict[str, Any]:
+        """Get the xrun, drop and queue-pressure counters of the current recording.
+        
+        Gap positions are in captured frames from the first recorded sample;
+        ``frames`` is None for overflows whose length the host did not report.
+        """
+        stats = {
+            "input_overflows": self._input_overflows,
+            "overflow_frames": self._overflow_frames,
+            "status_errors": self._status_errors,
+            "dropped_blocks": self._dropped_blocks,
+            "dropped_frames": self._dropped_frames,
+            "max_queue_depth": self._max_queue_depth,
+            "queue_capacity": self._audio_queue.maxsize,
+            "gap_count": self._gap_count
+        }
+        if include_gaps:
+            origin = self._first_stamp[0] if self._first_stamp else 0
+            stats["gaps"] = [
+                {**gap, "frame": gap["frame"] - origin,
+                 "seconds": (gap["frame"] - origin) / self.capture_rate}
+                for gap in self._gaps
+            ]
+            stats["gaps_truncated"] = self._gap_count > len(self._gaps)
+        return stats
+    
+    def enable_monitor_tap(self) -> Deque[np.ndarray]:
+        """Start copying captured blocks into a bounded buffer for live monitoring."""
+        if self._monitor_tap is None:
+            self._monitor_tap = create_tap()
+        return self._monitor_tap
+    
+    def disable_monitor_tap(self) -> None:
+        """Stop feeding the live monitoring buffer."""
+        self._monitor_tap = None
+        
     async def get_device_info(self, device: Optional[Union[int, str]] = None) -> Dict[str, Any]:
         """Get device info (for backward compatibility)."""
-        device_obj = await DeviceManager.get_device_info(device)
+        device_obj = await DeviceManager.get_device_info(device, backend=self._backend)
         return asdict(device_obj)
     
     async def list_input_devices(self) -> List[Dict[str, Any]]:
         """List input devices (for backward compatibility)."""
-        devices = await DeviceManager.list_input_devices()
+        devices = await DeviceManager.list_input_devices(backend=self._backend)
         return [asdict(device) for device in devices]
\ No newline at end of file
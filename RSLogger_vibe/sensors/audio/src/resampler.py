@@ -0,0 +1,137 @@
+"""Streaming polyphase resampler for RSLogger Audio.
+
+Used when a device is captured at its native rate and the file must be
+written at ``RecordingConfig.samplerate``. The resampler runs on the writer
+path, keeps its filter history between blocks so output is independent of
+how the input is split, and works in preallocated buffers so steady-state
+processing does not allocate.
+"""
+
+from math import gcd
+from typing import Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .exceptions import ConfigurationError
+
+
+DEFAULT_TAPS_PER_PHASE = 32
+DEFAULT_MAX_BLOCK = 16384
+
+
+def design_filter(up: int, down: int, taps_per_phase: int, beta: float = 8.6,
+                  rolloff: float = 0.92) -> np.ndarray:
+    """Design the Kaiser-windowed sinc prototype low-pass at the upsampled rate."""
+    length = taps_per_phase * up
+    # Cut off below the lower of the two Nyquist frequencies
+    cutoff = rolloff / max(up, down)
+    n = np.arange(length) - (length - 1) / 2
+    h = cutoff * np.sinc(cutoff * n) * np.kaiser(length, beta)
+    return h * up / h.sum()
+
+
+class PolyphaseResampler:
+    """Resample fixed-channel audio blocks by a rational factor."""
+
+    def __init__(self, in_rate: int, out_rate: int, channels: int, dtype: str = 'float32',
+                 taps_per_phase: int = DEFAULT_TAPS_PER_PHASE, max_block: int = DEFAULT_MAX_BLOCK):
+        if in_rate <= 0 or out_rate <= 0:
+            raise ConfigurationError("Sample rates must be positive")
+
+        divisor = gcd(int(in_rate), int(out_rate))
+        self.in_rate = int(in_rate)
+        self.out_rate = int(out_rate)
+        self.up = self.out_rate // divisor
+        self.down = self.in_rate // divisor
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self.taps = taps_per_phase
+        self.max_block = max_block
+
+        # Phase p holds h[p + k * up]; reversed so it lines up with ascending input windows
+        h = design_filter(self.up, self.down, taps_per_phase).astype(np.float32)
+        self._phases = np.ascontiguousarray(h.reshape(taps_per_phase, self.up).T[:, ::-1])
+        # Filter group delay, in input samples
+        self.delay = (len(h) - 1) / 2 / self.up
+
+        history = taps_per_phase - 1
+        max_out = (max_block * self.up) // self.down + 2
+        self._buffer = np.zeros((history + max_block, channels), dtype=np.float32)
+        self._positions = np.zeros(max_out, dtype=np.int64)
+        self._indices = np.zeros(max_out, dtype=np.int64)
+        self._phase_index = np.zeros(max_out, dtype=np.int64)
+        self._ramp = np.arange(max_out, dtype=np.int64) * self.down
+        self._windows = np.zeros((max_out, channels, taps_per_phase), dtype=np.float32)
+        self._coefficients = np.zeros((max_out, taps_per_phase), dtype=np.float32)
+        self._out = np.zeros((max_out, channels), dtype=np.float32)
+        self._out_native = np.zeros((max_out, channels), dtype=self.dtype)
+        self._scratch = np.zeros((max_out, channels), dtype=np.float32)
+        self._integer = np.issubdtype(self.dtype, np.integer)
+        if self._integer:
+            info = np.iinfo(self.dtype)
+            self._limits = (float(info.min), float(info.max))
+        # Position of the next output sample in upsampled units, relative to the block start
+        self._next = 0
+
+    def output_frames(self, frames: int) -> int:
+        """Number of output frames the next block of ``frames`` input frames will produce."""
+        remaining = frames * self.up - self._next
+        return max(0, -(-remaining // self.down))
+
+    def reset(self) -> None:
+        """Clear filter history."""
+        self._buffer[:] = 0
+        self._next = 0
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Resample a (frames, channels) block.
+
+        Returns a view into an internal buffer that is only valid until the
+        next call, so callers must consume (e.g. write) it immediately.
+        """
+        if len(block) > self.max_block:
+            parts = [self.process(block[i:i + self.max_block]).copy()
+                     for i in range(0, len(block), self.max_block)]
+            return np.concatenate(parts) if parts else self._out_native[:0]
+
+        frames = len(block)
+        history = self.taps - 1
+        count = self.output_frames(frames)
+        self._buffer[history:history + frames] = block.reshape(frames, self.channels)
+
+        if count:
+            positions = self._positions[:count]
+            indices = self._indices[:count]
+            phase_index = self._phase_index[:count]
+            np.add(self._ramp[:count], self._next, out=positions)
+            np.floor_divide(positions, self.up, out=indices)
+            np.remainder(positions, self.up, out=phase_index)
+
+            # Window j covers input samples j - history .. j of this block
+            windows = sliding_window_view(self._buffer[:history + frames], self.taps, axis=0)
+            np.take(windows, indices, axis=0, out=self._windows[:count])
+            np.take(self._phases, phase_index, axis=0, out=self._coefficients[:count])
+            np.matmul(self._windows[:count], self._coefficients[:count, :, None],
+                      out=self._out[:count, :, None])
+
+        # Keep the last samples as history for the next block
+        self._buffer[:history] = self._buffer[frames:frames + history]
+        self._next += count * self.down - frames * self.up
+
+        if not self._integer:
+            if self.dtype == np.float32:
+                return self._out[:count]
+            np.copyto(self._out_native[:count], self._out[:count], casting='unsafe')
+            return self._out_native[:count]
+
+        scratch = self._scratch[:count]
+        np.rint(self._out[:count], out=scratch)
+        np.clip(scratch, self._limits[0], self._limits[1], out=scratch)
+        np.copyto(self._out_native[:count], scratch, casting='unsafe')
+        return self._out_native[:count]
+
+
+def needs_resampling(capture_rate: Optional[float], target_rate: int) -> bool:
+    """Check whether a device's native rate differs from the configured rate."""
+    return capture_rate is not None and int(round(capture_rate)) != int(target_rate)
@@ -1,36 +1,74 @@
-"""System resource monitoring for long-running audio recordings."""
+"""System resource monitoring for long-running audio recordings.
+
+Samples are taken on a background thread with non-blocking CPU deltas and
+kept in a fixed-size ring buffer, so reading stats never blocks the event
+loop that feeds the audio writer.
+"""
 
 import psutil
 import logging
-from typing import Dict, Any
-import asyncio
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Deque, Union
 import time
 
+from .disk_guard import existing_path
+from .enums import AudioFormat
+
 logger = logging.getLogger(__name__)
 
+DEFAULT_SAMPLE_INTERVAL = 5.0  # Seconds between samples
+DEFAULT_HISTORY = 720  # One hour of samples at the default interval
+MB = 1024 * 1024
+
 
 class SystemMonitor:
     """Monitor system resources during long recordings."""
     
-    def __init__(self, log_interval: int = 300):  # Log every 5 minutes
+    def __init__(self, log_interval: int = 300,  # Log every 5 minutes
+                 sample_interval: float = DEFAULT_SAMPLE_INTERVAL,
+                 history: int = DEFAULT_HISTORY, path: Union[str, Path] = '/'):
         self.log_interval = log_interval
+        self.path = path  # Disk stats describe the filesystem holding this path
+        self.sample_interval = sample_interval
         self.monitoring = False
         self._start_memory = None
         self._start_time = None
-        
+        self._samples: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._users = 0  # Monitoring runs while anyone still needs it
+        self._process = psutil.Process()
+        self._last_io: Optional[Any] = None
+        self._last_io_time: Optional[float] = None
+        self._last_log = 0.0
+    
     async def start_monitoring(self):
         """Start system monitoring in background."""
+        self._users += 1
+        if self.monitoring:
+            return
         self.monitoring = True
         self._start_time = time.time()
         self._start_memory = psutil.virtual_memory().used
         
-        # Start monitoring task
-        asyncio.create_task(self._monitor_loop())
+        # Prime the CPU counters so the first sample reports a real delta
+        psutil.cpu_percent(interval=None)
+        self._process.cpu_percent(interval=None)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="system-monitor", daemon=True)
+        self._thread.start()
         logger.info("System monitoring started")
-        
+    
     async def stop_monitoring(self):
         """Stop system monitoring."""
+        self._users = max(0, self._users - 1)
+        if self._users or not self.monitoring:
+            return
         self.monitoring = False
+        self._stop.set()
         
         if self._start_memory and self._start_time:
             elapsed = time.time() - self._start_time
@@ -40,12 +78,12 @@ class SystemMonitor:
             logger.info(f"Recording session ended:")
             logger.info(f"  Duration: {elapsed/3600:.2f} hours")
             logger.info(f"  Memory delta: {memory_delta/1024/1024:.1f} MB")
-            
-    async def _monitor_loop(self):
-        """Background monitoring loop."""
-        while self.monitoring:
+    
+    def _sample_loop(self):
+        """Background sampling loop, run on its own thread."""
+        while not self._stop.is_set():
             try:
-                stats = self.get_system_stats()
+                stats = self.sample()
                 
                 # Log if memory usage is concerning
                 if stats['memory_percent'] > 80:
@@ -55,19 +93,20 @@ class SystemMonitor:
                     logger.warning(f"Low disk space: {stats['disk_percent']:.1f}% used")
                 
                 # Periodic info logging
-                if int(time.time()) % self.log_interval == 0:
+                if stats['timestamp'] - self._last_log >= self.log_interval:
+                    self._last_log = stats['timestamp']
                     self._log_stats(stats)
-                    
-                await asyncio.sleep(30)  # Check every 30 seconds
-                
+            
             except Exception as e:
                 logger.error(f"Error in system monitoring: {e}")
-                await asyncio.sleep(60)
-                
-    def get_system_stats(self) -> Dict[str, Any]:
-        """Get current system statistics."""
+            
+            self._stop.wait(self.sample_interval)
+    
+    def sample(self) -> Dict[str, Any]:
+        """Take one sample without blocking and add it to the time series."""
+        now = time.time()
         memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
+        disk = psutil.disk_usage(str(existing_path(self.path)))
         
         stats = {
             'memory_percent': memory.percent,
@@ -75,19 +114,132 @@ class SystemMonitor:
             'memory_used_mb': memory.used / 1024 / 1024,
             'disk_percent': disk.percent,
             'disk_free_gb': disk.free / 1024 / 1024 / 1024,
-            'cpu_percent': psutil.cpu_percent(interval=1),
-            'timestamp': time.time()
+            # CPU use since the previous sample
+            'cpu_percent': psutil.cpu_percent(interval=None),
+            'timestamp': now
         }
+        stats.update(self._disk_io_rates(now))
+        
+        process = self.process_snapshot()
+        stats.update({
+            'process_rss_mb': process['rss_bytes'] / MB if process['rss_bytes'] is not None else None,
+            'process_threads': process['threads'],
+            'process_cpu_seconds': process['cpu_seconds'],
+            'process_write_mb': process['write_bytes'] / MB if process['write_bytes'] is not None else None,
+            'process_fds': process['fds'],
+        })
+        try:
+            stats['process_cpu_percent'] = self._process.cpu_percent(interval=None)
+        except psutil.Error:
+            stats['process_cpu_percent'] = None
         
         # Add recording session info if available
         if self._start_time:
-            stats['session_duration_hours'] = (time.time() - self._start_time) / 3600
-            
+            stats['session_duration_hours'] = (now - self._start_time) / 3600
+        
         if self._start_memory:
             stats['memory_delta_mb'] = (memory.used - self._start_memory) / 1024 / 1024
-            
+        
+        with self._lock:
+            self._samples.append(stats)
         return stats
+    
+    def _disk_io_rates(self, now: float) -> Dict[str, Optional[float]]:
+        """Get system-wide disk read and write rates since the previous sample."""
+        try:
+            io = psutil.disk_io_counters()
+        except Exception:
+            io = None
+        rates = {'disk_read_mb_s': None, 'disk_write_mb_s': None}
+        if io is not None and self._last_io is not None and now > self._last_io_time:
+            elapsed = now - self._last_io_time
+            rates['disk_read_mb_s'] = (io.read_bytes - self._last_io.read_bytes) / elapsed / 1024 / 1024
+            rates['disk_write_mb_s'] = (io.write_bytes - self._last_io.write_bytes) / elapsed / 1024 / 1024
+        self._last_io, self._last_io_time = io, now
+        return rates
+    
+    def process_snapshot(self) -> Dict[str, Any]:
+        """Get this process's own resource counters; fields the platform lacks are None."""
+        snapshot = {'timestamp': time.time(), 'rss_bytes': None, 'cpu_seconds': None, 'threads': None,
+                    'read_bytes': None, 'write_bytes': None, 'fds': None}
+        process = self._process
+        with process.oneshot():
+            for key, read in (
+                ('rss_bytes', lambda: process.memory_info().rss),
+                ('cpu_seconds', lambda: sum(process.cpu_times()[:2])),
+                ('threads', process.num_threads),
+                ('fds', lambda: process.num_fds() if hasattr(process, 'num_fds') else process.num_handles()),
+            ):
+                try:
+                    snapshot[key] = read()
+                except (psutil.Error, AttributeError, NotImplementedError):
+                    pass
+            try:
+                io = process.io_counters()
+                snapshot['read_bytes'] = io.read_bytes
+                snapshot['write_bytes'] = io.write_bytes
+            except (psutil.Error, AttributeError, NotImplementedError):
+                pass  # Not available on macOS
+        return snapshot
+    
+    def process_delta(self, start: Dict[str, Any]) -> Dict[str, Any]:
+        """Get what this process used since a ``process_snapshot``."""
+        end = self.process_snapshot()
+        
+        def delta(key: str) -> Optional[float]:
+            if start.get(key) is None or end[key] is None:
+                return None
+            return end[key] - start[key]
         
+        def mb(value: Optional[float]) -> Optional[float]:
+            return value / MB if value is not None else None
+        
+        return {
+            'duration_seconds': end['timestamp'] - start['timestamp'],
+            'rss_start_mb': mb(start.get('rss_bytes')),
+            'rss_end_mb': mb(end['rss_bytes']),
+            'rss_delta_mb': mb(delta('rss_bytes')),
+            'cpu_seconds': delta('cpu_seconds'),
+            'io_read_mb': mb(delta('read_bytes')),
+            'io_write_mb': mb(delta('write_bytes')),
+            'threads_start': start.get('threads'),
+            'threads_end': end['threads'],
+            'fds_start': start.get('fds'),
+            'fds_end': end['fds'],
+            'fds_delta': delta('fds'),
+        }
+    
+    def get_system_stats(self) -> Dict[str, Any]:
+        """Get current system statistics.
+        
+        Returns the latest background sample, or takes one now when the
+        monitor is not running. Never blocks on CPU measurement.
+        """
+        with self._lock:
+            latest = self._samples[-1] if self._samples else None
+        if latest is not None and self.monitoring:
+            return dict(latest)
+        return self.sample()
+    
+    def get_history(self, since: Optional[float] = None, fields: Optional[List[str]] = None,
+                    limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get samples from the ring buffer, oldest first.
+        
+        ``since`` keeps samples newer than a timestamp, ``fields`` selects
+        the keys to return (the timestamp is always included) and ``limit``
+        keeps only the most recent samples.
+        """
+        with self._lock:
+            samples = list(self._samples)
+        if since is not None:
+            samples = [s for s in samples if s['timestamp'] > since]
+        if limit is not None:
+            samples = samples[-limit:] if limit > 0 else []
+        if fields:
+            keys = set(fields) | {'timestamp'}
+            samples = [{k: v for k, v in s.items() if k in keys} for s in samples]
+        return samples
+    
     def _log_stats(self, stats: Dict[str, Any]):
         """Log system statistics."""
         logger.info(f"System stats: "
@@ -100,20 +252,21 @@ class SystemMonitor:
         if 'session_duration_hours' in stats:
             logger.info(f"Recording session: {stats['session_duration_hours']:.2f}h, "
                        f"memory delta: {stats.get('memory_delta_mb', 0):.1f}MB")
-        
-    def check_available_space(self, estimated_hours: float, samplerate: int, 
-                            channels: int, dtype: str = 'float32') -> Dict[str, Any]:
+    
+    def check_available_space(self, estimated_hours: float, samplerate: int,
+                            channels: int, dtype: str = 'float32',
+                            path: Optional[Union[str, Path]] = None) -> Dict[str, Any]:
         """Check if enough disk space is available for estimated recording duration."""
         # Calculate bytes per second
-        bytes_per_sample = 4 if dtype == 'float32' else 2  # float32 or int16
+        bytes_per_sample = AudioFormat(dtype).bytes_per_sample
         bytes_per_second = samplerate * channels * bytes_per_sample
         
         # Estimate total size
         estimated_bytes = bytes_per_second * estimated_hours * 3600
         estimated_gb = estimated_bytes / 1024 / 1024 / 1024
         
-        # Get available space
-        disk = psutil.disk_usage('/')
+        # Get available space on the filesystem the recording goes to
+        disk = psutil.disk_usage(str(existing_path(path or self.path)))
         available_gb = disk.free / 1024 / 1024 / 1024
         
         result = {
@@ -124,4 +277,4 @@ class SystemMonitor:
             'max_duration_hours': (available_gb * 0.9) / (estimated_gb / estimated_hours)
         }
         
-        return result
\ No newline at end of file
+        return result
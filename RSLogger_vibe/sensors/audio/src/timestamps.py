@@ -0,0 +1,189 @@
+"""Per-block clock index for RSLogger Audio recordings.
+
+A ``.clock`` sidecar maps sample offsets in the audio file to the device ADC
+clock and the host monotonic clock, one entry for every ``every`` blocks
+delivered by the audio callback. Times between entries are interpolated,
+so audio can be aligned to video frames or events stamped on the same host
+clock without analyzing the audio.
+
+File layout (little-endian)::
+
+    header   <4sHHIId   magic, version, every, samplerate, capture_samplerate,
+                        wall_offset (time.time() - time.monotonic())
+    entries  <Qdd       file frame, ADC time (NaN if the host has none),
+                        host monotonic time
+
+Both times are for the first sample of the block. The host time is taken
+when the callback runs, less the block's duration, so it carries the
+callback's scheduling jitter; the ADC time, where the host API provides
+it, does not.
+
+Entries are appended while recording, so the sidecar of an interrupted
+recording is still usable.
+"""
+
+import struct
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Union
+
+import numpy as np
+
+
+CLOCK_MAGIC = b'RSTI'
+CLOCK_VERSION = 1
+CLOCK_SUFFIX = '.clock'
+HEADER = struct.Struct('<4sHHIId')
+ENTRY = np.dtype([('frame', '<u8'), ('adc_time', '<f8'), ('host_time', '<f8')])
+
+
+def clock_path_for(audio_path: Path) -> Path:
+    """Get the clock index sidecar path for an audio file."""
+    return audio_path.with_suffix(CLOCK_SUFFIX)
+
+
+class ClockIndexWriter:
+    """Append block timestamps of one audio file to its clock index.
+
+    ``add`` takes the block's position in captured frames; positions are
+    converted to file frames when the file is written at a different rate
+    than the device captures.
+    """
+
+    def __init__(self, path: Path, samplerate: int, capture_rate: int,
+                 wall_offset: float, every: int = 1):
+        self.path = path
+        self.samplerate = samplerate
+        self.capture_rate = capture_rate
+        self.every = max(1, every)
+        self._blocks = 0
+        self._pending: List[tuple] = []
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(CLOCK_MAGIC, CLOCK_VERSION, self.every, samplerate,
+                                     capture_rate, wall_offset))
+
+    def add(self, captured_frame: int, adc_time: Optional[float], host_time: float) -> None:
+        """Record the clock times of the block starting at ``captured_frame`` of this file."""
+        keep = self._blocks % self.every == 0
+        self._blocks += 1
+        if keep:
+            frame = int(round(captured_frame * self.samplerate / self.capture_rate))
+            self._pending.append((frame, adc_time if adc_time else np.nan, host_time))
+
+    def flush(self) -> None:
+        """Append the entries added since the last flush."""
+        if self._pending and self._file is not None:
+            self._file.write(np.array(self._pending, dtype=ENTRY).tobytes())
+            self._file.flush()
+            self._pending.clear()
+
+    def close(self) -> None:
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ClockIndex:
+    """Interpolating lookup between file frames and clock times.
+
+    Lookups accept scalars or arrays. Between entries times are
+    interpolated linearly; beyond the first and last entry they are
+    extrapolated at the nominal sample rate.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        raw = self.path.read_bytes()
+        if len(raw) < HEADER.size:
+            raise ValueError(f"{self.path.name} is not a clock index")
+        magic, version, self.every, self.samplerate, self.capture_rate, self.wall_offset = \
+            HEADER.unpack_from(raw)
+        if magic != CLOCK_MAGIC or version != CLOCK_VERSION:
+            raise ValueError(f"{self.path.name} is not a clock index")
+        # An entry cut short by a crash is ignored
+        count = (len(raw) - HEADER.size) // ENTRY.itemsize
+        self.entries = np.frombuffer(raw, dtype=ENTRY, count=count, offset=HEADER.size)
+        self._frames = self.entries['frame'].astype(np.float64)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def has_adc_time(self) -> bool:
+        return bool(len(self) and np.isfinite(self.entries['adc_time']).all())
+
+    def _time_at(self, times: np.ndarray, frames: Any) -> Any:
+        if len(self) == 0:
+            raise ValueError(f"{self.path.name} has no entries")
+        frames = np.asarray(frames, dtype=np.float64)
+        result = np.interp(frames, self._frames, times)
+        # Outside the indexed range, continue at the nominal rate
+        result = np.where(frames < self._frames[0],
+                          times[0] + (frames - self._frames[0]) / self.samplerate, result)
+        result = np.where(frames > self._frames[-1],
+                          times[-1] + (frames - self._frames[-1]) / self.samplerate, result)
+        return result if result.ndim else float(result)
+
+    def _frame_at(self, times: np.ndarray, time: Any) -> Any:
+        if len(self) == 0:
+            raise ValueError(f"{self.path.name} has no entries")
+        time = np.asarray(time, dtype=np.float64)
+        result = np.interp(time, times, self._frames)
+        result = np.where(time < times[0], self._frames[0] + (time - times[0]) * self.samplerate, result)
+        result = np.where(time > times[-1], self._frames[-1] + (time - times[-1]) * self.samplerate, result)
+        return result if result.ndim else float(result)
+
+    def _adc_times(self) -> np.ndarray:
+        if not self.has_adc_time:
+            raise ValueError(f"{self.path.name} has no ADC times")
+        return self.entries['adc_time']
+
+    def host_time(self, frame: Any) -> Any:
+        """Get the host monotonic time of a file frame."""
+        return self._time_at(self.entries['host_time'], frame)
+
+    def wall_time(self, frame: Any) -> Any:
+        """Get the ``time.time()`` of a file frame."""
+        return self.host_time(frame) + self.wall_offset
+
+    def adc_time(self, frame: Any) -> Any:
+        """Get the device ADC time of a file frame."""
+        return self._time_at(self._adc_times(), frame)
+
+    def frame_at_host_time(self, time: Any) -> Any:
+        """Get the (fractional) file frame captured at a host monotonic time."""
+        return self._frame_at(self.entries['host_time'], time)
+
+    def frame_at_wall_time(self, time: Any) -> Any:
+        """Get the (fractional) file frame captured at a ``time.time()``."""
+        return self.frame_at_host_time(np.asarray(time, dtype=np.float64) - self.wall_offset)
+
+    def frame_at_adc_time(self, time: Any) -> Any:
+        """Get the (fractional) file frame captured at a device ADC time."""
+        return self._frame_at(self._adc_times(), time)
+
+    def drift(self) -> Dict[str, Any]:
+        """Estimate the real sample rate against each clock from a least-squares fit.
+
+        Returns the fitted rates and their deviation from the nominal rate in
+        parts per million.
+        """
+        result: Dict[str, Any] = {"entries": len(self), "nominal_samplerate": self.samplerate}
+        clocks = {"host": self.entries['host_time']}
+        if self.has_adc_time:
+            clocks["adc"] = self.entries['adc_time']
+        for name, times in clocks.items():
+            if len(self) < 2 or times[-1] <= times[0]:
+                result[f"{name}_samplerate"] = None
+                result[f"{name}_ppm"] = None
+                continue
+            rate = np.polyfit(times - times[0], self._frames - self._frames[0], 1)[0]
+            result[f"{name}_samplerate"] = float(rate)
+            result[f"{name}_ppm"] = float((rate / self.samplerate - 1) * 1e6)
+        return result
+
+
+def read_clock_index(audio_path: Path) -> Optional[ClockIndex]:
+    """Load the clock index of an audio file, if it has one."""
+    path = clock_path_for(audio_path)
+    return ClockIndex(path) if path.exists() else None
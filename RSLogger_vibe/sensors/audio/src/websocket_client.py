@@ -1,17 +1,22 @@
 """WebSocket-based audio recorder service that connects to a central UI server."""
 import asyncio
+import contextvars
 import json
 import logging
+import socket
+import time
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Set, Tuple
 
 import websockets
 from websockets.client import WebSocketClientProtocol
 
 from .recorder import AudioRecorder, RecordingConfig
 from .config import ConfigManager
-from .devices import DeviceManager
+from .devices import DeviceManager, get_registry
+from .monitor import MonitorStream, DEFAULT_MONITOR_RATE
+from .system_monitor import SystemMonitor
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,19 +24,49 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+MONITOR_POLL_INTERVAL = 0.02  # Seconds between drains of the monitoring tap
+STATS_PUSH_INTERVAL = 30.0  # Seconds between system stats pushes to the hub
+START_TIMEOUT = 10.0  # Seconds start_recording waits for capture to begin before acknowledging
+
+# Errors reported while handling the current command, for its ack; tasks the command starts share it
+_command_errors: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar("command_errors", default=None)
+# What the current command reports back in its ack, such as the skew of a scheduled start
+_command_result: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("command_result",
+                                                                                         default=None)
+_command_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("command_id", default=None)
+
+
+def status_delta(previous: Dict[str, Any], current: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """Get the top-level fields of ``current`` that differ from ``previous``, and those it lacks."""
+    changes = {key: value for key, value in current.items() if key not in previous or previous[key] != value}
+    return changes, [key for key in previous if key not in current]
+
 
 class WebSocketRecorderClient:
     """WebSocket client that exposes audio recorder controls to external master program."""
     
-    def __init__(self, server_url: str, device: Optional[str] = None):
+    def __init__(self, server_url: str, device: Optional[str] = None,
+                 client_id: Optional[str] = None):
         self.server_url = server_url
         self.device = device
+        self.client_id = client_id or socket.gethostname()
         self.websocket: Optional[WebSocketClientProtocol] = None
         self.recorder: Optional[AudioRecorder] = None
         self.recording_task: Optional[asyncio.Task] = None
         self.config_manager = ConfigManager()
         self.config = self.config_manager.load()
         self.running = True
+        self.monitor_task: Optional[asyncio.Task] = None
+        self.monitor_rate = DEFAULT_MONITOR_RATE
+        # One monitor samples in the background for the client's lifetime and is shared by its recorders
+        self.system_monitor = SystemMonitor(path=self.config.output_dir)
+        self.stats_task: Optional[asyncio.Task] = None
+        # The last status sent and its version; later statuses only send the fields that changed
+        self.status_version = 0
+        self._sent_status: Optional[Dict[str, Any]] = None
+        # Commands run in their own tasks, so a slow one doesn't hold up those after it
+        self.command_tasks: Set[asyncio.Task] = set()
+        self._start_lock = asyncio.Lock()
         
         # Override device if specified
         if device:
@@ -39,12 +74,16 @@ class WebSocketRecorderClient:
             
     async def connect(self):
         """Connect to the control server."""
+        # Monitoring never survives a reconnect; the hub re-requests it if needed
+        await self.stop_monitor()
+        
         try:
             self.websocket = await websockets.connect(self.server_url)
             logger.info(f"Connected to control server at {self.server_url}")
             
-            # Send initial status
-            await self.send_status()
+            # Register with the hub, then send initial status
+            await self.send_message({"type": "register"})
+            await self.send_status(full=True)
             
         except Exception as e:
             logger.error(f"Failed to connect to control server: {e}")
@@ -52,18 +91,26 @@ class WebSocketRecorderClient:
             
     async def send_message(self, message: Dict[str, Any]):
         """Send a message to the server."""
+        if message.get("type") == "error" or message.get("event") == "recording_error":
+            errors = _command_errors.get()
+            if errors is not None:
+                errors.append(message.get("error"))
         if self.websocket:
             try:
-                await self.websocket.send(json.dumps(message))
+                await self.websocket.send(json.dumps({"client_id": self.client_id, **message}))
             except Exception as e:
                 logger.error(f"Error sending message: {e}")
                 
-    async def send_status(self):
-        """Send current status to control server."""
+    async def send_status(self, full: bool = False):
+        """Send current status to control server.
+        
+        A full snapshot goes out on registering and when the hub asks for one;
+        otherwise only the fields that changed since the last status are sent,
+        as a ``status_delta`` the hub applies to the version it names.
+        """
         device_info = await DeviceManager.get_device_info(self.config.device)
         
         status = {
-            "type": "status",
             "recording": self.recording_task is not None and not self.recording_task.done(),
             "config": {
                 "device": self.config.device,
@@ -71,12 +118,37 @@ class WebSocketRecorderClient:
                 "samplerate": self.config.samplerate,
                 "channels": self.config.channels,
                 "dtype": self.config.dtype,
-                "output_dir": self.config.output_dir
+                "output_dir": self.config.output_dir,
+                "native_rate": self.config.native_rate,
+                "pre_roll_seconds": self.config.pre_roll_seconds,
+                "sound_activated": self.config.sound_activated,
+                "threshold_db": self.config.threshold_db,
+                "hang_seconds": self.config.hang_seconds,
+                "disk_policy": self.config.disk_policy,
+                "secondary_output_dir": self.config.secondary_output_dir
             },
+            "armed": self.recorder is not None and self.recorder.armed,
+            "dropouts": self.recorder.get_dropout_stats() if self.recorder else None,
+            "disk": self.recorder.disk_projection if self.recorder else None,
             "capabilities": await self.get_capabilities()
         }
         
-        await self.send_message(status)
+        previous, self._sent_status = self._sent_status, status
+        if full or previous is None:
+            self.status_version += 1
+            await self.send_message({"type": "status", "version": self.status_version, **status})
+            return
+        changes, removed = status_delta(previous, status)
+        if not changes and not removed:
+            return
+        self.status_version += 1
+        await self.send_message({
+            "type": "status_delta",
+            "version": self.status_version,
+            "base_version": self.status_version - 1,
+            "changes": changes,
+            "removed": removed
+        })
         
     async def get_capabilities(self):
         """Get recorder capabilities including available devices and supported settings."""
@@ -99,18 +171,67 @@ class WebSocketRecorderClient:
             "max_recording_duration": 3600  # 1 hour max
         }
         
+    def dispatch(self, data: Dict[str, Any]) -> asyncio.Task:
+        """Handle a message from the control server in its own task."""
+        task = asyncio.create_task(self.handle_message(data))
+        self.command_tasks.add(task)
+        task.add_done_callback(self.command_tasks.discard)
+        return task
+        
+    async def cancel_commands(self):
+        """Cancel the commands still running, whose acks have nowhere to go."""
+        tasks = list(self.command_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        
+    async def handle_message(self, data: Dict[str, Any]):
+        """Handle a message from the control server, acknowledging commands that carry an ID."""
+        if data.get("type") != "command":
+            return
+        command = data.get("command")
+        command_id = data.get("command_id")
+        received = time.time()
+        errors: List[str] = []
+        result: Dict[str, Any] = {}
+        token = _command_errors.set(errors)
+        result_token = _command_result.set(result)
+        id_token = _command_id.set(command_id)
+        try:
+            await self.handle_command(command, data.get("payload") or {})
+        except Exception as e:
+            logger.error(f"Error handling command {command}: {e}")
+            errors.append(str(e))
+        finally:
+            _command_errors.reset(token)
+            _command_result.reset(result_token)
+            _command_id.reset(id_token)
+            
+        if command_id is not None:
+            await self.send_message({
+                "type": "ack",
+                "command_id": command_id,
+                "command": command,
+                "ok": not errors,
+                "error": errors[0] if errors else None,
+                "result": result or None,
+                "received_at": received,
+                "completed_at": time.time()
+            })
+            
     async def handle_command(self, command: str, payload: Dict[str, Any]):
         """Handle commands from the control server."""
         logger.info(f"Received command: {command}")
         
         if command == "start_recording":
-            await self.start_recording(payload.get("duration"), payload.get("filename"))
+            await self.start_recording(payload.get("duration"), payload.get("filename"), payload.get("start_at"))
             
         elif command == "stop_recording":
             await self.stop_recording()
             
         elif command == "get_status":
-            await self.send_status()
+            # Asked for, so the hub may be out of step: send everything
+            await self.send_status(full=True)
             
         elif command == "update_config":
             await self.update_config(payload)
@@ -136,59 +257,176 @@ class WebSocketRecorderClient:
                 ]
             })
             
-        elif command == "shutdown":
-            logger.info("Received shutdown command")
-            self.running = False
-            
-    async def start_recording(self, duration: Optional[float] = None, filename: Optional[str] = None):
-        """Start audio recording."""
-        if self.recording_task and not self.recording_task.done():
+        elif command == "get_system_stats":
             await self.send_message({
-                "type": "error",
-                "error": "Already recording"
+                "type": "system_stats_history",
+                "samples": self.system_monitor.get_history(
+                    payload.get("since"), payload.get("fields"), payload.get("limit")
+                )
             })
-            return
             
-        try:
-            # Create recorder
-            self.recorder = AudioRecorder(self.config)
+        elif command == "rescan_devices":
+            await self.rescan_devices()
             
-            # Use provided filename or generate one
-            if not filename:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                device_info = await DeviceManager.get_device_info(self.config.device)
-                device_name = device_info.name.replace(" ", "_").lower()
-                filename = f"recording_{timestamp}_{device_name}.wav"
+        elif command == "arm":
+            await self.arm(payload.get("pre_roll_seconds"))
             
-            output_path = Path(self.config.output_dir) / filename
-            output_path.parent.mkdir(exist_ok=True)
+        elif command == "disarm":
+            await self.disarm()
             
-            # Send recording started event
-            await self.send_message({
-                "type": "event",
-                "event": "recording_started",
-                "filename": filename,
-                "timestamp": datetime.now().isoformat()
-            })
+        elif command == "start_monitor":
+            await self.start_monitor(payload.get("samplerate", DEFAULT_MONITOR_RATE))
             
-            # Start recording task
-            self.recording_task = asyncio.create_task(
-                self._record(output_path, duration)
-            )
+        elif command == "stop_monitor":
+            await self.stop_monitor()
+            
+        elif command == "ping":
+            # Answered by the ack, whose timestamps give the hub this recorder's clock offset
+            pass
+            
+        elif command == "shutdown":
+            logger.info("Received shutdown command")
+            self.running = False
             
+    async def _stats_loop(self):
+        """Push the latest system stats sample to the hub periodically."""
+        while self.running:
+            await asyncio.sleep(STATS_PUSH_INTERVAL)
+            if self.websocket:
+                await self.send_message({
+                    "type": "system_stats",
+                    "stats": self.system_monitor.get_system_stats()
+                })
+                
+    async def rescan_devices(self):
+        """Refresh the device list now instead of waiting for the next poll."""
+        # Restarting PortAudio would end an open stream, so only do it while idle
+        busy = (self.recording_task is not None and not self.recording_task.done()) or \
+            (self.recorder is not None and self.recorder.armed)
+        try:
+            await DeviceManager.rescan(reinitialize=not busy)
         except Exception as e:
-            logger.error(f"Error starting recording: {e}")
-            await self.send_message({
-                "type": "event",
-                "event": "recording_error",
-                "error": str(e),
-                "timestamp": datetime.now().isoformat()
-            })
+            logger.error(f"Device rescan failed: {e}")
+            await self.send_message({"type": "error", "error": f"Device rescan failed: {e}"})
+            return
+        await self.send_status()
+        
+    async def start_recording(self, duration: Optional[float] = None, filename: Optional[str] = None,
+                              start_at: Optional[float] = None):
+        """Start audio recording, at wall-clock time ``start_at`` if given."""
+        async with self._start_lock:
+            # Commands run concurrently, so a second start must wait to see the first one's task
+            if self.recording_task and not self.recording_task.done():
+                await self.send_message({
+                    "type": "error",
+                    "error": "Already recording"
+                })
+                return
+                
+            try:
+                # An armed recorder already has its stream running and pre-roll buffered
+                if not (self.recorder and self.recorder.armed):
+                    self.recorder = AudioRecorder(self.config, system_monitor=self.system_monitor)
+                
+                # Use provided filename or generate one
+                if not filename:
+                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    device_info = await DeviceManager.get_device_info(self.config.device)
+                    device_name = device_info.name.replace(" ", "_").lower()
+                    filename = f"recording_{timestamp}_{device_name}.wav"
+                
+                output_path = Path(self.config.output_dir) / filename
+                output_path.parent.mkdir(exist_ok=True)
+                
+                # Send recording started event
+                await self.send_message({
+                    "type": "event",
+                    "event": "recording_started",
+                    "filename": filename,
+                    "timestamp": datetime.now().isoformat()
+                })
+                
+                # Start recording task
+                self.recording_task = asyncio.create_task(
+                    self._record(output_path, duration, start_at)
+                )
+                
+            except Exception as e:
+                logger.error(f"Error starting recording: {e}")
+                await self.send_message({
+                    "type": "event",
+                    "event": "recording_error",
+                    "error": str(e),
+                    "timestamp": datetime.now().isoformat()
+                })
+                return
+                
+        if start_at is None:
+            # Return, and so acknowledge the command, once capture has begun or failed to
+            error = await self._wait_for_start(self.recorder, self.recording_task, START_TIMEOUT)
+            if error:
+                await self.send_message({"type": "error", "error": error})
+            return
             
-    async def _record(self, output_path: Path, duration: Optional[float]):
+        # A scheduled start is acknowledged now, so stop, ping and get_status
+        # aren't left waiting out the lead time; a second ack reports the start
+        result = _command_result.get()
+        if result is not None:
+            result.update({"scheduled": True, "start_at": start_at})
+        command_id = _command_id.get()
+        if command_id is not None:
+            timeout = START_TIMEOUT + max(start_at - time.time(), 0.0)
+            task = asyncio.create_task(self._report_start(command_id, self.recorder, self.recording_task, timeout))
+            self.command_tasks.add(task)
+            task.add_done_callback(self.command_tasks.discard)
+            
+    async def _wait_for_start(self, recorder: AudioRecorder, recording_task: asyncio.Task,
+                              timeout: float) -> Optional[str]:
+        """Wait until the recording is capturing into its file; the error if it isn't within ``timeout``."""
+        started = asyncio.ensure_future(recorder.started.wait())
+        try:
+            done, _ = await asyncio.wait({started, recording_task}, timeout=timeout,
+                                         return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            started.cancel()
+        if not done:
+            return f"Recording did not start within {timeout:.1f}s"
+        if started not in done and recording_task.cancelled():
+            return "Recording stopped before it started"
+        # A recording that failed reports its own error
+        return None
+        
+    async def _report_start(self, command_id: str, recorder: AudioRecorder, recording_task: asyncio.Task,
+                            timeout: float):
+        """Send the second ack of a scheduled start, once it has happened or failed to."""
+        received = time.time()
+        errors: List[str] = []
+        token = _command_errors.set(errors)
+        try:
+            error = await self._wait_for_start(recorder, recording_task, timeout)
+            if error:
+                await self.send_message({"type": "error", "error": error})
+        finally:
+            _command_errors.reset(token)
+        if not errors and recorder.scheduled_start is None:
+            # Stopped, or failed, before the start instant came
+            errors.append("Recording ended before its scheduled start")
+        await self.send_message({
+            "type": "ack",
+            "command_id": command_id,
+            "command": "start_recording",
+            "stage": "started",
+            "ok": not errors,
+            "error": errors[0] if errors else None,
+            "result": recorder.scheduled_start,
+            "received_at": received,
+            "completed_at": time.time()
+        })
+        
+    async def _record(self, output_path: Path, duration: Optional[float], start_at: Optional[float] = None):
         """Perform the actual recording."""
         try:
-            await self.recorder.record(output_path, duration)
+            await self.recorder.record(output_path, duration, start_at)
             
             # Send recording completed event
             await self.send_message({
@@ -234,6 +472,98 @@ class WebSocketRecorderClient:
                 "error": "Not recording"
             })
             
+    async def arm(self, pre_roll_seconds: Optional[float] = None):
+        """Open the input stream ahead of time and buffer pre-roll audio."""
+        if self.recording_task and not self.recording_task.done():
+            await self.send_message({
+                "type": "error",
+                "error": "Cannot arm while recording"
+            })
+            return
+            
+        try:
+            if not (self.recorder and self.recorder.armed):
+                self.recorder = AudioRecorder(self.config, system_monitor=self.system_monitor)
+            await self.recorder.arm(pre_roll_seconds)
+            await self.send_message({
+                "type": "event",
+                "event": "armed",
+                "pre_roll_seconds": self.config.pre_roll_seconds,
+                "timestamp": datetime.now().isoformat()
+            })
+        except Exception as e:
+            logger.error(f"Error arming recorder: {e}")
+            await self.send_message({
+                "type": "error",
+                "error": f"Arm failed: {str(e)}"
+            })
+        await self.send_status()
+        
+    async def disarm(self):
+        """Close the armed input stream."""
+        if self.recorder and self.recorder.armed:
+            await self.recorder.disarm()
+            await self.send_message({
+                "type": "event",
+                "event": "disarmed",
+                "timestamp": datetime.now().isoformat()
+            })
+        await self.send_status()
+        
+    async def start_monitor(self, samplerate: int = DEFAULT_MONITOR_RATE):
+        """Start streaming low-rate monitoring audio to the hub."""
+        self.monitor_rate = int(samplerate)
+        if self.monitor_task and not self.monitor_task.done():
+            return
+        self.monitor_task = asyncio.create_task(self._monitor_loop())
+        logger.info(f"Live monitoring started at {self.monitor_rate} Hz")
+        
+    async def stop_monitor(self):
+        """Stop the monitoring stream."""
+        if self.monitor_task and not self.monitor_task.done():
+            self.monitor_task.cancel()
+            try:
+                await self.monitor_task
+            except asyncio.CancelledError:
+                pass
+            logger.info("Live monitoring stopped")
+        self.monitor_task = None
+        
+    async def _monitor_loop(self):
+        """Drain the active recorder's tap and send binary PCM frames to the hub."""
+        recorder: Optional[AudioRecorder] = None
+        tap = None
+        stream: Optional[MonitorStream] = None
+        
+        try:
+            while self.websocket:
+                # Follow the recorder across recordings
+                if self.recorder is not recorder:
+                    if recorder:
+                        recorder.disable_monitor_tap()
+                    recorder = self.recorder
+                    tap = recorder.enable_monitor_tap() if recorder else None
+                    stream = None
+                # The capture rate is only known once the recorder has opened its device
+                if recorder and (stream is None or stream.source_rate != recorder.capture_rate):
+                    stream = MonitorStream(recorder.capture_rate, self.monitor_rate)
+                    
+                while tap:
+                    try:
+                        block = tap.popleft()
+                    except IndexError:
+                        break
+                    for frame in stream.process(block):
+                        await self.websocket.send(frame)
+                        
+                await asyncio.sleep(MONITOR_POLL_INTERVAL)
+                
+        except websockets.exceptions.ConnectionClosed:
+            logger.info("Connection closed, monitoring stopped")
+        finally:
+            if recorder:
+                recorder.disable_monitor_tap()
+            
     async def update_config(self, config_update: Dict[str, Any]):
         """Update configuration."""
         try:
@@ -242,6 +572,14 @@ class WebSocketRecorderClient:
                     setattr(self.config, key, value)
                     
             self.config_manager.save(self.config)
+            self.system_monitor.path = self.config.output_dir
+            
+            # Reopen an idle armed stream so it picks up the new settings
+            recording = self.recording_task is not None and not self.recording_task.done()
+            if self.recorder and self.recorder.armed and not recording:
+                await self.recorder.disarm()
+                self.recorder = AudioRecorder(self.config, system_monitor=self.system_monitor)
+                await self.recorder.arm()
             await self.send_status()
             
         except Exception as e:
@@ -253,25 +591,30 @@ class WebSocketRecorderClient:
             
     async def run(self):
         """Main run loop."""
+        # Status reads the cached device list; a slow poll picks up hotplugged devices
+        registry = get_registry()
+        registry.add_listener(self.send_status)
+        registry.start_polling()
+        await self.system_monitor.start_monitoring()
+        self.stats_task = asyncio.create_task(self._stats_loop())
+        
         while self.running:
             try:
                 await self.connect()
                 
-                # Listen for messages
-                async for message in self.websocket:
-                    try:
-                        data = json.loads(message)
-                        
-                        if data.get("type") == "command":
-                            command = data.get("command")
-                            payload = data.get("payload", {})
-                            await self.handle_command(command, payload)
+                # Listen for messages, each handled in its own task
+                try:
+                    async for message in self.websocket:
+                        try:
+                            self.dispatch(json.loads(message))
                             
-                    except json.JSONDecodeError:
-                        logger.error(f"Invalid JSON message: {message}")
-                    except Exception as e:
-                        logger.error(f"Error handling message: {e}")
-                        
+                        except json.JSONDecodeError:
+                            logger.error(f"Invalid JSON message: {message}")
+                        except Exception as e:
+                            logger.error(f"Error handling message: {e}")
+                finally:
+                    await self.cancel_commands()
+                    
             except websockets.exceptions.ConnectionClosed:
                 logger.warning("Connection closed, reconnecting in 5 seconds...")
                 await asyncio.sleep(5)
@@ -286,10 +629,26 @@ class WebSocketRecorderClient:
         """Clean shutdown."""
         self.running = False
         
+        await self.cancel_commands()
+        await self.stop_monitor()
+        
+        registry = get_registry()
+        registry.remove_listener(self.send_status)
+        await registry.stop_polling()
+        
+        if self.stats_task:
+            self.stats_task.cancel()
+            self.stats_task = None
+        
         # Stop any active recording
         if self.recording_task and not self.recording_task.done():
             await self.stop_recording()
             
+        if self.recorder and self.recorder.armed:
+            await self.recorder.disarm()
+            
+        await self.system_monitor.stop_monitoring()
+        
         # Close websocket
         if self.websocket:
             await self.websocket.close()
@@ -11,6 +11,7 @@ sys.path.insert(0, str(Path(__file__).parent / "src"))
 
 from src.recorder import AudioRecorder, RecordingConfig
 from src.system_monitor import SystemMonitor
+from src.backends import VirtualBackend, set_backend
 
 # Setup logging
 logging.basicConfig(
@@ -105,6 +106,12 @@ if __name__ == "__main__":
     print("for long-duration recordings on resource-constrained devices.")
     print()
     
+    # Without a microphone, run the same capture path on a synthetic device
+    if "--virtual" in sys.argv:
+        set_backend(VirtualBackend())
+        print("Using the virtual input backend")
+        print()
+    
     # Test system monitoring first
     print("1. Testing system monitoring...")
     asyncio.run(test_memory_usage())
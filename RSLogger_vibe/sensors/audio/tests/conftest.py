@@ -1,6 +1,33 @@
 import sys
 from unittest.mock import MagicMock
 
+import pytest
+
 # Mock sounddevice before it's imported
 sys.modules['sounddevice'] = MagicMock()
-sys.modules['soundfile'] = MagicMock()
\ No newline at end of file
+sys.modules['soundfile'] = MagicMock()
+
+# Devices the mocked sounddevice reports unless a test patches query_devices
+MOCK_DEVICES = [
+    {'name': 'Built-in Microphone', 'index': 0, 'max_input_channels': 2, 'default_samplerate': 44100.0},
+    {'name': 'USB Mic', 'index': 1, 'max_input_channels': 1, 'default_samplerate': 48000.0},
+    {'name': 'USB Device', 'index': 2, 'max_input_channels': 2, 'default_samplerate': 48000.0},
+]
+
+
+def _query_devices(device=None, kind=None):
+    if device is None and kind is None:
+        return MOCK_DEVICES
+    return MOCK_DEVICES[device if isinstance(device, int) else 0]
+
+
+sys.modules['sounddevice'].query_devices.side_effect = _query_devices
+
+
+@pytest.fixture(autouse=True)
+def fresh_device_registries():
+    """Tests patch the device queries, so never reuse a device list cached by another test."""
+    from src import devices
+    devices._registries.clear()
+    yield
+    devices._registries.clear()
@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from src.activation import ActivityDetector, block_level_db, SILENCE_DB
+from src.enums import RecordingState
+from src.recorder import AudioRecorder, RecordingConfig
+
+
+class TestBlockLevel:
+    def test_full_scale_sine(self):
+        t = np.arange(4800) / 48000
+        block = np.sin(2 * np.pi * 1000 * t).astype('float32')[:, None]
+        assert block_level_db(block) == pytest.approx(-3.01, abs=0.05)
+        
+    def test_int16_is_scaled(self):
+        block = np.full((1000, 2), 3277, dtype='int16')
+        assert block_level_db(block) == pytest.approx(-20.0, abs=0.05)
+        
+    def test_silence(self):
+        assert block_level_db(np.zeros((512, 1), dtype='float32')) == SILENCE_DB
+        assert block_level_db(np.zeros((0, 1), dtype='float32')) == SILENCE_DB
+
+
+class TestActivityDetector:
+    def test_opens_at_threshold(self):
+        detector = ActivityDetector(1000, threshold_db=-20, hysteresis_db=6, hang_seconds=0.3)
+        assert detector.update(-30, 100) is None
+        assert detector.update(-20, 100) == ActivityDetector.OPEN
+        assert detector.active
+        
+    def test_hysteresis_keeps_segment_open(self):
+        detector = ActivityDetector(1000, threshold_db=-20, hysteresis_db=6, hang_seconds=0.3)
+        detector.update(-10, 100)
+        # Below the threshold but above the release level
+        for _ in range(10):
+            assert detector.update(-25, 100) is None
+        assert detector.active
+        
+    def test_closes_after_hang_time(self):
+        detector = ActivityDetector(1000, threshold_db=-20, hysteresis_db=6, hang_seconds=0.3)
+        detector.update(-10, 100)
+        assert detector.update(-40, 100) is None
+        assert detector.update(-40, 100) is None
+        # A loud block resets the hang timer
+        assert detector.update(-10, 100) is None
+        assert detector.update(-40, 100) is None
+        assert detector.update(-40, 100) is None
+        assert detector.update(-40, 100) == ActivityDetector.CLOSE
+        assert not detector.active
+
+
+class TestSoundActivatedRecording:
+    @pytest.fixture
+    def recorder(self, tmp_path):
+        config = RecordingConfig(samplerate=1000, output_dir=str(tmp_path), sound_activated=True,
+                                 threshold_db=-20, hang_seconds=0.3, pre_roll_seconds=0.2)
+        recorder = AudioRecorder(config)
+        recorder._start_time = 1000.0
+        recorder._wall_offset = 1000.0
+        recorder._first_stamp = (0, None, 0.1, 100)  # First block ended 0.1 s after the epoch
+        return recorder
+    
+    async def run_writer(self, recorder, output_path, levels):
+        for value in levels:
+            recorder._audio_queue.put_nowait(np.full((100, 1), value, dtype='float32'))
+        recorder._state = RecordingState.RECORDING
+        task = asyncio.create_task(recorder._activated_writer(output_path))
+        while not recorder._audio_queue.empty():
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.01)
+        recorder._state = RecordingState.STOPPING
+        await task
+        await recorder._close_segment()
+        await recorder._save_segment_index(output_path)
+    
+    async def test_segments_with_pre_roll_and_hang(self, recorder, tmp_path):
+        output_path = tmp_path / "session.wav"
+        levels = [0.0] * 5 + [0.5] * 3 + [0.0] * 5 + [0.5] * 2 + [0.0]
+        
+        await self.run_writer(recorder, output_path, levels)
+        
+        index = json.loads((tmp_path / "session_segments.json").read_text())
+        segments = index["segments"]
+        assert [s["audio_file"] for s in segments] == ["session_seg000.wav", "session_seg001.wav"]
+        # Two pre-roll blocks, three loud blocks and the three quiet blocks of the hang time
+        assert segments[0]["total_frames"] == 800
+        assert segments[0]["start_timestamp"] == pytest.approx(1000.3)
+        assert segments[1]["start_timestamp"] == pytest.approx(1001.1)
+        assert segments[1]["total_frames"] == 500
+        
+        metadata = json.loads((tmp_path / "session_seg000.json").read_text())
+        assert metadata["segment"]["start_offset_seconds"] == pytest.approx(0.3)
+        
+    async def test_silence_writes_no_segments(self, recorder, tmp_path):
+        output_path = tmp_path / "session.wav"
+        
+        await self.run_writer(recorder, output_path, [0.0] * 20)
+        
+        index = json.loads((tmp_path / "session_segments.json").read_text())
+        assert index["segments"] == []
+        assert not list(tmp_path.glob("*.wav"))
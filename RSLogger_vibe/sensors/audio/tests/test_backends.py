@@ -0,0 +1,167 @@
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.backends import (VirtualBackend, VirtualDevice, VirtualCallbackFlags, sine_source,
+                          create_backend, SoundDeviceBackend)
+from src.devices import DeviceManager
+from src.exceptions import ConfigurationError
+from src.recorder import AudioRecorder, RecordingConfig
+
+
+class Collector:
+    """Callback that records what a stream delivers."""
+    
+    def __init__(self, blocks=None):
+        self.blocks = []
+        self.statuses = []
+        self.times = []
+        self.threads = set()
+        self.limit = blocks
+        self.done = threading.Event()
+        
+    def __call__(self, indata, frames, time_info, status):
+        self.blocks.append(indata.copy())
+        self.statuses.append(status)
+        self.times.append(time_info.inputBufferAdcTime)
+        self.threads.add(threading.current_thread().name)
+        if self.limit and len(self.blocks) >= self.limit:
+            self.done.set()
+
+
+def run_stream(backend, blocks, **kwargs):
+    collector = Collector(blocks)
+    stream = backend.InputStream(callback=collector, **kwargs)
+    with stream:
+        assert collector.done.wait(5)
+    return collector, stream
+
+
+class TestVirtualBackend:
+    def test_query_devices(self):
+        backend = VirtualBackend([VirtualDevice("Built-in Mic", channels=1, samplerate=44100),
+                                  VirtualDevice("USB Interface", channels=2, samplerate=48000)])
+        
+        assert len(backend.query_devices()) == 2
+        assert backend.query_devices(kind='input')['name'] == "Built-in Mic"
+        assert backend.query_devices("usb", 'input')['index'] == 1
+        with pytest.raises(ValueError):
+            backend.query_devices(5, 'input')
+            
+    async def test_device_manager_uses_backend(self):
+        backend = VirtualBackend([VirtualDevice("Virtual A"), VirtualDevice("Virtual B", channels=1)])
+        
+        devices = await DeviceManager.list_input_devices(backend=backend)
+        info = await DeviceManager.get_device_info("Virtual B", backend=backend)
+        
+        assert [d.name for d in devices] == ["Virtual A", "Virtual B"]
+        assert info.id == 1
+        assert info.channels == 1
+        
+    def test_blocks_are_continuous_and_off_thread(self):
+        backend = VirtualBackend(speed=0, blocksize=256, source=sine_source(1000, 0.5))
+        collector, stream = run_stream(backend, 8, samplerate=48000, channels=1)
+        
+        data = np.concatenate(collector.blocks[:8])[:, 0]
+        expected = 0.5 * np.sin(2 * np.pi * 1000 * np.arange(len(data)) / 48000)
+        assert np.allclose(data, expected, atol=1e-6)
+        assert threading.current_thread().name not in collector.threads
+        assert not stream.active
+        
+    def test_realtime_pacing(self):
+        backend = VirtualBackend(speed=1.0, blocksize=480)
+        collector = Collector(5)
+        stream = backend.InputStream(callback=collector, samplerate=48000, channels=1)
+        begin = time.monotonic()
+        with stream:
+            assert collector.done.wait(5)
+            elapsed = time.monotonic() - begin
+        # Five 10 ms blocks cannot arrive before 50 ms of audio has been captured
+        assert elapsed >= 0.045
+        
+    def test_int16_conversion(self):
+        backend = VirtualBackend(speed=0, source=sine_source(440, 1.0))
+        collector, _ = run_stream(backend, 2, samplerate=48000, channels=2, dtype='int16')
+        
+        assert collector.blocks[0].dtype == np.int16
+        assert collector.blocks[0].shape == (512, 2)
+        assert np.abs(collector.blocks[0]).max() > 30000
+        
+    def test_xrun_drops_frames_and_flags_next_block(self):
+        backend = VirtualBackend(speed=0, blocksize=100, xrun_blocks={3}, xrun_length=2)
+        collector, stream = run_stream(backend, 5, samplerate=1000, channels=1)
+        
+        statuses = [bool(s) for s in collector.statuses[:5]]
+        assert statuses == [False, False, False, True, False]
+        assert collector.statuses[3].input_overflow
+        assert str(collector.statuses[3]) == "input overflow"
+        # The ADC clock jumps over the two lost blocks
+        assert collector.times[3] - collector.times[2] == pytest.approx(0.3)
+        assert stream.frames_dropped == 200
+        
+    def test_injected_status(self):
+        backend = VirtualBackend(speed=200, blocksize=100)
+        collector = Collector(20)
+        stream = backend.InputStream(callback=collector, samplerate=1000, channels=1)
+        with stream:
+            stream.inject_status(input_underflow=True)
+            assert collector.done.wait(5)
+            
+        flagged = [s for s in collector.statuses if s]
+        assert len(flagged) == 1
+        assert flagged[0].input_underflow
+        
+    def test_callback_flags_reject_unknown_names(self):
+        with pytest.raises(ConfigurationError):
+            VirtualCallbackFlags(bogus=True)
+            
+    def test_create_backend(self):
+        assert isinstance(create_backend("virtual", speed=0), VirtualBackend)
+        assert isinstance(create_backend("sounddevice"), SoundDeviceBackend)
+        with pytest.raises(ConfigurationError):
+            create_backend("alsa")
+
+
+class TestRecorderOnVirtualBackend:
+    async def test_capture_path_end_to_end(self, tmp_path):
+        backend = VirtualBackend([VirtualDevice("Virtual", channels=1, samplerate=16000)],
+                                 speed=20, blocksize=320)
+        recorder = AudioRecorder(RecordingConfig(samplerate=16000, output_dir=str(tmp_path)), backend=backend)
+        
+        await recorder.record(tmp_path / "virtual.wav", duration=0.5)
+        
+        # About ten seconds of audio pass through callback, queue and writer in half a second
+        stream = backend.streams[0]
+        assert stream.closed
+        assert recorder._total_frames_written > 0
+        assert recorder._total_frames_written <= stream.frames_delivered
+        assert stream.frames_delivered >= 16000 * 5
+        
+    async def test_xruns_are_recorded_in_metadata(self, tmp_path):
+        backend = VirtualBackend([VirtualDevice("Virtual", channels=1, samplerate=16000)],
+                                 speed=20, blocksize=320, xrun_blocks={5, 6, 20})
+        recorder = AudioRecorder(RecordingConfig(samplerate=16000, output_dir=str(tmp_path)), backend=backend)
+        
+        await recorder.record(tmp_path / "virtual.wav", duration=0.5)
+        
+        stats = json.loads((tmp_path / "virtual.json").read_text())["dropouts"]
+        assert stats["input_overflows"] == 2
+        assert stats["overflow_frames"] == backend.streams[0].frames_dropped == 960
+        assert [gap["frames"] for gap in stats["gaps"]] == [640, 320]
+        assert stats["gaps"][0]["frame"] == 5 * 320
+        
+    async def test_metadata_records_resource_usage(self, tmp_path):
+        backend = VirtualBackend([VirtualDevice("Virtual", channels=1, samplerate=16000)],
+                                 speed=20, blocksize=320)
+        recorder = AudioRecorder(RecordingConfig(samplerate=16000, output_dir=str(tmp_path)), backend=backend)
+        
+        await recorder.record(tmp_path / "virtual.wav", duration=0.3)
+        
+        resources = json.loads((tmp_path / "virtual.json").read_text())["resources"]
+        assert resources["rss_end_mb"] > 0
+        assert resources["cpu_seconds"] >= 0
+        assert resources["duration_seconds"] > 0.2
+        assert recorder._system_monitor.path == tmp_path
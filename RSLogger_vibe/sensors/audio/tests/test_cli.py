@@ -45,6 +45,30 @@ class TestCLI:
                 saved_config = mock_save.call_args[0][0]
                 assert saved_config.samplerate == 48000
                 
+    @pytest.mark.asyncio
+    async def test_save_config_keeps_hysteresis(self):
+        from src.recorder import RecordingConfig
+        with patch('src.config.ConfigManager.load', return_value=RecordingConfig(hysteresis_db=3.0)):
+            with patch('sys.argv', ['main.py', '--save-config']):
+                with patch('src.config.ConfigManager.save') as mock_save:
+                    await main()
+                    assert mock_save.call_args[0][0].hysteresis_db == 3.0
+                    
+            with patch('sys.argv', ['main.py', '--hysteresis', '4.5', '--save-config']):
+                with patch('src.config.ConfigManager.save') as mock_save:
+                    await main()
+                    assert mock_save.call_args[0][0].hysteresis_db == 4.5
+                    
+    @pytest.mark.asyncio
+    async def test_save_config_keeps_clock_index_every(self):
+        from src.recorder import RecordingConfig
+        with patch('src.config.ConfigManager.load', return_value=RecordingConfig(clock_index_every=8)):
+            with patch('sys.argv', ['main.py', '--samplerate', '48000', '--save-config']):
+                with patch('src.config.ConfigManager.save') as mock_save:
+                    await main()
+                    
+        assert mock_save.call_args[0][0].clock_index_every == 8
+                
     @pytest.mark.asyncio
     async def test_list_devices(self, capsys):
         mock_devices = [
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from src.backends import VirtualBackend, VirtualDevice
+from src.devices import DeviceManager, DeviceRegistry, get_registry
+from src.exceptions import DeviceNotFoundError
+
+
+class CountingBackend(VirtualBackend):
+    """Virtual backend that counts device queries."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queries = 0
+        
+    def query_devices(self, device=None, kind=None):
+        self.queries += 1
+        return super().query_devices(device, kind)
+
+
+@pytest.fixture
+def backend():
+    return CountingBackend([
+        VirtualDevice("Built-in Microphone", channels=2, samplerate=44100),
+        VirtualDevice("USB Audio Interface", channels=2, samplerate=48000),
+        VirtualDevice("USB Headset", channels=1, samplerate=16000),
+    ])
+
+
+class TestDeviceRegistry:
+    async def test_status_queries_hit_the_cache(self, backend):
+        await DeviceManager.get_device_info(None, backend=backend)
+        queries = backend.queries
+        
+        for _ in range(10):
+            await DeviceManager.get_device_info("usb audio", backend=backend)
+            await DeviceManager.list_input_devices(backend=backend)
+            
+        assert backend.queries == queries
+        
+    def test_lookup_by_index_and_name(self, backend):
+        registry = DeviceRegistry(backend)
+        registry.rescan()
+        
+        assert registry.lookup(None).name == "Built-in Microphone"
+        assert registry.lookup(2).name == "USB Headset"
+        assert registry.lookup("usb headset").id == 2
+        assert registry.lookup("Interface").id == 1
+        with pytest.raises(DeviceNotFoundError, match="Multiple"):
+            registry.lookup("USB")
+        with pytest.raises(DeviceNotFoundError):
+            registry.lookup(7)
+            
+    def test_rescan_reports_changes(self, backend):
+        registry = DeviceRegistry(backend)
+        assert registry.rescan()
+        assert not registry.rescan()
+        
+        backend.devices.append(VirtualDevice("Field Recorder", channels=2))
+        
+        assert registry.rescan()
+        assert registry.generation == 2
+        assert [d.name for d in registry.input_devices()][-1] == "Field Recorder"
+        
+    async def test_unknown_device_triggers_one_rescan(self, backend):
+        await DeviceManager.list_input_devices(backend=backend)
+        backend.devices.append(VirtualDevice("Field Recorder", channels=2))
+        
+        info = await DeviceManager.get_device_info("Field Recorder", backend=backend)
+        
+        assert info.id == 3
+        with pytest.raises(DeviceNotFoundError):
+            await DeviceManager.get_device_info("Nonexistent", backend=backend)
+            
+    async def test_missing_device_rescans_at_most_once_per_interval(self, backend):
+        await DeviceManager.list_input_devices(backend=backend)
+        queries = backend.queries
+        
+        for _ in range(10):
+            with pytest.raises(DeviceNotFoundError):
+                await DeviceManager.get_device_info("Field Recorder", backend=backend)
+                
+        # One rescan queries the device list and the default input
+        assert backend.queries == queries + 2
+        
+    async def test_default_device(self, backend):
+        assert await DeviceManager.get_default_device(backend=backend) == "Built-in Microphone"
+        
+    async def test_poll_notifies_listeners(self, backend):
+        registry = get_registry(backend)
+        registry.rescan()
+        changed = asyncio.Event()
+        
+        async def on_change():
+            changed.set()
+        
+        registry.add_listener(on_change)
+        registry.start_polling(0.01)
+        try:
+            backend.devices.pop()
+            await asyncio.wait_for(changed.wait(), timeout=1)
+        finally:
+            await registry.stop_polling()
+            
+        assert len(registry.input_devices()) == 2
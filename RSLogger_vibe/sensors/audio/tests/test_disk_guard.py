@@ -0,0 +1,160 @@
+import json
+import time
+from collections import namedtuple
+
+import psutil
+import pytest
+
+from src import recorder as recorder_module
+from src.backends import VirtualBackend, VirtualDevice
+from src.disk_guard import DiskGuard, DiskPolicy, WriterRegistry
+from src.enums import RecordingState
+from src.exceptions import ConfigurationError, RecordingError
+from src.recorder import AudioRecorder, RecordingConfig
+
+Usage = namedtuple("Usage", "total used free percent")
+MB = 1024 * 1024
+
+
+class FakeWriter:
+    def __init__(self, output_dir, rate):
+        self.output_dir = output_dir
+        self.rate = rate
+    
+    def write_rate(self):
+        return self.rate
+
+
+def fake_disk_usage(monkeypatch, free_for):
+    """Report the free bytes ``free_for(path)`` for every volume."""
+    def disk_usage(path):
+        free = free_for(str(path))
+        return Usage(100 * MB * 1024, 0, free, 50.0)
+    monkeypatch.setattr(psutil, "disk_usage", disk_usage)
+
+
+class TestDiskGuard:
+    def test_projection_from_writer_rate(self, tmp_path, monkeypatch):
+        fake_disk_usage(monkeypatch, lambda path: 11000)
+        writers = WriterRegistry()
+        writer = FakeWriter(tmp_path, 1000)
+        writers.add(writer)
+        guard = DiskGuard(tmp_path, reserve_bytes=1000, writers=writers)
+        
+        projection = guard.projection()
+        
+        assert projection["writers_rate_bytes_s"] == 1000
+        assert projection["seconds_to_full"] == pytest.approx(10)
+        
+        writers.discard(writer)
+        assert guard.projection()["seconds_to_full"] is None
+    
+    def test_observed_rate_over_window(self, tmp_path):
+        guard = DiskGuard(tmp_path, window=60, writers=WriterRegistry())
+        
+        assert guard._observed_rate(0.0, 10000) == 0.0
+        assert guard._observed_rate(10.0, 9000) == pytest.approx(100)
+        # Freed space does not project a negative rate
+        assert guard._observed_rate(20.0, 12000) == 0.0
+    
+    def test_reserve_reached(self, tmp_path, monkeypatch):
+        fake_disk_usage(monkeypatch, lambda path: 500)
+        guard = DiskGuard(tmp_path, reserve_bytes=1000, writers=WriterRegistry())
+        
+        assert guard.projection()["seconds_to_full"] == 0.0
+        assert not guard.admits(1)
+    
+    def test_missing_directory_uses_its_filesystem(self, tmp_path, monkeypatch):
+        fake_disk_usage(monkeypatch, lambda path: 5000)
+        guard = DiskGuard(tmp_path / "not" / "created", writers=WriterRegistry())
+        
+        assert guard.admits(5000)
+        assert not guard.admits(5001)
+
+
+class TestDiskConfig:
+    def test_unknown_policy(self):
+        with pytest.raises(ConfigurationError):
+            RecordingConfig(disk_policy="panic")
+    
+    def test_rotate_needs_secondary(self):
+        with pytest.raises(ConfigurationError):
+            RecordingConfig(disk_policy=DiskPolicy.ROTATE)
+        RecordingConfig(disk_policy=DiskPolicy.ROTATE, secondary_output_dir="/mnt/spare")
+
+
+class TestDiskPolicies:
+    """16 kHz mono float32 is 64000 bytes per second of audio."""
+    
+    @pytest.fixture(autouse=True)
+    def fast_checks(self, monkeypatch):
+        monkeypatch.setattr(recorder_module, "DISK_CHECK_INTERVAL", 0.02)
+    
+    def make_recorder(self, tmp_path, **config):
+        backend = VirtualBackend([VirtualDevice("Virtual", channels=1, samplerate=16000)],
+                                 speed=20, blocksize=320)
+        config = RecordingConfig(samplerate=16000, output_dir=str(tmp_path), disk_reserve_mb=1,
+                                 disk_action_seconds=10, **config)
+        return AudioRecorder(config, backend=backend)
+    
+    async def test_stop_policy_refuses_a_recording_that_does_not_fit(self, tmp_path, monkeypatch):
+        fake_disk_usage(monkeypatch, lambda path: MB + 100000)
+        recorder = self.make_recorder(tmp_path, disk_policy=DiskPolicy.STOP)
+        
+        with pytest.raises(RecordingError):
+            await recorder.record(tmp_path / "full.wav", duration=5)
+        assert recorder._state == RecordingState.IDLE
+        assert not (tmp_path / "full.json").exists()
+    
+    async def test_warn_policy_records_anyway(self, tmp_path, monkeypatch):
+        fake_disk_usage(monkeypatch, lambda path: MB + 100000)
+        recorder = self.make_recorder(tmp_path)
+        
+        await recorder.record(tmp_path / "full.wav", duration=0.1)
+        
+        assert (tmp_path / "full.json").exists()
+    
+    async def test_rotate_policy_starts_on_the_secondary(self, tmp_path, monkeypatch):
+        primary, secondary = tmp_path / "primary", tmp_path / "secondary"
+        primary.mkdir()
+        secondary.mkdir()
+        fake_disk_usage(monkeypatch, lambda path: 100 * MB if "secondary" in path else MB)
+        recorder = self.make_recorder(primary, disk_policy=DiskPolicy.ROTATE,
+                                      secondary_output_dir=str(secondary))
+        
+        await recorder.record(primary / "take.wav", duration=0.1)
+        
+        assert (secondary / "take.json").exists()
+        assert not (primary / "take.json").exists()
+    
+    async def test_stop_policy_stops_before_the_disk_fills(self, tmp_path, monkeypatch):
+        # Room for the admission check, but at 20x speed the projection drops below 10 s at once
+        fake_disk_usage(monkeypatch, lambda path: MB + 400000)
+        recorder = self.make_recorder(tmp_path, disk_policy=DiskPolicy.STOP)
+        
+        started = time.monotonic()
+        await recorder.record(tmp_path / "take.wav", duration=5)
+        
+        assert time.monotonic() - started < 2
+        metadata = json.loads((tmp_path / "take.json").read_text())
+        assert metadata["stop_reason"] == "disk_space"
+        assert metadata["disk"]["seconds_to_full"] <= 10
+        assert recorder._state == RecordingState.IDLE
+    
+    async def test_rotate_policy_continues_in_a_new_part(self, tmp_path, monkeypatch):
+        primary, secondary = tmp_path / "primary", tmp_path / "secondary"
+        primary.mkdir()
+        fake_disk_usage(monkeypatch, lambda path: 100 * MB if "secondary" in path else MB + 400000)
+        recorder = self.make_recorder(primary, disk_policy=DiskPolicy.ROTATE,
+                                      secondary_output_dir=str(secondary))
+        
+        await recorder.record(primary / "take.wav", duration=0.3)
+        
+        first = json.loads((primary / "take.json").read_text())
+        assert first["stop_reason"] == "disk_rotation"
+        assert first["continued_in"] == str(secondary / "take_part02.wav")
+        second = json.loads((secondary / "take_part02.json").read_text())
+        assert second["part"] == 2
+        assert second["previous_part"] == str(primary / "take.wav")
+        assert second["stop_reason"] is None
+        assert first["total_frames"] + second["total_frames"] > 0
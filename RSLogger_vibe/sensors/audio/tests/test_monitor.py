@@ -0,0 +1,103 @@
+import numpy as np
+
+from src.monitor import MonitorStream, decode_frame, create_tap, MAX_TAP_BLOCKS
+from src.recorder import AudioRecorder, RecordingConfig
+
+
+class TestMonitorStream:
+    def test_frames_are_downsampled(self):
+        stream = MonitorStream(48000, 16000, frame_ms=20)
+        block = np.zeros((48000, 1), dtype='float32')
+        
+        frames = stream.process(block)
+        
+        # One second of audio yields 50 frames of 320 samples
+        assert len(frames) == 50
+        decoded = decode_frame(frames[0])
+        assert decoded["samplerate"] == 16000
+        assert len(decoded["samples"]) == 320
+        
+    def test_sequence_numbers_increment(self):
+        stream = MonitorStream(16000, 16000, frame_ms=20)
+        frames = []
+        for _ in range(10):
+            frames.extend(stream.process(np.zeros((512, 1), dtype='float32')))
+            
+        sequences = [decode_frame(frame)["sequence"] for frame in frames]
+        assert sequences == list(range(len(frames)))
+        
+    def test_block_boundaries_are_continuous(self):
+        stream = MonitorStream(44100, 16000)
+        t = np.arange(44100) / 44100
+        tone = (0.5 * np.sin(2 * np.pi * 440 * t)).astype('float32').reshape(-1, 1)
+        
+        frames = []
+        for start in range(0, len(tone), 1000):
+            frames.extend(stream.process(tone[start:start + 1000]))
+            
+        samples = np.concatenate([decode_frame(f)["samples"] for f in frames]) / 32768
+        # Output length tracks the resampling ratio without drift
+        assert abs(len(samples) - 16000) <= stream.frame_size
+        # A 440 Hz tone at 16 kHz never jumps more than a sample-to-sample step allows
+        assert np.max(np.abs(np.diff(samples))) < 0.1
+        
+    def test_stereo_int16_is_downmixed(self):
+        stream = MonitorStream(16000, 16000)
+        block = np.full((320, 2), 16384, dtype='int16')
+        block[:, 1] = 0
+        
+        frames = stream.process(block)
+        
+        samples = decode_frame(frames[0])["samples"]
+        assert np.allclose(samples, 8192, atol=2)
+
+
+class TestMonitorTap:
+    def test_tap_is_bounded(self):
+        tap = create_tap()
+        for i in range(MAX_TAP_BLOCKS + 10):
+            tap.append(np.zeros(1))
+        assert len(tap) == MAX_TAP_BLOCKS
+        
+    def test_callback_feeds_tap_only_when_enabled(self):
+        recorder = AudioRecorder(RecordingConfig())
+        indata = np.ones((256, 1), dtype='float32')
+        
+        recorder._audio_callback(indata, 256, None, None)
+        tap = recorder.enable_monitor_tap()
+        recorder._audio_callback(indata, 256, None, None)
+        recorder.disable_monitor_tap()
+        recorder._audio_callback(indata, 256, None, None)
+        
+        assert len(tap) == 1
+        assert recorder._audio_queue.qsize() == 3
+
+
+class TestMonitorLoop:
+    async def test_stream_follows_capture_rate(self, tmp_path, monkeypatch):
+        import asyncio
+        from src.websocket_client import WebSocketRecorderClient
+        
+        monkeypatch.setenv("HOME", str(tmp_path))
+        client = WebSocketRecorderClient("ws://localhost:0")
+        sent = []
+        
+        class FakeSocket:
+            async def send(self, frame):
+                sent.append(frame)
+        
+        client.websocket = FakeSocket()
+        client.recorder = AudioRecorder(RecordingConfig(samplerate=16000))
+        task = asyncio.create_task(client._monitor_loop())
+        await asyncio.sleep(0.05)
+        
+        # The device turns out to run at 48 kHz once the recorder opens it
+        client.recorder.capture_rate = 48000
+        client.recorder._monitor_tap.append(np.zeros((4800, 1), dtype='float32'))
+        await asyncio.sleep(0.1)
+        client.websocket = None
+        await task
+        
+        # 0.1 s of 48 kHz audio becomes 0.1 s at the monitor rate
+        samples = sum(len(decode_frame(frame)["samples"]) for frame in sent)
+        assert samples == 1600
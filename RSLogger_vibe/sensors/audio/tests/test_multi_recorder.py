@@ -0,0 +1,83 @@
+import pytest
+from pathlib import Path
+from types import SimpleNamespace
+import numpy as np
+
+from src.recorder import AudioRecorder, RecordingConfig
+from src.multi_recorder import MultiStreamRecorder, compute_drift_report
+from src.exceptions import ConfigurationError
+
+
+def make_clock(frames, host_start, host_end, adc_start=None, adc_end=None, block=1000):
+    return {
+        "frames_captured": frames + block,
+        "first_block": {"frame": 0, "adc_time": adc_start, "host_time": host_start, "frames": block},
+        "last_block": {"frame": frames, "adc_time": adc_end, "host_time": host_end, "frames": block}
+    }
+
+
+class TestDriftReport:
+    def test_reference_stream_has_zero_skew(self):
+        report = compute_drift_report([
+            {"label": "a", "samplerate": 48000, "clock": make_clock(48000 * 100, 10.0, 110.0)}
+        ], epoch=9.0)
+        
+        assert report[0]["start_skew_ms"] == 0
+        assert report[0]["relative_drift_ppm"] == 0
+        assert report[0]["drift_ppm_host"] == pytest.approx(0, abs=1e-6)
+        
+    def test_relative_drift_and_skew(self):
+        # Second device runs 10 ppm fast and starts 5 ms later
+        frames = 48000 * 100
+        report = compute_drift_report([
+            {"label": "a", "samplerate": 48000, "clock": make_clock(frames, 10.0, 110.0)},
+            {"label": "b", "samplerate": 48000,
+             "clock": make_clock(int(frames * 1.00001), 10.005, 110.005, 1.0, 101.0)},
+        ], epoch=10.0)
+        
+        assert report[1]["start_skew_ms"] == pytest.approx(5.0)
+        assert report[1]["relative_drift_ppm"] == pytest.approx(10.0, abs=0.1)
+        assert report[1]["drift_ppm_adc"] == pytest.approx(10.0, abs=0.1)
+        
+    def test_stream_without_audio(self):
+        clock = {"frames_captured": 0, "first_block": None, "last_block": None}
+        report = compute_drift_report([{"label": "a", "samplerate": 44100, "clock": clock}], epoch=0.0)
+        assert report[0]["error"] == "no audio captured"
+
+
+class TestMultiStreamRecorder:
+    def test_requires_configs(self):
+        with pytest.raises(ConfigurationError):
+            MultiStreamRecorder([])
+            
+    def test_one_recorder_per_device_with_shared_monitor(self):
+        multi = MultiStreamRecorder.for_devices(RecordingConfig(), [1, "USB Mic"])
+        
+        assert [r.config.device for r in multi.recorders] == [1, "USB Mic"]
+        assert multi.recorders[0]._system_monitor is multi.recorders[1]._system_monitor
+        assert multi.recorders[0]._audio_queue is not multi.recorders[1]._audio_queue
+        
+    def test_output_paths(self):
+        multi = MultiStreamRecorder.for_devices(RecordingConfig(), [1, "USB Mic"])
+        paths = multi.output_paths(Path("recordings/session.wav"))
+        assert [p.name for p in paths] == ["session_device1.wav", "session_usb_mic.wav"]
+        
+    def test_colliding_labels_are_made_unique(self):
+        multi = MultiStreamRecorder.for_devices(RecordingConfig(), ["USB Mic", "usb-mic"])
+        paths = multi.output_paths(Path("recordings/session.wav"))
+        assert [p.name for p in paths] == ["session_usb_mic.wav", "session_usb_mic_1.wav"]
+
+
+class TestClockStamps:
+    def test_callback_stamps_blocks(self):
+        recorder = AudioRecorder(RecordingConfig())
+        block = np.zeros((512, 1), dtype='float32')
+        
+        recorder._audio_callback(block, 512, SimpleNamespace(inputBufferAdcTime=1.5), None)
+        recorder._audio_callback(block, 512, SimpleNamespace(inputBufferAdcTime=1.51), None)
+        
+        stamps = recorder.get_clock_stamps()
+        assert stamps["frames_captured"] == 1024
+        assert stamps["first_block"]["adc_time"] == 1.5
+        assert stamps["last_block"]["frame"] == 512
+        assert stamps["last_block"]["host_time"] >= stamps["first_block"]["host_time"]
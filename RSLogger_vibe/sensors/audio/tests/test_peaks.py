@@ -0,0 +1,150 @@
+import numpy as np
+import pytest
+from pathlib import Path
+
+from src.peaks import (PeakPyramidBuilder, read_peaks, read_header, peaks_path_for,
+                       partial_path_for, find_peaks, PARTIAL_HEADER)
+
+
+def brute_force(data, frames_per_bucket):
+    buckets = -(-len(data) // frames_per_bucket)
+    return np.array([
+        [data[i * frames_per_bucket:(i + 1) * frames_per_bucket].min(axis=0),
+         data[i * frames_per_bucket:(i + 1) * frames_per_bucket].max(axis=0)]
+        for i in range(buckets)
+    ])
+
+
+class TestPeakPyramid:
+    @pytest.fixture
+    def audio(self):
+        rng = np.random.default_rng(0)
+        return rng.uniform(-1, 1, (200_003, 2)).astype('float32')
+        
+    def test_levels_match_brute_force(self, audio, tmp_path):
+        builder = PeakPyramidBuilder(2, 48000, base_block=256, factor=4)
+        # Uneven chunk sizes exercise the remainder and carry handling
+        for start in range(0, len(audio), 4410):
+            builder.add(audio[start:start + 4410])
+            
+        path = tmp_path / "test.peaks"
+        builder.write(path)
+        header, table = read_header(path)
+        
+        assert header["total_frames"] == len(audio)
+        for level, (offset, count) in enumerate(table):
+            frames_per_bucket = 256 * 4 ** level
+            expected = brute_force(audio, frames_per_bucket)
+            data = np.memmap(path, dtype='<i2', mode='r', offset=offset, shape=(count, 2, 2))
+            assert count == len(expected)
+            assert np.allclose(data[..., 0] / 32767, expected[:, 0], atol=1e-4)
+            assert np.allclose(data[..., 1] / 32767, expected[:, 1], atol=1e-4)
+            
+    def test_coarsest_level_has_one_bucket(self, audio, tmp_path):
+        builder = PeakPyramidBuilder(2, 48000)
+        builder.add(audio)
+        path = tmp_path / "test.peaks"
+        builder.write(path)
+        
+        _, table = read_header(path)
+        assert table[-1][1] == 1
+        
+    def test_int16_input_is_normalized(self, tmp_path):
+        builder = PeakPyramidBuilder(1, 16000, base_block=4)
+        builder.add(np.array([[-32767], [0], [16384], [32767]], dtype='int16'))
+        path = tmp_path / "test.peaks"
+        builder.write(path)
+        
+        peaks = read_peaks(path, width=1)
+        assert peaks["min"][0][0] == pytest.approx(-1.0, abs=1e-4)
+        assert peaks["max"][0][0] == pytest.approx(1.0, abs=1e-4)
+
+
+class TestReadPeaks:
+    def test_level_selection_for_width(self, tmp_path):
+        builder = PeakPyramidBuilder(1, 1000, base_block=10, factor=2)
+        builder.add(np.zeros((10_000, 1), dtype='float32'))
+        path = tmp_path / "test.peaks"
+        builder.write(path)
+        
+        # 10 seconds at 1 kHz; 100 points needs buckets of at most 100 frames
+        peaks = read_peaks(path, 0, 10, width=100)
+        assert peaks["frames_per_bucket"] == 80
+        assert len(peaks["min"]) == 125
+        
+    def test_time_range(self, tmp_path):
+        builder = PeakPyramidBuilder(1, 1000, base_block=10, factor=2)
+        builder.add(np.zeros((10_000, 1), dtype='float32'))
+        path = tmp_path / "test.peaks"
+        builder.write(path)
+        
+        peaks = read_peaks(path, 2.0, 3.0, width=100)
+        assert peaks["start_frame"] == 2000
+        assert len(peaks["min"]) == 100
+        
+    def test_peaks_path(self):
+        assert peaks_path_for(Path("recordings/a.wav")) == Path("recordings/a.peaks")
+
+
+class TestPeakSpool:
+    @pytest.fixture
+    def audio(self):
+        rng = np.random.default_rng(1)
+        return rng.uniform(-1, 1, (50_000, 2)).astype('float32')
+    
+    def test_spooled_pyramid_matches_in_memory(self, audio, tmp_path):
+        wav = tmp_path / "rec.wav"
+        spooled = PeakPyramidBuilder(2, 48000, spool_path=partial_path_for(wav))
+        in_memory = PeakPyramidBuilder(2, 48000)
+        for start in range(0, len(audio), 3000):
+            spooled.add(audio[start:start + 3000])
+            in_memory.add(audio[start:start + 3000])
+            
+        spooled.write(tmp_path / "spooled.peaks")
+        in_memory.write(tmp_path / "memory.peaks")
+        
+        assert (tmp_path / "spooled.peaks").read_bytes() == (tmp_path / "memory.peaks").read_bytes()
+        assert not partial_path_for(wav).exists()
+        
+    def test_in_progress_peaks_are_readable(self, audio, tmp_path):
+        wav = tmp_path / "rec.wav"
+        builder = PeakPyramidBuilder(2, 48000, base_block=256, spool_path=partial_path_for(wav))
+        builder.add(audio)
+        
+        # Nothing has been finalized, as after a crash or while still recording
+        path = find_peaks(wav)
+        assert path == partial_path_for(wav)
+        peaks = read_peaks(path, width=10)
+        
+        buckets = len(audio) // 256
+        group = buckets // 10
+        expected = brute_force(audio[:buckets * 256], 256 * group)
+        assert peaks["partial"] is True
+        assert peaks["total_frames"] == buckets * 256
+        assert peaks["frames_per_bucket"] == 256 * group
+        assert np.allclose(peaks["min"], expected[:, 0], atol=1e-4)
+        assert np.allclose(peaks["max"], expected[:, 1], atol=1e-4)
+        
+    def test_spool_flushes_are_batched(self, audio, tmp_path):
+        wav = tmp_path / "rec.wav"
+        builder = PeakPyramidBuilder(2, 48000, spool_path=partial_path_for(wav), flush_interval=3600)
+        builder.add(audio[:3000])
+        flushed = partial_path_for(wav).stat().st_size
+        assert flushed > PARTIAL_HEADER.size
+        
+        for start in range(3000, 30_000, 3000):
+            builder.add(audio[start:start + 3000])
+        assert partial_path_for(wav).stat().st_size == flushed
+        
+        # Finalizing reads the spool, which brings the file up to date
+        builder.finalize()
+        assert read_peaks(partial_path_for(wav), width=1)["total_frames"] == 30_000 // 256 * 256
+        
+    def test_find_peaks_prefers_final_sidecar(self, audio, tmp_path):
+        wav = tmp_path / "rec.wav"
+        assert find_peaks(wav) is None
+        builder = PeakPyramidBuilder(2, 48000, spool_path=partial_path_for(wav))
+        builder.add(audio)
+        builder.write(peaks_path_for(wav))
+        assert find_peaks(wav) == peaks_path_for(wav)
+
@@ -0,0 +1,126 @@
+import json
+import struct
+import wave
+
+import numpy as np
+import pytest
+
+from src.reader import Recording, SegmentedRecording, open_recording, read_layout, wav_header
+
+
+def write_wav(path, data, samplerate, rf64=False):
+    """Write samples in their own format: int16 as PCM, float32 as IEEE float."""
+    channels = data.shape[1]
+    header = wav_header(len(data), channels, samplerate, data.dtype)
+    if rf64:
+        # Same fmt chunk, but sizes move to a ds64 chunk
+        data_size = data.nbytes
+        header = (struct.pack('<4sI4s', b'RF64', 0xFFFFFFFF, b'WAVE')
+                  + struct.pack('<4sIQQQI', b'ds64', 28, 0, data_size, len(data), 0)
+                  + header[12:-8] + struct.pack('<4sI', b'data', 0xFFFFFFFF))
+    path.write_bytes(header + np.ascontiguousarray(data).tobytes())
+
+
+class TestRecording:
+    def test_header_matches_wave_module(self, tmp_path):
+        data = np.arange(-500, 500, dtype=np.int16).reshape(-1, 2)
+        write_wav(tmp_path / "a.wav", data, 8000)
+        
+        with wave.open(str(tmp_path / "a.wav")) as f:
+            assert (f.getnchannels(), f.getframerate(), f.getnframes()) == (2, 8000, 500)
+        layout = read_layout(tmp_path / "a.wav")
+        assert (layout.channels, layout.samplerate, layout.frames) == (2, 8000, 500)
+    
+    def test_views_are_zero_copy(self, tmp_path):
+        data = np.arange(2000, dtype=np.int16).reshape(-1, 2)
+        write_wav(tmp_path / "a.wav", data, 1000)
+        recording = Recording(tmp_path / "a.wav")
+        
+        view = recording.view(100, 200, channels=1)
+        assert np.array_equal(view, data[100:200, 1])
+        assert np.shares_memory(view, recording.data)
+        assert not view.flags.writeable
+        assert np.shares_memory(recording.view_seconds(0.1, 0.2, channels=slice(0, 1)), recording.data)
+    
+    def test_seconds_and_clipping(self, tmp_path):
+        data = np.arange(1000, dtype=np.int16).reshape(-1, 1)
+        write_wav(tmp_path / "a.wav", data, 1000)
+        recording = Recording(tmp_path / "a.wav")
+        
+        assert recording.duration == 1.0
+        assert np.array_equal(recording.view_seconds(0.25, 0.5)[:, 0], np.arange(250, 500))
+        assert len(recording.view_seconds(0.9, 5.0)) == 100
+        assert len(recording.view(-10, 5)) == 5
+        assert len(recording.view_seconds(2.0)) == 0
+    
+    def test_read_converts_only_the_range(self, tmp_path):
+        data = np.array([[-32768], [0], [16384]], dtype=np.int16)
+        write_wav(tmp_path / "a.wav", data, 1000)
+        recording = Recording(tmp_path / "a.wav")
+        
+        samples = recording.read(1, 3)
+        assert samples.dtype == np.float32
+        assert samples[:, 0].tolist() == [0.0, 0.5]
+        assert recording.read(dtype=None).dtype == np.dtype('<i2')
+        with pytest.raises(ValueError):
+            recording.read(dtype='int32')
+    
+    def test_blocks_cover_the_range(self, tmp_path):
+        data = np.random.default_rng(0).standard_normal((1000, 2)).astype(np.float32)
+        write_wav(tmp_path / "a.wav", data, 1000)
+        recording = Recording(tmp_path / "a.wav")
+        
+        blocks = list(recording.blocks(100, 950, channels=0, block_frames=256))
+        assert [len(b) for b in blocks] == [256, 256, 256, 82]
+        assert np.array_equal(np.concatenate(blocks), data[100:950, 0])
+    
+    def test_rf64_and_metadata(self, tmp_path):
+        data = np.linspace(-1, 1, 300, dtype=np.float32).reshape(-1, 1)
+        write_wav(tmp_path / "big.wav", data, 48000, rf64=True)
+        (tmp_path / "big.json").write_text(json.dumps({"total_frames": 300}))
+        
+        recording = open_recording(tmp_path / "big.wav")
+        assert recording.frames == 300
+        assert np.array_equal(recording.view()[:, 0], data[:, 0])
+        assert recording.metadata == {"total_frames": 300}
+    
+    def test_wav_bytes_round_trip(self, tmp_path):
+        data = np.arange(2000, dtype=np.int16).reshape(-1, 2)
+        write_wav(tmp_path / "a.wav", data, 1000)
+        
+        out = tmp_path / "slice.wav"
+        out.write_bytes(b"".join(Recording(tmp_path / "a.wav").wav_bytes(10, 20, channels=1, block_frames=3)))
+        
+        with wave.open(str(out)) as f:
+            assert (f.getnchannels(), f.getnframes()) == (1, 10)
+            assert np.array_equal(np.frombuffer(f.readframes(10), dtype='<i2'), data[10:20, 1])
+
+
+class TestSegmentedRecording:
+    def test_views_on_the_session_timeline(self, tmp_path):
+        for index, value in enumerate((1, 2)):
+            write_wav(tmp_path / f"s_seg{index:03d}.wav", np.full((1000, 1), value, dtype=np.int16), 1000)
+        spare = tmp_path / "spare"
+        spare.mkdir()
+        write_wav(spare / "s_seg002.wav", np.full((500, 1), 3, dtype=np.int16), 1000)
+        manifest = {
+            "session_duration_seconds": 20.0,
+            "segments": [
+                {"audio_file": "s_seg000.wav", "start_offset_seconds": 1.0, "duration_seconds": 1.0},
+                {"audio_file": "s_seg001.wav", "start_offset_seconds": 5.0, "duration_seconds": 1.0},
+                # A segment on a rotated volume is listed by its full path
+                {"audio_file": str(spare / "s_seg002.wav"), "start_offset_seconds": 10.0,
+                 "duration_seconds": 0.5},
+            ]
+        }
+        (tmp_path / "s_segments.json").write_text(json.dumps(manifest))
+        
+        session = open_recording(tmp_path / "s_segments.json")
+        assert isinstance(session, SegmentedRecording)
+        assert len(session) == 3
+        
+        views = session.views_seconds(1.5, 10.25)
+        assert [(round(t, 3), len(v), int(v[0, 0])) for t, v in views] == [
+            (1.5, 500, 1), (5.0, 1000, 2), (10.0, 250, 3)
+        ]
+        assert session.views_seconds(2.0, 4.0) == []
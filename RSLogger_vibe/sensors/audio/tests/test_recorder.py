@@ -3,10 +3,13 @@ import asyncio
 import json
 from pathlib import Path
 import tempfile
+import time
+import threading
 import numpy as np
 from unittest.mock import Mock, patch, AsyncMock, MagicMock
 
 from src.recorder import AudioRecorder, RecordingConfig
+from src.peaks import peaks_path_for, partial_path_for
 
 
 class TestAudioRecorder:
@@ -89,13 +92,12 @@ class TestAudioRecorder:
         
     @pytest.mark.asyncio
     async def test_get_device_info_by_id(self, recorder):
-        mock_device = {
-            'name': 'USB Mic',
-            'max_input_channels': 1,
-            'default_samplerate': 48000.0
-        }
+        mock_devices = [
+            {'name': 'Built-in', 'max_input_channels': 2, 'default_samplerate': 44100.0},
+            {'name': 'USB Mic', 'max_input_channels': 1, 'default_samplerate': 48000.0},
+        ]
         
-        with patch('sounddevice.query_devices', return_value=mock_device):
+        with patch('sounddevice.query_devices', return_value=mock_devices):
             info = await recorder.get_device_info(1)
             
         assert info['id'] == 1
@@ -118,6 +120,21 @@ class TestAudioRecorder:
         assert devices[1]['id'] == 1
         assert devices[1]['name'] == 'USB Mic'
         
+    async def test_peaks_are_built_on_their_own_thread(self, recorder, tmp_path):
+        wav = tmp_path / "rec.wav"
+        await recorder._open_file(wav)
+        threads = []
+        add = recorder._peaks.add
+        recorder._peaks.add = lambda chunk: (threads.append(threading.current_thread().name), add(chunk))
+        
+        for _ in range(3):
+            recorder._write_chunk_to_file(np.zeros((4410, 1), dtype='float32'))
+        await recorder._close_file_and_save_metadata(wav)
+        
+        assert len(threads) == 3 and all(name.startswith("peaks") for name in threads)
+        assert peaks_path_for(wav).exists()
+        assert not partial_path_for(wav).exists()
+        
     # Note: These tests were for the old chunk-based architecture
     # The new streaming architecture doesn't use _save_recording method
     @pytest.mark.skip(reason="Architecture changed to streaming - test no longer applicable")
@@ -178,4 +195,185 @@ class TestAudioRecorder:
                         record_task.cancel()
                         
                         with pytest.raises(asyncio.CancelledError):
-                            await record_task
\ No newline at end of file
+                            await record_task
+
+class TestArmedPreRoll:
+    @pytest.fixture
+    def recorder(self):
+        return AudioRecorder(RecordingConfig(samplerate=1000, channels=1, pre_roll_seconds=0.5))
+    
+    @pytest.fixture
+    def device(self):
+        from src.devices import DeviceManager, AudioDevice
+        with patch.object(DeviceManager, 'get_device_info', new_callable=AsyncMock) as mock_get_info:
+            mock_get_info.return_value = AudioDevice(id=0, name='Default', channels=2, samplerate=1000)
+            yield mock_get_info
+    
+    @staticmethod
+    def feed(recorder, first, count, frames=100):
+        for value in range(first, first + count):
+            recorder._audio_callback(np.full((frames, 1), value, dtype='float32'), frames, None, None)
+    
+    async def test_arm_buffers_bounded_pre_roll(self, recorder, device):
+        from src.enums import RecordingState
+        with patch('sounddevice.InputStream', return_value=MagicMock()):
+            await recorder.arm()
+        
+        self.feed(recorder, 0, 20)
+        
+        assert recorder._state == RecordingState.ARMED
+        assert recorder.armed
+        assert recorder._audio_queue.qsize() == 0
+        assert recorder._pre_roll_frames == 500
+        
+    async def test_record_writes_pre_roll_then_returns_to_armed(self, recorder, device, tmp_path):
+        from src.enums import RecordingState
+        mock_stream = MagicMock()
+        with patch('sounddevice.InputStream', return_value=mock_stream):
+            await recorder.arm()
+        self.feed(recorder, 0, 10)
+        
+        with patch.object(recorder, '_write_chunk_to_file') as mock_write, \
+             patch.object(recorder, '_close_file_and_save_metadata', new_callable=AsyncMock):
+            task = asyncio.create_task(recorder.record(tmp_path / "test.wav", duration=0.3))
+            while recorder._pre_roll is not None:
+                await asyncio.sleep(0.01)
+            # Blocks arriving after the trigger go through the queue
+            self.feed(recorder, 10, 1)
+            await task
+            
+        written = np.concatenate([call.args[0] for call in mock_write.call_args_list])
+        # The last 0.5 s before the trigger, followed seamlessly by live audio
+        assert np.array_equal(written[:, 0], np.repeat(np.arange(5, 11), 100))
+        assert recorder.get_clock_stamps()["first_block"]["frame"] == 500
+        assert recorder._state == RecordingState.ARMED
+        mock_stream.close.assert_not_called()
+        
+    async def test_disarm_closes_stream(self, recorder, device):
+        from src.enums import RecordingState
+        mock_stream = MagicMock()
+        with patch('sounddevice.InputStream', return_value=mock_stream):
+            await recorder.arm()
+            await recorder.disarm()
+        
+        assert recorder._state == RecordingState.IDLE
+        assert not recorder.armed
+        mock_stream.close.assert_called_once()
+        
+        self.feed(recorder, 0, 1)
+        assert recorder._audio_queue.qsize() == 1
+
+
+class TestScheduledStart:
+    @pytest.fixture
+    def backend(self):
+        from src.backends import VirtualBackend, VirtualDevice
+        # Real-time pacing, so host stamps follow the virtual device clock
+        return VirtualBackend([VirtualDevice("Virtual", channels=1, samplerate=16000)], speed=1.0, blocksize=160)
+    
+    @pytest.fixture
+    def recorder(self, backend, tmp_path):
+        return AudioRecorder(RecordingConfig(samplerate=16000, output_dir=str(tmp_path), pre_roll_seconds=0),
+                             backend=backend)
+    
+    @staticmethod
+    def first_sample_error(recorder, start_at):
+        # The virtual ADC clock is the host monotonic clock, so it tells when the first written sample was captured
+        adc_time = recorder.get_clock_stamps()["first_block"]["adc_time"]
+        return adc_time - (start_at - (time.time() - time.monotonic()))
+    
+    async def test_starts_at_sample_nearest_start_at(self, recorder, tmp_path):
+        start_at = time.time() + 0.3
+        await recorder.record(tmp_path / "scheduled.wav", duration=0.2, start_at=start_at)
+        
+        scheduled = recorder.scheduled_start
+        assert scheduled["start_at"] == start_at
+        assert abs(scheduled["start_skew_ms"]) < 0.1
+        assert recorder.get_clock_stamps()["first_block"]["frame"] == scheduled["frame"]
+        assert abs(self.first_sample_error(recorder, start_at)) < 0.005
+        metadata = json.loads((tmp_path / "scheduled.json").read_text())
+        assert metadata["scheduled_start"] == scheduled
+        
+    async def test_armed_start_is_taken_from_the_ring(self, recorder, backend, tmp_path):
+        from src.enums import RecordingState
+        await recorder.arm()
+        start_at = time.time() + 0.2
+        await recorder.record(tmp_path / "scheduled.wav", duration=0.2, start_at=start_at)
+        
+        assert abs(recorder.scheduled_start["start_skew_ms"]) < 0.1
+        assert abs(self.first_sample_error(recorder, start_at)) < 0.005
+        assert recorder._state == RecordingState.ARMED
+        assert not backend.streams[0].closed
+        await recorder.disarm()
+        
+    async def test_past_start_begins_with_the_stream_and_reports_the_lag(self, recorder, tmp_path):
+        start_at = time.time() - 0.5
+        await recorder.record(tmp_path / "late.wav", duration=0.1, start_at=start_at)
+        
+        assert recorder.scheduled_start["frame"] == 0
+        assert recorder.scheduled_start["start_skew_ms"] >= 500
+        
+    async def test_stop_before_start(self, recorder, backend, tmp_path):
+        from src.enums import RecordingState
+        task = asyncio.create_task(recorder.record(tmp_path / "stopped.wav", start_at=time.time() + 10))
+        while not backend.streams:
+            await asyncio.sleep(0.01)
+        recorder.stop()
+        await asyncio.wait_for(task, 1.0)
+        
+        assert recorder.scheduled_start is None
+        assert recorder._pre_roll is None
+        assert recorder._state == RecordingState.IDLE
+        assert backend.streams[0].closed
+
+
+class TestDropoutAccounting:
+    @pytest.fixture
+    def recorder(self):
+        recorder = AudioRecorder(RecordingConfig(samplerate=1000, channels=1))
+        recorder._audio_queue = asyncio.Queue(maxsize=3)
+        return recorder
+    
+    def test_consecutive_drops_form_one_gap(self, recorder, caplog):
+        block = np.zeros((100, 1), dtype='float32')
+        with caplog.at_level('WARNING'):
+            for _ in range(6):
+                recorder._audio_callback(block, 100, None, None)
+        
+        stats = recorder.get_dropout_stats(include_gaps=True)
+        assert stats["dropped_blocks"] == 3
+        assert stats["dropped_frames"] == 300
+        assert stats["max_queue_depth"] == 3
+        assert stats["queue_capacity"] == 3
+        assert stats["gaps"] == [{"frame": 300, "frames": 300, "reason": "queue_full", "seconds": 0.3}]
+        assert caplog.text.count("Audio queue full") == 1
+        
+    def test_overflow_length_comes_from_adc_clock(self, recorder):
+        from src.backends import VirtualCallbackFlags, VirtualTimeInfo
+        block = np.zeros((100, 1), dtype='float32')
+        recorder._audio_callback(block, 100, VirtualTimeInfo(10.0, 0), VirtualCallbackFlags())
+        # The next block arrives 0.25 s of ADC time late
+        recorder._audio_callback(block, 100, VirtualTimeInfo(10.35, 0),
+                                 VirtualCallbackFlags(input_overflow=True))
+        recorder._audio_callback(block, 100, VirtualTimeInfo(10.45, 0),
+                                 VirtualCallbackFlags(input_underflow=True))
+        
+        stats = recorder.get_dropout_stats(include_gaps=True)
+        assert stats["input_overflows"] == 1
+        assert stats["overflow_frames"] == 250
+        assert stats["status_errors"] == 1
+        assert stats["gaps"] == [{"frame": 100, "frames": 250, "reason": "input_overflow", "seconds": 0.1}]
+        assert not stats["gaps_truncated"]
+        
+    def test_gap_list_is_bounded(self, recorder):
+        from src.recorder import MAX_GAPS
+        from src.backends import VirtualCallbackFlags
+        block = np.zeros((1, 1), dtype='float32')
+        for _ in range(MAX_GAPS + 5):
+            recorder._audio_callback(block, 1, None, VirtualCallbackFlags(input_overflow=True))
+            recorder._drain_queue()
+        
+        stats = recorder.get_dropout_stats(include_gaps=True)
+        assert stats["gap_count"] == MAX_GAPS + 5
+        assert len(stats["gaps"]) == MAX_GAPS
+        assert stats["gaps_truncated"]
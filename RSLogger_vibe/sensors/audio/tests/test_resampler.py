@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from src.resampler import PolyphaseResampler, needs_resampling
+from src.recorder import AudioRecorder, RecordingConfig
+
+
+def tone(freq, rate, seconds, amplitude=0.5, channels=1):
+    t = np.arange(int(rate * seconds)) / rate
+    signal = (amplitude * np.sin(2 * np.pi * freq * t)).astype('float32')
+    return np.repeat(signal[:, None], channels, axis=1)
+
+
+def process_in_blocks(resampler, data, blocksize):
+    return np.concatenate([
+        resampler.process(data[i:i + blocksize]).copy()
+        for i in range(0, len(data), blocksize)
+    ])
+
+
+class TestPolyphaseResampler:
+    @pytest.mark.parametrize("in_rate,out_rate", [(48000, 44100), (44100, 48000), (96000, 48000)])
+    def test_passband_tone_quality(self, in_rate, out_rate):
+        resampler = PolyphaseResampler(in_rate, out_rate, 1)
+        output = process_in_blocks(resampler, tone(1000, in_rate, 1.0), 1024)
+        
+        n = np.arange(len(output))
+        expected = 0.5 * np.sin(2 * np.pi * 1000 * (n / out_rate - resampler.delay / in_rate))
+        steady = slice(1000, len(output) - 1000)
+        error = output[steady, 0] - expected[steady]
+        snr = 10 * np.log10(np.mean(expected[steady] ** 2) / np.mean(error ** 2))
+        assert snr > 80
+        
+    def test_alias_rejection(self):
+        # 30 kHz is above the 22.05 kHz output Nyquist and must be filtered out
+        resampler = PolyphaseResampler(96000, 44100, 1)
+        output = resampler.process(tone(30000, 96000, 0.5, amplitude=1.0))
+        assert 20 * np.log10(np.abs(output[500:-500]).max()) < -60
+        
+    def test_output_independent_of_block_size(self):
+        data = np.random.default_rng(1).uniform(-0.5, 0.5, (48000, 2)).astype('float32')
+        
+        first = process_in_blocks(PolyphaseResampler(48000, 44100, 2), data, 512)
+        second = process_in_blocks(PolyphaseResampler(48000, 44100, 2), data, 777)
+        
+        assert np.array_equal(first, second)
+        
+    def test_output_length_tracks_ratio(self):
+        resampler = PolyphaseResampler(48000, 44100, 1)
+        output = process_in_blocks(resampler, np.zeros((48000 * 3, 1), dtype='float32'), 1000)
+        assert len(output) == 44100 * 3
+        
+    def test_large_blocks_are_split(self):
+        resampler = PolyphaseResampler(48000, 16000, 1, max_block=1024)
+        output = resampler.process(np.zeros((4800, 1), dtype='float32'))
+        assert len(output) == 1600
+        
+    def test_int16_output_is_clipped(self):
+        resampler = PolyphaseResampler(48000, 44100, 1, dtype='int16')
+        data = np.full((4800, 1), 32767, dtype='int16')
+        data[::2] = -32768
+        output = resampler.process(data)
+        assert output.dtype == np.int16
+        assert output.max() <= 32767 and output.min() >= -32768
+        
+    def test_needs_resampling(self):
+        assert needs_resampling(48000.0, 44100)
+        assert not needs_resampling(44100.0, 44100)
+        assert not needs_resampling(None, 44100)
+
+
+class TestRecorderResampling:
+    def test_writer_resamples_and_counts_output_frames(self):
+        recorder = AudioRecorder(RecordingConfig(samplerate=44100, native_rate=True))
+        recorder._resampler = PolyphaseResampler(48000, 44100, 1)
+        
+        recorder._write_chunk_to_file(np.zeros((48000, 1), dtype='float32'))
+        
+        assert recorder._total_frames_written == 44100
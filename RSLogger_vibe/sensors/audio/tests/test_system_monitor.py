@@ -0,0 +1,102 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import psutil
+
+from src.system_monitor import SystemMonitor
+
+
+class TestSystemMonitor:
+    def test_stats_never_block_on_cpu(self):
+        monitor = SystemMonitor()
+        real_cpu_percent = psutil.cpu_percent
+        
+        def cpu_percent(interval=None, **kwargs):
+            assert interval is None
+            return real_cpu_percent(interval=None, **kwargs)
+        
+        with patch('psutil.cpu_percent', side_effect=cpu_percent):
+            start = time.monotonic()
+            stats = monitor.get_system_stats()
+            
+        assert time.monotonic() - start < 0.5
+        assert {'cpu_percent', 'memory_percent', 'disk_free_gb', 'process_rss_mb',
+                'process_threads', 'disk_write_mb_s'} <= set(stats)
+        
+    def test_history_is_a_bounded_ring(self):
+        monitor = SystemMonitor(history=3)
+        for _ in range(5):
+            monitor.sample()
+            
+        samples = monitor.get_history()
+        assert len(samples) == 3
+        assert [s['timestamp'] for s in samples] == sorted(s['timestamp'] for s in samples)
+        
+    def test_history_query(self):
+        monitor = SystemMonitor()
+        first = monitor.sample()
+        monitor.sample()
+        monitor.sample()
+        
+        assert len(monitor.get_history(since=first['timestamp'])) == 2
+        assert len(monitor.get_history(limit=1)) == 1
+        assert monitor.get_history(limit=0) == []
+        assert set(monitor.get_history(fields=['cpu_percent'])[0]) == {'cpu_percent', 'timestamp'}
+        
+    async def test_samples_on_a_background_thread(self):
+        monitor = SystemMonitor(sample_interval=0.01)
+        await monitor.start_monitoring()
+        await asyncio.sleep(0.2)
+        await monitor.stop_monitoring()
+        monitor._thread.join(1)
+        
+        assert not monitor._thread.is_alive()
+        assert len(monitor.get_history()) >= 2
+        
+    async def test_shared_monitor_runs_until_last_user_stops(self):
+        monitor = SystemMonitor(sample_interval=0.01)
+        await monitor.start_monitoring()
+        await monitor.start_monitoring()
+        await monitor.stop_monitoring()
+        assert monitor.monitoring
+        
+        await monitor.stop_monitoring()
+        assert not monitor.monitoring
+        
+    def test_process_delta_tracks_memory_and_descriptors(self, tmp_path):
+        monitor = SystemMonitor()
+        start = monitor.process_snapshot()
+        assert start['rss_bytes'] > 0
+        assert start['threads'] >= 1
+        
+        ballast = bytearray(64 * 1024 * 1024)
+        ballast[::4096] = b'x' * len(ballast[::4096])  # Touch every page
+        files = [open(tmp_path / f"f{i}", 'w') for i in range(5)]
+        try:
+            delta = monitor.process_delta(start)
+        finally:
+            for f in files:
+                f.close()
+                
+        assert delta['rss_delta_mb'] > 32
+        if delta['fds_delta'] is not None:
+            assert delta['fds_delta'] >= 5
+        assert delta['cpu_seconds'] >= 0
+        
+    def test_disk_stats_follow_the_output_filesystem(self, tmp_path):
+        monitor = SystemMonitor(path=tmp_path / "recordings" / "not_created_yet")
+        
+        with patch('psutil.disk_usage', wraps=psutil.disk_usage) as disk_usage:
+            monitor.sample()
+            monitor.check_available_space(1, 48000, 2)
+            
+        assert [call.args[0] for call in disk_usage.call_args_list] == [str(tmp_path)] * 2
+        
+    def test_space_estimate_uses_the_sample_width(self):
+        monitor = SystemMonitor()
+        
+        sizes = {dtype: monitor.check_available_space(1, 48000, 2, dtype)['estimated_size_gb']
+                 for dtype in ('int16', 'int32', 'float32')}
+        
+        assert sizes['int32'] == sizes['float32'] == 2 * sizes['int16']
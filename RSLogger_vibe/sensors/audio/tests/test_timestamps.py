@@ -0,0 +1,124 @@
+import asyncio
+import json
+import time
+
+import numpy as np
+import pytest
+
+from src.backends import VirtualBackend, VirtualDevice
+from src.recorder import AudioRecorder, RecordingConfig
+from src.timestamps import ClockIndex, ClockIndexWriter, clock_path_for, read_clock_index
+
+
+def write_index(path, blocks, blocksize=100, samplerate=1000, capture_rate=1000, every=1,
+                wall_offset=1e9, ppm=0.0):
+    writer = ClockIndexWriter(path, samplerate, capture_rate, wall_offset, every)
+    for block in range(blocks):
+        frame = block * blocksize
+        writer.add(frame, 5.0 + frame / (capture_rate * (1 + ppm / 1e6)), 100.0 + frame / capture_rate)
+    writer.close()
+    return ClockIndex(path)
+
+
+class TestClockIndex:
+    def test_interpolates_between_entries(self, tmp_path):
+        index = write_index(tmp_path / "a.clock", 10, every=3)
+        
+        assert len(index) == 4
+        assert index.entries['frame'].tolist() == [0, 300, 600, 900]
+        assert index.host_time(450) == pytest.approx(100.45)
+        assert index.adc_time(np.array([0, 150])) == pytest.approx([5.0, 5.15])
+        assert index.wall_time(0) == pytest.approx(1e9 + 100.0)
+    
+    def test_extrapolates_at_the_nominal_rate(self, tmp_path):
+        index = write_index(tmp_path / "a.clock", 3)
+        
+        assert index.host_time(500) == pytest.approx(100.5)
+        assert index.host_time(-100) == pytest.approx(99.9)
+    
+    def test_inverse_lookup(self, tmp_path):
+        index = write_index(tmp_path / "a.clock", 10)
+        
+        assert index.frame_at_host_time(100.2345) == pytest.approx(234.5)
+        assert index.frame_at_adc_time(5.5) == pytest.approx(500)
+        assert index.frame_at_wall_time(1e9 + 100.1) == pytest.approx(100, abs=1e-3)
+    
+    def test_file_frames_at_a_different_rate(self, tmp_path):
+        index = write_index(tmp_path / "a.clock", 3, samplerate=500, capture_rate=1000)
+        
+        assert index.entries['frame'].tolist() == [0, 50, 100]
+        assert index.host_time(50) == pytest.approx(100.1)
+    
+    def test_drift(self, tmp_path):
+        index = write_index(tmp_path / "a.clock", 1000, ppm=50.0)
+        
+        drift = index.drift()
+        assert drift["adc_ppm"] == pytest.approx(50.0, abs=0.1)
+        assert drift["host_ppm"] == pytest.approx(0.0, abs=0.1)
+    
+    def test_missing_adc_time_and_truncated_entry(self, tmp_path):
+        path = tmp_path / "a.clock"
+        writer = ClockIndexWriter(path, 1000, 1000, 0.0)
+        writer.add(0, None, 1.0)
+        writer.add(100, None, 1.1)
+        writer.close()
+        with open(path, 'ab') as f:
+            f.write(b'\x00' * 5)  # Cut short by a crash
+        
+        index = ClockIndex(path)
+        assert len(index) == 2
+        assert not index.has_adc_time
+        with pytest.raises(ValueError):
+            index.adc_time(0)
+        assert "adc_ppm" not in index.drift()
+
+
+class TestRecorderClockIndex:
+    async def test_index_follows_the_file(self, tmp_path):
+        backend = VirtualBackend([VirtualDevice("Virtual", channels=1, samplerate=16000, drift_ppm=200)],
+                                 speed=20, blocksize=320, xrun_blocks={5})
+        recorder = AudioRecorder(RecordingConfig(samplerate=16000, output_dir=str(tmp_path)), backend=backend)
+        
+        await recorder.record(tmp_path / "take.wav", duration=0.5)
+        
+        metadata = json.loads((tmp_path / "take.json").read_text())
+        assert metadata["clock_index_file"] == "take.clock"
+        index = read_clock_index(tmp_path / "take.wav")
+        frames = index.entries['frame']
+        # One entry per written block, at its offset in the file
+        assert len(index) == metadata["total_frames"] // 320
+        assert frames.tolist() == list(range(0, len(index) * 320, 320))
+        # The xrun lost one block: the file is contiguous, the ADC clock is not
+        assert index.adc_time(5 * 320) - index.adc_time(4 * 320) == pytest.approx(2 * 320 / 16000, rel=1e-3)
+        assert np.all(np.diff(index.entries['host_time']) >= 0)
+    
+    async def test_armed_pre_roll_is_indexed(self, tmp_path):
+        backend = VirtualBackend([VirtualDevice("Virtual", channels=1, samplerate=16000)],
+                                 speed=20, blocksize=320)
+        config = RecordingConfig(samplerate=16000, output_dir=str(tmp_path), pre_roll_seconds=1.0)
+        recorder = AudioRecorder(config, backend=backend)
+        await recorder.arm()
+        await asyncio.sleep(0.1)
+        
+        triggered = time.monotonic()
+        await recorder.record(tmp_path / "take.wav", duration=0.2)
+        await recorder.disarm()
+        
+        index = read_clock_index(tmp_path / "take.wav")
+        frames = index.entries['frame']
+        assert frames[0] == 0
+        assert np.all(np.diff(frames) > 0)
+        # The pre-roll was captured before the trigger
+        assert index.host_time(0) < triggered
+        assert frames[-1] < json.loads((tmp_path / "take.json").read_text())["total_frames"]
+    
+    async def test_index_can_be_disabled(self, tmp_path):
+        backend = VirtualBackend([VirtualDevice("Virtual", channels=1, samplerate=16000)],
+                                 speed=20, blocksize=320)
+        config = RecordingConfig(samplerate=16000, output_dir=str(tmp_path), clock_index_every=0)
+        recorder = AudioRecorder(config, backend=backend)
+        
+        await recorder.record(tmp_path / "take.wav", duration=0.2)
+        
+        assert json.loads((tmp_path / "take.json").read_text())["clock_index_file"] is None
+        assert not clock_path_for(tmp_path / "take.wav").exists()
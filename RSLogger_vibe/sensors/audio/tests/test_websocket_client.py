@@ -0,0 +1,162 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from src import backends
+from src.backends import VirtualBackend, VirtualDevice
+from src.websocket_client import WebSocketRecorderClient
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+        
+    async def send(self, data):
+        self.sent.append(json.loads(data))
+        
+    def of_type(self, kind):
+        return [message for message in self.sent if message["type"] == kind]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(backends, "_backend", VirtualBackend(
+        [VirtualDevice("Virtual", channels=1, samplerate=16000)], speed=20, blocksize=320))
+    client = WebSocketRecorderClient("ws://localhost:0", client_id="rec-1")
+    client.config.samplerate = 16000
+    client.config.output_dir = str(tmp_path / "recordings")
+    client.websocket = FakeSocket()
+    return client
+
+
+class TestCommandAcks:
+    async def test_command_with_id_is_acknowledged(self, client):
+        await client.handle_message({"type": "command", "command": "get_capabilities", "command_id": "c1"})
+        
+        ack = client.websocket.of_type("ack")[0]
+        assert ack["command_id"] == "c1" and ack["command"] == "get_capabilities"
+        assert ack["ok"] and ack["error"] is None
+        assert ack["completed_at"] >= ack["received_at"]
+        assert ack["client_id"] == "rec-1"
+    
+    async def test_failure_is_reported_in_the_ack(self, client):
+        await client.handle_message({"type": "command", "command": "stop_recording", "command_id": "c2"})
+        
+        ack = client.websocket.of_type("ack")[0]
+        assert not ack["ok"] and ack["error"] == "Not recording"
+    
+    async def test_command_without_id_is_not_acknowledged(self, client):
+        await client.handle_message({"type": "command", "command": "get_capabilities"})
+        
+        assert client.websocket.of_type("ack") == []
+    
+    async def test_start_is_acknowledged_once_capturing(self, client):
+        await client.handle_message({"type": "command", "command": "start_recording", "command_id": "c3",
+                                     "payload": {"duration": 0.5, "filename": "take.wav"}})
+        
+        ack = client.websocket.of_type("ack")[0]
+        assert ack["ok"]
+        assert client.recorder.started.is_set()
+        await client.handle_message({"type": "command", "command": "stop_recording", "command_id": "c4"})
+        assert client.websocket.of_type("ack")[1]["ok"]
+        assert not client.recorder.started.is_set()
+    
+    async def test_ping_is_acknowledged_with_the_recorder_clock(self, client):
+        before = time.time()
+        await client.handle_message({"type": "command", "command": "ping", "command_id": "p1"})
+        
+        ack = client.websocket.of_type("ack")[0]
+        assert ack["ok"] and ack["result"] is None
+        assert before <= ack["received_at"] <= ack["completed_at"] <= time.time()
+    
+    async def test_scheduled_start_acknowledges_its_skew(self, client):
+        start_at = time.time() + 0.2
+        await client.handle_message({"type": "command", "command": "start_recording", "command_id": "c5",
+                                     "payload": {"duration": 0.2, "filename": "take.wav", "start_at": start_at}})
+        
+        # Acknowledged straight away as scheduled
+        scheduled, = client.websocket.of_type("ack")
+        assert scheduled["ok"] and scheduled["completed_at"] < start_at
+        assert scheduled["result"] == {"scheduled": True, "start_at": start_at}
+        
+        await asyncio.wait_for(asyncio.gather(*client.command_tasks), 5.0)
+        started = client.websocket.of_type("ack")[1]
+        assert started["command_id"] == "c5" and started["stage"] == "started"
+        assert started["ok"]
+        assert started["completed_at"] >= start_at
+        assert started["result"]["start_at"] == start_at
+        assert "start_skew_ms" in started["result"]
+        await client.recording_task
+    
+    async def test_scheduled_start_can_be_stopped_before_it_starts(self, client):
+        start_at = time.time() + 5
+        await client.handle_message({"type": "command", "command": "start_recording", "command_id": "c6",
+                                     "payload": {"filename": "take.wav", "start_at": start_at}})
+        ping = client.dispatch({"type": "command", "command": "ping", "command_id": "p2"})
+        stop = client.dispatch({"type": "command", "command": "stop_recording", "command_id": "c7"})
+        await asyncio.wait_for(asyncio.gather(ping, stop), 1.0)
+        await asyncio.wait_for(asyncio.gather(*client.command_tasks), 1.0)
+        
+        acks = [(ack["command_id"], ack.get("stage"), ack["ok"]) for ack in client.websocket.of_type("ack")]
+        assert ("p2", None, True) in acks and ("c7", None, True) in acks
+        assert ("c6", "started", False) in acks
+
+
+class TestConcurrentCommands:
+    async def test_slow_command_does_not_hold_up_a_ping(self, client, monkeypatch):
+        async def slow_capabilities():
+            await asyncio.sleep(5)
+            return {}
+        monkeypatch.setattr(client, "get_capabilities", slow_capabilities)
+        
+        client.dispatch({"type": "command", "command": "get_capabilities", "command_id": "slow"})
+        ping = client.dispatch({"type": "command", "command": "ping", "command_id": "p1"})
+        await asyncio.wait_for(ping, 1.0)
+        
+        assert [ack["command_id"] for ack in client.websocket.of_type("ack")] == ["p1"]
+        assert len(client.command_tasks) == 1
+        
+        # Going away cancels what is still running, without acks to a connection that is gone
+        await client.cancel_commands()
+        assert not client.command_tasks
+        assert len(client.websocket.of_type("ack")) == 1
+    
+    async def test_concurrent_starts_record_once(self, client):
+        first = client.dispatch({"type": "command", "command": "start_recording", "command_id": "s1",
+                                 "payload": {"filename": "take.wav"}})
+        second = client.dispatch({"type": "command", "command": "start_recording", "command_id": "s2",
+                                  "payload": {"filename": "other.wav"}})
+        await asyncio.wait_for(asyncio.gather(first, second), 5.0)
+        
+        acks = {ack["command_id"]: ack for ack in client.websocket.of_type("ack")}
+        assert acks["s1"]["ok"]
+        assert acks["s2"]["error"] == "Already recording"
+        await client.stop_recording()
+
+
+class TestStatusDeltas:
+    async def test_snapshot_then_changed_fields_only(self, client):
+        await client.send_status(full=True)
+        await client.send_status()
+        client.config.threshold_db = -30.0
+        await client.send_status()
+        
+        snapshot, = client.websocket.of_type("status")
+        assert snapshot["version"] == 1
+        assert "capabilities" in snapshot and "config" in snapshot
+        # An unchanged status isn't sent at all
+        delta, = client.websocket.of_type("status_delta")
+        assert delta["version"] == 2 and delta["base_version"] == 1
+        assert list(delta["changes"]) == ["config"]
+        assert delta["changes"]["config"]["threshold_db"] == -30.0
+        assert delta["removed"] == []
+    
+    async def test_first_status_and_get_status_are_full(self, client):
+        await client.send_status()
+        await client.handle_message({"type": "command", "command": "get_status"})
+        
+        assert [message["version"] for message in client.websocket.of_type("status")] == [1, 2]
+        assert client.websocket.of_type("status_delta") == []
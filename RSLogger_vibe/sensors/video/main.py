@@ -17,6 +17,8 @@ try:
 except ImportError:
     PICAMERA2_AVAILABLE = False
 
+START_TIMEOUT = 10.0  # Seconds a scheduled start may run past its instant before giving up
+
 
 class CameraInterface(ABC):
     """Abstract base class for camera implementations"""
@@ -238,13 +240,17 @@ class CameraController:
         self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
         self.capture_task = None
         self.camera_handler: Optional[CameraInterface] = None
+        self.start_at: Optional[float] = None  # Wall-clock instant the next recording begins at
+        self.started = asyncio.Event()  # Set once the first frame of a recording is written
         self.status = {
             'recording': False,
             'camera_type': camera_type,
             'camera_index': 0,
             'resolution': [640, 480],
             'fps': 30,
-            'output_file': None
+            'output_file': None,
+            'start_at': None,
+            'start_skew_ms': None
         }
         self._initialize_camera_handler()
     
@@ -276,7 +282,7 @@ class CameraController:
         
         return True
 
-    async def start_recording(self, filename=None, duration=None):
+    async def start_recording(self, filename=None, duration=None, start_at=None):
         if self.recording:
             return False
         
@@ -284,6 +290,10 @@ class CameraController:
             self.output_file = filename
         if duration:
             self.duration = duration
+        self.start_at = start_at
+        self.started.clear()
+        self.status['start_at'] = start_at
+        self.status['start_skew_ms'] = None
             
         if not await self.start_camera():
             return False
@@ -332,28 +342,44 @@ class CameraController:
         frame_count = 0
         max_frames = self.status['fps'] * self.duration if self.duration > 0 else float('inf')
         loop = asyncio.get_event_loop()
+        start_at = self.start_at
+        previous = None  # The last frame captured before a scheduled start, with its capture time
         
         try:
             while self.recording and frame_count < max_frames:
                 ret, frame = await self.camera_handler.capture_frame()
+                # Frames are stamped as they are read, so the stamp trails the exposure by the readout
+                captured = time.time()
                 if not ret or frame is None:
                     break
                 
-                if self.out:
-                    await loop.run_in_executor(self.executor, self.out.write, frame)
-                
-                _, buffer = await loop.run_in_executor(self.executor, cv2.imencode, '.jpg', frame)
-                frame_data = await loop.run_in_executor(self.executor, base64.b64encode, buffer)
-                frame_data_str = frame_data.decode('utf-8')
+                frames = [(captured, frame)]
+                if start_at is not None and not self.started.is_set():
+                    if captured < start_at:
+                        previous = (captured, frame)
+                        continue
+                    # Begin at whichever frame is nearest the scheduled instant
+                    if previous is not None and start_at - previous[0] < captured - start_at:
+                        frames.insert(0, previous)
+                    self.status['start_skew_ms'] = round((frames[0][0] - start_at) * 1000, 3)
+                self.started.set()
                 
-                await self.frame_queue.put({
-                    'type': 'frame',
-                    'data': frame_data_str,
-                    'timestamp': time.time(),
-                    'frame_num': frame_count
-                })
-                
-                frame_count += 1
+                for captured, frame in frames:
+                    if self.out:
+                        await loop.run_in_executor(self.executor, self.out.write, frame)
+                    
+                    _, buffer = await loop.run_in_executor(self.executor, cv2.imencode, '.jpg', frame)
+                    frame_data = await loop.run_in_executor(self.executor, base64.b64encode, buffer)
+                    frame_data_str = frame_data.decode('utf-8')
+                    
+                    await self.frame_queue.put({
+                        'type': 'frame',
+                        'data': frame_data_str,
+                        'timestamp': captured,
+                        'frame_num': frame_count
+                    })
+                    
+                    frame_count += 1
                 await asyncio.sleep(0.001)  # Small yield to allow other tasks
                 
         except asyncio.CancelledError:
@@ -363,21 +389,60 @@ class CameraController:
 
     async def handle_client(self, websocket, path):
         self.clients.add(websocket)
+        # Each command runs in its own task, so a slow one doesn't hold up a stop or ping
+        tasks = set()
         try:
             async for message in websocket:
                 try:
                     command = json.loads(message)
-                    response = await self.handle_command(command)
-                    await websocket.send(json.dumps(response))
                 except json.JSONDecodeError:
                     await websocket.send(json.dumps({
                         'type': 'error',
                         'message': 'Invalid JSON'
                     }))
+                    continue
+                task = asyncio.create_task(self.respond(websocket, command, tasks))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
         except websockets.exceptions.ConnectionClosed:
             pass
         finally:
             self.clients.discard(websocket)
+            for task in list(tasks):
+                task.cancel()
+
+    async def respond(self, websocket, command, tasks):
+        """Handle a command and send its response; later reports are added to ``tasks``."""
+        try:
+            response = await self.handle_command(command)
+            await websocket.send(json.dumps(response))
+            if response.get('scheduled'):
+                task = asyncio.create_task(self.report_start(websocket, command['start_at']))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def report_start(self, websocket, start_at):
+        """Send a second response once a scheduled start has happened, with how far it was off."""
+        timeout = max(start_at - time.time(), 0) + START_TIMEOUT
+        started = asyncio.ensure_future(self.started.wait())
+        try:
+            await asyncio.wait({started, self.capture_task}, timeout=timeout,
+                               return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            started.cancel()
+        response = {'type': 'response', 'cmd': 'start_recording', 'stage': 'started', 'start_at': start_at}
+        if self.started.is_set():
+            response.update(success=True, start_skew_ms=self.status['start_skew_ms'])
+        elif self.recording:
+            response.update(success=False, message=f'Recording did not start within {timeout:.1f}s')
+        else:
+            response.update(success=False, message='Recording stopped before its scheduled start')
+        try:
+            await websocket.send(json.dumps(response))
+        except websockets.exceptions.ConnectionClosed:
+            pass
 
     async def handle_command(self, command):
         cmd = command.get('cmd')
@@ -385,10 +450,19 @@ class CameraController:
         if cmd == 'start_recording':
             filename = command.get('filename', self.output_file)
             duration = command.get('duration', self.duration)
-            success = await self.start_recording(filename, duration)
+            start_at = command.get('start_at')
+            success = await self.start_recording(filename, duration, start_at)
             if success:
                 self.capture_task = asyncio.create_task(self.capture_frames())
-            return {'type': 'response', 'cmd': cmd, 'success': success}
+            if not success or start_at is None:
+                return {'type': 'response', 'cmd': cmd, 'success': success}
+            # A scheduled start answers now; a second response follows once the first frame is written
+            return {'type': 'response', 'cmd': cmd, 'success': True, 'scheduled': True, 'start_at': start_at}
+        
+        elif cmd == 'ping':
+            # The controller's clock, for a master estimating its offset from the round trip
+            now = time.time()
+            return {'type': 'response', 'cmd': cmd, 'received_at': now, 'completed_at': now}
         
         elif cmd == 'stop_recording':
             success = await self.stop_recording()
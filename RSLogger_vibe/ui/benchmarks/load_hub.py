@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""Load test for the WebSocket hub with many simulated recorders and UI clients.
+
+Starts ``ws_ui_server`` in a subprocess (or targets a running hub with
+``--url``), connects simulated recorders on ``/ws/recorder`` and browsers on
+``/ws`` that speak the real message schema (register, status, devices_list,
+event, command), and ramps the number of recorders step by step. For each
+step it reports:
+
+- broadcast latency: a recorder sending a ``status_delta`` to each UI
+  receiving the update it is forwarded in, and the share delivered. The hub
+  holds status changes for up to one status tick (0.1 s) to coalesce them,
+  so that much of the latency is by design, and two statuses from one
+  recorder within a tick arrive as one
+- command fan-out latency: a UI sending a command to ``all`` to the last
+  recorder receiving it
+- hub RSS and memory per connection, and hub CPU
+- whether the step is saturated: broadcast p99 over ``--latency-budget`` or
+  fewer than ``--min-delivery`` of the messages delivered
+
+The first saturated step is the saturation point. Simulated clients all run
+in this process, so watch its own CPU too: a load generator that can't keep
+up inflates the latencies it reports.
+
+Run from the ui directory:
+
+    python benchmarks/load_hub.py --recorders 25 50 100 200 --uis 5 --json hub.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+import psutil
+import websockets
+
+UI_DIR = Path(__file__).resolve().parent.parent
+
+
+def percentiles_ms(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {key: None for key in ("p50", "p90", "p99", "p999", "max")}
+    data = np.array(values) * 1000
+    return {
+        "p50": float(np.percentile(data, 50)),
+        "p90": float(np.percentile(data, 90)),
+        "p99": float(np.percentile(data, 99)),
+        "p999": float(np.percentile(data, 99.9)),
+        "max": float(data.max()),
+    }
+
+
+def status_message(index: int, sent_at: float, recording: bool = False, version: int = 1) -> Dict[str, Any]:
+    """A status shaped like the audio recorder's, stamped with the load generator's clock."""
+    return {
+        "type": "status",
+        "version": version,
+        "recording": recording,
+        "config": {
+            "device": 0,
+            "device_name": f"Simulated Input {index}",
+            "samplerate": 48000,
+            "channels": 2,
+            "dtype": "int16",
+            "output_dir": "recordings",
+            "native_rate": None,
+            "pre_roll_seconds": 0,
+            "sound_activated": False,
+            "threshold_db": -40.0,
+            "hang_seconds": 2.0,
+            "disk_policy": "warn",
+            "secondary_output_dir": None
+        },
+        "armed": False,
+        "dropouts": None,
+        "disk": None,
+        "capabilities": {
+            "devices": [
+                {"id": device, "name": f"Simulated Input {device}", "channels": 2,
+                 "default_samplerate": 48000, "is_current": device == 0}
+                for device in range(4)
+            ],
+            "supported_samplerates": [8000, 16000, 22050, 44100, 48000, 96000, 192000],
+            "supported_channels": [1, 2],
+            "supported_dtypes": ["int16", "int32", "float32"],
+            "max_recording_duration": 3600
+        },
+        "sent_at": sent_at,
+    }
+
+
+class SimulatedRecorder:
+    """A recorder that registers, reports status periodically and answers commands."""
+
+    def __init__(self, url: str, index: int):
+        self.url = url
+        self.index = index
+        self.client_id = f"load-recorder-{index:04d}"
+        self.commands: Dict[int, float] = {}  # load_id -> when it arrived
+        self.statuses_sent = 0
+        self.websocket = None
+        self.recording = False
+        self.version = 0
+
+    async def send_snapshot(self) -> None:
+        self.version += 1
+        await self.send(status_message(self.index, time.monotonic(), self.recording, self.version))
+
+    async def send_delta(self) -> None:
+        # Like the audio recorder, only what changed: here just the timestamp and recording flag
+        self.version += 1
+        await self.send({"type": "status_delta", "version": self.version, "base_version": self.version - 1,
+                         "changes": {"sent_at": time.monotonic(), "recording": self.recording}, "removed": []})
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        await self.websocket.send(json.dumps({"client_id": self.client_id, **message}))
+
+    async def connect(self) -> None:
+        self.websocket = await websockets.connect(f"{self.url}/ws/recorder", max_size=None)
+        await self.send({"type": "register"})
+        await self.send_snapshot()
+        await self.send({"type": "devices_list", "devices": [
+            {"id": device, "name": f"Simulated Input {device}", "channels": 2, "samplerate": 48000}
+            for device in range(4)
+        ]})
+
+    async def receive(self) -> None:
+        async for raw in self.websocket:
+            received = time.monotonic()
+            if isinstance(raw, bytes):
+                continue
+            message = json.loads(raw)
+            if message.get("type") != "command":
+                continue
+            payload = message.get("payload") or {}
+            if "load_id" in payload:
+                self.commands[payload["load_id"]] = received
+            command = message.get("command")
+            if "command_id" in message:
+                await self.send({"type": "ack", "command_id": message["command_id"], "command": command,
+                                 "ok": True, "error": None, "received_at": time.time(), "completed_at": time.time()})
+            if command == "get_status":
+                await self.send_snapshot()
+            elif command == "start_recording":
+                self.recording = True
+                await self.send({"type": "event", "event": "recording_started",
+                                 "filename": f"{self.client_id}.wav", "timestamp": datetime.now().isoformat()})
+            elif command == "stop_recording":
+                self.recording = False
+
+    async def report_status(self, interval: float, stop: asyncio.Event) -> None:
+        # Spread the recorders over the interval, as independent machines would be
+        await asyncio.sleep(random.uniform(0, interval))
+        while not stop.is_set():
+            await self.send_delta()
+            self.statuses_sent += 1
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self) -> None:
+        if self.websocket:
+            await self.websocket.close()
+
+
+class SimulatedUI:
+    """A browser that records when forwarded recorder messages arrive."""
+
+    def __init__(self, url: str, index: int):
+        self.url = url
+        self.index = index
+        self.websocket = None
+        self.connected: Set[str] = set()
+        self.latencies: List[float] = []
+        self.statuses_received = 0
+
+    async def connect(self) -> None:
+        self.websocket = await websockets.connect(f"{self.url}/ws", max_size=None)
+
+    async def receive(self) -> None:
+        async for raw in self.websocket:
+            received = time.monotonic()
+            if isinstance(raw, bytes):
+                continue
+            message = json.loads(raw)
+            kind = message.get("type")
+            if kind == "initial_state":
+                self.connected.update(message.get("recorders", {}))
+            elif kind == "recorder_connected":
+                self.connected.add(message["client_id"])
+            elif kind == "recorder_disconnected":
+                self.connected.discard(message["client_id"])
+            elif kind in ("recorder_status", "recorder_status_delta"):
+                sent_at = message.get("status" if kind == "recorder_status" else "changes", {}).get("sent_at")
+                if sent_at is not None:
+                    self.latencies.append(received - sent_at)
+                    # A coalesced update stands for every recorder status since the previous one
+                    base_version = message.get("base_version")
+                    self.statuses_received += message["version"] - base_version if base_version else 1
+
+    async def command(self, command: str, load_id: int) -> None:
+        await self.websocket.send(json.dumps({
+            "type": "command", "client_id": "all", "command": command, "payload": {"load_id": load_id}
+        }))
+
+    def reset(self) -> None:
+        self.latencies = []
+        self.statuses_received = 0
+
+    async def close(self) -> None:
+        if self.websocket:
+            await self.websocket.close()
+
+
+class Hub:
+    """``ws_ui_server`` in a subprocess, working in a scratch directory."""
+
+    def __init__(self, workdir: Path):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        self.url = f"ws://127.0.0.1:{self.port}"
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "ws_ui_server:app", "--app-dir", str(UI_DIR),
+             "--host", "127.0.0.1", "--port", str(self.port), "--log-level", "warning"],
+            cwd=workdir, env={**os.environ, "PYTHONUNBUFFERED": "1"},
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        self.stats = psutil.Process(self.process.pid)
+
+    async def wait_ready(self, timeout: float = 30.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("Hub exited during startup")
+            try:
+                await asyncio.to_thread(urllib.request.urlopen, f"http://127.0.0.1:{self.port}/api/connections", None, 1)
+                return
+            except OSError:
+                await asyncio.sleep(0.2)
+        raise RuntimeError("Hub did not start")
+
+    def rss_mb(self) -> float:
+        return self.stats.memory_info().rss / 1024 / 1024
+
+    def stop(self) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+async def run_step(recorders: List[SimulatedRecorder], uis: List[SimulatedUI], hub: Optional[Hub],
+                   args: argparse.Namespace, load_ids: "itertools.count") -> Dict[str, Any]:
+    """Run the connected clients for ``args.seconds`` and measure the hub."""
+    for ui in uis:
+        ui.reset()
+    for recorder in recorders:
+        recorder.commands.clear()
+        recorder.statuses_sent = 0
+
+    stop = asyncio.Event()
+    reporters = [asyncio.create_task(recorder.report_status(args.status_interval, stop)) for recorder in recorders]
+    sent_commands: Dict[int, float] = {}
+
+    async def send_commands() -> None:
+        while not stop.is_set():
+            load_id = next(load_ids)
+            sent_commands[load_id] = time.monotonic()
+            await uis[0].command("get_status", load_id)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=args.command_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    commander = asyncio.create_task(send_commands())
+    if hub:
+        hub.stats.cpu_percent()
+    await asyncio.sleep(args.seconds)
+    stop.set()
+    await asyncio.gather(commander, *reporters)
+    # Let in-flight messages land before counting them
+    await asyncio.sleep(args.drain)
+    hub_cpu = hub.stats.cpu_percent() if hub else None
+
+    fan_out = []
+    command_receipts = 0
+    for load_id, sent_at in sent_commands.items():
+        arrivals = [recorder.commands[load_id] for recorder in recorders if load_id in recorder.commands]
+        command_receipts += len(arrivals)
+        if len(arrivals) == len(recorders):
+            fan_out.append(max(arrivals) - sent_at)
+
+    broadcast = [latency for ui in uis for latency in ui.latencies]
+    # Each get_status command a recorder received was answered with a status too
+    statuses_sent = sum(recorder.statuses_sent for recorder in recorders) + command_receipts
+    statuses_expected = statuses_sent * len(uis)
+    delivered = sum(ui.statuses_received for ui in uis) / statuses_expected if statuses_expected else None
+
+    latency = percentiles_ms(broadcast)
+    connections = len(recorders) + len(uis)
+    rss = hub.rss_mb() if hub else None
+    return {
+        "recorders": len(recorders),
+        "uis": len(uis),
+        "statuses_sent": statuses_sent,
+        "status_rate_per_second": statuses_sent / args.seconds,
+        "broadcast_latency_ms": latency,
+        "broadcast_delivered": delivered,
+        "commands_sent": len(sent_commands),
+        "command_fan_out_ms": percentiles_ms(fan_out),
+        "commands_delivered": command_receipts / (len(sent_commands) * len(recorders)) if sent_commands else None,
+        "hub_rss_mb": rss,
+        "hub_cpu_percent": hub_cpu,
+        "connections": connections,
+        "saturated": (latency["p99"] is None or latency["p99"] > args.latency_budget
+                      or delivered is None or delivered < args.min_delivery),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    hub = None
+    url = args.url
+    workdir = tempfile.TemporaryDirectory()
+    if not url:
+        hub = Hub(Path(workdir.name))
+        url = hub.url
+    recorders: List[SimulatedRecorder] = []
+    uis: List[SimulatedUI] = []
+    receivers: List[asyncio.Task] = []
+    steps = []
+    try:
+        if hub:
+            await hub.wait_ready()
+            # Let the hub settle before taking the baseline
+            await asyncio.sleep(1.0)
+        baseline_rss = hub.rss_mb() if hub else None
+
+        for index in range(args.uis):
+            ui = SimulatedUI(url, index)
+            await ui.connect()
+            uis.append(ui)
+            receivers.append(asyncio.create_task(ui.receive()))
+
+        load_ids = itertools.count()
+        for target in sorted(args.recorders):
+            added = [SimulatedRecorder(url, index) for index in range(len(recorders), target)]
+            limit = asyncio.Semaphore(args.connect_concurrency)
+
+            async def connect(recorder: SimulatedRecorder) -> None:
+                async with limit:
+                    await recorder.connect()
+
+            await asyncio.gather(*(connect(recorder) for recorder in added))
+            recorders.extend(added)
+            receivers.extend(asyncio.create_task(recorder.receive()) for recorder in added)
+            expected = {recorder.client_id for recorder in recorders}
+            deadline = time.monotonic() + args.settle
+            while time.monotonic() < deadline and not all(expected <= ui.connected for ui in uis):
+                await asyncio.sleep(0.1)
+
+            step = await run_step(recorders, uis, hub, args, load_ids)
+            if hub:
+                step["rss_mb_per_connection"] = (step["hub_rss_mb"] - baseline_rss) / step["connections"]
+            steps.append(step)
+            latency = step["broadcast_latency_ms"]
+            fan_out = step["command_fan_out_ms"]
+            print(f"{step['recorders']:>5} recorders {step['uis']:>3} UIs  "
+                  f"{step['status_rate_per_second']:7.0f} status/s  "
+                  f"broadcast p50 {latency['p50'] or 0:7.1f} ms p99 {latency['p99'] or 0:7.1f} ms  "
+                  f"delivered {100 * (step['broadcast_delivered'] or 0):5.1f}%  "
+                  f"fan-out p99 {fan_out['p99'] or 0:7.1f} ms  "
+                  + (f"RSS {step['hub_rss_mb']:6.1f} MB ({1024 * step['rss_mb_per_connection']:5.1f} KB/conn)  "
+                     f"CPU {step['hub_cpu_percent']:5.1f}%" if hub else "")
+                  + ("  SATURATED" if step["saturated"] else ""))
+            if step["saturated"] and args.stop_at_saturation:
+                break
+    finally:
+        for client in recorders + uis:
+            try:
+                await client.close()
+            except Exception:
+                pass
+        for task in receivers:
+            task.cancel()
+        await asyncio.gather(*receivers, return_exceptions=True)
+        if hub:
+            hub.stop()
+        workdir.cleanup()
+
+    saturated = [step["recorders"] for step in steps if step["saturated"]]
+    return {
+        "baseline_rss_mb": baseline_rss,
+        "status_interval": args.status_interval,
+        "command_interval": args.command_interval,
+        "latency_budget_ms": args.latency_budget,
+        "saturation_recorders": saturated[0] if saturated else None,
+        "steps": steps,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the WebSocket hub with simulated recorders and UIs")
+    parser.add_argument("--url", help="Hub to test, e.g. ws://localhost:8080 (default: start one locally)")
+    parser.add_argument("--recorders", type=int, nargs="+", default=[10, 25, 50, 100, 200],
+                        help="Recorder counts to ramp through")
+    parser.add_argument("--uis", type=int, default=5, help="Simulated UI clients")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Measured seconds per step")
+    parser.add_argument("--status-interval", type=float, default=1.0, help="Seconds between a recorder's statuses")
+    parser.add_argument("--command-interval", type=float, default=1.0, help="Seconds between fan-out commands")
+    parser.add_argument("--latency-budget", type=float, default=250.0, help="Broadcast p99 (ms) above which a step is saturated")
+    parser.add_argument("--min-delivery", type=float, default=0.99, help="Delivered share below which a step is saturated")
+    parser.add_argument("--connect-concurrency", type=int, default=50, help="Connections opened at once")
+    parser.add_argument("--settle", type=float, default=10.0, help="Seconds to wait for new recorders to register")
+    parser.add_argument("--drain", type=float, default=1.0, help="Seconds to wait for in-flight messages after a step")
+    parser.add_argument("--stop-at-saturation", action="store_true", help="Stop ramping at the first saturated step")
+    parser.add_argument("--json", type=Path, help="Write results to a JSON file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = asyncio.run(run(args))
+    print(f"Saturation point: {results['saturation_recorders'] or 'not reached'}"
+          + (" recorders" if results["saturation_recorders"] else ""))
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
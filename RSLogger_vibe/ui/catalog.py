@@ -0,0 +1,347 @@
+"""Persistent catalog of the recordings directory.
+
+Recording metadata is indexed in an SQLite database in the recordings
+directory, so listing recordings is a query rather than a directory scan
+that parses every metadata file. The catalog is reconciled with the
+directory at startup, updated for each completed recording, and kept in
+step with files added, changed or removed by other means by a polling
+watcher that only rescans when the directory changes. All database and
+file access runs on one worker thread, never on the event loop.
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable, Union
+
+logger = logging.getLogger(__name__)
+
+CATALOG_NAME = ".catalog.sqlite3"
+WATCH_INTERVAL = 2.0  # Seconds between checks of the directory for changes
+FULL_RESCAN_INTERVAL = 300.0  # Also catch metadata rewritten in place, which the directory doesn't show
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    filename TEXT PRIMARY KEY,
+    json_mtime_ns INTEGER NOT NULL,
+    wav_mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    duration REAL,
+    device TEXT,
+    client_id TEXT,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recordings_created ON recordings (created DESC, filename DESC);
+CREATE INDEX IF NOT EXISTS recordings_device ON recordings (device, created DESC);
+CREATE INDEX IF NOT EXISTS recordings_client ON recordings (client_id, created DESC);
+"""
+
+# A change listener gets the entries added or updated and the filenames removed
+ChangeListener = Callable[[List[Dict[str, Any]], List[str]], Awaitable[None]]
+
+
+def _entry(row: sqlite3.Row) -> Dict[str, Any]:
+    """Shape a row like the entries the UI has always received."""
+    return {
+        "filename": row["filename"],
+        "metadata": json.loads(row["metadata"]),
+        "size": row["size"],
+        "created": datetime.fromtimestamp(row["created"]).isoformat(),
+        "client_id": row["client_id"],
+    }
+
+
+def query_filters(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Pick and convert the ``query`` arguments from request parameters or a UI message.
+
+    Dates are ISO 8601 strings or Unix timestamps. Raises ValueError for
+    values that can't be converted.
+    """
+    filters: Dict[str, Any] = {}
+    for key, convert in (("cursor", str), ("limit", int), ("device", str), ("client_id", str),
+                         ("since", _date), ("until", _date),
+                         ("min_duration", float), ("max_duration", float)):
+        value = params.get(key)
+        if value is not None and value != "":
+            try:
+                filters[key] = convert(value)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Invalid {key}: {value!r}") from e
+    return filters
+
+
+def _date(value: Union[str, float]) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def _timestamp(value: Union[datetime, float, None]) -> Optional[float]:
+    return value.timestamp() if isinstance(value, datetime) else value
+
+
+def encode_cursor(created: float, filename: str) -> str:
+    """Opaque cursor for the page after the recording with this sort key."""
+    return base64.urlsafe_b64encode(json.dumps([created, filename]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        created, filename = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(created), str(filename)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+class RecordingsCatalog:
+    """SQLite index of the recordings in a directory."""
+
+    def __init__(self, directory: Path = Path("recordings"), db_path: Optional[Path] = None,
+                 watch_interval: float = WATCH_INTERVAL):
+        self.directory = directory
+        self.db_path = db_path or directory / CATALOG_NAME
+        self.watch_interval = watch_interval
+        # One thread owns the connection and does all the file access
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog")
+        self._db: Optional[sqlite3.Connection] = None
+        self._loaded: Optional[asyncio.Future] = None
+        self._watch_task: Optional[asyncio.Task] = None
+        self._listeners: List[ChangeListener] = []
+        self._scanned_state: Optional[Tuple[int, int]] = None
+        self._unreadable = False
+
+    def add_listener(self, listener: ChangeListener) -> None:
+        """Call ``listener`` with the changes the watcher finds."""
+        self._listeners.append(listener)
+
+    async def _run(self, func, *args):
+        return await asyncio.get_event_loop().run_in_executor(self._executor, func, *args)
+
+    async def start(self) -> None:
+        """Reconcile the catalog with the directory and start watching it."""
+        await self._ensure_loaded()
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch_loop())
+
+    async def stop(self) -> None:
+        """Stop watching and close the database."""
+        if self._watch_task:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
+        await self._run(self._close)
+        self._executor.shutdown(wait=False)
+
+    async def _ensure_loaded(self) -> None:
+        # Queries before start() still get a reconciled catalog, loaded once
+        if self._loaded is None:
+            self._loaded = asyncio.ensure_future(self._run(self.reconcile))
+        await asyncio.shield(self._loaded)
+
+    async def list(self) -> List[Dict[str, Any]]:
+        """Get all recordings, newest first."""
+        await self._ensure_loaded()
+        return await self._run(self._list)
+
+    async def query(self, cursor: Optional[str] = None, limit: int = PAGE_SIZE, device: Optional[str] = None,
+                    client_id: Optional[str] = None, since: Union[datetime, float, None] = None,
+                    until: Union[datetime, float, None] = None, min_duration: Optional[float] = None,
+                    max_duration: Optional[float] = None) -> Dict[str, Any]:
+        """Get one page of recordings, newest first.
+
+        ``since`` and ``until`` bound the creation time, ``min_duration`` and
+        ``max_duration`` the duration in seconds. Returns the entries and
+        ``next_cursor``, to be passed back for the following page, or None
+        on the last page. Raises ValueError for an invalid cursor.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        filters = {"device": device, "client_id": client_id, "since": _timestamp(since),
+                   "until": _timestamp(until), "min_duration": min_duration, "max_duration": max_duration}
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        await self._ensure_loaded()
+        return await self._run(self._query, filters, after, limit)
+
+    async def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Get one recording."""
+        await self._ensure_loaded()
+        return await self._run(self._get, filename)
+
+    async def refresh(self, filename: str, client_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Index or re-index one recording, e.g. when a recorder reports it complete.
+
+        Returns the entry, or None if the recording or its metadata is
+        missing, in which case it is removed from the catalog.
+        """
+        await self._ensure_loaded()
+        return await self._run(self._refresh, filename, client_id)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            # Only ever used by one thread at a time: the worker, or a caller of reconcile()
+            self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def _close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _list(self) -> List[Dict[str, Any]]:
+        rows = self._connect().execute("SELECT * FROM recordings ORDER BY created DESC, filename DESC")
+        return [_entry(row) for row in rows]
+
+    def _query(self, filters: Dict[str, Any], after: Optional[Tuple[float, str]], limit: int) -> Dict[str, Any]:
+        clauses, params = [], []
+        for column, op, key in (("device", "=", "device"), ("client_id", "=", "client_id"),
+                                ("created", ">=", "since"), ("created", "<", "until"),
+                                ("duration", ">=", "min_duration"), ("duration", "<=", "max_duration")):
+            if filters[key] is not None:
+                clauses.append(f"{column} {op} ?")
+                params.append(filters[key])
+        if after:
+            # Keyset pagination: stable while recordings are added, and no OFFSET scan
+            clauses.append("(created < ? OR (created = ? AND filename < ?))")
+            params.extend([after[0], after[0], after[1]])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"SELECT * FROM recordings {where} ORDER BY created DESC, filename DESC LIMIT ?",
+            (*params, limit + 1)).fetchall()
+        # The cursor keeps the stored key; the ISO date in the entries is rounded
+        last = rows[limit - 1] if len(rows) > limit else None
+        return {"recordings": [_entry(row) for row in rows[:limit]],
+                "next_cursor": encode_cursor(last["created"], last["filename"]) if last else None}
+
+    def _get(self, filename: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT * FROM recordings WHERE filename = ?", (filename,)).fetchone()
+        return _entry(row) if row else None
+
+    def _upsert(self, wav_name: str, json_stat: os.stat_result, wav_stat: os.stat_result,
+                client_id: Optional[str] = None) -> bool:
+        """Parse one recording's metadata into the catalog; False if it can't be read yet."""
+        json_path = (self.directory / wav_name).with_suffix('.json')
+        try:
+            metadata = json.loads(json_path.read_text())
+        except (OSError, ValueError) as e:
+            # Possibly still being written; the next pass retries
+            logger.warning(f"Cannot index {json_path.name}: {e}")
+            return False
+        device = metadata.get("device") if isinstance(metadata, dict) else None
+        db = self._connect()
+        db.execute(
+            "INSERT INTO recordings (filename, json_mtime_ns, wav_mtime_ns, size, created, duration, device,"
+            " client_id, metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (filename) DO UPDATE SET json_mtime_ns = excluded.json_mtime_ns,"
+            " wav_mtime_ns = excluded.wav_mtime_ns, size = excluded.size, created = excluded.created,"
+            " duration = excluded.duration, device = excluded.device,"
+            " client_id = COALESCE(excluded.client_id, recordings.client_id), metadata = excluded.metadata",
+            (wav_name, json_stat.st_mtime_ns, wav_stat.st_mtime_ns, wav_stat.st_size, wav_stat.st_ctime,
+             metadata.get("duration_seconds") if isinstance(metadata, dict) else None,
+             device.get("name") if isinstance(device, dict) else None,
+             client_id, json.dumps(metadata))
+        )
+        return True
+
+    def _refresh(self, filename: str, client_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        db = self._connect()
+        wav_path = self.directory / filename
+        try:
+            wav_stat = wav_path.stat()
+            json_stat = wav_path.with_suffix('.json').stat()
+        except OSError:
+            with db:
+                db.execute("DELETE FROM recordings WHERE filename = ?", (filename,))
+            return None
+        with db:
+            self._upsert(filename, json_stat, wav_stat, client_id)
+        return self._get(filename)
+
+    def reconcile(self) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Bring the catalog in line with the directory (blocking).
+
+        Only recordings whose files changed since they were indexed are
+        parsed again. Returns the entries added or updated and the
+        filenames removed.
+        """
+        db = self._connect()
+        # Taken before scanning, so changes made during the scan are seen by the next one
+        self._scanned_state = self._directory_state()
+        known = {row["filename"]: (row["json_mtime_ns"], row["wav_mtime_ns"], row["size"])
+                 for row in db.execute("SELECT filename, json_mtime_ns, wav_mtime_ns, size FROM recordings")}
+        seen = set()
+        changed = []
+        unreadable = False
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            entries = []
+        with db:
+            for entry in entries:
+                if not entry.name.endswith('.json') or entry.name.startswith('.'):
+                    continue
+                wav_name = entry.name[:-len('.json')] + '.wav'
+                try:
+                    wav_stat = os.stat(self.directory / wav_name)
+                    json_stat = entry.stat()
+                except OSError:
+                    continue  # Segment indexes and other metadata without audio
+                seen.add(wav_name)
+                if known.get(wav_name) == (json_stat.st_mtime_ns, wav_stat.st_mtime_ns, wav_stat.st_size):
+                    continue
+                if self._upsert(wav_name, json_stat, wav_stat):
+                    changed.append(wav_name)
+                else:
+                    unreadable = True
+            removed = [name for name in known if name not in seen]
+            db.executemany("DELETE FROM recordings WHERE filename = ?", [(name,) for name in removed])
+        self._unreadable = unreadable
+        if changed or removed:
+            logger.info(f"Recordings catalog: {len(changed)} indexed, {len(removed)} removed")
+        return [self._get(name) for name in changed], removed
+
+    def _directory_state(self) -> Optional[Tuple[int, int]]:
+        # The entry count catches files created within the same mtime tick as the last scan
+        try:
+            return os.stat(self.directory).st_mtime_ns, len(os.listdir(self.directory))
+        except OSError:
+            return None
+
+    async def _watch_loop(self) -> None:
+        """Rescan when files are added to or removed from the directory, and now and then regardless.
+
+        Metadata that could not be read, e.g. because it was still being
+        written, is retried on every pass until it can.
+        """
+        loop = asyncio.get_event_loop()
+        last_full = loop.time()
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            try:
+                state = await self._run(self._directory_state)
+                if (state == self._scanned_state and not self._unreadable
+                        and loop.time() - last_full < FULL_RESCAN_INTERVAL):
+                    continue
+                last_full = loop.time()
+                changed, removed = await self._run(self.reconcile)
+            except Exception as e:
+                logger.error(f"Error updating recordings catalog: {e}")
+                continue
+            if changed or removed:
+                for listener in self._listeners:
+                    try:
+                        await listener(changed, removed)
+                    except Exception as e:
+                        logger.error(f"Error in catalog listener: {e}")
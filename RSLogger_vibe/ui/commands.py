@@ -0,0 +1,133 @@
+"""Correlation of hub-to-recorder commands with the recorders' acknowledgements.
+
+A command sent with a ``command_id`` is acknowledged by each recorder with
+an ``ack`` message carrying the same ID once it has taken effect, or failed
+to. A ``FanOut`` tracks one command sent to a set of recorders until every
+one has answered or its deadline passes, and summarizes which recorders
+acknowledged it, how quickly, and which did not answer in time.
+
+A command that takes effect later, like a scheduled start, is acknowledged
+again when it does, with an ack naming its ``stage``; each stage is tracked
+by a fan-out of its own.
+"""
+
+import asyncio
+import time
+import uuid
+from typing import Optional, Dict, Any, Iterable, Tuple
+
+import numpy as np
+
+COMMAND_TIMEOUT = 5.0  # Default seconds to wait for acknowledgements
+MAX_COMMAND_TIMEOUT = 60.0
+
+
+def new_command_id() -> str:
+    return uuid.uuid4().hex
+
+
+class FanOut:
+    """One command sent to a set of recorders, waiting for their acknowledgements."""
+
+    def __init__(self, command: str, client_ids: Iterable[str], timeout: float = COMMAND_TIMEOUT,
+                 command_id: Optional[str] = None, stage: Optional[str] = None):
+        self.command_id = command_id or new_command_id()
+        self.command = command
+        self.stage = stage
+        self.timeout = min(max(timeout, 0.0), MAX_COMMAND_TIMEOUT)
+        self.client_ids = list(client_ids)
+        self.sent_at = time.monotonic()
+        self.sent_wall = time.time()
+        self.acks: Dict[str, Dict[str, Any]] = {}
+        self.unreachable: Dict[str, str] = {}
+        self._done = asyncio.Event()
+        if not self.client_ids:
+            self._done.set()
+
+    def ack(self, client_id: str, message: Dict[str, Any]) -> None:
+        """Record a recorder's acknowledgement; later duplicates are ignored."""
+        if client_id not in self.client_ids or client_id in self.acks or client_id in self.unreachable:
+            return
+        latency = time.monotonic() - self.sent_at
+        self.acks[client_id] = {
+            "ok": bool(message.get("ok", True)),
+            "error": message.get("error"),
+            "result": message.get("result"),
+            "latency": latency,
+            "latency_ms": round(latency * 1000, 3),
+            # The recorder's clock when it got the command and when it answered
+            "received_at": message.get("received_at"),
+            "completed_at": message.get("completed_at"),
+        }
+        self._check_done()
+
+    def fail(self, client_id: str, reason: str) -> None:
+        """Give up on a recorder that can't answer, e.g. because it disconnected."""
+        if client_id in self.client_ids and client_id not in self.acks:
+            self.unreachable[client_id] = reason
+            self._check_done()
+
+    def _check_done(self) -> None:
+        if len(self.acks) + len(self.unreachable) >= len(self.client_ids):
+            self._done.set()
+
+    async def wait(self) -> Dict[str, Any]:
+        """Wait for every acknowledgement or the deadline, then summarize."""
+        remaining = self.timeout - (time.monotonic() - self.sent_at)
+        try:
+            await asyncio.wait_for(self._done.wait(), max(remaining, 0.0))
+        except asyncio.TimeoutError:
+            pass
+        return self.result()
+
+    def result(self) -> Dict[str, Any]:
+        """Which recorders acknowledged, failed or timed out, and how quickly they answered."""
+        latencies = np.array([ack["latency_ms"] for ack in self.acks.values()])
+        answered = set(self.acks) | set(self.unreachable)
+        return {
+            "command_id": self.command_id,
+            "command": self.command,
+            "sent_at": self.sent_wall,
+            "timeout": self.timeout,
+            "recorders": len(self.client_ids),
+            "acked": sorted(client_id for client_id, ack in self.acks.items() if ack["ok"]),
+            "failed": {client_id: ack["error"] for client_id, ack in self.acks.items() if not ack["ok"]},
+            "unreachable": dict(self.unreachable),
+            "timed_out": sorted(client_id for client_id in self.client_ids if client_id not in answered),
+            "results": {client_id: ack["result"] for client_id, ack in self.acks.items() if ack["result"]},
+            "latency_ms": {
+                "p50": float(np.percentile(latencies, 50)) if len(latencies) else None,
+                "p90": float(np.percentile(latencies, 90)) if len(latencies) else None,
+                "max": float(latencies.max()) if len(latencies) else None,
+                "by_recorder": {client_id: ack["latency_ms"] for client_id, ack in self.acks.items()},
+            },
+        }
+
+
+class CommandTracker:
+    """The fan-outs awaiting acknowledgements, by command ID."""
+
+    def __init__(self):
+        self.pending: Dict[Tuple[str, Optional[str]], FanOut] = {}
+
+    def start(self, command: str, client_ids: Iterable[str], timeout: float = COMMAND_TIMEOUT,
+              command_id: Optional[str] = None, stage: Optional[str] = None) -> FanOut:
+        """Track a command, or with ``command_id`` and ``stage`` a later stage of one."""
+        fan_out = FanOut(command, client_ids, timeout, command_id, stage)
+        self.pending[fan_out.command_id, stage] = fan_out
+        return fan_out
+
+    async def wait(self, fan_out: FanOut) -> Dict[str, Any]:
+        try:
+            return await fan_out.wait()
+        finally:
+            self.pending.pop((fan_out.command_id, fan_out.stage), None)
+
+    def ack(self, client_id: str, message: Dict[str, Any]) -> None:
+        fan_out = self.pending.get((message.get("command_id"), message.get("stage")))
+        if fan_out:
+            fan_out.ack(client_id, message)
+
+    def recorder_gone(self, client_id: str) -> None:
+        for fan_out in list(self.pending.values()):
+            fan_out.fail(client_id, "disconnected")
@@ -0,0 +1,97 @@
+"""Recorder fleet state over MQTT, from retained status and last wills.
+
+This is the hub's side of the protocol. Each recorder is expected to
+publish its status retained on ``rslogger/audio/<id>/status`` and
+``online`` retained on ``rslogger/audio/<id>/online``, after registering a
+last will that sets the latter to ``offline`` (also retained) should it drop
+off without saying so. The broker therefore always holds every
+recorder's last status and whether it is alive, and hands all of it to a hub
+as soon as the hub subscribes. A hub that starts or restarts rebuilds the
+whole fleet from that one burst of retained messages instead of sending
+``get_status`` to recorders it doesn't know about yet.
+
+Status changes, including that initial burst, are collected for a tick and
+sent to each UI client as one batch.
+"""
+
+from typing import Optional, Dict, Any, List, Set, Tuple
+
+TOPIC_PREFIX = "rslogger/audio"
+ONLINE = "online"
+OFFLINE = "offline"
+
+# Topics the hub subscribes to, by message kind. Liveness comes first, so a
+# recorder's retained ``offline`` is known before its last status arrives
+HUB_TOPICS = ("online", "status", "response", "data", "stats")
+
+
+def topic(client_id: str, kind: str) -> str:
+    return f"{TOPIC_PREFIX}/{client_id}/{kind}"
+
+
+def parse_topic(name: str) -> Optional[Tuple[str, str]]:
+    """Split a recorder topic into its client_id and kind, or None if it isn't one."""
+    prefix = TOPIC_PREFIX + "/"
+    if not name.startswith(prefix):
+        return None
+    parts = name[len(prefix):].split("/")
+    if len(parts) != 2 or not all(parts):
+        return None
+    return parts[0], parts[1]
+
+
+class FleetState:
+    """Every recorder's last status and liveness, and whose status changed since the last batch."""
+
+    def __init__(self):
+        self.statuses: Dict[str, Dict[str, Any]] = {}
+        # Recorders that publish no liveness are taken to be online while they have a status
+        self.offline: Set[str] = set()
+        self.pending: Dict[str, None] = {}  # Changed since the last batch, in order of arrival
+
+    def recorders(self) -> Dict[str, Dict[str, Any]]:
+        """The status of every recorder that is online."""
+        return {client_id: status for client_id, status in self.statuses.items()
+                if client_id not in self.offline}
+
+    def is_online(self, client_id: str) -> bool:
+        return client_id in self.statuses and client_id not in self.offline
+
+    def set_status(self, client_id: str, status: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Apply a status message; None clears it. Returns the UI events to send right away."""
+        was_online = self.is_online(client_id)
+        if status is None:
+            # An empty retained message removes a decommissioned recorder from the broker
+            self.statuses.pop(client_id, None)
+            self.offline.discard(client_id)
+            self.pending.pop(client_id, None)
+        else:
+            self.statuses[client_id] = status
+            self.pending[client_id] = None
+        return self._liveness_events(client_id, was_online)
+
+    def set_liveness(self, client_id: str, value: str) -> List[Dict[str, Any]]:
+        """Apply an ``online`` message. Returns the UI events to send right away."""
+        if not value:
+            # Cleared from the broker like its status, so the recorder is forgotten
+            return self.set_status(client_id, None)
+        was_online = self.is_online(client_id)
+        if value == OFFLINE:
+            self.offline.add(client_id)
+        elif value == ONLINE:
+            self.offline.discard(client_id)
+            if client_id in self.statuses and not was_online:
+                # Clients dropped it when it went offline
+                self.pending[client_id] = None
+        return self._liveness_events(client_id, was_online)
+
+    def take_batch(self) -> Dict[str, Dict[str, Any]]:
+        """Get the status of every online recorder that changed since the last call."""
+        pending, self.pending = self.pending, {}
+        return {client_id: self.statuses[client_id] for client_id in pending if self.is_online(client_id)}
+
+    def _liveness_events(self, client_id: str, was_online: bool) -> List[Dict[str, Any]]:
+        # A recorder coming online is announced by its status in the next batch
+        if was_online and not self.is_online(client_id):
+            return [{"type": "recorder_disconnected", "client_id": client_id}]
+        return []
@@ -4,17 +4,36 @@ import asyncio
 import json
 import logging
 from pathlib import Path
-from datetime import datetime
 from typing import Dict, List, Optional, Any
 import argparse
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from asyncio_mqtt import Client as MQTTClient
 import uvicorn
 
+try:
+    from .peaks import read_peaks, find_peaks
+    from .spectrogram import SpectrogramService
+    from .reader import Recording
+    from .catalog import RecordingsCatalog, query_filters
+    from .outbox import Outbox, OverflowPolicy
+    from .subscriptions import SubscriptionIndex
+    from .status import STATUS_TICK
+    from .fleet import FleetState, HUB_TOPICS, ONLINE, topic, parse_topic
+except ImportError:
+    # Run as a script from the ui directory
+    from peaks import read_peaks, find_peaks
+    from spectrogram import SpectrogramService
+    from reader import Recording
+    from catalog import RecordingsCatalog, query_filters
+    from outbox import Outbox, OverflowPolicy
+    from subscriptions import SubscriptionIndex
+    from status import STATUS_TICK
+    from fleet import FleetState, HUB_TOPICS, ONLINE, topic, parse_topic
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -35,14 +54,25 @@ app.add_middleware(
 class MQTTUIManager:
     """Manages MQTT communication and WebSocket connections."""
     
-    def __init__(self, broker: str = "localhost", port: int = 1883):
+    def __init__(self, broker: str = "localhost", port: int = 1883, status_tick: float = STATUS_TICK):
         self.broker = broker
         self.port = port
         self.mqtt_client: Optional[MQTTClient] = None
-        self.active_connections: List[WebSocket] = []
-        self.recorder_status: Dict[str, Any] = {}
-        self.recordings: List[Dict[str, Any]] = []
+        self.active_connections: Dict[WebSocket, Outbox] = {}
+        self.fleet = FleetState()
+        self.recorder_stats: Dict[str, Any] = {}
+        self.subscriptions = SubscriptionIndex()
+        self.catalog = RecordingsCatalog(Path("recordings"))
+        self.catalog.add_listener(self.update_recordings)
         self.mqtt_task: Optional[asyncio.Task] = None
+        # Status changes are sent to UI clients in one batch per tick
+        self.status_tick = status_tick
+        self._status_flush: Optional[asyncio.Task] = None
+        
+    @property
+    def recorder_status(self) -> Dict[str, Any]:
+        """The last status of every recorder that is online."""
+        return self.fleet.recorders()
         
     async def start_mqtt(self):
         """Start MQTT client and subscribe to topics."""
@@ -51,16 +81,13 @@ class MQTTUIManager:
             await self.mqtt_client.connect()
             logger.info(f"Connected to MQTT broker at {self.broker}:{self.port}")
             
-            # Subscribe to all recorder topics
-            await self.mqtt_client.subscribe("rslogger/audio/+/status")
-            await self.mqtt_client.subscribe("rslogger/audio/+/response")
-            await self.mqtt_client.subscribe("rslogger/audio/+/data")
-            
-            # Start listening for messages
+            # Start listening before subscribing so the retained burst is not missed
             self.mqtt_task = asyncio.create_task(self._mqtt_listener())
             
-            # Request status from all recorders
-            await self.broadcast_command("get_status")
+            # The broker answers the status and online subscriptions with every
+            # recorder's retained messages, so no get_status needs to be sent
+            for kind in HUB_TOPICS:
+                await self.mqtt_client.subscribe(topic("+", kind), qos=1)
             
         except Exception as e:
             logger.error(f"Failed to connect to MQTT broker: {e}")
@@ -70,37 +97,78 @@ class MQTTUIManager:
         async with self.mqtt_client.messages() as messages:
             async for message in messages:
                 try:
-                    topic = str(message.topic)
-                    payload = json.loads(message.payload.decode())
-                    
-                    # Extract client_id from topic
-                    parts = topic.split('/')
-                    if len(parts) >= 4:
-                        client_id = parts[2]
-                        message_type = parts[3]
-                        
-                        if message_type == "status":
-                            await self.handle_status(client_id, payload)
-                        elif message_type == "response":
-                            await self.handle_response(client_id, payload)
-                        elif message_type == "data":
-                            await self.handle_data(client_id, payload)
-                            
+                    await self.handle_mqtt_message(str(message.topic), message.payload)
                 except Exception as e:
                     logger.error(f"Error processing MQTT message: {e}", exc_info=True)
                     
-    async def handle_status(self, client_id: str, status: Dict[str, Any]):
-        """Handle recorder status updates."""
-        self.recorder_status[client_id] = status
-        await self.broadcast_to_websockets({
-            "type": "recorder_status",
+    async def handle_mqtt_message(self, name: str, payload: bytes):
+        """Dispatch a message from a recorder topic by its kind."""
+        parsed = parse_topic(name)
+        if parsed is None:
+            return
+        client_id, message_type = parsed
+        
+        if message_type == "status":
+            # An empty retained status clears a recorder from the broker
+            await self.handle_status(client_id, json.loads(payload.decode()) if payload else None)
+        elif message_type == "online":
+            await self.handle_online(client_id, payload.decode())
+        elif message_type == "response":
+            await self.handle_response(client_id, json.loads(payload.decode()))
+        elif message_type == "data":
+            await self.handle_data(client_id, json.loads(payload.decode()))
+        elif message_type == "stats":
+            await self.handle_stats(client_id, json.loads(payload.decode()))
+            
+    async def handle_status(self, client_id: str, status: Optional[Dict[str, Any]]):
+        """Handle recorder status updates, retained or live."""
+        for event in self.fleet.set_status(client_id, status):
+            await self.publish_to_websockets(client_id, event)
+        await self.status_changed()
+        
+    async def handle_online(self, client_id: str, value: str):
+        """Handle a recorder announcing itself, or its last will saying it is gone."""
+        for event in self.fleet.set_liveness(client_id, value):
+            await self.publish_to_websockets(client_id, event)
+        if value == ONLINE:
+            await self.status_changed()
+            
+    async def status_changed(self):
+        """Send status changes with the others arriving within the tick."""
+        if self.status_tick <= 0:
+            await self.flush_statuses()
+        elif self._status_flush is None:
+            self._status_flush = asyncio.create_task(self._flush_after_tick())
+            
+    async def _flush_after_tick(self):
+        await asyncio.sleep(self.status_tick)
+        self._status_flush = None
+        await self.flush_statuses()
+        
+    async def flush_statuses(self):
+        """Send each UI client one batch with the changed status of the recorders it watches."""
+        batch = self.fleet.take_batch()
+        if not batch:
+            return
+        for websocket in list(self.active_connections):
+            recorders = {client_id: status for client_id, status in batch.items()
+                         if websocket in self.subscriptions.subscribers(client_id, "recorder_status")}
+            if recorders:
+                self.send_to_websocket(websocket, {"type": "recorder_status_batch", "recorders": recorders})
+                
+
+    async def handle_stats(self, client_id: str, stats: Dict[str, Any]):
+        """Handle periodic system stats samples from recorders."""
+        self.recorder_stats[client_id] = stats
+        await self.publish_to_websockets(client_id, {
+            "type": "recorder_system_stats",
             "client_id": client_id,
-            "status": status
+            "stats": stats
         })
         
     async def handle_response(self, client_id: str, response: Dict[str, Any]):
         """Handle command responses."""
-        await self.broadcast_to_websockets({
+        await self.publish_to_websockets(client_id, {
             "type": "command_response",
             "client_id": client_id,
             "response": response
@@ -111,16 +179,15 @@ class MQTTUIManager:
         event = data.get("event")
         
         if event == "recording_started":
-            await self.broadcast_to_websockets({
+            await self.publish_to_websockets(client_id, {
                 "type": "recording_started",
                 "client_id": client_id,
                 "timestamp": data.get("timestamp")
             })
             
         elif event == "recording_completed":
-            # Update recordings list
-            await self.update_recordings()
-            await self.broadcast_to_websockets({
+            await self.recording_completed(client_id, data.get("filename"))
+            await self.publish_to_websockets(client_id, {
                 "type": "recording_completed",
                 "client_id": client_id,
                 "filename": data.get("filename"),
@@ -128,7 +195,7 @@ class MQTTUIManager:
             })
             
         elif event == "recording_error":
-            await self.broadcast_to_websockets({
+            await self.publish_to_websockets(client_id, {
                 "type": "recording_error",
                 "client_id": client_id,
                 "error": data.get("error"),
@@ -144,82 +211,136 @@ class MQTTUIManager:
         if payload:
             command_data.update(payload)
             
-        topic = f"rslogger/audio/{client_id}/command"
-        await self.mqtt_client.publish(topic, json.dumps(command_data).encode())
+        await self.mqtt_client.publish(topic(client_id, "command"), json.dumps(command_data).encode())
         logger.info(f"Sent command '{command}' to {client_id}")
         
     async def broadcast_command(self, command: str, payload: Dict[str, Any] = None):
-        """Broadcast command to all recorders."""
-        for client_id in self.recorder_status.keys():
-            await self.send_command(client_id, command, payload)
+        """Broadcast command to all recorders that are online."""
+        await asyncio.gather(*(self.send_command(client_id, command, payload)
+                               for client_id in self.recorder_status))
             
     async def connect_websocket(self, websocket: WebSocket):
         """Handle new WebSocket connection."""
         await websocket.accept()
-        self.active_connections.append(websocket)
-        
-        # Send initial state
-        await websocket.send_json({
+        initial_state = {
             "type": "initial_state",
             "recorders": self.recorder_status,
-            "recordings": await self.get_recordings()
-        })
+            **await self.initial_recordings()
+        }
+        # Queue the initial state before any broadcast can reach the new client
+        # UI state is re-sent continually, so a client that falls behind loses its oldest messages
+        self.active_connections[websocket] = Outbox(
+            websocket, "UI client", policy=OverflowPolicy.DROP_OLDEST,
+            on_close=lambda outbox: self.disconnect_websocket(outbox.websocket))
+        self.subscriptions.add(websocket)
+        self.send_to_websocket(websocket, initial_state)
         
     def disconnect_websocket(self, websocket: WebSocket):
         """Handle WebSocket disconnection."""
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        self.subscriptions.remove(websocket)
+        outbox = self.active_connections.pop(websocket, None)
+        if outbox:
+            outbox.close()
             
     async def broadcast_to_websockets(self, message: Dict[str, Any]):
         """Broadcast message to all WebSocket connections."""
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception:
-                disconnected.append(connection)
+        # Serialized once; queueing never waits on a slow client
+        data = json.dumps(message)
+        for outbox in list(self.active_connections.values()):
+            outbox.send(data)
+            
+    async def publish_to_websockets(self, client_id: str, message: Dict[str, Any]):
+        """Send a recorder's message to the WebSocket connections subscribed to it."""
+        subscribers = self.subscriptions.subscribers(client_id, message["type"])
+        if not subscribers:
+            return
+        data = json.dumps(message)
+        for websocket in subscribers:
+            outbox = self.active_connections.get(websocket)
+            if outbox:
+                outbox.send(data)
+                
+    def update_subscriptions(self, websocket: WebSocket, message: Dict[str, Any]):
+        """Apply a client's subscribe or unsubscribe and send it its topics."""
+        client_ids, types = message.get("client_ids"), message.get("types")
+        watched = {client_id for client_id in self.recorder_status
+                   if websocket in self.subscriptions.subscribers(client_id, "recorder_status")}
+        if message["type"] == "subscribe":
+            self.subscriptions.subscribe(websocket, client_ids, types)
+        else:
+            self.subscriptions.unsubscribe(websocket, client_ids, types)
+        self.send_to_websocket(websocket, {
+            "type": "subscribed",
+            "topics": [{"client_id": client_id, "type": kind}
+                       for client_id, kind in self.subscriptions.topics(websocket)]
+        })
+        # Start newly watched recorders from their last known status
+        for client_id, status in self.recorder_status.items():
+            if client_id not in watched and websocket in self.subscriptions.subscribers(
+                    client_id, "recorder_status"):
+                self.send_to_websocket(websocket, {
+                    "type": "recorder_status",
+                    "client_id": client_id,
+                    "status": status
+                })
                 
-        for conn in disconnected:
-            self.disconnect_websocket(conn)
+    def send_to_websocket(self, websocket: WebSocket, message: Dict[str, Any]):
+        """Queue a message for one WebSocket connection."""
+        outbox = self.active_connections.get(websocket)
+        if outbox:
+            outbox.send(json.dumps(message))
             
-    async def get_recordings(self) -> List[Dict[str, Any]]:
-        """Get list of all recordings."""
-        recordings = []
-        recordings_dir = Path("recordings")
+    def connection_metrics(self) -> Dict[str, Any]:
+        """Send queue depth, drops and lag of every WebSocket connection."""
+        return {"ui": [outbox.metrics() for outbox in self.active_connections.values()]}
+            
+    async def get_recordings(self, **filters) -> Dict[str, Any]:
+        """Get a page of recordings, newest first, from the catalog.
+
+        Takes the catalog's ``query`` arguments: a ``cursor`` and ``limit``,
+        and device, client_id, since/until and min/max_duration filters.
+        """
+        return await self.catalog.query(**filters)
         
-        if recordings_dir.exists():
-            for json_file in recordings_dir.glob("*.json"):
-                try:
-                    with open(json_file, 'r') as f:
-                        metadata = json.load(f)
-                    wav_file = json_file.with_suffix('.wav')
-                    if wav_file.exists():
-                        recordings.append({
-                            "filename": wav_file.name,
-                            "metadata": metadata,
-                            "size": wav_file.stat().st_size,
-                            "created": datetime.fromtimestamp(wav_file.stat().st_ctime).isoformat()
-                        })
-                except Exception as e:
-                    logger.error(f"Error reading recording: {e}")
-                    
-        return sorted(recordings, key=lambda x: x['created'], reverse=True)
+    async def initial_recordings(self) -> Dict[str, Any]:
+        """The first page of recordings for a newly connected client."""
+        page = await self.get_recordings()
+        return {"recordings": page["recordings"], "recordings_cursor": page["next_cursor"]}
         
-    async def update_recordings(self):
-        """Update recordings list and notify clients."""
-        self.recordings = await self.get_recordings()
-        await self.broadcast_to_websockets({
-            "type": "recordings_updated",
-            "recordings": self.recordings
-        })
+    async def update_recordings(self, changed: List[Dict[str, Any]], removed: List[str] = ()):
+        """Push only the recordings added, changed or removed to clients."""
+        if changed or removed:
+            await self.broadcast_to_websockets({
+                "type": "recordings_changed",
+                "changed": changed,
+                "removed": list(removed)
+            })
+            
+    async def recording_completed(self, client_id: str, filename: Optional[str]):
+        """Index a recording a recorder reports complete and push it to clients."""
+        if not filename:
+            return
+        entry = await self.catalog.refresh(filename, client_id)
+        if entry:
+            await self.update_recordings([entry])
+        else:
+            await self.update_recordings([], [filename])
 
 
 # Create global manager
 manager = MQTTUIManager()
+spectrograms = SpectrogramService(Path("recordings"))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop spectrogram worker processes and the catalog."""
+    spectrograms.shutdown()
+    await manager.catalog.stop()
 
 @app.on_event("startup")
 async def startup_event():
-    """Start MQTT client on server startup."""
+    """Start the recordings catalog and the MQTT client on server startup."""
+    await manager.catalog.start()
     await manager.start_mqtt()
 
 @app.websocket("/ws")
@@ -239,26 +360,97 @@ async def websocket_endpoint(websocket: WebSocket):
                 else:
                     await manager.send_command(client_id, command, payload)
                     
+            elif data["type"] in ("subscribe", "unsubscribe"):
+                manager.update_subscriptions(websocket, data)
+                
             elif data["type"] == "refresh_recorders":
                 await manager.broadcast_command("get_status")
                 
             elif data["type"] == "get_recordings":
-                recordings = await manager.get_recordings()
-                await websocket.send_json({
+                try:
+                    filters = query_filters(data)
+                    page = await manager.get_recordings(**filters)
+                except ValueError as e:
+                    manager.send_to_websocket(websocket, {"type": "error", "error": str(e)})
+                    continue
+                manager.send_to_websocket(websocket, {
                     "type": "recordings_list",
-                    "recordings": recordings
+                    "cursor": filters.get("cursor"),
+                    "recordings": page["recordings"],
+                    "next_cursor": page["next_cursor"]
                 })
                 
     except WebSocketDisconnect:
         manager.disconnect_websocket(websocket)
 
+@app.get("/api/connections")
+async def get_connection_metrics():
+    """Per-connection send queue metrics."""
+    return manager.connection_metrics()
+
+@app.get("/api/recordings")
+async def list_recordings(request: Request):
+    """List recordings, newest first, a page at a time.
+
+    Query parameters: ``cursor`` (from the previous page's ``next_cursor``),
+    ``limit``, ``device``, ``client_id``, ``since``/``until`` (ISO 8601 or
+    Unix time) and ``min_duration``/``max_duration`` (seconds).
+    """
+    try:
+        return await manager.get_recordings(**query_filters(request.query_params))
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
 @app.get("/api/recordings/{filename}")
-async def download_recording(filename: str):
-    """Download a recording file."""
+async def download_recording(filename: str, start: Optional[float] = None, end: Optional[float] = None,
+                             channel: Optional[int] = None):
+    """Download a recording file, or the range ``start``..``end`` seconds of it."""
     file_path = Path("recordings") / filename
     if not file_path.exists() or not file_path.is_file():
         return JSONResponse(status_code=404, content={"error": "Recording not found"})
-    return FileResponse(file_path, media_type="audio/wav", filename=filename)
+    if start is None and end is None and channel is None:
+        return FileResponse(file_path, media_type="audio/wav", filename=filename)
+    
+    # Ranges are streamed from a memory map, so only the requested pages are read
+    loop = asyncio.get_event_loop()
+    try:
+        recording = await loop.run_in_executor(None, Recording, file_path)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    if channel is not None and not 0 <= channel < recording.channels:
+        return JSONResponse(status_code=400, content={"error": f"No channel {channel}"})
+    first = recording.frame_at(start or 0.0)
+    stop = recording.frames if end is None else recording.frame_at(end)
+    name = f"{file_path.stem}_{first}-{stop}.wav"
+    return StreamingResponse(recording.wav_bytes(first, stop, channel), media_type="audio/wav",
+                             headers={"Content-Disposition": f'attachment; filename="{name}"'})
+
+@app.get("/api/recordings/{filename}/peaks")
+async def get_recording_peaks(filename: str, start: float = 0.0, end: Optional[float] = None, width: int = 1000):
+    """Get waveform peaks for a time range at the resolution needed for ``width`` pixels."""
+    # Recordings still in progress are served from their level-0 spool
+    peaks_path = find_peaks(Path("recordings") / filename)
+    if peaks_path is None:
+        return JSONResponse(status_code=404, content={"error": "Peaks not found"})
+    loop = asyncio.get_event_loop()
+    try:
+        peaks = await loop.run_in_executor(None, read_peaks, peaks_path, start, end, max(1, width))
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return JSONResponse(content=peaks)
+
+@app.get("/api/recordings/{filename}/spectrogram/{zoom}/{index}")
+async def get_spectrogram_tile(filename: str, zoom: int, index: int, nfft: int = 1024):
+    """Get a spectrogram tile covering 2**zoom seconds as a PNG."""
+    try:
+        tile = await spectrograms.get_tile(filename, zoom, index, nfft)
+    except FileNotFoundError:
+        return JSONResponse(status_code=404, content={"error": "Recording not found"})
+    except IndexError as e:
+        return JSONResponse(status_code=404, content={"error": str(e)})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return Response(content=tile, media_type="image/png", headers={"Cache-Control": "max-age=3600"})
 
 # Serve static files
 static_dir = Path(__file__).parent / "static"
@@ -297,6 +489,8 @@ async def main():
     parser.add_argument("--broker", default="localhost", help="MQTT broker address")
     parser.add_argument("--mqtt-port", type=int, default=1883, help="MQTT broker port")
     parser.add_argument("--web-port", type=int, default=8080, help="Web server port")
+    parser.add_argument("--status-tick", type=float, default=STATUS_TICK,
+                        help="Seconds status changes are batched before being sent to UI clients; 0 sends each one")
     
     args = parser.parse_args()
     
@@ -307,6 +501,7 @@ async def main():
     # Update manager with broker settings
     manager.broker = args.broker
     manager.port = args.mqtt_port
+    manager.status_tick = args.status_tick
     
     # Run web server
     config = uvicorn.Config(app, host="0.0.0.0", port=args.web_port, log_level="info")
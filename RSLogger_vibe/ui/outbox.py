@@ -0,0 +1,120 @@
+"""Per-connection outbound queues for the hub's WebSocket connections.
+
+Broadcasting by awaiting each connection's send in turn lets one stalled
+browser delay every other client, and serializes the same message once per
+connection. Instead each connection gets a bounded queue drained by its own
+writer task: a broadcast serializes the message once and only enqueues it,
+which never blocks. When a slow consumer's queue is full, its overflow
+policy either drops the oldest queued message or disconnects it.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from enum import Enum
+from typing import Optional, Dict, Any, Union, Callable, Deque, Tuple
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 256  # Messages a connection may fall behind before its overflow policy applies
+
+
+class OverflowPolicy(Enum):
+    """What to do when a connection's queue is full."""
+    DROP_OLDEST = "drop_oldest"  # Lose the oldest queued message; for state that is sent again anyway
+    DISCONNECT = "disconnect"  # Close the connection; for messages that must not be lost
+
+
+class Outbox:
+    """Bounded send queue and writer task for one WebSocket."""
+
+    def __init__(self, websocket: WebSocket, name: str, maxsize: int = QUEUE_SIZE,
+                 policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+                 on_close: Optional[Callable[["Outbox"], None]] = None):
+        self.websocket = websocket
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self.on_close = on_close
+        self.closed = False
+        self._queue: Deque[Tuple[Union[str, bytes], float]] = deque()
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._writer())
+        # Metrics
+        self.sent = 0
+        self.dropped = 0
+        self.lag = 0.0  # Seconds the last message waited in the queue
+        self.max_lag = 0.0
+        self._lag_total = 0.0
+
+    def send(self, data: Union[str, bytes]) -> bool:
+        """Queue a serialized message without waiting; False if it was not queued."""
+        if self.closed:
+            return False
+        if len(self._queue) >= self.maxsize:
+            if self.policy is OverflowPolicy.DISCONNECT:
+                logger.warning(f"Disconnecting {self.name}: {len(self._queue)} messages behind")
+                self.close(disconnect=True)
+                return False
+            self._queue.popleft()
+            self.dropped += 1
+        self._queue.append((data, time.monotonic()))
+        self._ready.set()
+        return True
+
+    async def _writer(self) -> None:
+        try:
+            while True:
+                await self._ready.wait()
+                while self._queue:
+                    data, queued_at = self._queue.popleft()
+                    if isinstance(data, bytes):
+                        await self.websocket.send_bytes(data)
+                    else:
+                        await self.websocket.send_text(data)
+                    self.lag = time.monotonic() - queued_at
+                    self.max_lag = max(self.max_lag, self.lag)
+                    self._lag_total += self.lag
+                    self.sent += 1
+                self._ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"Send to {self.name} failed: {e}")
+            self.close()
+
+    def close(self, disconnect: bool = False) -> None:
+        """Stop the writer and drop queued messages; ``disconnect`` also closes the socket."""
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.clear()
+        if asyncio.current_task() is not self._task:
+            self._task.cancel()
+        if disconnect:
+            asyncio.create_task(self._close_socket())
+        if self.on_close:
+            self.on_close(self)
+
+    async def _close_socket(self) -> None:
+        try:
+            # 1008: policy violation, the client didn't keep up
+            await self.websocket.close(code=1008)
+        except Exception:
+            pass
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, counts and how long messages waited to be sent."""
+        return {
+            "queued": len(self._queue),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "lag_ms": round(self.lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "mean_lag_ms": round(self._lag_total / self.sent * 1000, 3) if self.sent else 0.0,
+            "policy": self.policy.value,
+            "closed": self.closed,
+        }
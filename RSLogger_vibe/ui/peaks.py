@@ -0,0 +1,27 @@
+"""Reader for the waveform peak sidecars written by the audio recorder.
+
+The file format and its reader live in ``sensors/audio/src/peaks.py``. The
+hub loads that module by path, so there is a single implementation of the
+format whether the UI runs as a package or as a script.
+"""
+
+import importlib.util
+from pathlib import Path
+
+_SOURCE = Path(__file__).resolve().parent.parent / 'sensors' / 'audio' / 'src' / 'peaks.py'
+
+
+def _load_format_module():
+    """Import the recorder's peaks module without importing the recorder package."""
+    spec = importlib.util.spec_from_file_location('rslogger_audio_peaks', _SOURCE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+_peaks = _load_format_module()
+
+PEAKS_SUFFIX = _peaks.PEAKS_SUFFIX
+find_peaks = _peaks.find_peaks
+read_header = _peaks.read_header
+read_peaks = _peaks.read_peaks
@@ -0,0 +1,29 @@
+"""Random-access reader for recordings made by the audio recorder.
+
+The reader lives in ``sensors/audio/src/reader.py``. The hub loads that
+module by path, like the peaks format, so there is one implementation
+whether the UI runs as a package or as a script.
+"""
+
+import importlib.util
+from pathlib import Path
+
+_SOURCE = Path(__file__).resolve().parent.parent / 'sensors' / 'audio' / 'src' / 'reader.py'
+
+
+def _load_reader_module():
+    """Import the recorder's reader module without importing the recorder package."""
+    spec = importlib.util.spec_from_file_location('rslogger_audio_reader', _SOURCE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+_reader = _load_reader_module()
+
+Recording = _reader.Recording
+SegmentedRecording = _reader.SegmentedRecording
+open_recording = _reader.open_recording
+map_wav = _reader.map_wav
+read_layout = _reader.read_layout
+to_float = _reader.to_float
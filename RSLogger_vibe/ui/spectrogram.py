@@ -0,0 +1,205 @@
+"""Cached spectrogram tiles for recordings.
+
+Tiles are addressed by zoom level and index: a tile at zoom ``z`` covers
+``2 ** z`` seconds and is rendered as a grayscale PNG with ``TILE_WIDTH``
+time columns and ``nfft // 2`` frequency rows. Tiles are computed in a
+process pool from a memory-mapped WAV and cached on disk with LRU eviction.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict
+
+import numpy as np
+
+try:
+    from .reader import map_wav
+except ImportError:
+    # Run as a script from the ui directory
+    from reader import map_wav
+
+logger = logging.getLogger(__name__)
+
+TILE_WIDTH = 256
+SUPPORTED_NFFT = (256, 512, 1024, 2048)
+MIN_ZOOM = -4
+MAX_ZOOM = 12
+DB_RANGE = 100.0  # Dynamic range mapped onto 0..255
+
+
+def encode_png(image: np.ndarray) -> bytes:
+    """Encode a 2-D uint8 array as a grayscale PNG."""
+    height, width = image.shape
+
+    def chunk(kind: bytes, body: bytes) -> bytes:
+        return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body))
+
+    # Each row is prefixed with filter type 0 (none)
+    raw = np.hstack((np.zeros((height, 1), dtype=np.uint8), image)).tobytes()
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, 6))
+            + chunk(b'IEND', b''))
+
+
+def render_tile(path: str, zoom: int, index: int, nfft: int) -> bytes:
+    """Compute one spectrogram tile as a PNG (runs in a worker process)."""
+    data, samplerate = map_wav(Path(path))
+    tile_frames = samplerate * 2.0 ** zoom
+    tile_start = index * tile_frames
+    if len(data) == 0 or tile_start >= len(data):
+        raise IndexError("Tile is beyond the end of the recording")
+
+    # One analysis window per column, centred on the column's time
+    centres = tile_start + (np.arange(TILE_WIDTH) + 0.5) * (tile_frames / TILE_WIDTH)
+    starts = np.round(centres).astype(np.int64) - nfft // 2
+    indices = starts[:, None] + np.arange(nfft)[None, :]
+    valid = (indices >= 0) & (indices < len(data))
+
+    # Fancy indexing on the memmap only touches the pages the windows need
+    samples = data[np.clip(indices, 0, len(data) - 1)].astype(np.float32)
+    if np.issubdtype(data.dtype, np.integer):
+        samples /= float(np.iinfo(data.dtype).max)
+    samples = samples.mean(axis=-1) * valid
+
+    window = np.hanning(nfft).astype(np.float32)
+    spectrum = np.abs(np.fft.rfft(samples * window, axis=1))[:, :nfft // 2]
+    db = 20 * np.log10(spectrum / (window.sum() / 2) + 1e-10)
+
+    levels = np.clip((db + DB_RANGE) / DB_RANGE * 255, 0, 255).astype(np.uint8)
+    # Columns are time, rows are frequency with low frequencies at the bottom
+    return encode_png(np.ascontiguousarray(levels.T[::-1]))
+
+
+class TileCache:
+    """On-disk tile cache with least-recently-used eviction."""
+
+    def __init__(self, directory: Path, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        """Index existing tiles, oldest access first."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tiles = sorted(self.directory.glob('*.png'), key=lambda p: p.stat().st_mtime)
+        for tile in tiles:
+            size = tile.stat().st_size
+            self._entries[tile.stem] = size
+            self._total_bytes += size
+        self._loaded = True
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Read a cached tile and mark it as recently used."""
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: str) -> Optional[bytes]:
+        if not self._loaded:
+            self._load()
+        if key not in self._entries:
+            return None
+        path = self.directory / f"{key}.png"
+        try:
+            data = path.read_bytes()
+            os.utime(path)  # Persist recency across restarts
+        except OSError:
+            self._total_bytes -= self._entries.pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store a tile and evict the least recently used ones over the size limit."""
+        with self._lock:
+            self._put(key, data)
+
+    def _put(self, key: str, data: bytes) -> None:
+        if not self._loaded:
+            self._load()
+        path = self.directory / f"{key}.png"
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        if key in self._entries:
+            self._total_bytes -= self._entries.pop(key)
+        self._entries[key] = len(data)
+        self._total_bytes += len(data)
+
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            old_key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                (self.directory / f"{old_key}.png").unlink()
+            except OSError:
+                pass
+
+
+class SpectrogramService:
+    """Serve spectrogram tiles, computing each tile at most once."""
+
+    def __init__(self, recordings_dir: Path = Path("recordings"), cache_dir: Optional[Path] = None,
+                 max_cache_bytes: int = 256 * 1024 * 1024, workers: Optional[int] = None):
+        self.recordings_dir = recordings_dir
+        self.cache = TileCache(cache_dir or recordings_dir / ".spectrogram_cache", max_cache_bytes)
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    def _cache_key(self, path: Path, zoom: int, index: int, nfft: int) -> str:
+        """Key tiles by file identity so rewritten recordings get fresh tiles."""
+        stat = path.stat()
+        ident = f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}:{zoom}:{index}:{nfft}"
+        return hashlib.sha1(ident.encode()).hexdigest()
+
+    async def get_tile(self, filename: str, zoom: int, index: int, nfft: int = 1024) -> bytes:
+        """Get a tile from the cache, computing it in the process pool if needed."""
+        if nfft not in SUPPORTED_NFFT:
+            raise ValueError(f"nfft must be one of {SUPPORTED_NFFT}")
+        if not MIN_ZOOM <= zoom <= MAX_ZOOM or index < 0:
+            raise IndexError("Tile out of range")
+
+        path = self.recordings_dir / filename
+        if not path.is_file():
+            raise FileNotFoundError(filename)
+
+        key = self._cache_key(path, zoom, index, nfft)
+
+        # Concurrent requests for the same tile share one lookup and computation
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load_tile(key, path, zoom, index, nfft))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _load_tile(self, key: str, path: Path, zoom: int, index: int, nfft: int) -> bytes:
+        """Read a tile from the cache or render and cache it."""
+        loop = asyncio.get_event_loop()
+        cached = await loop.run_in_executor(None, self.cache.get, key)
+        if cached is not None:
+            return cached
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        tile = await loop.run_in_executor(self._executor, render_tile, str(path), zoom, index, nfft)
+        await loop.run_in_executor(None, self.cache.put, key, tile)
+        return tile
+
+    def shutdown(self) -> None:
+        """Stop the worker processes."""
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
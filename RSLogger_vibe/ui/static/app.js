@@ -2,7 +2,11 @@ class WebSocketControlCenter {
     constructor() {
         this.ws = null;
         this.recorders = {};
+        this.statusVersions = {};  // client_id -> status version the next delta must follow on from
         this.recordings = [];
+        this.recordingsCursor = null;  // next_cursor of the last page loaded, null when all are loaded
+        this.monitoring = {};  // client_id -> playback state for live monitoring
+        this.audioContext = null;
         
         this.elements = {
             connectionStatus: document.getElementById('connectionStatus'),
@@ -30,14 +34,16 @@ class WebSocketControlCenter {
         const wsUrl = `${protocol}//${window.location.host}/ws`;
         
         this.ws = new WebSocket(wsUrl);
+        this.ws.binaryType = 'arraybuffer';
         
         this.ws.onopen = () => {
+            // The initial state carries every recorder's status
             this.updateConnectionStatus(true);
-            this.refreshRecorders();
         };
         
         this.ws.onclose = () => {
             this.updateConnectionStatus(false);
+            this.monitoring = {};
             // Attempt to reconnect after 2 seconds
             setTimeout(() => this.connectWebSocket(), 2000);
         };
@@ -48,6 +54,10 @@ class WebSocketControlCenter {
         };
         
         this.ws.onmessage = (event) => {
+            if (event.data instanceof ArrayBuffer) {
+                this.handleMonitorFrame(event.data);
+                return;
+            }
             const data = JSON.parse(event.data);
             this.handleWebSocketMessage(data);
         };
@@ -59,18 +69,38 @@ class WebSocketControlCenter {
         switch (data.type) {
             case 'initial_state':
                 this.recorders = data.recorders || {};
+                this.statusVersions = data.status_versions || {};
                 this.recordings = data.recordings || [];
+                this.recordingsCursor = data.recordings_cursor || null;
                 this.updateUI();
                 break;
                 
             case 'recorder_status':
-                this.recorders[data.client_id] = data.status;
+                // Keep the last pushed system stats across status updates
+                const previous = this.recorders[data.client_id] || {};
+                this.recorders[data.client_id] = {...data.status, system_stats: previous.system_stats};
+                this.statusVersions[data.client_id] = data.version;
                 this.updateRecorderCard(data.client_id);
                 break;
                 
+            case 'recorder_status_delta':
+                this.applyStatusDelta(data);
+                break;
+                
+            case 'recorder_status_batch':
+                this.applyStatusBatch(data.recorders);
+                break;
+                
+            case 'recorder_system_stats':
+                if (this.recorders[data.client_id]) {
+                    this.recorders[data.client_id].system_stats = data.stats;
+                    this.updateRecorderCard(data.client_id);
+                }
+                break;
+                
             case 'recorder_connected':
+                // Its status follows once the hub has it
                 this.showNotification(`Recorder ${data.client_id} connected`, 'info');
-                this.refreshRecorders();
                 break;
                 
             case 'recorder_disconnected':
@@ -93,7 +123,6 @@ class WebSocketControlCenter {
                     this.updateRecorderCard(data.data.client_id);
                 }
                 this.showNotification(`Recording completed on ${data.data.client_id}`, 'success');
-                this.refreshRecordings();
                 break;
                 
             case 'recorder_recording_error':
@@ -108,15 +137,107 @@ class WebSocketControlCenter {
                 this.showNotification(`Error from ${data.client_id}: ${data.error}`, 'error');
                 break;
                 
-            case 'recordings_updated':
-                this.recordings = data.recordings;
+            case 'recordings_list':
+                // A page requested with a cursor continues the list; without one it starts over
+                this.recordings = data.cursor ? this.recordings.concat(data.recordings) : data.recordings;
+                this.recordingsCursor = data.next_cursor || null;
                 this.updateRecordingsList();
                 break;
                 
+            case 'recordings_changed':
+                this.applyRecordingChanges(data.changed || [], data.removed || []);
+                break;
+                
             case 'command_response':
                 console.log(`Response from ${data.client_id}:`, data.response);
                 break;
+                
+            case 'command_result':
+                this.showCommandResult(data);
+                break;
+        }
+    }
+    
+    applyStatusBatch(recorders) {
+        // A restarted MQTT hub sends the whole fleet at once, so build the grid once
+        const added = Object.keys(recorders).some(clientId => !this.recorders[clientId]);
+        for (const [clientId, status] of Object.entries(recorders)) {
+            const previous = this.recorders[clientId] || {};
+            this.recorders[clientId] = {...status, system_stats: previous.system_stats};
+            if (!added) {
+                this.updateRecorderCard(clientId);
+            }
+        }
+        if (added) {
+            this.updateRecordersGrid();
+        }
+    }
+    
+    applyStatusDelta(data) {
+        const recorder = this.recorders[data.client_id];
+        if (!recorder || this.statusVersions[data.client_id] !== data.base_version) {
+            // A status message was dropped on the way; get the hub's copy instead
+            this.ws.send(JSON.stringify({type: 'get_recorder_status', client_id: data.client_id}));
+            return;
+        }
+        Object.assign(recorder, data.changes);
+        for (const field of data.removed) delete recorder[field];
+        this.statusVersions[data.client_id] = data.version;
+        this.updateRecorderCard(data.client_id);
+    }
+    
+    handleMonitorFrame(buffer) {
+        // Layout: u8 id length, client_id, then '<4sIIdH' header and int16 PCM
+        const view = new DataView(buffer);
+        const idLength = view.getUint8(0);
+        const clientId = new TextDecoder().decode(new Uint8Array(buffer, 1, idLength));
+        const state = this.monitoring[clientId];
+        if (!state || !this.audioContext) {
+            return;
+        }
+        
+        const headerOffset = 1 + idLength;
+        const sequence = view.getUint32(headerOffset + 4, true);
+        const samplerate = view.getUint32(headerOffset + 8, true);
+        const count = view.getUint16(headerOffset + 20, true);
+        const dataOffset = headerOffset + 22;
+        
+        if (state.lastSequence !== null && sequence !== state.lastSequence + 1) {
+            console.warn(`Monitor frames lost from ${clientId}: ${sequence - state.lastSequence - 1}`);
+        }
+        state.lastSequence = sequence;
+        
+        const audioBuffer = this.audioContext.createBuffer(1, count, samplerate);
+        const channel = audioBuffer.getChannelData(0);
+        for (let i = 0; i < count; i++) {
+            channel[i] = view.getInt16(dataOffset + i * 2, true) / 32768;
         }
+        
+        const source = this.audioContext.createBufferSource();
+        source.buffer = audioBuffer;
+        source.connect(this.audioContext.destination);
+        
+        // Keep a small jitter buffer; resync if playback fell behind
+        const now = this.audioContext.currentTime;
+        if (state.nextTime < now) {
+            state.nextTime = now + 0.1;
+        }
+        source.start(state.nextTime);
+        state.nextTime += audioBuffer.duration;
+    }
+    
+    toggleMonitor(clientId) {
+        if (this.monitoring[clientId]) {
+            delete this.monitoring[clientId];
+            this.ws.send(JSON.stringify({type: 'monitor_unsubscribe', client_id: clientId}));
+        } else {
+            if (!this.audioContext) {
+                this.audioContext = new AudioContext();
+            }
+            this.monitoring[clientId] = {nextTime: 0, lastSequence: null};
+            this.ws.send(JSON.stringify({type: 'monitor_subscribe', client_id: clientId}));
+        }
+        this.updateRecorderCard(clientId);
     }
     
     updateConnectionStatus(connected) {
@@ -151,10 +272,18 @@ class WebSocketControlCenter {
             const startBtn = document.getElementById(`start-${id}`);
             const stopBtn = document.getElementById(`stop-${id}`);
             const applyBtn = document.getElementById(`apply-${id}`);
+            const listenBtn = document.getElementById(`listen-${id}`);
+            const armBtn = document.getElementById(`arm-${id}`);
             
             if (startBtn) {
                 startBtn.addEventListener('click', () => this.startRecording(id));
             }
+            if (listenBtn) {
+                listenBtn.addEventListener('click', () => this.toggleMonitor(id));
+            }
+            if (armBtn) {
+                armBtn.addEventListener('click', () => this.toggleArm(id));
+            }
             if (stopBtn) {
                 stopBtn.addEventListener('click', () => this.stopRecording(id));
             }
@@ -176,10 +305,18 @@ class WebSocketControlCenter {
             const startBtn = document.getElementById(`start-${clientId}`);
             const stopBtn = document.getElementById(`stop-${clientId}`);
             const applyBtn = document.getElementById(`apply-${clientId}`);
+            const listenBtn = document.getElementById(`listen-${clientId}`);
+            const armBtn = document.getElementById(`arm-${clientId}`);
             
             if (startBtn) {
                 startBtn.addEventListener('click', () => this.startRecording(clientId));
             }
+            if (listenBtn) {
+                listenBtn.addEventListener('click', () => this.toggleMonitor(clientId));
+            }
+            if (armBtn) {
+                armBtn.addEventListener('click', () => this.toggleArm(clientId));
+            }
             if (stopBtn) {
                 stopBtn.addEventListener('click', () => this.stopRecording(clientId));
             }
@@ -194,8 +331,11 @@ class WebSocketControlCenter {
     createRecorderCard(id) {
         const recorder = this.recorders[id];
         const isRecording = recorder.recording || false;
+        const isArmed = recorder.armed || false;
         const config = recorder.config || {};
         const capabilities = recorder.capabilities || {};
+        const stats = recorder.system_stats;
+        const dropouts = recorder.dropouts;
         
         return `
             <div class="recorder-card ${isRecording ? 'recording' : ''}" id="recorder-${id}">
@@ -203,7 +343,7 @@ class WebSocketControlCenter {
                     <div class="recorder-name">${id}</div>
                     <div class="recorder-status ${isRecording ? 'recording' : ''}">
                         <span class="status-indicator"></span>
-                        ${isRecording ? 'Recording' : 'Ready'}
+                        ${isRecording ? 'Recording' : (isArmed ? 'Armed' : 'Ready')}
                     </div>
                 </div>
                 <div class="recorder-details">
@@ -231,6 +371,16 @@ class WebSocketControlCenter {
                             ).join('') : `<option value="${config.channels}">${config.channels}ch</option>`}
                         </select>
                     </div>
+                    ${stats ? `
+                    <div class="config-row">
+                        <label>System:</label>
+                        <span>CPU ${stats.cpu_percent.toFixed(0)}% · RSS ${(stats.process_rss_mb || 0).toFixed(0)} MB · ${stats.disk_free_gb.toFixed(1)} GB free</span>
+                    </div>` : ''}
+                    ${dropouts ? `
+                    <div class="config-row">
+                        <label>Dropouts:</label>
+                        <span>${dropouts.input_overflows} overflows · ${dropouts.dropped_blocks} dropped · queue max ${dropouts.max_queue_depth}/${dropouts.queue_capacity}</span>
+                    </div>` : ''}
                 </div>
                 <div class="recorder-controls">
                     <button class="recorder-button" id="start-${id}" ${isRecording ? 'disabled' : ''}>
@@ -244,11 +394,35 @@ class WebSocketControlCenter {
                     <button class="recorder-button config" id="apply-${id}" ${isRecording ? 'disabled' : ''} title="Apply Configuration">
                         <span class="material-icons">save</span>
                     </button>
+                    <button class="recorder-button config" id="listen-${id}" title="${this.monitoring[id] ? 'Stop Listening' : 'Listen'}">
+                        <span class="material-icons">${this.monitoring[id] ? 'volume_off' : 'headphones'}</span>
+                    </button>
+                    <button class="recorder-button config" id="arm-${id}" ${isRecording ? 'disabled' : ''} title="${isArmed ? 'Disarm' : 'Arm (keep pre-roll)'}">
+                        <span class="material-icons">${isArmed ? 'sensors_off' : 'sensors'}</span>
+                    </button>
                 </div>
             </div>
         `;
     }
     
+    applyRecordingChanges(changed, removed) {
+        const drop = new Set(removed.concat(changed.map(recording => recording.filename)));
+        this.recordings = this.recordings.filter(recording => !drop.has(recording.filename));
+        // Only add entries that fall within the pages already loaded; later pages bring the rest
+        const oldest = this.recordings.length ? this.recordings[this.recordings.length - 1] : null;
+        for (const recording of changed) {
+            if (!this.recordingsCursor || !oldest || recording.created >= oldest.created) {
+                this.recordings.push(recording);
+            }
+        }
+        this.recordings.sort((a, b) => b.created.localeCompare(a.created) || b.filename.localeCompare(a.filename));
+        if (this.recordings.length === 0 && this.recordingsCursor) {
+            // Everything loaded was removed; start again from the first page
+            this.refreshRecordings();
+        }
+        this.updateRecordingsList();
+    }
+    
     updateRecordingsList() {
         const listEl = this.elements.recordingsList;
         
@@ -274,7 +448,8 @@ class WebSocketControlCenter {
                     </button>
                 </div>
             </div>
-        `).join('');
+        `).join('') + (this.recordingsCursor ?
+            '<button class="recorder-button load-more" onclick="app.loadMoreRecordings()">Load more</button>' : '');
     }
     
     refreshRecorders() {
@@ -288,6 +463,14 @@ class WebSocketControlCenter {
         }));
     }
     
+    loadMoreRecordings() {
+        if (!this.recordingsCursor) return;
+        this.ws.send(JSON.stringify({
+            type: 'get_recordings',
+            cursor: this.recordingsCursor
+        }));
+    }
+    
     startRecording(clientId) {
         const duration = this.elements.masterDuration.value ? 
             parseFloat(this.elements.masterDuration.value) : null;
@@ -299,6 +482,11 @@ class WebSocketControlCenter {
         this.sendCommand(clientId, 'stop_recording');
     }
     
+    toggleArm(clientId) {
+        const recorder = this.recorders[clientId] || {};
+        this.sendCommand(clientId, recorder.armed ? 'disarm' : 'arm');
+    }
+    
     startAllRecording() {
         const duration = this.elements.masterDuration.value ? 
             parseFloat(this.elements.masterDuration.value) : null;
@@ -319,6 +507,22 @@ class WebSocketControlCenter {
         }));
     }
     
+    showCommandResult(result) {
+        const problems = result.timed_out.length + Object.keys(result.failed).length +
+            Object.keys(result.unreachable).length;
+        // Routine requests only deserve a notification when something went wrong
+        if (problems === 0 && result.command === 'get_status') return;
+        const slowest = result.latency_ms.max !== null ? ` (slowest ${result.latency_ms.max.toFixed(0)} ms)` : '';
+        let text = `${result.command}: ${result.acked.length}/${result.recorders} acknowledged${slowest}`;
+        if (result.start_skew_ms && result.start_skew_ms.spread !== null) {
+            text += `, started within ${result.start_skew_ms.spread.toFixed(2)} ms`;
+        }
+        if (result.timed_out.length) text += `, timed out: ${result.timed_out.join(', ')}`;
+        for (const [clientId, error] of Object.entries(result.failed)) text += `, ${clientId}: ${error}`;
+        for (const [clientId, reason] of Object.entries(result.unreachable)) text += `, ${clientId} ${reason}`;
+        this.showNotification(text, problems ? 'warning' : 'success');
+    }
+    
     applyConfig(clientId) {
         const deviceSelect = document.getElementById(`device-${clientId}`);
         const samplerateSelect = document.getElementById(`samplerate-${clientId}`);
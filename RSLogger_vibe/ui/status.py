@@ -0,0 +1,79 @@
+"""Versioned recorder status, kept in step from snapshots and deltas.
+
+Recorders send a full ``status`` snapshot when they register or the hub asks
+for one, and otherwise a ``status_delta`` with just the top-level fields
+that changed. Each status has a version and each delta names the version it
+applies to, so a delta that doesn't follow on from what the hub holds is
+detected and answered with a request for a snapshot instead of being
+applied to the wrong state.
+
+The hub forwards status to UI clients the same way, but coalesced: changes
+arriving within one tick are sent as a single update per recorder holding
+the current value of every field that changed.
+"""
+
+from typing import Optional, Dict, Any, Set
+
+STATUS_TICK = 0.1  # Seconds status changes are collected before being forwarded to UI clients
+
+# Message fields that describe the message rather than the recorder
+ENVELOPE_FIELDS = ("type", "version", "base_version")
+
+
+class RecorderStatus:
+    """One recorder's status as the hub knows it, and what changed since it was last forwarded."""
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.version: Optional[int] = None
+        self.forwarded_version: Optional[int] = None
+        self.changed: Set[str] = set()
+        self.removed: Set[str] = set()
+        self.full = False  # A snapshot arrived since the last forward
+        self.resync_requested = False
+
+    def snapshot(self, message: Dict[str, Any]) -> None:
+        """Replace the status with a full snapshot."""
+        self.fields = {key: value for key, value in message.items() if key not in ENVELOPE_FIELDS}
+        self.version = message.get("version")
+        self.changed.clear()
+        self.removed.clear()
+        self.full = True
+        self.resync_requested = False
+
+    def apply(self, message: Dict[str, Any]) -> bool:
+        """Apply a delta; False if it doesn't follow on from the version held, which needs a resync."""
+        if self.version is None or message.get("base_version") != self.version:
+            return False
+        changes = message.get("changes") or {}
+        removed = message.get("removed") or []
+        self.fields.update(changes)
+        for key in removed:
+            self.fields.pop(key, None)
+        self.changed.update(changes)
+        self.changed.difference_update(removed)
+        self.removed.update(removed)
+        self.removed.difference_update(changes)
+        self.version = message.get("version")
+        return True
+
+    def take_update(self) -> Optional[Dict[str, Any]]:
+        """Get the UI message for what changed since the last call, or None if nothing did."""
+        if self.full:
+            update = {"type": "recorder_status", "version": self.version, "base_version": self.forwarded_version,
+                      "status": dict(self.fields)}
+        elif self.changed or self.removed:
+            update = {
+                "type": "recorder_status_delta",
+                "version": self.version,
+                "base_version": self.forwarded_version,
+                "changes": {key: self.fields[key] for key in sorted(self.changed)},
+                "removed": sorted(self.removed),
+            }
+        else:
+            return None
+        self.full = False
+        self.changed.clear()
+        self.removed.clear()
+        self.forwarded_version = self.version
+        return update
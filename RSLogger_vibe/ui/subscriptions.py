@@ -0,0 +1,99 @@
+"""Which UI clients receive which recorders' messages.
+
+A topic is a recorder's client_id and a UI message type, either of which
+may be ``*`` for any. Clients start out subscribed to everything, as before;
+their first ``subscribe`` replaces that with just the topics they ask for,
+so a dashboard watching 3 of 200 recorders only gets their traffic. Fan-out
+looks subscribers up in an index from topic to subscribers instead of
+checking every connection against every message.
+"""
+
+from collections import defaultdict
+from typing import Dict, Set, Tuple, Iterable, Optional, Hashable, List
+
+WILDCARD = "*"
+
+# Message types that belong to another topic, so subscribing to it gets them too
+TOPIC_ALIASES = {
+    "recorder_status_delta": "recorder_status",
+}
+
+Topic = Tuple[str, str]
+
+
+def topic_type(message_type: str) -> str:
+    return TOPIC_ALIASES.get(message_type, message_type)
+
+
+class SubscriptionIndex:
+    """Subscribers by topic, and topics by subscriber."""
+
+    def __init__(self):
+        self._subscribers: Dict[Topic, Set[Hashable]] = defaultdict(set)
+        self._topics: Dict[Hashable, Set[Topic]] = {}
+        self._default: Set[Hashable] = set()  # Subscribed to everything until they choose
+
+    def add(self, subscriber: Hashable) -> None:
+        """Add a subscriber that receives everything until its first ``subscribe``."""
+        self.remove(subscriber)
+        self._default.add(subscriber)
+        self._add_topics(subscriber, [(WILDCARD, WILDCARD)])
+
+    def remove(self, subscriber: Hashable) -> None:
+        self._default.discard(subscriber)
+        for topic in self._topics.pop(subscriber, ()):
+            self._discard(topic, subscriber)
+
+    def subscribe(self, subscriber: Hashable, client_ids: Optional[Iterable[str]] = None,
+                  types: Optional[Iterable[str]] = None) -> List[Topic]:
+        """Subscribe to every pairing of ``client_ids`` and ``types``; either defaults to any."""
+        if subscriber in self._default:
+            # Choosing topics replaces the subscription to everything
+            self.remove(subscriber)
+        topics = expand(client_ids, types)
+        self._add_topics(subscriber, topics)
+        return topics
+
+    def unsubscribe(self, subscriber: Hashable, client_ids: Optional[Iterable[str]] = None,
+                    types: Optional[Iterable[str]] = None) -> None:
+        """Drop topics; with neither ``client_ids`` nor ``types``, drop them all."""
+        self._default.discard(subscriber)
+        topics = self._topics.get(subscriber, set())
+        if client_ids is None and types is None:
+            dropped = set(topics)
+        else:
+            dropped = topics & set(expand(client_ids, types))
+        for topic in dropped:
+            topics.discard(topic)
+            self._discard(topic, subscriber)
+
+    def subscribers(self, client_id: str, message_type: str) -> Set[Hashable]:
+        """Get everyone subscribed to a recorder's message of this type."""
+        kind = topic_type(message_type)
+        found: Set[Hashable] = set()
+        for topic in ((client_id, kind), (client_id, WILDCARD), (WILDCARD, kind), (WILDCARD, WILDCARD)):
+            found |= self._subscribers.get(topic, set())
+        return found
+
+    def topics(self, subscriber: Hashable) -> List[Topic]:
+        return sorted(self._topics.get(subscriber, ()))
+
+    def _add_topics(self, subscriber: Hashable, topics: Iterable[Topic]) -> None:
+        own = self._topics.setdefault(subscriber, set())
+        for topic in topics:
+            own.add(topic)
+            self._subscribers[topic].add(subscriber)
+
+    def _discard(self, topic: Topic, subscriber: Hashable) -> None:
+        subscribers = self._subscribers.get(topic)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[topic]
+
+
+def expand(client_ids: Optional[Iterable[str]], types: Optional[Iterable[str]]) -> List[Topic]:
+    """Pair every client_id with every type, either defaulting to the wildcard."""
+    client_ids = list(client_ids) if client_ids else [WILDCARD]
+    types = [topic_type(kind) for kind in types] if types else [WILDCARD]
+    return [(client_id, kind) for client_id in client_ids for kind in types]
@@ -0,0 +1,69 @@
+"""Recorder clock offsets, for starting several recorders at the same instant.
+
+Sending ``start_recording`` to every recorder in turn starts them as far
+apart as the sends, the network and each recorder's stream setup happen to
+be, typically tens to hundreds of milliseconds. Instead the hub pings each
+recorder to estimate how far its clock is from the hub's, then tells every
+recorder to start at one instant a little in the future, given on the
+recorder's own clock; each recorder begins writing at the sample nearest it.
+
+A ping is an acknowledged command: the ack carries the recorder's clock
+when it received the command and when it answered. As in NTP, the offset
+assumes the network delay is the same both ways, so its error is at most
+half the round trip; the ping with the shortest round trip is kept.
+"""
+
+import time
+from typing import Optional, Dict, Any
+
+SYNC_PINGS = 5  # Pings per recorder before a synchronized start
+SYNC_TIMEOUT = 1.0  # Seconds to wait for each ping's acknowledgement
+START_LEAD = 1.0  # Seconds between sending a synchronized start and the start itself
+
+
+class ClockEstimate:
+    """A recorder's clock offset from the hub, from the best ping so far."""
+
+    def __init__(self):
+        self.offset: Optional[float] = None  # Seconds the recorder's clock is ahead of the hub's
+        self.rtt: Optional[float] = None  # Network round trip of the ping the offset comes from
+        self.measured_at: Optional[float] = None
+        self.samples = 0
+
+    def reset(self) -> None:
+        self.offset = None
+        self.rtt = None
+        self.measured_at = None
+        self.samples = 0
+
+    def add(self, sent_at: float, latency: float, received_at: Optional[float],
+            completed_at: Optional[float]) -> None:
+        """Add a ping sent at hub time ``sent_at`` and acknowledged ``latency`` seconds later.
+
+        ``received_at`` and ``completed_at`` are the recorder's clock when the
+        ping arrived and when it was acknowledged.
+        """
+        if received_at is None or completed_at is None:
+            return
+        self.samples += 1
+        # Time spent in the recorder is not network delay
+        rtt = max(latency - (completed_at - received_at), 0.0)
+        if self.rtt is not None and rtt >= self.rtt:
+            return
+        self.rtt = rtt
+        self.offset = ((received_at - sent_at) + (completed_at - (sent_at + latency))) / 2
+        self.measured_at = time.time()
+
+    def to_recorder(self, hub_time: float) -> float:
+        """Convert a hub wall-clock time to the recorder's clock."""
+        return hub_time + self.offset
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "offset_ms": round(self.offset * 1000, 3) if self.offset is not None else None,
+            "rtt_ms": round(self.rtt * 1000, 3) if self.rtt is not None else None,
+            # The offset is off by at most half the round trip
+            "uncertainty_ms": round(self.rtt * 500, 3) if self.rtt is not None else None,
+            "measured_at": self.measured_at,
+            "samples": self.samples,
+        }
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The hub modules use script-style imports
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
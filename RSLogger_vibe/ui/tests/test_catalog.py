@@ -0,0 +1,192 @@
+import asyncio
+import json
+import os
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import ws_ui_server
+from catalog import RecordingsCatalog, query_filters
+
+
+def write_recording(directory, name, metadata=None):
+    (directory / f"{name}.wav").write_bytes(b"\0" * 64)
+    (directory / f"{name}.json").write_text(json.dumps(metadata or {"device": {"name": "Mic"}}))
+
+
+class TestRecordingsCatalog:
+    async def test_reconcile_indexes_the_directory(self, tmp_path):
+        write_recording(tmp_path, "a")
+        write_recording(tmp_path, "b", {"duration_seconds": 2.0})
+        (tmp_path / "s_segments.json").write_text("{}")  # Metadata without audio
+        catalog = RecordingsCatalog(tmp_path)
+        
+        recordings = await catalog.list()
+        
+        assert sorted(r["filename"] for r in recordings) == ["a.wav", "b.wav"]
+        assert (await catalog.get("a.wav"))["metadata"] == {"device": {"name": "Mic"}}
+        assert (await catalog.get("a.wav"))["size"] == 64
+        await catalog.stop()
+    
+    async def test_only_changed_files_are_parsed_again(self, tmp_path):
+        write_recording(tmp_path, "a")
+        write_recording(tmp_path, "b")
+        catalog = RecordingsCatalog(tmp_path)
+        await catalog.list()
+        
+        assert catalog.reconcile() == ([], [])
+        
+        (tmp_path / "a.json").write_text(json.dumps({"note": "edited"}))
+        os.utime(tmp_path / "a.json", ns=(1, 1))
+        (tmp_path / "b.wav").unlink()
+        changed, removed = catalog.reconcile()
+        assert [entry["filename"] for entry in changed] == ["a.wav"]
+        assert changed[0]["metadata"] == {"note": "edited"}
+        assert removed == ["b.wav"]
+        await catalog.stop()
+    
+    async def test_catalog_persists_across_restarts(self, tmp_path):
+        write_recording(tmp_path, "a")
+        catalog = RecordingsCatalog(tmp_path)
+        await catalog.refresh("a.wav", client_id="recorder-1")
+        await catalog.stop()
+        
+        catalog = RecordingsCatalog(tmp_path)
+        assert catalog.reconcile() == ([], [])
+        assert (await catalog.get("a.wav"))["client_id"] == "recorder-1"
+        await catalog.stop()
+    
+    async def test_refresh_of_a_missing_recording_removes_it(self, tmp_path):
+        write_recording(tmp_path, "a")
+        catalog = RecordingsCatalog(tmp_path)
+        await catalog.list()
+        (tmp_path / "a.wav").unlink()
+        
+        assert await catalog.refresh("a.wav") is None
+        assert await catalog.list() == []
+        await catalog.stop()
+    
+    async def test_watcher_reports_changes(self, tmp_path):
+        catalog = RecordingsCatalog(tmp_path, watch_interval=0.01)
+        changes = asyncio.Queue()
+        
+        async def listener(changed, removed):
+            await changes.put(([entry["filename"] for entry in changed], removed))
+        
+        catalog.add_listener(listener)
+        await catalog.start()
+        write_recording(tmp_path, "new")
+        
+        assert await asyncio.wait_for(changes.get(), 2.0) == (["new.wav"], [])
+        (tmp_path / "new.wav").unlink()
+        assert await asyncio.wait_for(changes.get(), 2.0) == ([], ["new.wav"])
+        await catalog.stop()
+
+
+class TestQuery:
+    async def make_catalog(self, tmp_path):
+        devices = ["Mic", "Line", "Mic", "Line", "Mic"]
+        for index, device in enumerate(devices):
+            write_recording(tmp_path, f"r{index}", {"device": {"name": device}, "duration_seconds": index * 10.0})
+        catalog = RecordingsCatalog(tmp_path)
+        await catalog.refresh("r1.wav", client_id="recorder-1")
+        return catalog
+    
+    async def test_pages_follow_the_cursor(self, tmp_path):
+        catalog = await self.make_catalog(tmp_path)
+        
+        names = []
+        cursor = None
+        while True:
+            page = await catalog.query(cursor=cursor, limit=2)
+            names += [entry["filename"] for entry in page["recordings"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        
+        # Every recording once, in the same order as a single page
+        everything = await catalog.query(limit=100)
+        assert names == [entry["filename"] for entry in everything["recordings"]]
+        assert sorted(names) == [f"r{index}.wav" for index in range(5)]
+        await catalog.stop()
+    
+    async def test_cursor_is_stable_while_recordings_are_added(self, tmp_path):
+        catalog = await self.make_catalog(tmp_path)
+        first = await catalog.query(limit=2)
+        
+        write_recording(tmp_path, "newer")
+        await catalog.refresh("newer.wav")
+        second = await catalog.query(cursor=first["next_cursor"], limit=2)
+        
+        seen = {entry["filename"] for entry in first["recordings"]}
+        assert not seen & {entry["filename"] for entry in second["recordings"]}
+        assert "newer.wav" not in {entry["filename"] for entry in second["recordings"]}
+        await catalog.stop()
+    
+    async def test_filters(self, tmp_path):
+        catalog = await self.make_catalog(tmp_path)
+        
+        async def names(**filters):
+            return sorted(entry["filename"] for entry in (await catalog.query(**filters))["recordings"])
+        
+        assert await names(device="Line") == ["r1.wav", "r3.wav"]
+        assert await names(client_id="recorder-1") == ["r1.wav"]
+        assert await names(min_duration=15, max_duration=30) == ["r2.wav", "r3.wav"]
+        assert len(await names(since=0, until=datetime(2100, 1, 1))) == 5
+        assert await names(until=0) == []
+        await catalog.stop()
+    
+    def test_query_filters_convert_request_parameters(self):
+        filters = query_filters({"limit": "10", "since": "2024-01-02T03:04:05", "max_duration": "2.5",
+                                 "device": "", "unknown": "x"})
+        
+        assert filters == {"limit": 10, "since": datetime(2024, 1, 2, 3, 4, 5).timestamp(), "max_duration": 2.5}
+        with pytest.raises(ValueError):
+            query_filters({"since": "yesterday"})
+    
+    async def test_invalid_cursor(self, tmp_path):
+        catalog = RecordingsCatalog(tmp_path)
+        with pytest.raises(ValueError):
+            await catalog.query(cursor="not-a-cursor")
+        await catalog.stop()
+
+
+class TestRecordingUpdates:
+    async def test_completion_pushes_only_the_new_entry(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "recordings").mkdir()
+        for index in range(3):
+            write_recording(tmp_path / "recordings", f"old{index}")
+        manager = ws_ui_server.WebSocketUIManager()
+        sent = []
+        
+        async def broadcast(message):
+            sent.append(message)
+        
+        monkeypatch.setattr(manager, "broadcast_to_ui", broadcast)
+        write_recording(tmp_path / "recordings", "take")
+        
+        await manager.recording_completed("rec-1", "take.wav")
+        await manager.recording_completed("rec-1", "missing.wav")
+        
+        assert [message["type"] for message in sent] == ["recordings_changed", "recordings_changed"]
+        assert [entry["filename"] for entry in sent[0]["changed"]] == ["take.wav"]
+        assert sent[0]["changed"][0]["client_id"] == "rec-1"
+        assert sent[1] == {"type": "recordings_changed", "changed": [], "removed": ["missing.wav"]}
+        await manager.catalog.stop()
+    
+    def test_rest_pagination(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "recordings").mkdir()
+        for index in range(3):
+            write_recording(tmp_path / "recordings", f"r{index}")
+        monkeypatch.setattr(ws_ui_server, "manager", ws_ui_server.WebSocketUIManager())
+        client = TestClient(ws_ui_server.app)
+        
+        first = client.get("/api/recordings", params={"limit": 2}).json()
+        rest = client.get("/api/recordings", params={"cursor": first["next_cursor"]}).json()
+        
+        assert len(first["recordings"]) == 2
+        assert len(rest["recordings"]) == 1 and rest["next_cursor"] is None
+        assert client.get("/api/recordings", params={"limit": "many"}).status_code == 400
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import ws_ui_server
+from commands import FanOut
+
+
+class FakeRecorder:
+    """A recorder socket that acknowledges commands, after ``delay`` or never.
+    
+    Its clock runs ``offset`` seconds ahead of the hub's.
+    """
+    
+    def __init__(self, manager, client_id, delay=0.0, ok=True, offset=0.0):
+        self.manager = manager
+        self.client_id = client_id
+        self.delay = delay
+        self.ok = ok
+        self.offset = offset
+        self.received = []
+        
+    async def send_text(self, data):
+        message = json.loads(data)
+        self.received.append(message)
+        if "command_id" in message and self.delay is not None:
+            # Half the delay each way
+            asyncio.get_running_loop().call_later(self.delay / 2, self.answer, message)
+            
+    def answer(self, message):
+        now = time.time() + self.offset
+        start_at = message["payload"].get("start_at")
+        result = {"scheduled": True, "start_at": start_at} if start_at and self.ok else None
+        self.send_ack(message, self.delay / 2, result, now)
+        if result:
+            # Acknowledged again once started, at the instant on its own clock
+            skew = {"start_at": start_at, "start_skew_ms": 0.25 if self.client_id == "a" else -0.25}
+            self.send_ack(message, max(start_at - now, 0.0), skew, start_at, stage="started")
+            
+    def send_ack(self, message, delay, result, now, stage=None):
+        asyncio.get_running_loop().call_later(delay, lambda: asyncio.ensure_future(
+            self.manager.handle_recorder_message(self, {
+                "type": "ack", "client_id": self.client_id, "command_id": message["command_id"],
+                "command": message["command"], "stage": stage, "ok": self.ok,
+                "error": None if self.ok else "Already recording",
+                "result": result, "received_at": now, "completed_at": now
+            })))
+            
+    async def close(self, code=1000):
+        pass
+
+
+async def register(manager, *recorders):
+    for recorder in recorders:
+        await manager.handle_recorder_message(recorder, {"type": "register", "client_id": recorder.client_id})
+
+
+class TestFanOut:
+    async def test_completes_when_all_acknowledge(self):
+        fan_out = FanOut("start_recording", ["a", "b"], timeout=5.0)
+        fan_out.ack("a", {"ok": True})
+        fan_out.ack("b", {"ok": False, "error": "Already recording"})
+        fan_out.ack("b", {"ok": True})  # Duplicates are ignored
+        fan_out.ack("c", {"ok": True})  # So are recorders it wasn't sent to
+        
+        result = await asyncio.wait_for(fan_out.wait(), 1.0)
+        
+        assert result["acked"] == ["a"]
+        assert result["failed"] == {"b": "Already recording"}
+        assert result["timed_out"] == []
+        assert set(result["latency_ms"]["by_recorder"]) == {"a", "b"}
+    
+    async def test_deadline(self):
+        fan_out = FanOut("start_recording", ["a", "b", "c"], timeout=0.05)
+        fan_out.ack("a", {"ok": True})
+        fan_out.fail("b", "disconnected")
+        
+        result = await fan_out.wait()
+        
+        assert result["acked"] == ["a"]
+        assert result["unreachable"] == {"b": "disconnected"}
+        assert result["timed_out"] == ["c"]
+
+
+class TestRunCommand:
+    async def test_aggregates_the_fleet(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        manager = ws_ui_server.WebSocketUIManager()
+        fast, slow, busy, silent = (FakeRecorder(manager, "fast"), FakeRecorder(manager, "slow", delay=0.05),
+                                    FakeRecorder(manager, "busy", ok=False), FakeRecorder(manager, "silent", delay=None))
+        await register(manager, fast, slow, busy, silent)
+        
+        result = await manager.run_command("all", "arm", {"pre_roll_seconds": 2}, timeout=0.3)
+        
+        assert result["acked"] == ["fast", "slow"]
+        assert result["failed"] == {"busy": "Already recording"}
+        assert result["timed_out"] == ["silent"]
+        by_recorder = result["latency_ms"]["by_recorder"]
+        assert by_recorder["slow"] > by_recorder["fast"]
+        # Every recorder got the same command ID
+        assert {r.received[-1]["command_id"] for r in (fast, slow, busy, silent)} == {result["command_id"]}
+        assert not manager.commands.pending
+        await manager.catalog.stop()
+    
+    async def test_disconnect_ends_the_wait(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        manager = ws_ui_server.WebSocketUIManager()
+        silent = FakeRecorder(manager, "silent", delay=None)
+        await register(manager, silent)
+        
+        task = asyncio.create_task(manager.run_command("silent", "stop_recording", timeout=5.0))
+        await asyncio.sleep(0.01)
+        manager.disconnect_recorder("silent")
+        result = await asyncio.wait_for(task, 1.0)
+        
+        assert result["unreachable"] == {"silent": "disconnected"}
+        await manager.catalog.stop()
+    
+    async def test_ui_gets_the_result(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        manager = ws_ui_server.WebSocketUIManager()
+        await register(manager, FakeRecorder(manager, "rec"))
+        sent = []
+        monkeypatch.setattr(manager, "send_to_ui", lambda websocket, message: sent.append(message))
+        
+        await manager.handle_ui_message(None, {"type": "command", "client_id": "rec", "command": "get_status",
+                                               "request_id": 7, "timeout": 1})
+        await asyncio.sleep(0.05)
+        
+        assert sent[0]["type"] == "command_result"
+        assert sent[0]["request_id"] == 7 and sent[0]["acked"] == ["rec"]
+        await manager.catalog.stop()
+
+
+class TestSynchronizedStart:
+    async def test_clock_offsets_from_pings(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        manager = ws_ui_server.WebSocketUIManager()
+        await register(manager, FakeRecorder(manager, "ahead", delay=0.02, offset=5.0),
+                       FakeRecorder(manager, "behind", delay=0.01, offset=-3.0))
+        
+        await manager.sync_clocks(["ahead", "behind"], pings=3)
+        
+        clocks = manager.connection_metrics()["clocks"]
+        assert clocks["ahead"]["samples"] == clocks["behind"]["samples"] == 3
+        # Symmetric delays leave only the scheduling jitter as error
+        assert abs(clocks["ahead"]["offset_ms"] - 5000) < 10
+        assert abs(clocks["behind"]["offset_ms"] + 3000) < 10
+        assert clocks["ahead"]["rtt_ms"] >= 20
+        assert clocks["ahead"]["uncertainty_ms"] == pytest.approx(clocks["ahead"]["rtt_ms"] / 2, abs=0.001)
+        await manager.catalog.stop()
+    
+    async def test_start_all_is_scheduled_on_each_recorders_clock(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(ws_ui_server, "SYNC_TIMEOUT", 0.1)
+        manager = ws_ui_server.WebSocketUIManager()
+        a, b, silent = (FakeRecorder(manager, "a", offset=2.0), FakeRecorder(manager, "b", offset=-1.0),
+                        FakeRecorder(manager, "silent", delay=None))
+        await register(manager, a, b, silent)
+        start_at = time.time() + 0.5
+        
+        result = await manager.run_command("all", "start_recording", {"duration": 10, "start_at": start_at},
+                                           timeout=0.3)
+        
+        assert result["acked"] == ["a", "b"]
+        assert result["unreachable"] == {"silent": "no clock estimate"}
+        assert result["start_at"] == start_at
+        payload_a, payload_b = a.received[-1]["payload"], b.received[-1]["payload"]
+        assert payload_a["duration"] == 10
+        assert abs(payload_a["start_at"] - (start_at + 2.0)) < 0.01
+        assert abs(payload_b["start_at"] - (start_at - 1.0)) < 0.01
+        assert result["start_skew_ms"] == {"by_recorder": {"a": 0.25, "b": -0.25}, "spread": 0.5}
+        # Answered after the start, while the latency is that of the scheduled ack
+        assert time.time() >= start_at
+        assert result["latency_ms"]["max"] < 300
+        assert set(result["clocks"]) == {"a", "b", "silent"}
+        assert not manager.commands.pending
+        await manager.catalog.stop()
+    
+    async def test_start_is_scheduled_ahead_by_default(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(ws_ui_server, "START_LEAD", 0.2)
+        manager = ws_ui_server.WebSocketUIManager()
+        recorder = FakeRecorder(manager, "rec")
+        await register(manager, recorder)
+        sent = time.time()
+        
+        result = await manager.start_synchronized(["rec"], {"filename": "take.wav"})
+        
+        assert result["acked"] == ["rec"]
+        assert result["start_at"] >= sent + ws_ui_server.START_LEAD
+        assert recorder.received[-1]["payload"]["filename"] == "take.wav"
+        await manager.catalog.stop()
+    
+    async def test_failed_scheduling_is_not_waited_for(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        manager = ws_ui_server.WebSocketUIManager()
+        good, busy = FakeRecorder(manager, "a"), FakeRecorder(manager, "busy", ok=False)
+        await register(manager, good, busy)
+        
+        result = await manager.start_synchronized(["a", "busy"], {"start_at": time.time() + 0.3})
+        
+        assert result["acked"] == ["a"]
+        assert result["failed"] == {"busy": "Already recording"}
+        assert result["start_skew_ms"]["by_recorder"] == {"a": 0.25}
+        assert not manager.commands.pending
+        await manager.catalog.stop()
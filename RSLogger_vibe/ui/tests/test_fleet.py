@@ -0,0 +1,174 @@
+import json
+
+from fleet import FleetState, HUB_TOPICS, OFFLINE, ONLINE, topic, parse_topic
+
+
+def matches(pattern, name):
+    """MQTT topic matching for the single-level ``+`` wildcard."""
+    pattern_parts, name_parts = pattern.split("/"), name.split("/")
+    return len(pattern_parts) == len(name_parts) and all(
+        part in ("+", other) for part, other in zip(pattern_parts, name_parts))
+
+
+class Broker:
+    """A local stand-in for an MQTT broker: retained messages and last wills."""
+
+    def __init__(self):
+        self.retained = {}
+        self.published = []
+        self.clients = []
+
+    def connect(self, will=None):
+        client = BrokerClient(self, will)
+        self.clients.append(client)
+        return client
+
+    def publish(self, name, payload, retain=False):
+        self.published.append(name)
+        if retain:
+            if payload:
+                self.retained[name] = payload
+            else:
+                # An empty retained message clears the topic
+                self.retained.pop(name, None)
+        for client in self.clients:
+            if any(matches(pattern, name) for pattern in client.patterns):
+                client.inbox.append((name, payload))
+
+    def drop(self, client):
+        """Lose a client's connection without a disconnect, firing its will."""
+        self.clients.remove(client)
+        if client.will:
+            self.publish(client.will["topic"], client.will["payload"].encode(), retain=client.will["retain"])
+
+
+class BrokerClient:
+    def __init__(self, broker, will):
+        self.broker = broker
+        self.will = will
+        self.patterns = []
+        self.inbox = []
+
+    def subscribe(self, pattern):
+        self.patterns.append(pattern)
+        # Retained messages are delivered as soon as a client subscribes
+        for name, payload in self.broker.retained.items():
+            if matches(pattern, name):
+                self.inbox.append((name, payload))
+
+    def publish(self, name, payload, retain=False):
+        self.broker.publish(name, payload, retain)
+
+
+def start_recorder(broker, client_id, status):
+    """Connect as a recorder following the protocol in the fleet module docstring."""
+    will = {"topic": topic(client_id, "online"), "payload": OFFLINE, "retain": True}
+    client = broker.connect(will=will)
+    client.publish(topic(client_id, "online"), ONLINE.encode(), retain=True)
+    client.publish(topic(client_id, "status"), json.dumps(status).encode(), retain=True)
+    return client
+
+
+def follow(fleet, client):
+    """Apply everything a hub's client received, as MQTTUIManager.handle_mqtt_message does."""
+    events = []
+    for name, payload in client.inbox:
+        client_id, kind = parse_topic(name)
+        if kind == "status":
+            events += fleet.set_status(client_id, json.loads(payload) if payload else None)
+        elif kind == "online":
+            events += fleet.set_liveness(client_id, payload.decode())
+    client.inbox.clear()
+    return events
+
+
+class TestTopics:
+    def test_parse_topic(self):
+        assert parse_topic(topic("rec-01", "status")) == ("rec-01", "status")
+        assert parse_topic("rslogger/audio/rec-01") is None
+        assert parse_topic("rslogger/audio/rec-01/status/extra") is None
+        assert parse_topic("rslogger/video/rec-01/status") is None
+
+
+class TestFleetState:
+    def test_changes_are_batched(self):
+        fleet = FleetState()
+        assert fleet.set_status("rec-1", {"recording": False}) == []
+        fleet.set_status("rec-2", {"recording": False})
+        fleet.set_status("rec-1", {"recording": True})
+
+        assert fleet.take_batch() == {"rec-1": {"recording": True}, "rec-2": {"recording": False}}
+        assert fleet.take_batch() == {}
+
+    def test_offline_recorders_drop_out(self):
+        fleet = FleetState()
+        fleet.set_status("rec-1", {"recording": False})
+        fleet.take_batch()
+
+        assert fleet.set_liveness("rec-1", OFFLINE) == [{"type": "recorder_disconnected", "client_id": "rec-1"}]
+        assert fleet.recorders() == {}
+        fleet.set_status("rec-1", {"recording": True})
+        assert fleet.take_batch() == {}
+
+        # Coming back sends its status again, since clients dropped it
+        assert fleet.set_liveness("rec-1", ONLINE) == []
+        assert fleet.take_batch() == {"rec-1": {"recording": True}}
+
+    def test_cleared_status_forgets_the_recorder(self):
+        fleet = FleetState()
+        fleet.set_status("rec-1", {})
+
+        assert fleet.set_status("rec-1", None) == [{"type": "recorder_disconnected", "client_id": "rec-1"}]
+        assert fleet.statuses == {}
+        assert fleet.take_batch() == {}
+
+    def test_cleared_liveness_forgets_the_recorder(self):
+        fleet = FleetState()
+        fleet.set_status("rec-1", {})
+        fleet.set_liveness("rec-1", OFFLINE)
+
+        # Not brought back as online
+        assert fleet.set_liveness("rec-1", "") == []
+        assert fleet.statuses == {} and fleet.offline == set()
+        assert fleet.take_batch() == {}
+        assert fleet.set_liveness("rec-2", "") == []
+        assert fleet.recorders() == {}
+
+
+class TestRetainedState:
+    def test_restarted_hub_rebuilds_the_fleet_in_one_pass(self):
+        broker = Broker()
+        recorders = {f"rec-{index}": start_recorder(broker, f"rec-{index}", {"recording": False})
+                     for index in range(4)}
+        recorders["rec-1"].publish(topic("rec-1", "status"), json.dumps({"recording": True}).encode(), retain=True)
+        broker.drop(recorders["rec-3"])
+
+        # The hub starts after all of that and only subscribes
+        hub = broker.connect()
+        before = len(broker.published)
+        for kind in HUB_TOPICS:
+            hub.subscribe(topic("+", kind))
+        fleet = FleetState()
+        events = follow(fleet, hub)
+
+        assert events == []
+        assert fleet.take_batch() == {"rec-0": {"recording": False}, "rec-1": {"recording": True},
+                                      "rec-2": {"recording": False}}
+        assert sorted(fleet.recorders()) == ["rec-0", "rec-1", "rec-2"]
+        # Nothing was asked of the recorders
+        assert len(broker.published) == before
+
+    def test_last_will_marks_a_recorder_offline(self):
+        broker = Broker()
+        hub = broker.connect()
+        for kind in HUB_TOPICS:
+            hub.subscribe(topic("+", kind))
+        fleet = FleetState()
+        recorder = start_recorder(broker, "rec-1", {"recording": True})
+        follow(fleet, hub)
+        assert fleet.take_batch() == {"rec-1": {"recording": True}}
+
+        broker.drop(recorder)
+
+        assert follow(fleet, hub) == [{"type": "recorder_disconnected", "client_id": "rec-1"}]
+        assert broker.retained[topic("rec-1", "online")] == OFFLINE.encode()
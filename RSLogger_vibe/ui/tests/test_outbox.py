@@ -0,0 +1,164 @@
+import asyncio
+import json
+import time
+
+import ws_ui_server
+from outbox import QUEUE_SIZE, Outbox, OverflowPolicy
+
+
+class FakeWebSocket:
+    """Records what is sent; a stalled socket blocks until released."""
+    
+    def __init__(self, stalled=False):
+        self.sent = []
+        self.closed_with = None
+        self.release = asyncio.Event()
+        if not stalled:
+            self.release.set()
+            
+    async def send_text(self, data):
+        await self.release.wait()
+        self.sent.append(data)
+        
+    async def send_bytes(self, data):
+        await self.release.wait()
+        self.sent.append(data)
+        
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+async def drain():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestOutbox:
+    async def test_sends_in_order_and_tracks_lag(self):
+        websocket = FakeWebSocket()
+        outbox = Outbox(websocket, "test")
+        
+        assert outbox.send("a") and outbox.send(b"b")
+        await drain()
+        
+        assert websocket.sent == ["a", b"b"]
+        metrics = outbox.metrics()
+        assert metrics["sent"] == 2 and metrics["queued"] == 0
+        assert metrics["max_lag_ms"] >= metrics["lag_ms"] >= 0
+        outbox.close()
+    
+    async def test_drop_oldest_when_full(self):
+        websocket = FakeWebSocket(stalled=True)
+        outbox = Outbox(websocket, "test", maxsize=3)
+        await drain()  # The writer is now blocked sending nothing yet
+        
+        for index in range(6):
+            outbox.send(str(index))
+        websocket.release.set()
+        await drain()
+        
+        assert websocket.sent == ["3", "4", "5"]
+        assert outbox.metrics()["dropped"] == 3
+        outbox.close()
+    
+    async def test_disconnect_when_full(self):
+        websocket = FakeWebSocket(stalled=True)
+        closed = []
+        outbox = Outbox(websocket, "test", maxsize=2, policy=OverflowPolicy.DISCONNECT, on_close=closed.append)
+        
+        results = [outbox.send(str(index)) for index in range(3)]
+        await drain()
+        
+        assert results == [True, True, False]
+        assert closed == [outbox]
+        assert websocket.closed_with == 1008
+        assert not outbox.send("late")
+    
+    async def test_failed_send_closes(self):
+        websocket = FakeWebSocket()
+        
+        async def broken(data):
+            raise ConnectionError("gone")
+        
+        websocket.send_text = broken
+        closed = []
+        outbox = Outbox(websocket, "test", on_close=closed.append)
+        outbox.send("a")
+        await drain()
+        
+        assert closed == [outbox] and outbox.closed
+
+
+class TestBroadcast:
+    async def connect(self, manager, websocket):
+        websocket.accept = lambda: asyncio.sleep(0)
+        await manager.connect_ui(websocket)
+        
+    async def test_stalled_client_does_not_delay_others(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        manager = ws_ui_server.WebSocketUIManager()
+        stalled = FakeWebSocket(stalled=True)
+        healthy = [FakeWebSocket() for _ in range(3)]
+        for websocket in [stalled] + healthy:
+            await self.connect(manager, websocket)
+            
+        started = time.monotonic()
+        await manager.broadcast_to_ui({"type": "recorder_status", "client_id": "rec-1"})
+        await drain()
+        
+        assert time.monotonic() - started < 0.5
+        for websocket in healthy:
+            assert json.loads(websocket.sent[-1]) == {"type": "recorder_status", "client_id": "rec-1"}
+        # Every client got the same serialized message
+        assert len({id(websocket.sent[-1]) for websocket in healthy}) == 1
+        assert stalled.sent == []
+        assert len(manager.connection_metrics()["ui"]) == 4
+        await manager.catalog.stop()
+    
+    async def test_commands_to_recorders(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        manager = ws_ui_server.WebSocketUIManager()
+        recorders = {f"rec-{index}": FakeWebSocket() for index in range(3)}
+        for client_id, websocket in recorders.items():
+            await manager.handle_recorder_message(websocket, {"type": "register", "client_id": client_id})
+            
+        await manager.broadcast_command_to_recorders("get_status")
+        await manager.send_command_to_recorder("rec-1", "stop_recording")
+        await drain()
+        
+        assert [json.loads(m)["command"] for m in recorders["rec-0"].sent] == ["get_status"]
+        assert [json.loads(m)["command"] for m in recorders["rec-1"].sent] == ["get_status", "stop_recording"]
+        assert set(manager.connection_metrics()["recorders"]) == set(recorders)
+        await manager.catalog.stop()
+    
+    async def test_old_socket_closing_keeps_the_reconnected_recorder(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        manager = ws_ui_server.WebSocketUIManager()
+        old, new = FakeWebSocket(), FakeWebSocket()
+        await manager.handle_recorder_message(old, {"type": "register", "client_id": "rec"})
+        await manager.handle_recorder_message(new, {"type": "register", "client_id": "rec"})
+        
+        # The old socket's receive loop only now sees its disconnect
+        manager.disconnect_recorder("rec", old)
+        await manager.send_command_to_recorder("rec", "get_status")
+        await drain()
+        
+        assert manager.recorder_connections["rec"].websocket is new
+        assert [json.loads(m)["command"] for m in new.sent] == ["get_status"]
+        manager.disconnect_recorder("rec", new)
+        assert "rec" not in manager.recorder_connections
+        await manager.catalog.stop()
+    
+    async def test_recorder_that_falls_behind_is_disconnected(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        manager = ws_ui_server.WebSocketUIManager()
+        websocket = FakeWebSocket(stalled=True)
+        await manager.handle_recorder_message(websocket, {"type": "register", "client_id": "slow"})
+        
+        for _ in range(QUEUE_SIZE + 1):
+            await manager.send_command_to_recorder("slow", "get_status")
+        await drain()
+        
+        assert "slow" not in manager.recorder_connections
+        assert websocket.closed_with == 1008
+        await manager.catalog.stop()
@@ -0,0 +1,19 @@
+import numpy as np
+
+import peaks
+
+
+class TestSharedPeaksReader:
+    def test_reader_is_the_recorder_module(self):
+        # One implementation of the format, loaded from the recorder package
+        assert peaks.read_peaks.__code__.co_filename.endswith("sensors/audio/src/peaks.py")
+        
+    def test_reads_recorder_sidecar(self, tmp_path):
+        builder = peaks._peaks.PeakPyramidBuilder(1, 1000, base_block=10, factor=2)
+        builder.add(np.linspace(-1, 1, 10_000, dtype='float32')[:, None])
+        wav = tmp_path / "rec.wav"
+        builder.write(wav.with_suffix(peaks.PEAKS_SUFFIX))
+        
+        result = peaks.read_peaks(peaks.find_peaks(wav), width=10)
+        assert result["min"][0][0] == -1.0
+        assert result["max"][-1][0] == 1.0
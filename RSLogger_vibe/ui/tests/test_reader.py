@@ -0,0 +1,49 @@
+import wave
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+import reader
+import ws_ui_server
+
+
+def write_pcm16(path, data, samplerate):
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(data.shape[1])
+        f.setsampwidth(2)
+        f.setframerate(samplerate)
+        f.writeframes(data.astype('<i2').tobytes())
+
+
+class TestSharedReader:
+    def test_reader_is_the_recorder_module(self):
+        assert reader.Recording.__init__.__code__.co_filename.endswith("sensors/audio/src/reader.py")
+
+
+class TestRangeDownload:
+    def test_streams_a_range_of_one_channel(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "recordings").mkdir()
+        data = np.arange(4000, dtype=np.int16).reshape(-1, 2)
+        write_pcm16(tmp_path / "recordings" / "take.wav", data, 1000)
+        client = TestClient(ws_ui_server.app)
+        
+        response = client.get("/api/recordings/take.wav", params={"start": 0.5, "end": 0.75, "channel": 1})
+        
+        assert response.status_code == 200
+        assert 'take_500-750.wav' in response.headers["content-disposition"]
+        out = tmp_path / "slice.wav"
+        out.write_bytes(response.content)
+        with wave.open(str(out)) as f:
+            assert (f.getnchannels(), f.getframerate(), f.getnframes()) == (1, 1000, 250)
+            assert np.array_equal(np.frombuffer(f.readframes(250), dtype='<i2'), data[500:750, 1])
+            
+    def test_whole_file_and_bad_channel(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "recordings").mkdir()
+        write_pcm16(tmp_path / "recordings" / "take.wav", np.zeros((100, 1)), 1000)
+        client = TestClient(ws_ui_server.app)
+        
+        whole = client.get("/api/recordings/take.wav")
+        assert whole.content == (tmp_path / "recordings" / "take.wav").read_bytes()
+        assert client.get("/api/recordings/take.wav", params={"channel": 1}).status_code == 400
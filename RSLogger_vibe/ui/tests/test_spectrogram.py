@@ -0,0 +1,170 @@
+import asyncio
+import struct
+import threading
+import time
+import wave
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import spectrogram
+from spectrogram import map_wav, render_tile, TileCache, SpectrogramService, TILE_WIDTH
+
+
+def write_pcm16(path, data, samplerate):
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(data.shape[1])
+        f.setsampwidth(2)
+        f.setframerate(samplerate)
+        f.writeframes(data.astype('<i2').tobytes())
+
+
+def write_float(path, data, samplerate, rf64=False, declared_frames=None):
+    """Write an IEEE float WAV, optionally with an RF64 ds64 header."""
+    channels = data.shape[1]
+    payload = data.astype('<f4').tobytes()
+    data_size = (declared_frames if declared_frames is not None else len(data)) * channels * 4
+    fmt = struct.pack('<HHIIHH', 3, channels, samplerate, samplerate * channels * 4, channels * 4, 32)
+    with open(path, 'wb') as f:
+        if rf64:
+            f.write(struct.pack('<4sI4s', b'RF64', 0xFFFFFFFF, b'WAVE'))
+            f.write(struct.pack('<4sIQQQI', b'ds64', 28, 0, data_size, len(data), 0))
+        else:
+            f.write(struct.pack('<4sI4s', b'RIFF', 36 + data_size, b'WAVE'))
+        f.write(struct.pack('<4sI', b'fmt ', len(fmt)) + fmt)
+        f.write(struct.pack('<4sI', b'data', 0xFFFFFFFF if rf64 else data_size))
+        f.write(payload)
+
+
+def decode_png(png):
+    """Decode the grayscale PNGs produced by encode_png."""
+    width, height = struct.unpack('>II', png[16:24])
+    idat_length = struct.unpack('>I', png[33:37])[0]
+    raw = zlib.decompress(png[41:41 + idat_length])
+    return np.frombuffer(raw, dtype=np.uint8).reshape(height, width + 1)[:, 1:]
+
+
+class TestMapWav:
+    def test_pcm16(self, tmp_path):
+        data = np.arange(-500, 500, dtype=np.int16).reshape(-1, 2)
+        write_pcm16(tmp_path / "a.wav", data, 8000)
+        
+        mapped, rate = map_wav(tmp_path / "a.wav")
+        assert rate == 8000
+        assert mapped.dtype == np.dtype('<i2')
+        assert np.array_equal(mapped, data)
+        
+    def test_float(self, tmp_path):
+        data = np.linspace(-1, 1, 300, dtype=np.float32).reshape(-1, 1)
+        write_float(tmp_path / "a.wav", data, 16000)
+        
+        mapped, rate = map_wav(tmp_path / "a.wav")
+        assert rate == 16000
+        assert np.array_equal(mapped, data)
+        
+    def test_rf64(self, tmp_path):
+        data = np.linspace(-1, 1, 400, dtype=np.float32).reshape(-1, 2)
+        write_float(tmp_path / "a.wav", data, 48000, rf64=True)
+        
+        mapped, _ = map_wav(tmp_path / "a.wav")
+        assert mapped.shape == (200, 2)
+        assert np.array_equal(mapped, data)
+        
+    def test_file_still_being_written(self, tmp_path):
+        # The header claims more frames than have reached the disk
+        data = np.ones((100, 1), dtype=np.float32)
+        write_float(tmp_path / "a.wav", data, 8000, declared_frames=10_000)
+        with open(tmp_path / "a.wav", 'ab') as f:
+            f.write(b'\x00\x00')  # Half a sample
+        
+        mapped, _ = map_wav(tmp_path / "a.wav")
+        assert len(mapped) == 100
+        
+    def test_not_a_wav(self, tmp_path):
+        (tmp_path / "a.wav").write_bytes(b'not a wav file at all')
+        with pytest.raises(ValueError):
+            map_wav(tmp_path / "a.wav")
+
+
+class TestRenderTile:
+    def test_tone_lands_in_expected_row(self, tmp_path):
+        rate, nfft, freq = 8000, 256, 1000
+        t = np.arange(rate * 2) / rate
+        write_pcm16(tmp_path / "tone.wav", (np.sin(2 * np.pi * freq * t) * 16000)[:, None], rate)
+        
+        image = decode_png(render_tile(str(tmp_path / "tone.wav"), 0, 0, nfft))
+        
+        assert image.shape == (nfft // 2, TILE_WIDTH)
+        # Low frequencies are at the bottom
+        expected_row = nfft // 2 - 1 - freq * nfft // rate
+        loudest_rows = image[:, 10:-10].argmax(axis=0)
+        assert np.all(np.abs(loudest_rows - expected_row) <= 1)
+        
+    def test_tile_past_end(self, tmp_path):
+        write_pcm16(tmp_path / "a.wav", np.zeros((8000, 1)), 8000)
+        with pytest.raises(IndexError):
+            render_tile(str(tmp_path / "a.wav"), 0, 5, 256)
+
+
+class TestTileCache:
+    def test_lru_eviction_and_accounting(self, tmp_path):
+        cache = TileCache(tmp_path, max_bytes=30)
+        cache.put("a", b"x" * 10)
+        cache.put("b", b"x" * 10)
+        cache.put("c", b"x" * 10)
+        # Touch "a" so "b" is the least recently used
+        assert cache.get("a") == b"x" * 10
+        cache.put("d", b"x" * 10)
+        
+        assert cache.get("b") is None
+        assert not (tmp_path / "b.png").exists()
+        assert cache._total_bytes == 30
+        assert list(cache._entries) == ["c", "a", "d"]
+        
+    def test_replacing_a_tile_updates_size(self, tmp_path):
+        cache = TileCache(tmp_path, max_bytes=100)
+        cache.put("a", b"x" * 10)
+        cache.put("a", b"x" * 25)
+        assert cache._total_bytes == 25
+        
+    def test_index_is_rebuilt_from_disk(self, tmp_path):
+        TileCache(tmp_path).put("a", b"tile")
+        assert TileCache(tmp_path).get("a") == b"tile"
+
+
+class TestSpectrogramService:
+    async def test_concurrent_requests_share_one_computation(self, tmp_path, monkeypatch):
+        write_pcm16(tmp_path / "a.wav", np.zeros((8000, 1)), 8000)
+        calls = []
+        lock = threading.Lock()
+        
+        def slow_render(path, zoom, index, nfft):
+            with lock:
+                calls.append((zoom, index, nfft))
+            time.sleep(0.1)
+            return b"png"
+        
+        monkeypatch.setattr(spectrogram, "render_tile", slow_render)
+        service = SpectrogramService(tmp_path, cache_dir=tmp_path / "cache")
+        service._executor = ThreadPoolExecutor(max_workers=4)
+        try:
+            tiles = await asyncio.gather(*(service.get_tile("a.wav", 0, 0, 256) for _ in range(5)))
+            # Later requests are served from the cache
+            again = await service.get_tile("a.wav", 0, 0, 256)
+        finally:
+            service.shutdown()
+        
+        assert tiles == [b"png"] * 5
+        assert again == b"png"
+        assert calls == [(0, 0, 256)]
+        
+    async def test_rejects_bad_requests(self, tmp_path):
+        service = SpectrogramService(tmp_path)
+        with pytest.raises(ValueError):
+            await service.get_tile("a.wav", 0, 0, 300)
+        with pytest.raises(IndexError):
+            await service.get_tile("a.wav", 99, 0, 256)
+        with pytest.raises(FileNotFoundError):
+            await service.get_tile("missing.wav", 0, 0, 256)
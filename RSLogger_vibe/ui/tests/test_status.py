@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+import ws_ui_server
+from status import RecorderStatus
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+        
+    async def send_text(self, data):
+        self.sent.append(json.loads(data))
+        
+    async def close(self, code=1000):
+        pass
+    
+    def of_type(self, kind):
+        return [message for message in self.sent if message["type"] == kind]
+
+
+def delta(version, changes, removed=()):
+    return {"type": "status_delta", "client_id": "rec", "version": version, "base_version": version - 1,
+            "changes": changes, "removed": list(removed)}
+
+
+class TestRecorderStatus:
+    def test_deltas_follow_on_from_the_snapshot(self):
+        status = RecorderStatus()
+        assert not status.apply(delta(2, {"recording": True}))
+        
+        status.snapshot({"type": "status", "version": 1, "recording": False, "armed": False, "disk": None})
+        assert status.take_update() == {"type": "recorder_status", "version": 1, "base_version": None,
+                                        "status": {"recording": False, "armed": False, "disk": None}}
+        assert status.apply(delta(2, {"recording": True}))
+        assert status.apply(delta(3, {"armed": True}, removed=["disk"]))
+        assert status.apply(delta(4, {"recording": False}))
+        # A delta that skips a version is refused
+        assert not status.apply(delta(6, {"armed": False}))
+        
+        assert status.take_update() == {"type": "recorder_status_delta", "version": 4, "base_version": 1,
+                                        "changes": {"armed": True, "recording": False}, "removed": ["disk"]}
+        assert status.take_update() is None
+        assert status.fields == {"recording": False, "armed": True}
+
+
+class TestStatusForwarding:
+    async def setup(self, tmp_path, monkeypatch, tick):
+        monkeypatch.chdir(tmp_path)
+        manager = ws_ui_server.WebSocketUIManager(status_tick=tick)
+        recorder, ui = FakeSocket(), FakeSocket()
+        await manager.handle_recorder_message(recorder, {"type": "register", "client_id": "rec"})
+        await manager.handle_recorder_message(recorder, {"type": "status", "client_id": "rec", "version": 1,
+                                                         "recording": False, "capabilities": {"devices": []}})
+        await asyncio.sleep(tick + 0.01)  # Forward the snapshot before the client connects
+        manager.ui_connections[ui] = ws_ui_server.Outbox(ui, "UI client")
+        manager.subscriptions.add(ui)
+        return manager, recorder, ui
+    
+    async def test_bursts_are_coalesced_per_tick(self, tmp_path, monkeypatch):
+        manager, recorder, ui = await self.setup(tmp_path, monkeypatch, tick=0.05)
+        for version in range(2, 12):
+            await manager.handle_recorder_message(recorder, delta(version, {"recording": version % 2 == 0}))
+        await asyncio.sleep(0.1)
+        
+        update, = ui.of_type("recorder_status_delta")
+        assert update == {"type": "recorder_status_delta", "client_id": "rec", "version": 11, "base_version": 1,
+                          "changes": {"recording": False}, "removed": []}
+        assert manager.get_recorders_status()["rec"] == {"client_id": "rec", "recording": False,
+                                                         "capabilities": {"devices": []}}
+        await manager.catalog.stop()
+    
+    async def test_without_a_tick_each_change_is_forwarded(self, tmp_path, monkeypatch):
+        manager, recorder, ui = await self.setup(tmp_path, monkeypatch, tick=0)
+        await manager.handle_recorder_message(recorder, delta(2, {"recording": True}))
+        await manager.handle_recorder_message(recorder, delta(3, {"recording": False}))
+        await asyncio.sleep(0.01)
+        
+        assert [update["version"] for update in ui.of_type("recorder_status_delta")] == [2, 3]
+        await manager.catalog.stop()
+    
+    async def test_missed_delta_requests_one_snapshot(self, tmp_path, monkeypatch):
+        manager, recorder, ui = await self.setup(tmp_path, monkeypatch, tick=0)
+        await manager.handle_recorder_message(recorder, delta(3, {"recording": True}))
+        await manager.handle_recorder_message(recorder, delta(4, {"recording": False}))
+        await asyncio.sleep(0.01)
+        
+        requests = [message for message in recorder.sent if message.get("command") == "get_status"]
+        assert len(requests) == 1
+        assert ui.of_type("recorder_status_delta") == []
+        
+        await manager.handle_recorder_message(recorder, {"type": "status", "client_id": "rec", "version": 4,
+                                                         "recording": False})
+        await manager.handle_recorder_message(recorder, delta(5, {"recording": True}))
+        await asyncio.sleep(0.01)
+        assert ui.of_type("recorder_status")[-1]["version"] == 4
+        assert ui.of_type("recorder_status_delta")[-1]["changes"] == {"recording": True}
+        await manager.catalog.stop()
+    
+    async def test_ui_can_ask_for_the_hubs_copy(self, tmp_path, monkeypatch):
+        manager, recorder, ui = await self.setup(tmp_path, monkeypatch, tick=0)
+        await manager.handle_ui_message(ui, {"type": "get_recorder_status", "client_id": "rec"})
+        await asyncio.sleep(0.01)
+        
+        status, = ui.of_type("recorder_status")
+        assert status["version"] == 1 and status["status"]["recording"] is False
+        await manager.catalog.stop()
@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+import ws_ui_server
+from subscriptions import SubscriptionIndex
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+        
+    async def send_text(self, data):
+        self.sent.append(json.loads(data))
+        
+    async def close(self, code=1000):
+        pass
+    
+    def of_type(self, kind):
+        return [message for message in self.sent if message["type"] == kind]
+
+
+class TestSubscriptionIndex:
+    def test_everything_until_the_first_subscribe(self):
+        index = SubscriptionIndex()
+        index.add("ui")
+        assert index.subscribers("rec-1", "recorder_error") == {"ui"}
+        
+        index.subscribe("ui", client_ids=["rec-1", "rec-2"])
+        index.subscribe("ui", types=["recorder_error"])
+        
+        assert index.subscribers("rec-1", "recorder_system_stats") == {"ui"}
+        assert index.subscribers("rec-3", "recorder_system_stats") == set()
+        assert index.subscribers("rec-3", "recorder_error") == {"ui"}
+    
+    def test_status_deltas_follow_status(self):
+        index = SubscriptionIndex()
+        index.subscribe("ui", client_ids=["rec-1"], types=["recorder_status"])
+        
+        assert index.subscribers("rec-1", "recorder_status_delta") == {"ui"}
+        assert index.subscribers("rec-1", "recorder_error") == set()
+    
+    def test_unsubscribe_and_remove(self):
+        index = SubscriptionIndex()
+        index.subscribe("a", client_ids=["rec-1", "rec-2"])
+        index.subscribe("b", client_ids=["rec-1"])
+        
+        index.unsubscribe("a", client_ids=["rec-1"])
+        assert index.topics("a") == [("rec-2", "*")]
+        assert index.subscribers("rec-1", "recorder_status") == {"b"}
+        
+        index.remove("b")
+        index.unsubscribe("a")
+        assert index.subscribers("rec-1", "recorder_status") == set()
+        assert index.subscribers("rec-2", "recorder_status") == set()
+        # Emptied topics don't linger in the index
+        assert not index._subscribers
+
+
+class TestHubFanOut:
+    async def test_dashboard_gets_only_its_recorders(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        manager = ws_ui_server.WebSocketUIManager(status_tick=0)
+        recorders = {f"rec-{index}": FakeSocket() for index in range(5)}
+        for client_id, socket in recorders.items():
+            await manager.handle_recorder_message(socket, {"type": "register", "client_id": client_id})
+            await manager.handle_recorder_message(socket, {"type": "status", "client_id": client_id, "version": 1,
+                                                           "recording": False})
+        dashboard, overview = FakeSocket(), FakeSocket()
+        for ui in (dashboard, overview):
+            manager.ui_connections[ui] = ws_ui_server.Outbox(ui, "UI client")
+            manager.subscriptions.add(ui)
+        
+        await manager.handle_ui_message(dashboard, {"type": "subscribe", "client_ids": ["rec-1"]})
+        await manager.handle_ui_message(dashboard, {"type": "subscribe", "client_ids": ["rec-3"]})
+        for client_id, socket in recorders.items():
+            await manager.handle_recorder_message(socket, {"type": "error", "client_id": client_id, "error": "x"})
+        await asyncio.sleep(0.01)
+        
+        subscribed = dashboard.of_type("subscribed")[-1]
+        assert subscribed["topics"] == [{"client_id": "rec-1", "type": "*"}, {"client_id": "rec-3", "type": "*"}]
+        # Only newly watched recorders are started from the hub's copy of their status
+        assert [message["client_id"] for message in dashboard.of_type("recorder_status")] == ["rec-3"]
+        assert [message["client_id"] for message in dashboard.of_type("recorder_error")] == ["rec-1", "rec-3"]
+        # A client that never subscribed still gets everything
+        assert len(overview.of_type("recorder_error")) == 5
+        
+        manager.disconnect_ui(dashboard)
+        assert dashboard not in manager.subscriptions.subscribers("rec-1", "recorder_error")
+        await manager.catalog.stop()
@@ -3,19 +3,42 @@
 import asyncio
 import json
 import logging
+import struct
+import time
 from pathlib import Path
-from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Set
 import argparse
 import sys
 import signal
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 
+try:
+    from .peaks import read_peaks, find_peaks
+    from .spectrogram import SpectrogramService
+    from .reader import Recording
+    from .catalog import RecordingsCatalog, query_filters
+    from .outbox import Outbox, OverflowPolicy
+    from .commands import CommandTracker, COMMAND_TIMEOUT
+    from .sync import ClockEstimate, SYNC_PINGS, SYNC_TIMEOUT, START_LEAD
+    from .status import RecorderStatus, STATUS_TICK
+    from .subscriptions import SubscriptionIndex
+except ImportError:
+    # Run as a script from the ui directory
+    from peaks import read_peaks, find_peaks
+    from spectrogram import SpectrogramService
+    from reader import Recording
+    from catalog import RecordingsCatalog, query_filters
+    from outbox import Outbox, OverflowPolicy
+    from commands import CommandTracker, COMMAND_TIMEOUT
+    from sync import ClockEstimate, SYNC_PINGS, SYNC_TIMEOUT, START_LEAD
+    from status import RecorderStatus, STATUS_TICK
+    from subscriptions import SubscriptionIndex
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -33,33 +56,58 @@ app.add_middleware(
 )
 
 
+MONITOR_RATE = 16000  # Sample rate requested for live monitoring streams
+
+
 class RecorderConnection:
     """Represents a connected recorder client."""
-    def __init__(self, client_id: str, websocket: WebSocket):
+    def __init__(self, client_id: str, websocket: WebSocket, outbox: Outbox):
         self.client_id = client_id
         self.websocket = websocket
-        self.status = {}
+        self.outbox = outbox
+        self.status = RecorderStatus()
+        self.system_stats: Dict[str, Any] = {}
+        self.clock = ClockEstimate()
         
 
 class WebSocketUIManager:
     """Manages WebSocket connections for both UI clients and recorder services."""
     
-    def __init__(self):
-        self.ui_connections: List[WebSocket] = []
+    def __init__(self, status_tick: float = STATUS_TICK):
+        self.ui_connections: Dict[WebSocket, Outbox] = {}
+        # The recorders and message types each UI client receives
+        self.subscriptions = SubscriptionIndex()
         self.recorder_connections: Dict[str, RecorderConnection] = {}
-        self.recordings: List[Dict[str, Any]] = []
+        self.commands = CommandTracker()
+        self.catalog = RecordingsCatalog(Path("recordings"))
+        self.catalog.add_listener(self.update_recordings)
+        self.monitor_listeners: Dict[str, Set[WebSocket]] = {}
+        # Recorders already told to stop monitoring, so in-flight frames don't trigger more stops
+        self.monitor_stop_pending: Set[str] = set()
+        # Recorders whose status changed since it was last forwarded, sent on together every tick
+        self.status_tick = status_tick
+        self.status_pending: Set[str] = set()
+        self._status_flush: Optional[asyncio.Task] = None
         
     async def connect_ui(self, websocket: WebSocket):
         """Handle new UI client connection."""
         await websocket.accept()
-        self.ui_connections.append(websocket)
-        
-        # Send initial state
-        await websocket.send_json({
+        initial_state = {
             "type": "initial_state",
             "recorders": self.get_recorders_status(),
-            "recordings": await self.get_recordings()
-        })
+            # The versions later recorder_status_delta messages follow on from
+            "status_versions": {
+                client_id: recorder.status.forwarded_version
+                for client_id, recorder in self.recorder_connections.items()
+            },
+            **await self.initial_recordings()
+        }
+        # Queue the initial state before any broadcast can reach the new client
+        # UI state is re-sent continually, so a client that falls behind loses its oldest messages
+        self.ui_connections[websocket] = Outbox(websocket, "UI client", policy=OverflowPolicy.DROP_OLDEST,
+                                                on_close=lambda outbox: self.disconnect_ui(outbox.websocket))
+        self.subscriptions.add(websocket)
+        self.send_to_ui(websocket, initial_state)
         
     async def connect_recorder(self, websocket: WebSocket):
         """Handle new recorder service connection."""
@@ -68,73 +116,129 @@ class WebSocketUIManager:
         
     def disconnect_ui(self, websocket: WebSocket):
         """Handle UI client disconnection."""
-        if websocket in self.ui_connections:
-            self.ui_connections.remove(websocket)
+        outbox = self.ui_connections.pop(websocket, None)
+        if outbox:
+            outbox.close()
+        self.subscriptions.remove(websocket)
             
-    def disconnect_recorder(self, client_id: str):
-        """Handle recorder service disconnection."""
-        if client_id in self.recorder_connections:
-            del self.recorder_connections[client_id]
-            # Notify UI clients
-            asyncio.create_task(self.broadcast_to_ui({
-                "type": "recorder_disconnected",
-                "client_id": client_id
-            }))
+        # Release any monitoring streams this client was listening to
+        for client_id in list(self.monitor_listeners):
+            self.remove_monitor_listener(client_id, websocket)
             
+    def disconnect_recorder(self, client_id: str, websocket: Optional[WebSocket] = None):
+        """Handle recorder service disconnection.
+
+        With ``websocket``, only if that is still the recorder's connection:
+        a recorder that reconnected has replaced it, and the old socket
+        closing must not take the new connection with it.
+        """
+        recorder = self.recorder_connections.get(client_id)
+        if recorder is None or (websocket is not None and recorder.websocket is not websocket):
+            return
+        self.monitor_stop_pending.discard(client_id)
+        self.status_pending.discard(client_id)
+        self.recorder_connections.pop(client_id).outbox.close()
+        self.commands.recorder_gone(client_id)
+        # Notify UI clients
+        asyncio.create_task(self.publish_to_ui(client_id, {
+            "type": "recorder_disconnected",
+            "client_id": client_id
+        }))
+        
     async def handle_recorder_message(self, websocket: WebSocket, message: Dict[str, Any]):
         """Handle messages from recorder services."""
         msg_type = message.get("type")
         client_id = message.get("client_id")
         
         if msg_type == "register":
-            # Register new recorder
-            self.recorder_connections[client_id] = RecorderConnection(client_id, websocket)
+            # Register new recorder, replacing a connection it left behind
+            previous = self.recorder_connections.get(client_id)
+            if previous:
+                previous.outbox.on_close = None
+                previous.outbox.close()
+            # Commands must not be lost, so a recorder that can't keep up is disconnected
+            outbox = Outbox(websocket, f"recorder {client_id}", policy=OverflowPolicy.DISCONNECT,
+                            on_close=lambda outbox: self.recorder_outbox_closed(client_id, outbox))
+            self.recorder_connections[client_id] = RecorderConnection(client_id, websocket, outbox)
             logger.info(f"Recorder {client_id} registered")
+            # Recorders stop monitoring whenever they connect
+            self.monitor_stop_pending.discard(client_id)
+            
+            # Resume monitoring for UIs that were listening before a reconnect
+            if self.monitor_listeners.get(client_id):
+                await self.send_command_to_recorder(client_id, "start_monitor", {"samplerate": MONITOR_RATE})
             
             # Notify UI clients
-            await self.broadcast_to_ui({
+            await self.publish_to_ui(client_id, {
                 "type": "recorder_connected",
                 "client_id": client_id
             })
             
         elif msg_type == "status":
-            # Update recorder status
-            if client_id in self.recorder_connections:
-                self.recorder_connections[client_id].status = message
+            # A full snapshot, sent on registering or when asked for
+            recorder = self.recorder_connections.get(client_id)
+            if recorder:
+                recorder.status.snapshot(message)
+                await self.status_changed(client_id)
                 
-            # Forward to UI clients
-            await self.broadcast_to_ui({
-                "type": "recorder_status",
-                "client_id": client_id,
-                "status": message
-            })
+        elif msg_type == "status_delta":
+            recorder = self.recorder_connections.get(client_id)
+            if not recorder:
+                return
+            if recorder.status.apply(message):
+                await self.status_changed(client_id)
+            elif not recorder.status.resync_requested:
+                # A delta went missing or arrived out of order; start again from a snapshot
+                recorder.status.resync_requested = True
+                logger.info(f"Status of {client_id} out of step, requesting a snapshot")
+                await self.send_command_to_recorder(client_id, "get_status")
             
         elif msg_type == "event":
             # Handle recorder events
             event = message.get("event")
             
             if event == "recording_completed":
-                # Update recordings list
-                await self.update_recordings()
+                await self.recording_completed(client_id, message.get("filename"))
                 
             # Forward event to UI clients
-            await self.broadcast_to_ui({
+            await self.publish_to_ui(client_id, {
                 "type": f"recorder_{event}",
                 "client_id": client_id,
                 "data": message
             })
             
+        elif msg_type == "ack":
+            # A recorder finished handling a command sent with an ID
+            self.commands.ack(client_id, message)
+            
         elif msg_type == "error":
             # Forward error to UI clients
-            await self.broadcast_to_ui({
+            await self.publish_to_ui(client_id, {
                 "type": "recorder_error",
                 "client_id": client_id,
                 "error": message.get("error")
             })
             
+        elif msg_type == "system_stats":
+            # Periodic resource sample pushed by the recorder
+            if client_id in self.recorder_connections:
+                self.recorder_connections[client_id].system_stats = message.get("stats", {})
+            await self.publish_to_ui(client_id, {
+                "type": "recorder_system_stats",
+                "client_id": client_id,
+                "stats": message.get("stats", {})
+            })
+            
+        elif msg_type == "system_stats_history":
+            await self.publish_to_ui(client_id, {
+                "type": "recorder_system_stats_history",
+                "client_id": client_id,
+                "samples": message.get("samples", [])
+            })
+            
         elif msg_type == "devices_list":
             # Forward devices list to UI clients
-            await self.broadcast_to_ui({
+            await self.publish_to_ui(client_id, {
                 "type": "devices_list",
                 "client_id": client_id,
                 "devices": message.get("devices", [])
@@ -149,113 +253,380 @@ class WebSocketUIManager:
             command = message.get("command")
             payload = message.get("payload", {})
             
-            if client_id == "all":
-                # Broadcast to all recorders
-                await self.broadcast_command_to_recorders(command, payload)
-            elif client_id in self.recorder_connections:
-                # Send to specific recorder
-                await self.send_command_to_recorder(client_id, command, payload)
+            if client_id == "all" or client_id in self.recorder_connections:
+                # Reply with the recorders' acknowledgements without holding up this client's messages
+                asyncio.create_task(self.report_command(websocket, message))
             else:
-                await websocket.send_json({
+                self.send_to_ui(websocket, {
                     "type": "error",
                     "error": f"Recorder {client_id} not connected"
                 })
                 
+        elif msg_type == "monitor_subscribe":
+            client_id = message.get("client_id")
+            if client_id in self.recorder_connections:
+                listeners = self.monitor_listeners.setdefault(client_id, set())
+                first_listener = not listeners
+                listeners.add(websocket)
+                if first_listener:
+                    self.monitor_stop_pending.discard(client_id)
+                    await self.send_command_to_recorder(client_id, "start_monitor", {"samplerate": MONITOR_RATE})
+            else:
+                self.send_to_ui(websocket, {
+                    "type": "error",
+                    "error": f"Recorder {client_id} not connected"
+                })
+                
+        elif msg_type == "monitor_unsubscribe":
+            self.remove_monitor_listener(message.get("client_id"), websocket)
+            
+        elif msg_type in ("subscribe", "unsubscribe"):
+            client_ids, types = message.get("client_ids"), message.get("types")
+            watched = {client_id for client_id in self.recorder_connections
+                       if websocket in self.subscriptions.subscribers(client_id, "recorder_status")}
+            if msg_type == "subscribe":
+                self.subscriptions.subscribe(websocket, client_ids, types)
+            else:
+                self.subscriptions.unsubscribe(websocket, client_ids, types)
+            self.send_to_ui(websocket, {
+                "type": "subscribed",
+                "topics": [{"client_id": client_id, "type": kind}
+                           for client_id, kind in self.subscriptions.topics(websocket)]
+            })
+            if msg_type == "subscribe":
+                # Start newly watched recorders from their current status
+                for client_id in self.recorder_connections:
+                    if client_id not in watched and websocket in self.subscriptions.subscribers(
+                            client_id, "recorder_status"):
+                        self.send_recorder_status(websocket, client_id)
+                        
+        elif msg_type == "get_recorder_status":
+            # A client that missed a status delta starts again from the hub's copy
+            for client_id in self.recorder_connections:
+                if message.get("client_id") in (None, client_id):
+                    self.send_recorder_status(websocket, client_id)
+                    
         elif msg_type == "refresh_recorders":
             # Request status from all recorders
             await self.broadcast_command_to_recorders("get_status")
             
         elif msg_type == "get_recordings":
-            recordings = await self.get_recordings()
-            await websocket.send_json({
+            try:
+                filters = query_filters(message)
+                page = await self.get_recordings(**filters)
+            except ValueError as e:
+                self.send_to_ui(websocket, {"type": "error", "error": str(e)})
+                return
+            self.send_to_ui(websocket, {
                 "type": "recordings_list",
-                "recordings": recordings
+                "cursor": filters.get("cursor"),
+                "recordings": page["recordings"],
+                "next_cursor": page["next_cursor"]
             })
             
-    async def send_command_to_recorder(self, client_id: str, command: str, payload: Dict[str, Any] = None):
-        """Send command to specific recorder."""
+    async def handle_recorder_audio(self, client_id: str, frame: bytes):
+        """Forward a binary monitoring frame to the UIs listening to this recorder."""
+        listeners = self.monitor_listeners.get(client_id)
+        if not listeners:
+            # Nobody is listening any more; tell the recorder to stop streaming, once
+            if client_id not in self.monitor_stop_pending:
+                self.monitor_stop_pending.add(client_id)
+                await self.send_command_to_recorder(client_id, "stop_monitor")
+            return
+            
+        # Prefix the client_id so the browser can route the frame
+        encoded_id = client_id.encode()
+        message = struct.pack('<B', len(encoded_id)) + encoded_id + frame
+        
+        for connection in list(listeners):
+            outbox = self.ui_connections.get(connection)
+            if outbox:
+                outbox.send(message)
+            
+    def remove_monitor_listener(self, client_id: str, websocket: WebSocket):
+        """Remove a UI from a monitoring stream, stopping the stream when it was the last one."""
+        listeners = self.monitor_listeners.get(client_id)
+        if not listeners or websocket not in listeners:
+            return
+        listeners.discard(websocket)
+        if not listeners:
+            del self.monitor_listeners[client_id]
+            self.monitor_stop_pending.add(client_id)
+            asyncio.create_task(self.send_command_to_recorder(client_id, "stop_monitor"))
+            
+    def command_message(self, command: str, payload: Optional[Dict[str, Any]], command_id: Optional[str]) -> str:
+        """Serialize a command, with the ID recorders acknowledge it by if there is one."""
+        message = {
+            "type": "command",
+            "command": command,
+            "payload": payload or {}
+        }
+        if command_id:
+            message["command_id"] = command_id
+        return json.dumps(message)
+        
+    async def send_command_to_recorder(self, client_id: str, command: str, payload: Dict[str, Any] = None,
+                                       command_id: Optional[str] = None) -> bool:
+        """Send command to specific recorder; False if it could not be queued."""
         if client_id in self.recorder_connections:
             recorder = self.recorder_connections[client_id]
-            try:
-                await recorder.websocket.send_json({
-                    "type": "command",
-                    "command": command,
-                    "payload": payload or {}
-                })
+            if recorder.outbox.send(self.command_message(command, payload, command_id)):
                 logger.info(f"Sent command '{command}' to {client_id}")
-            except Exception as e:
-                logger.error(f"Error sending command to {client_id}: {e}")
-                self.disconnect_recorder(client_id)
-                
-    async def broadcast_command_to_recorders(self, command: str, payload: Dict[str, Any] = None):
-        """Broadcast command to all recorders."""
-        disconnected = []
-        for client_id, recorder in self.recorder_connections.items():
-            try:
-                await recorder.websocket.send_json({
-                    "type": "command",
-                    "command": command,
-                    "payload": payload or {}
-                })
-            except Exception:
-                disconnected.append(client_id)
+                return True
+        return False
                 
-        for client_id in disconnected:
-            self.disconnect_recorder(client_id)
+    async def broadcast_command_to_recorders(self, command: str, payload: Dict[str, Any] = None,
+                                             command_id: Optional[str] = None) -> List[str]:
+        """Broadcast command to all recorders; returns the recorders it could not be queued for."""
+        # Serialized once; queueing never waits on a slow recorder
+        data = self.command_message(command, payload, command_id)
+        return [
+            recorder.client_id for recorder in list(self.recorder_connections.values())
+            if not recorder.outbox.send(data)
+        ]
+        
+    async def run_command(self, client_id: str, command: str, payload: Dict[str, Any] = None,
+                          timeout: float = COMMAND_TIMEOUT) -> Dict[str, Any]:
+        """Send a command to one recorder or ``"all"`` and wait for the acknowledgements.
+
+        Returns the fan-out result: the recorders that acknowledged, failed,
+        couldn't be sent the command or timed out, with ack latencies.
+        """
+        targets = list(self.recorder_connections) if client_id == "all" else [client_id]
+        if command == "start_recording" and (client_id == "all" or "start_at" in (payload or {})):
+            return await self.start_synchronized(targets, payload, timeout)
+        fan_out = self.commands.start(command, targets, timeout)
+        if client_id == "all":
+            unsent = await self.broadcast_command_to_recorders(command, payload, fan_out.command_id)
+        elif await self.send_command_to_recorder(client_id, command, payload, fan_out.command_id):
+            unsent = []
+        else:
+            unsent = [client_id]
+        for target in unsent:
+            fan_out.fail(target, "not connected")
+        result = await self.commands.wait(fan_out)
+        logger.info(f"Command '{command}': {len(result['acked'])}/{result['recorders']} acknowledged, "
+                    f"{len(result['timed_out'])} timed out")
+        return result
+        
+    async def sync_clocks(self, client_ids: List[str], pings: int = SYNC_PINGS):
+        """Estimate the clock offset of each recorder from a few acknowledged pings."""
+        for client_id in client_ids:
+            if client_id in self.recorder_connections:
+                self.recorder_connections[client_id].clock.reset()
+        for _ in range(pings):
+            fan_out = self.commands.start("ping", client_ids, SYNC_TIMEOUT)
+            for client_id in client_ids:
+                if not await self.send_command_to_recorder(client_id, "ping", None, fan_out.command_id):
+                    fan_out.fail(client_id, "not connected")
+            await self.commands.wait(fan_out)
+            for client_id, ack in fan_out.acks.items():
+                recorder = self.recorder_connections.get(client_id)
+                if recorder:
+                    recorder.clock.add(fan_out.sent_wall, ack["latency"], ack["received_at"], ack["completed_at"])
+                    
+    async def start_synchronized(self, client_ids: List[str], payload: Optional[Dict[str, Any]] = None,
+                                 timeout: float = COMMAND_TIMEOUT) -> Dict[str, Any]:
+        """Start recording on every recorder at one instant, and report how close each came.
+
+        The instant is ``payload["start_at"]`` on the hub's clock if given, or
+        shortly after the recorders' clocks have been measured. Each recorder
+        is sent it on its own clock and acknowledges it straight away as
+        scheduled, then again with its start skew once it has started.
+        """
+        payload = dict(payload or {})
+        await self.sync_clocks(client_ids)
+        clocks = {client_id: self.recorder_connections[client_id].clock
+                  for client_id in client_ids if client_id in self.recorder_connections}
+        # Leave time for the slowest recorder to get the command and open its stream
+        lead = START_LEAD + max((clock.rtt for clock in clocks.values() if clock.rtt is not None), default=0.0)
+        start_at = payload.pop("start_at", None) or time.time() + lead
+        
+        fan_out = self.commands.start("start_recording", client_ids, timeout)
+        # Tracked from the outset, so a start that comes quickly isn't missed
+        started = self.commands.start("start_recording", client_ids, timeout + max(start_at - time.time(), 0.0),
+                                      fan_out.command_id, stage="started")
+        for client_id in client_ids:
+            clock = clocks.get(client_id)
+            if clock is None or clock.offset is None:
+                fan_out.fail(client_id, "no clock estimate")
+            elif not await self.send_command_to_recorder(client_id, "start_recording",
+                                                         {**payload, "start_at": clock.to_recorder(start_at)},
+                                                         fan_out.command_id):
+                fan_out.fail(client_id, "not connected")
+        scheduled = await self.commands.wait(fan_out)
+        
+        # Only recorders that scheduled the start have a second ack to wait for
+        for client_id, ack in fan_out.acks.items():
+            if not ack["ok"] or not (ack["result"] or {}).get("scheduled"):
+                # A failure, or a recorder that answers only once started
+                started.ack(client_id, ack)
+        for client_id, reason in fan_out.unreachable.items():
+            started.fail(client_id, reason)
+        for client_id in scheduled["timed_out"]:
+            started.fail(client_id, "start not acknowledged")
+        result = await self.commands.wait(started)
+        # How quickly recorders answered the command, rather than how long until the start
+        result["latency_ms"] = scheduled["latency_ms"]
+        
+        skews = {client_id: recorder_result["start_skew_ms"] for client_id, recorder_result in result["results"].items()
+                 if recorder_result.get("start_skew_ms") is not None}
+        result["start_at"] = start_at
+        result["clocks"] = {client_id: clock.as_dict() for client_id, clock in clocks.items()}
+        # Each skew is exact on its recorder's clock; across recorders add the offsets' uncertainty
+        result["start_skew_ms"] = {
+            "by_recorder": skews,
+            "spread": round(max(skews.values()) - min(skews.values()), 3) if skews else None,
+        }
+        logger.info(f"Synchronized start at {start_at:.3f}: {len(result['acked'])}/{result['recorders']} started, "
+                    f"skew spread {result['start_skew_ms']['spread']} ms")
+        return result
+        
+    async def report_command(self, websocket: WebSocket, message: Dict[str, Any]):
+        """Run a UI client's command and send it the result."""
+        try:
+            timeout = float(message.get("timeout") or COMMAND_TIMEOUT)
+        except (TypeError, ValueError):
+            timeout = COMMAND_TIMEOUT
+        result = await self.run_command(message.get("client_id"), message.get("command"),
+                                        message.get("payload", {}), timeout)
+        self.send_to_ui(websocket, {
+            "type": "command_result",
+            "request_id": message.get("request_id"),
+            **result
+        })
             
     async def broadcast_to_ui(self, message: Dict[str, Any]):
         """Broadcast message to all UI clients."""
-        disconnected = []
-        for connection in self.ui_connections:
-            try:
-                await connection.send_json(message)
-            except Exception:
-                disconnected.append(connection)
+        # Serialized once; queueing never waits on a slow client
+        data = json.dumps(message)
+        for outbox in list(self.ui_connections.values()):
+            outbox.send(data)
+            
+    async def publish_to_ui(self, client_id: str, message: Dict[str, Any]):
+        """Send a recorder's message to the UI clients subscribed to it."""
+        subscribers = self.subscriptions.subscribers(client_id, message["type"])
+        if not subscribers:
+            return
+        data = json.dumps(message)
+        for websocket in subscribers:
+            outbox = self.ui_connections.get(websocket)
+            if outbox:
+                outbox.send(data)
                 
-        for conn in disconnected:
-            self.disconnect_ui(conn)
+    def send_recorder_status(self, websocket: WebSocket, client_id: str):
+        """Send one UI client the hub's copy of a recorder's status."""
+        recorder = self.recorder_connections[client_id]
+        self.send_to_ui(websocket, {
+            "type": "recorder_status",
+            "client_id": client_id,
+            "version": recorder.status.forwarded_version,
+            "status": recorder.status.fields
+        })
+        
+    def send_to_ui(self, websocket: WebSocket, message: Dict[str, Any]):
+        """Queue a message for one UI client."""
+        outbox = self.ui_connections.get(websocket)
+        if outbox:
+            outbox.send(json.dumps(message))
             
+    def recorder_outbox_closed(self, client_id: str, outbox: Outbox):
+        """Drop a recorder whose connection failed or fell too far behind."""
+        recorder = self.recorder_connections.get(client_id)
+        if recorder and recorder.outbox is outbox:
+            self.disconnect_recorder(client_id)
+            
+    def connection_metrics(self) -> Dict[str, Any]:
+        """Send queue depth, drops and lag of every connection."""
+        return {
+            "ui": [outbox.metrics() for outbox in self.ui_connections.values()],
+            "recorders": {
+                client_id: recorder.outbox.metrics()
+                for client_id, recorder in self.recorder_connections.items()
+            },
+            "clocks": {
+                client_id: recorder.clock.as_dict()
+                for client_id, recorder in self.recorder_connections.items()
+            }
+        }
+        
+
     def get_recorders_status(self) -> Dict[str, Any]:
         """Get status of all connected recorders."""
         return {
-            client_id: recorder.status
+            client_id: recorder.status.fields
             for client_id, recorder in self.recorder_connections.items()
         }
         
-    async def get_recordings(self) -> List[Dict[str, Any]]:
-        """Get list of all recordings."""
-        recordings = []
-        recordings_dir = Path("recordings")
+    async def status_changed(self, client_id: str):
+        """Forward a recorder's status change with the others arriving within the tick."""
+        self.status_pending.add(client_id)
+        if self.status_tick <= 0:
+            await self.flush_statuses()
+        elif self._status_flush is None:
+            self._status_flush = asyncio.create_task(self._flush_after_tick())
+            
+    async def _flush_after_tick(self):
+        await asyncio.sleep(self.status_tick)
+        self._status_flush = None
+        await self.flush_statuses()
         
-        if recordings_dir.exists():
-            for json_file in recordings_dir.glob("*.json"):
-                try:
-                    with open(json_file, 'r') as f:
-                        metadata = json.load(f)
-                    wav_file = json_file.with_suffix('.wav')
-                    if wav_file.exists():
-                        recordings.append({
-                            "filename": wav_file.name,
-                            "metadata": metadata,
-                            "size": wav_file.stat().st_size,
-                            "created": datetime.fromtimestamp(wav_file.stat().st_ctime).isoformat()
-                        })
-                except Exception as e:
-                    logger.error(f"Error reading recording: {e}")
-                    
-        return sorted(recordings, key=lambda x: x['created'], reverse=True)
+    async def flush_statuses(self):
+        """Send UI clients one update for each recorder whose status changed."""
+        pending, self.status_pending = self.status_pending, set()
+        for client_id in pending:
+            recorder = self.recorder_connections.get(client_id)
+            update = recorder.status.take_update() if recorder else None
+            if update:
+                await self.publish_to_ui(client_id, {"client_id": client_id, **update})
         
-    async def update_recordings(self):
-        """Update recordings list and notify UI clients."""
-        self.recordings = await self.get_recordings()
-        await self.broadcast_to_ui({
-            "type": "recordings_updated",
-            "recordings": self.recordings
-        })
+    async def get_recordings(self, **filters) -> Dict[str, Any]:
+        """Get a page of recordings, newest first, from the catalog.
+
+        Takes the catalog's ``query`` arguments: a ``cursor`` and ``limit``,
+        and device, client_id, since/until and min/max_duration filters.
+        """
+        return await self.catalog.query(**filters)
+        
+    async def initial_recordings(self) -> Dict[str, Any]:
+        """The first page of recordings for a newly connected client."""
+        page = await self.get_recordings()
+        return {"recordings": page["recordings"], "recordings_cursor": page["next_cursor"]}
+        
+    async def update_recordings(self, changed: List[Dict[str, Any]], removed: List[str] = ()):
+        """Push only the recordings added, changed or removed to UI clients."""
+        if changed or removed:
+            await self.broadcast_to_ui({
+                "type": "recordings_changed",
+                "changed": changed,
+                "removed": list(removed)
+            })
+            
+    async def recording_completed(self, client_id: str, filename: Optional[str]):
+        """Index a recording a recorder reports complete and push it to UI clients."""
+        if not filename:
+            return
+        entry = await self.catalog.refresh(filename, client_id)
+        if entry:
+            await self.update_recordings([entry])
+        else:
+            await self.update_recordings([], [filename])
 
 
 # Create global manager
 manager = WebSocketUIManager()
+spectrograms = SpectrogramService(Path("recordings"))
+
+@app.on_event("startup")
+async def startup_event():
+    """Reconcile the recordings catalog and start watching the recordings directory."""
+    await manager.catalog.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop spectrogram worker processes and the catalog."""
+    spectrograms.shutdown()
+    await manager.catalog.stop()
 
 @app.websocket("/ws")
 async def websocket_ui_endpoint(websocket: WebSocket):
@@ -280,7 +651,17 @@ async def websocket_recorder_endpoint(websocket: WebSocket):
     
     try:
         while True:
-            data = await websocket.receive_json()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+                
+            # Binary messages carry live monitoring audio
+            if message.get("bytes") is not None:
+                if client_id:
+                    await manager.handle_recorder_audio(client_id, message["bytes"])
+                continue
+                
+            data = json.loads(message["text"])
             
             # Extract client_id from registration or any message
             if not client_id and data.get("client_id"):
@@ -290,19 +671,99 @@ async def websocket_recorder_endpoint(websocket: WebSocket):
             
     except WebSocketDisconnect:
         if client_id:
-            manager.disconnect_recorder(client_id)
+            manager.disconnect_recorder(client_id, websocket)
     except Exception as e:
         logger.error(f"Recorder WebSocket error: {e}")
         if client_id:
-            manager.disconnect_recorder(client_id)
+            manager.disconnect_recorder(client_id, websocket)
+
+@app.post("/api/commands")
+async def post_command(request: Request):
+    """Send a command and wait for the recorders' acknowledgements.
+
+    Body: ``{"client_id": "<id>" or "all", "command": ..., "payload": {...},
+    "timeout": seconds}``. Returns the fan-out result.
+    """
+    body = await request.json()
+    client_id = body.get("client_id")
+    if not body.get("command"):
+        return JSONResponse(status_code=400, content={"error": "No command"})
+    if client_id != "all" and client_id not in manager.recorder_connections:
+        return JSONResponse(status_code=404, content={"error": f"Recorder {client_id} not connected"})
+    try:
+        timeout = float(body.get("timeout") or COMMAND_TIMEOUT)
+    except (TypeError, ValueError):
+        return JSONResponse(status_code=400, content={"error": "Invalid timeout"})
+    return await manager.run_command(client_id, body["command"], body.get("payload", {}), timeout)
+
+@app.get("/api/connections")
+async def get_connection_metrics():
+    """Per-connection send queue metrics."""
+    return manager.connection_metrics()
+
+@app.get("/api/recordings")
+async def list_recordings(request: Request):
+    """List recordings, newest first, a page at a time.
+
+    Query parameters: ``cursor`` (from the previous page's ``next_cursor``),
+    ``limit``, ``device``, ``client_id``, ``since``/``until`` (ISO 8601 or
+    Unix time) and ``min_duration``/``max_duration`` (seconds).
+    """
+    try:
+        return await manager.get_recordings(**query_filters(request.query_params))
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
 
 @app.get("/api/recordings/{filename}")
-async def download_recording(filename: str):
-    """Download a recording file."""
+async def download_recording(filename: str, start: Optional[float] = None, end: Optional[float] = None,
+                             channel: Optional[int] = None):
+    """Download a recording file, or the range ``start``..``end`` seconds of it."""
     file_path = Path("recordings") / filename
     if not file_path.exists() or not file_path.is_file():
         return JSONResponse(status_code=404, content={"error": "Recording not found"})
-    return FileResponse(file_path, media_type="audio/wav", filename=filename)
+    if start is None and end is None and channel is None:
+        return FileResponse(file_path, media_type="audio/wav", filename=filename)
+    
+    # Ranges are streamed from a memory map, so only the requested pages are read
+    loop = asyncio.get_event_loop()
+    try:
+        recording = await loop.run_in_executor(None, Recording, file_path)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    if channel is not None and not 0 <= channel < recording.channels:
+        return JSONResponse(status_code=400, content={"error": f"No channel {channel}"})
+    first = recording.frame_at(start or 0.0)
+    stop = recording.frames if end is None else recording.frame_at(end)
+    name = f"{file_path.stem}_{first}-{stop}.wav"
+    return StreamingResponse(recording.wav_bytes(first, stop, channel), media_type="audio/wav",
+                             headers={"Content-Disposition": f'attachment; filename="{name}"'})
+
+@app.get("/api/recordings/{filename}/peaks")
+async def get_recording_peaks(filename: str, start: float = 0.0, end: Optional[float] = None, width: int = 1000):
+    """Get waveform peaks for a time range at the resolution needed for ``width`` pixels."""
+    # Recordings still in progress are served from their level-0 spool
+    peaks_path = find_peaks(Path("recordings") / filename)
+    if peaks_path is None:
+        return JSONResponse(status_code=404, content={"error": "Peaks not found"})
+    loop = asyncio.get_event_loop()
+    try:
+        peaks = await loop.run_in_executor(None, read_peaks, peaks_path, start, end, max(1, width))
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return JSONResponse(content=peaks)
+
+@app.get("/api/recordings/{filename}/spectrogram/{zoom}/{index}")
+async def get_spectrogram_tile(filename: str, zoom: int, index: int, nfft: int = 1024):
+    """Get a spectrogram tile covering 2**zoom seconds as a PNG."""
+    try:
+        tile = await spectrograms.get_tile(filename, zoom, index, nfft)
+    except FileNotFoundError:
+        return JSONResponse(status_code=404, content={"error": "Recording not found"})
+    except IndexError as e:
+        return JSONResponse(status_code=404, content={"error": str(e)})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return Response(content=tile, media_type="image/png", headers={"Cache-Control": "max-age=3600"})
 
 # Serve static files
 static_dir = Path(__file__).parent / "static"
@@ -334,8 +795,11 @@ async def main():
     
     parser = argparse.ArgumentParser(description="WebSocket UI Server")
     parser.add_argument("--port", type=int, default=8080, help="Web server port")
+    parser.add_argument("--status-tick", type=float, default=STATUS_TICK,
+                        help="Seconds recorder status changes are collected before forwarding; 0 forwards each one")
     
     args = parser.parse_args()
+    manager.status_tick = args.status_tick
     
     # Setup signal handlers
     def signal_handler(sig, frame):